@@ -4,8 +4,9 @@ Base: nik0finance
 Melhorado com: Multi-tenant, Contas, Cartões, Parcelamentos, Recorrências
 """
 
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, g, make_response
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime, timedelta
 from functools import wraps
 import sqlite3
@@ -19,7 +20,28 @@ from dotenv import load_dotenv
 from services.api_connectors import InvestmentAPIFactory
 from services.investment_calculator import InvestmentCalculator
 from services.investment_ai_advisor import InvestmentAIAdvisor
+from services.transaction_queries import (
+    parse_filters as parse_transaction_filters,
+    fetch_page as fetch_transactions_page,
+    fetch_totals as fetch_transactions_totals
+)
+from services.card_ledger import card_ledger
+from services.change_log import change_log
+from services.notification_preferences import notification_preferences
+from services.transaction_service import check_high_expense, transaction_service
+from services.phone_directory import mask_phone, normalize_phone, phone_directory
+from services.principal import (
+    current_principal, load_principal, new_principal_version, principal_cache, refresh_principal
+)
+from services.transaction_batch import BatchValidationError, transaction_batch
 from utils.formatters import format_brl
+from services import metrics, static_assets
+from services.render_cache import (
+    FragmentCacheExtension,
+    bytecode_cache as jinja_bytecode_cache,
+    cached_page,
+    get_stats as get_render_cache_stats
+)
 
 load_dotenv()
 
@@ -33,15 +55,37 @@ app.config['SESSION_COOKIE_SECURE'] = False  # True se usar HTTPS
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 
+# Atrás do nginx: remote_addr e scheme vêm do X-Forwarded-* gravado pelos proxies
+# confiáveis (TRUSTED_PROXY_HOPS); sem proxy (0), os cabeçalhos são ignorados
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
+
 # Registrar filtro customizado BRL
 app.jinja_env.filters['brl'] = format_brl
 
+# Cache de renderização: {% cache %} para fragmentos e bytecode dos templates em disco
+app.jinja_env.add_extension(FragmentCacheExtension)
+app.jinja_env.bytecode_cache = jinja_bytecode_cache()
+
+# Assets com fingerprint (scripts/build_assets.py): {{ asset_url('js/arquivo.js') }}
+app.jinja_env.globals['asset_url'] = static_assets.asset_url
+
+# Usuário da sessão resolvido uma vez por request (g.principal, sem o hash da senha)
+app.before_request(load_principal)
+
+# Latência por rota, SQL e chamadas externas (/metrics, Server-Timing opcional)
+metrics.init_app(app)
+
 # Registrar blueprints de API
 from routes.accounts import accounts_bp
 from routes.recurring import recurring_bp
 from routes.installments import installments_bp
 from routes.investments import investments_bp
 from routes.bank_import import import_bp
+from routes.export import export_bp
+from routes.stream import stream_bp
+from routes.sync import sync_bp
 
 # AI blueprint - carregamento opcional (requer sklearn/scipy)
 # try:
@@ -57,6 +101,9 @@ app.register_blueprint(recurring_bp)
 app.register_blueprint(installments_bp)
 app.register_blueprint(investments_bp)
 app.register_blueprint(import_bp)
+app.register_blueprint(export_bp)
+app.register_blueprint(stream_bp)
+app.register_blueprint(sync_bp)
 
 # WhatsApp GPT Integration
 from routes.whatsapp_gpt import whatsapp_gpt_bp
@@ -67,10 +114,16 @@ from routes.notifications import notifications_bp
 app.register_blueprint(notifications_bp)
 print("✅ Notifications routes loaded")
 
-# Auto Notifications Service (Scheduler)
+# Jobs agendados: todos os workers registram, só o líder (lease no SQLite) executa
+from scheduler import register_jobs as register_scheduler_jobs
+from services.job_runner import job_runner
+register_scheduler_jobs()
+job_runner.start()  # Independe de AUTO_NOTIFICATIONS_ENABLED
+
+# Auto Notifications Service (registra seus jobs no mesmo runner)
 from services.auto_notifications import notification_service
 notification_service.start()
-print("✅ Auto Notifications Scheduler started")
+print("✅ Auto Notifications jobs registered")
 
 # =====================================================
 # DATABASE HELPERS
@@ -78,7 +131,7 @@ print("✅ Auto Notifications Scheduler started")
 
 def get_db():
     """Conecta ao banco de dados SQLite"""
-    db = sqlite3.connect(app.config['DATABASE'], timeout=30.0, check_same_thread=False)
+    db = metrics.connect(app.config['DATABASE'], timeout=30.0, check_same_thread=False)
     db.row_factory = sqlite3.Row
     db.execute('PRAGMA journal_mode=WAL')  # Write-Ahead Logging para melhor concorrência
     return db
@@ -221,18 +274,9 @@ def login_required(f):
     return decorated_function
 
 def get_current_user():
-    """Retorna dados do usuário atual"""
-    if 'user_id' not in session:
-        return None
-    
-    db = get_db()
-    user = db.execute(
-        "SELECT id, tenant_id, email, name, is_admin, password_hash as password, phone FROM users WHERE id = ?",
-        (session['user_id'],)
-    ).fetchone()
-    db.close()
-    
-    return dict(user) if user else None
+    """Retorna dados do usuário atual (principal do request, sem o hash da senha)"""
+    principal = current_principal()
+    return dict(principal) if principal else None
 
 # =====================================================
 # TEMPLATE FILTERS
@@ -306,6 +350,7 @@ def login():
             session['tenant_id'] = user['tenant_id']
             session['user_name'] = user['name']
             session['is_admin'] = user['is_admin']
+            session['principal_version'] = new_principal_version()
             flash(f'Bem-vindo(a), {user["name"]}!', 'success')
             return redirect(url_for('dashboard'))
         else:
@@ -369,8 +414,23 @@ def offline():
     """Página offline para PWA"""
     return render_template('offline.html')
 
+@app.route('/service-worker.js')
+def service_worker():
+    """Service worker gerado a partir do manifesto de assets (escopo /)"""
+    response = make_response(render_template('service-worker.js', **static_assets.service_worker_context()))
+    response.headers['Content-Type'] = 'application/javascript; charset=utf-8'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Service-Worker-Allowed'] = '/'
+    return response
+
+@app.route('/static/dist/<path:filename>')
+def fingerprinted_asset(filename):
+    """Assets com fingerprint: cache imutável e variante .br/.gz"""
+    return static_assets.send_asset(filename)
+
 @app.route('/settings')
 @login_required
+@cached_page
 def settings():
     """Página de configurações do perfil"""
     user = get_current_user()
@@ -421,9 +481,9 @@ def api_register_with_whatsapp():
         if existing_email:
             return jsonify({'error': 'Este email já está cadastrado'}), 400
         
-        # Verificar se WhatsApp já existe
-        existing_phone = db.execute("SELECT id FROM users WHERE phone = ?", (phone,)).fetchone()
-        if existing_phone:
+        # Verificar se WhatsApp já existe (comparando em E.164)
+        phone_normalized = normalize_phone(whatsapp)
+        if phone_directory.owner(db, whatsapp):
             return jsonify({'error': 'Este WhatsApp já está cadastrado'}), 400
         
         # Pegar ou criar tenant padrão
@@ -443,9 +503,9 @@ def api_register_with_whatsapp():
         
         db.execute(
             """INSERT INTO users 
-               (id, tenant_id, email, password_hash, name, phone, active) 
-               VALUES (?, ?, ?, ?, ?, ?, 1)""",
-            (user_id, tenant_id, email, password_hash, name, phone)
+               (id, tenant_id, email, password_hash, name, phone, phone_normalized, active) 
+               VALUES (?, ?, ?, ?, ?, ?, ?, 1)""",
+            (user_id, tenant_id, email, password_hash, name, phone, phone_normalized)
         )
         
         # Criar conta padrão
@@ -460,6 +520,9 @@ def api_register_with_whatsapp():
         db.commit()
         db.close()
         
+        # Remetente pode estar no cache negativo (mensagem antes do cadastro)
+        phone_directory.invalidate(phones=[whatsapp])
+        
         print(f"✅ Novo usuário cadastrado via WhatsApp:")
         print(f"   Nome: {name}")
         print(f"   Email: {email}")
@@ -506,12 +569,18 @@ def api_update_profile():
         if existing:
             return jsonify({'success': False, 'message': 'Email já está em uso'}), 400
         
+        owner = phone_directory.owner(db, phone)
+        if owner and owner != user['id']:
+            return jsonify({'success': False, 'message': 'WhatsApp já está em uso'}), 400
+        
         db.execute('''
             UPDATE users 
-            SET name = ?, email = ?, phone = ?, updated_at = CURRENT_TIMESTAMP
+            SET name = ?, email = ?, phone = ?, phone_normalized = ?, updated_at = CURRENT_TIMESTAMP
             WHERE id = ?
-        ''', (name, email, phone, user['id']))
+        ''', (name, email, phone, normalize_phone(phone), user['id']))
         db.commit()
+        phone_directory.invalidate(user['id'], phones=[phone])
+        refresh_principal(user['id'])
         
         return jsonify({'success': True, 'message': 'Perfil atualizado com sucesso'})
     except Exception as e:
@@ -539,14 +608,15 @@ def api_change_password():
         if len(new_password) < 6:
             return jsonify({'success': False, 'message': 'A senha deve ter no mínimo 6 caracteres'}), 400
         
-        # Verifica senha atual
-        if not check_password_hash(user['password'], current_password):
+        # Verifica senha atual (o hash não faz parte do principal)
+        row = db.execute('SELECT password_hash FROM users WHERE id = ?', (user['id'],)).fetchone()
+        if not row or not check_password_hash(row['password_hash'], current_password):
             return jsonify({'success': False, 'message': 'Senha atual incorreta'}), 401
         
         # Atualiza senha
         new_password_hash = generate_password_hash(new_password)
         db.execute(
-            'UPDATE users SET password = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+            'UPDATE users SET password_hash = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
             (new_password_hash, user['id'])
         )
         db.commit()
@@ -612,6 +682,7 @@ def api_notification_settings():
                 data.get('weekly_report', True)
             ))
             db.commit()
+            notification_preferences.invalidate(user['id'])
             
             return jsonify({'success': True, 'message': 'Configurações salvas'})
     except Exception as e:
@@ -738,6 +809,7 @@ def api_privacy_settings():
 
 @app.route('/dashboard')
 @login_required
+@cached_page
 def dashboard():
     """Dashboard principal (estilo nik0finance melhorado)"""
     user = get_current_user()
@@ -816,12 +888,12 @@ def dashboard():
     """, (user['tenant_id'],)).fetchall()
     
     # Cartões de crédito para o formulário de adicionar transação
-    cards = db.execute("""
-        SELECT id, name, limit_amount, COALESCE(used_limit, 0) as used_limit
+    cards = card_ledger.annotate(db, db.execute("""
+        SELECT id, name, limit_amount, closing_day, due_day
         FROM cards
         WHERE user_id = ? AND tenant_id = ? AND active = 1
         ORDER BY name
-    """, (user['id'], user['tenant_id'])).fetchall()
+    """, (user['id'], user['tenant_id'])).fetchall())
     
     # Próximas parcelas a vencer (próximos 30 dias)
     upcoming_installments = []
@@ -920,64 +992,17 @@ def dashboard():
 @app.route('/transactions')
 @login_required
 def all_transactions():
-    """Página com TODAS as transações com filtros"""
+    """Página com as transações (paginadas por cursor) e filtros"""
     user = get_current_user()
     db = get_db()
     
     # Pegar filtros da query string
-    type_filter = request.args.get('type', '')
-    category_filter = request.args.get('category', '')
-    start_date = request.args.get('start_date', '')
-    end_date = request.args.get('end_date', '')
-    
-    # Montar query base
-    query = """
-        SELECT 
-            t.id,
-            t.description,
-            t.value,
-            t.type,
-            t.date,
-            t.account_id,
-            t.category_id,
-            t.is_fixed,
-            t.card_id,
-            c.name as category_name,
-            c.icon as category_icon,
-            cards.name as card_name
-        FROM transactions t
-        LEFT JOIN categories c ON t.category_id = c.id
-        LEFT JOIN cards ON t.card_id = cards.id
-        WHERE t.user_id = ? AND t.tenant_id = ?
-    """
-    
-    params = [user['id'], user['tenant_id']]
-    
-    # Aplicar filtros
-    if type_filter:
-        query += " AND t.type = ?"
-        params.append(type_filter)
-    
-    if category_filter:
-        query += " AND t.category_id = ?"
-        params.append(category_filter)
+    filters = parse_transaction_filters(request.args)
     
-    if start_date:
-        query += " AND t.date >= ?"
-        params.append(start_date)
-    
-    if end_date:
-        query += " AND t.date <= ?"
-        params.append(end_date)
-    
-    query += " ORDER BY t.date DESC, t.created_at DESC"
-    
-    transactions = db.execute(query, params).fetchall()
-    
-    # Calcular totais
-    total_receitas = sum(float(t['value']) for t in transactions if t['type'] == 'Receita')
-    total_despesas = sum(float(t['value']) for t in transactions if t['type'] == 'Despesa')
-    total_transactions = len(transactions)
+    # Primeira página + totais dos filtros em uma única agregação SQL
+    page = fetch_transactions_page(db, user['id'], user['tenant_id'], filters,
+                                   cursor=request.args.get('cursor'))
+    totals = fetch_transactions_totals(db, user['id'], user['tenant_id'], filters)
     
     # Buscar categorias para o filtro
     categories = db.execute("""
@@ -996,13 +1021,62 @@ def all_transactions():
     db.close()
     
     return render_template('all_transactions.html',
-                         transactions=[dict(t) for t in transactions],
-                         total_transactions=total_transactions,
-                         total_receitas=total_receitas,
-                         total_despesas=total_despesas,
+                         transactions=page['transactions'],
+                         next_cursor=page['next_cursor'],
+                         total_transactions=totals['total_transactions'],
+                         total_receitas=totals['total_receitas'],
+                         total_despesas=totals['total_despesas'],
                          categories=[dict(c) for c in categories],
                          accounts=[dict(a) for a in accounts])
 
+@app.route('/api/transactions')
+@login_required
+def api_transactions():
+    """
+    GET /api/transactions?cursor=&limit=50&type=&category=&account_id=&card_id=&start_date=&end_date=
+    Lista transações paginadas por cursor (rolagem infinita)
+    
+    Os totais só são calculados na primeira página (sem cursor) ou com
+    include_totals=1; as páginas seguintes usam apenas o índice.
+    """
+    user = get_current_user()
+    db = get_db()
+    
+    try:
+        filters = parse_transaction_filters(request.args)
+        cursor = request.args.get('cursor')
+        
+        page = fetch_transactions_page(db, user['id'], user['tenant_id'], filters,
+                                       cursor=cursor,
+                                       limit=request.args.get('limit', 50, type=int))
+        
+        if not cursor or request.args.get('include_totals') == '1':
+            page['totals'] = fetch_transactions_totals(db, user['id'], user['tenant_id'], filters)
+        
+        return jsonify({'success': True, **page})
+    finally:
+        db.close()
+
+@app.route('/api/transactions/batch', methods=['POST'])
+@login_required
+def api_transactions_batch():
+    """
+    POST /api/transactions/batch
+    Lista de operações create/update/delete com idempotency_key (ver
+    services/transaction_batch); validada inteira antes de gravar e aplicada
+    em um único commit. Retorna um resultado por operação.
+    """
+    user = get_current_user()
+    payload = request.get_json(silent=True)
+    operations = payload.get('operations') if isinstance(payload, dict) else payload
+    
+    try:
+        batch = transaction_batch.apply(user['id'], user['tenant_id'], operations)
+    except BatchValidationError as e:
+        return jsonify({'success': False, 'errors': e.errors}), 400
+    
+    return jsonify({'success': True, **batch})
+
 # =====================================================
 # ACCOUNTS (CONTAS BANCÁRIAS)
 # =====================================================
@@ -1173,13 +1247,13 @@ def cards():
     user = get_current_user()
     db = get_db()
     
-    cards_list = db.execute("""
+    cards_list = card_ledger.annotate(db, db.execute("""
         SELECT c.*, a.name as account_name
         FROM cards c
         LEFT JOIN accounts a ON c.account_id = a.id
         WHERE c.user_id = ? AND c.tenant_id = ? AND c.active = 1
         ORDER BY c.name
-    """, (user['id'], user['tenant_id'])).fetchall()
+    """, (user['id'], user['tenant_id'])).fetchall())
     
     # Pegar contas para o form
     accounts = db.execute("""
@@ -1284,21 +1358,21 @@ def api_cards_list():
     user = get_current_user()
     db = get_db()
     
-    cards = db.execute("""
+    cards = card_ledger.annotate(db, db.execute("""
         SELECT c.id, c.name, c.last_digits, c.brand, c.limit_amount, 
-               COALESCE(c.used_limit, 0) as used_limit,
+               c.closing_day, c.due_day,
                a.name as account_name
         FROM cards c
         LEFT JOIN accounts a ON c.account_id = a.id
         WHERE c.user_id = ? AND c.tenant_id = ? AND c.active = 1
         ORDER BY c.name ASC
-    """, (user['id'], user['tenant_id'])).fetchall()
+    """, (user['id'], user['tenant_id'])).fetchall())
     
     db.close()
     
     return jsonify({
         'success': True,
-        'cards': [dict(c) for c in cards]
+        'cards': cards
     })
 
 @app.route('/api/cards', methods=['GET'])
@@ -1316,7 +1390,6 @@ def api_cards():
                 c.last_digits, 
                 c.brand, 
                 c.limit_amount, 
-                COALESCE(c.used_limit, 0) as used_limit,
                 c.closing_day,
                 c.due_day,
                 c.active,
@@ -1327,15 +1400,12 @@ def api_cards():
             ORDER BY c.name ASC
         """, (user['id'], user['tenant_id'])).fetchall()
         
+        # Converter para dict e adicionar limite usado/disponível e faturas (ledger)
+        cards_list = card_ledger.annotate(db, cards)
         db.close()
         
-        # Converter para dict e adicionar campos calculados
-        cards_list = []
-        for c in cards:
-            card_dict = dict(c)
+        for card_dict in cards_list:
             card_dict['limit'] = card_dict.get('limit_amount', 0)
-            card_dict['available_limit'] = (card_dict.get('limit_amount', 0) - card_dict.get('used_limit', 0))
-            cards_list.append(card_dict)
         
         return jsonify({
             'success': True,
@@ -1519,6 +1589,7 @@ def create_installment_web():
         total_amount = float(request.form.get('total_amount'))
         installment_count = int(request.form.get('installment_count'))
         interest_rate = float(request.form.get('interest_rate', 0))
+        amortization_system = request.form.get('amortization_system') or 'simples'
         first_due_date = request.form.get('first_due_date')
         account_id = request.form.get('account_id') or None
         card_id = request.form.get('card_id') or None
@@ -1531,6 +1602,7 @@ def create_installment_web():
             'total_amount': total_amount,
             'installment_count': installment_count,
             'interest_rate': interest_rate,
+            'amortization_system': amortization_system,
             'first_due_date': first_due_date,
             'account_id': account_id,
             'card_id': card_id,
@@ -1555,6 +1627,7 @@ def create_installment_web():
 
 @app.route('/investments')
 @login_required
+@cached_page
 def investments_page():
     """Página de listagem de investimentos"""
     try:
@@ -1641,6 +1714,7 @@ def investments_page():
         print(f"❌ Erro na página de investimentos: {e}")
         import traceback
         traceback.print_exc()
+        g.render_no_etag = True
         
         # Retornar com dados vazios em caso de erro
         return render_template('investments.html', 
@@ -1796,6 +1870,7 @@ def add_investment():
 
 @app.route('/investments/<int:investment_id>')
 @login_required
+@cached_page
 def investment_details(investment_id):
     """Página de detalhes de um investimento"""
     user = get_current_user()
@@ -1882,10 +1957,12 @@ def update_investment_quotes():
     
     updated = 0
     errors = 0
+    events = []
     
     try:
         # Usar o novo serviço de API
         from services.api_connectors import InvestmentAPIFactory
+        from services.event_stream import event_stream, quote_event, portfolio_event
         
         # Buscar investimentos ativos COM quantidade
         investments = db.execute("""
@@ -1894,6 +1971,10 @@ def update_investment_quotes():
             WHERE user_id = ? AND tenant_id = ? AND investment_status = 'active'
         """, (user['id'], user['tenant_id'])).fetchall()
         
+        # Limite de variação para notificar (lido uma vez, fora do loop)
+        from services.notification_center import notify_investment_change
+        change_threshold = notification_preferences.get(user['id']).get('investment_change_threshold', 5.0)
+        
         for inv in investments:
             # Converter Row para dict
             inv_dict = dict(inv)
@@ -1955,17 +2036,16 @@ def update_investment_quotes():
                 """, (new_current_value, inv_dict['id']))
                 
                 updated += 1
+                events.append(quote_event(
+                    user['id'], user['tenant_id'], inv_dict['id'], inv_dict['name'],
+                    new_price, quantity_owned, inv_dict['amount'], new_current_value
+                ))
                 
                 # Calcular rentabilidade para exibir
                 profit_pct = ((new_current_value - inv_dict['amount']) / inv_dict['amount'] * 100) if inv_dict['amount'] > 0 else 0
                 
                 # NOTIFICAÇÃO: Variação relevante de investimento
-                from services.notification_center import notify_investment_change, NotificationCenter
-                center = NotificationCenter()
-                prefs = center.get_user_preferences(user['id'])
-                threshold = prefs.get('investment_change_threshold', 5.0)
-                
-                if abs(profit_pct) >= threshold:
+                if abs(profit_pct) >= change_threshold:
                     notify_investment_change(user['id'], user['tenant_id'], inv_dict['name'], profit_pct)
                 
                 print(f"✅ {inv_dict['name']}: Qtd {quantity_owned} × R$ {new_price:.2f} = R$ {new_current_value:.2f} ({profit_pct:+.2f}%)")
@@ -1975,6 +2055,10 @@ def update_investment_quotes():
         
         db.commit()
         
+        # Páginas abertas recebem os novos valores via SSE (sem recarregar)
+        events.append(portfolio_event(db, user['id'], user['tenant_id'], updated, errors))
+        event_stream.publish_many(events)
+        
         return jsonify({
             'success': True,
             'updated': updated,
@@ -2019,78 +2103,58 @@ def add_transaction():
         flash('Selecione um cartão de crédito para transações no crédito!', 'error')
         return redirect(url_for('dashboard'))
     
-    db = get_db()
-    
-    # Se for parcelado (mais de 1x), criar as parcelas
-    if installments > 1 and payment_method == 'credito':
-        installment_id = str(uuid.uuid4())
-        installment_value = value / installments
+    # Inserção, saldo da conta e faturas do cartão em um único commit
+    # (services/transaction_service); a notificação roda depois, fora da requisição
+    with transaction_service.unit_of_work() as uow:
+        db = uow.conn
         
-        # Criar o registro de parcelamento
-        db.execute("""
-            INSERT INTO installments (id, user_id, tenant_id, description, total_value, installment_count, category_id, card_id, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (installment_id, user['id'], user['tenant_id'], description, value, installments, category_id, card_id, datetime.now()))
-        
-        # Criar cada parcela como uma transação
-        from dateutil.relativedelta import relativedelta
-        base_date = datetime.strptime(date, '%Y-%m-%d')
-        
-        for i in range(installments):
-            transaction_id = str(uuid.uuid4())
-            installment_date = (base_date + relativedelta(months=i)).strftime('%Y-%m-%d')
-            installment_desc = f"{description} - Parcela {i+1}/{installments}"
-            installment_status = 'Pago' if i == 0 else 'Pendente'
+        # Se for parcelado (mais de 1x), criar as parcelas
+        if installments > 1 and payment_method == 'credito':
+            installment_id = str(uuid.uuid4())
+            installment_value = value / installments
             
+            # Criar o registro de parcelamento
             db.execute("""
-                INSERT INTO transactions (id, user_id, tenant_id, account_id, category_id, card_id, type, description, value, date, status, is_fixed, payment_method, installment_id, installment_number, paid_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (transaction_id, user['id'], user['tenant_id'], account_id, category_id, card_id, trans_type, installment_desc, installment_value, installment_date, installment_status, is_fixed, payment_method, installment_id, i+1, datetime.now() if installment_status == 'Pago' else None))
-        
-        # Deduzir do limite do cartão apenas o valor total (não por parcela)
-        if card_id and trans_type == 'Despesa':
-            db.execute("""
-                UPDATE cards 
-                SET used_limit = COALESCE(used_limit, 0) + ?
-                WHERE id = ? AND user_id = ?
-            """, (value, card_id, user['id']))
-        
-        flash(f'Compra parcelada em {installments}x de R$ {installment_value:.2f}!', 'success')
-    else:
-        # Transação à vista (sem parcelamento)
-        transaction_id = str(uuid.uuid4())
-        
-        db.execute("""
-            INSERT INTO transactions (id, user_id, tenant_id, account_id, category_id, card_id, type, description, value, date, status, is_fixed, payment_method, paid_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (transaction_id, user['id'], user['tenant_id'], account_id, category_id, card_id, trans_type, description, value, date, status, is_fixed, payment_method, datetime.now() if status == 'Pago' else None))
-        
-        # Se a transação for com cartão e for despesa, deduzir do limite disponível
-        if card_id and trans_type == 'Despesa':
-            db.execute("""
-                UPDATE cards 
-                SET used_limit = COALESCE(used_limit, 0) + ?
-                WHERE id = ? AND user_id = ?
-            """, (value, card_id, user['id']))
-        
-        flash(f'Transação "{description}" adicionada!', 'success')
-    
-    db.commit()
-    db.close()
-    
-    # INTEGRAÇÃO: Atualizar saldo da conta
-    from routes.accounts import update_account_balance_after_transaction
-    update_account_balance_after_transaction(transaction_id)
-    
-    # NOTIFICAÇÃO: Gasto alto detectado
-    if trans_type == 'Despesa':
-        from services.notification_center import notify_high_expense, NotificationCenter
-        center = NotificationCenter()
-        prefs = center.get_user_preferences(user['id'])
-        threshold = prefs.get('high_expense_threshold', 500.0)
+                INSERT INTO installments (id, user_id, tenant_id, description, total_value, installment_count, category_id, card_id, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (installment_id, user['id'], user['tenant_id'], description, value, installments, category_id, card_id, datetime.now()))
+            
+            # Criar cada parcela como uma transação
+            from dateutil.relativedelta import relativedelta
+            base_date = datetime.strptime(date, '%Y-%m-%d')
+            
+            parcels = []
+            for i in range(installments):
+                installment_date = (base_date + relativedelta(months=i)).strftime('%Y-%m-%d')
+                installment_status = 'Pago' if i == 0 else 'Pendente'
+                parcels.append({
+                    'user_id': user['id'], 'tenant_id': user['tenant_id'], 'account_id': account_id,
+                    'category_id': category_id, 'card_id': card_id, 'type': trans_type,
+                    'description': f"{description} - Parcela {i+1}/{installments}",
+                    'value': installment_value, 'date': installment_date, 'status': installment_status,
+                    'is_fixed': is_fixed, 'payment_method': payment_method,
+                    'installment_id': installment_id, 'installment_number': i + 1,
+                    'paid_at': datetime.now() if installment_status == 'Pago' else None
+                })
+            uow.add_many(parcels)
+            
+            # Limite do cartão: cada parcela entra na fatura do seu ciclo (services/card_ledger)
+            
+            flash(f'Compra parcelada em {installments}x de R$ {installment_value:.2f}!', 'success')
+        else:
+            # Transação à vista (sem parcelamento)
+            uow.add(
+                user_id=user['id'], tenant_id=user['tenant_id'], account_id=account_id,
+                category_id=category_id, card_id=card_id, type=trans_type, description=description,
+                value=value, date=date, status=status, is_fixed=is_fixed, payment_method=payment_method,
+                paid_at=datetime.now() if status == 'Pago' else None
+            )
+            
+            flash(f'Transação "{description}" adicionada!', 'success')
         
-        if value >= threshold:
-            notify_high_expense(user['id'], user['tenant_id'], value, description)
+        # NOTIFICAÇÃO: Gasto alto detectado
+        if trans_type == 'Despesa':
+            uow.after_commit(check_high_expense, user['id'], user['tenant_id'], value, description)
     
     flash(f'Transação "{description}" adicionada!', 'success')
     return redirect(url_for('dashboard'))
@@ -2117,52 +2181,20 @@ def edit_transaction():
         flash('Selecione um cartão de crédito para transações no crédito!', 'error')
         return redirect(url_for('dashboard'))
     
-    db = get_db()
-    
-    # Buscar transação antiga para ajustar limite de cartão se necessário
-    old_transaction = db.execute("""
-        SELECT card_id, type, value 
-        FROM transactions 
-        WHERE id = ? AND user_id = ?
-    """, (transaction_id, user['id'])).fetchone()
+    # Atualizar a transação e os saldos das contas antiga/nova no mesmo commit
+    # (as faturas do cartão antigo e do novo são ajustadas por trigger)
+    with transaction_service.unit_of_work() as uow:
+        found = uow.update(
+            transaction_id, user['id'],
+            account_id=account_id, category_id=category_id, card_id=card_id, type=trans_type,
+            description=description, value=value, date=date, is_fixed=is_fixed,
+            payment_method=payment_method
+        )
     
-    if not old_transaction:
+    if not found:
         flash('Transação não encontrada!', 'error')
         return redirect(url_for('dashboard'))
     
-    # Restaurar limite do cartão antigo se havia
-    if old_transaction['card_id'] and old_transaction['type'] == 'Despesa':
-        db.execute("""
-            UPDATE cards 
-            SET used_limit = COALESCE(used_limit, 0) - ?
-            WHERE id = ? AND user_id = ?
-        """, (old_transaction['value'], old_transaction['card_id'], user['id']))
-    
-    # Atualizar a transação
-    db.execute("""
-        UPDATE transactions 
-        SET account_id = ?, category_id = ?, card_id = ?, type = ?, 
-            description = ?, value = ?, date = ?, is_fixed = ?, 
-            payment_method = ?, updated_at = CURRENT_TIMESTAMP
-        WHERE id = ? AND user_id = ?
-    """, (account_id, category_id, card_id, trans_type, description, value, 
-          date, is_fixed, payment_method, transaction_id, user['id']))
-    
-    # Deduzir do novo cartão se for crédito e despesa
-    if card_id and trans_type == 'Despesa':
-        db.execute("""
-            UPDATE cards 
-            SET used_limit = COALESCE(used_limit, 0) + ?
-            WHERE id = ? AND user_id = ?
-        """, (value, card_id, user['id']))
-    
-    db.commit()
-    db.close()
-    
-    # INTEGRAÇÃO: Atualizar saldo da conta
-    from routes.accounts import update_account_balance_after_transaction
-    update_account_balance_after_transaction(transaction_id)
-    
     flash(f'Transação "{description}" atualizada!', 'success')
     return redirect(url_for('dashboard'))
 
@@ -2171,42 +2203,15 @@ def edit_transaction():
 def delete_transaction(transaction_id):
     """Deleta transação"""
     user = get_current_user()
-    db = get_db()
     
-    # Buscar dados da transação antes de deletar (para restaurar limite do cartão)
-    transaction = db.execute("""
-        SELECT account_id, card_id, type, value 
-        FROM transactions 
-        WHERE id = ? AND user_id = ?
-    """, (transaction_id, user['id'])).fetchone()
+    # Deletar a transação e estornar o saldo no mesmo commit (a fatura do cartão é ajustada por trigger)
+    with transaction_service.unit_of_work() as uow:
+        found = uow.delete(transaction_id, user['id'])
     
-    if not transaction:
+    if not found:
         flash('Transação não encontrada!', 'error')
         return redirect(url_for('dashboard'))
     
-    account_id = transaction['account_id']
-    card_id = transaction['card_id']
-    trans_type = transaction['type']
-    value = transaction['value']
-    
-    # Se a transação era com cartão e despesa, devolver o limite
-    if card_id and trans_type == 'Despesa':
-        db.execute("""
-            UPDATE cards 
-            SET used_limit = COALESCE(used_limit, 0) - ?
-            WHERE id = ? AND user_id = ?
-        """, (value, card_id, user['id']))
-    
-    # Deletar a transação
-    db.execute("DELETE FROM transactions WHERE id = ? AND user_id = ?", (transaction_id, user['id']))
-    db.commit()
-    db.close()
-    
-    # INTEGRAÇÃO: Recalcular saldo da conta
-    if account_id:
-        from routes.accounts import recalculate_account_balance
-        recalculate_account_balance(account_id)
-    
     flash('Transação excluída!', 'success')
     return redirect(url_for('dashboard'))
 
@@ -2429,6 +2434,70 @@ def execute_recurring_now():
         'count': count
     })
 
+@app.route('/api/admin/jobs', methods=['GET'])
+@login_required
+def admin_jobs_status():
+    """Jobs agendados, líder atual e histórico de execuções (ADMIN apenas)"""
+    user = get_current_user()
+    
+    if not user or not user.get('is_admin'):
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    from services.job_runner import job_runner
+    history = min(request.args.get('history', 10, type=int), 200)
+    
+    return jsonify({
+        'success': True,
+        **job_runner.get_status(history=history)
+    })
+
+@app.route('/api/admin/providers', methods=['GET'])
+@login_required
+def admin_providers_status():
+    """Saúde das fontes de cotação: circuit breakers, acertos e latência p95 (ADMIN apenas)"""
+    user = get_current_user()
+
+    if not user or not user.get('is_admin'):
+        return jsonify({'error': 'Admin access required'}), 403
+
+    from services.api_connectors import stock_router
+
+    return jsonify({
+        'success': True,
+        **stock_router.get_stats()
+    })
+
+@app.route('/api/admin/render-cache', methods=['GET'])
+@login_required
+def admin_render_cache_status():
+    """Cache de fragmentos dos templates: ocupação e acertos (ADMIN apenas)"""
+    user = get_current_user()
+
+    if not user or not user.get('is_admin'):
+        return jsonify({'error': 'Admin access required'}), 403
+
+    return jsonify({
+        'success': True,
+        **get_render_cache_stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Métricas no formato texto do Prometheus (todos os workers)
+
+    Com METRICS_TOKEN definido exige "Authorization: Bearer <token>";
+    sem ele, só responde para localhost.
+    """
+    denied = metrics.scrape_denied(request)
+    if denied:
+        return jsonify({'error': 'Não autorizado'}), denied
+
+    response = make_response(metrics.collect())
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @app.route('/admin/update-investments', methods=['POST'])
 @login_required
 def admin_update_investments():
@@ -2629,34 +2698,16 @@ WHATSAPP_SERVER_URL = os.getenv('WHATSAPP_SERVER_URL', 'http://localhost:3000')
 WHATSAPP_AUTH_TOKEN = os.getenv('WHATSAPP_AUTH_TOKEN', 'change_me')
 
 def get_user_by_whatsapp(whatsapp_number):
-    """Busca usuário pelo número de WhatsApp"""
+    """Busca usuário pelo número de WhatsApp (índice E.164 + cache, services/phone_directory)"""
     try:
-        db = get_db()
-        # Remove @c.us se existir
-        clean_number = whatsapp_number.replace('@c.us', '')
-        
-        whatsapp_logger.info(f"🔍 Buscando usuário:")
-        whatsapp_logger.info(f"   Original: {whatsapp_number}")
-        whatsapp_logger.info(f"   Limpo: {clean_number}")
-        whatsapp_logger.info(f"   Com +: +{clean_number}")
-        
-        # Tentar buscar com e sem o sinal de +
-        user = db.execute('''
-            SELECT id, tenant_id, email, name, phone
-            FROM users
-            WHERE (phone = ? OR phone = ?) AND active = 1
-        ''', (clean_number, f'+{clean_number}')).fetchone()
+        user = phone_directory.resolve(whatsapp_number)
         
         if user:
-            whatsapp_logger.info(f"✅ Usuário encontrado: {dict(user)['name']} ({dict(user)['phone']})")
+            whatsapp_logger.info(f"✅ Usuário encontrado: {user['name']} ({mask_phone(user['phone'])})")
         else:
-            whatsapp_logger.warning(f"❌ Usuário NÃO encontrado!")
-            # Mostrar todos os usuários para debug
-            all_users = db.execute("SELECT phone FROM users WHERE active = 1").fetchall()
-            whatsapp_logger.warning(f"   Phones cadastrados: {[u[0] for u in all_users]}")
+            whatsapp_logger.warning(f"❌ Usuário NÃO encontrado: {mask_phone(normalize_phone(whatsapp_number))}")
         
-        db.close()
-        return dict(user) if user else None
+        return user
     except Exception as e:
         whatsapp_logger.error(f"Erro ao buscar usuário: {e}")
         return None
@@ -2672,13 +2723,6 @@ def whatsapp_webhook():
             return jsonify({'error': 'Unauthorized'}), 401
         
         data = request.json
-        print(f"\n{'='*60}")
-        print(f"DEBUG: Webhook recebido!")
-        print(f"  Data completa: {data}")
-        print(f"  Type: {data.get('type')}")
-        print(f"  From: {data.get('from')}")
-        print(f"  Text: {data.get('text')}")
-        print(f"{'='*60}\n")
         
         whatsapp_logger.info(f"📨 Webhook recebido: {data.get('type')} de {data.get('from')}")
         
@@ -3074,14 +3118,15 @@ def get_smart_account_or_card(db, user_id: str, tenant_id: str, transaction_text
             """, (user_id, tenant_id, f'%{mentioned_bank}%')).fetchone()
         
         if not card:
-            # Buscar cartão com maior limite disponível
-            card = db.execute("""
-                SELECT id, name, (limit_amount - COALESCE(used_limit, 0)) as available
+            # Buscar cartão com maior limite disponível (faturas em aberto no ledger)
+            cards = db.execute("""
+                SELECT id, name, limit_amount, closing_day, due_day
                 FROM cards
                 WHERE user_id = ? AND tenant_id = ? AND active = 1
-                ORDER BY available DESC
-                LIMIT 1
-            """, (user_id, tenant_id)).fetchone()
+            """, (user_id, tenant_id)).fetchall()
+            if cards:
+                ledger = card_ledger.summaries(db, cards)
+                card = max(cards, key=lambda c: ledger[c['id']]['available'])
         
         if card:
             return {'type': 'card', 'id': card['id'], 'name': card['name']}
@@ -3183,69 +3228,28 @@ def insert_transaction_from_whatsapp(data: dict, sender: str) -> str:
         
         print(f"{'='*60}\n")
         
-        # Inserir transação
-        transaction_id = str(uuid.uuid4())
-        
-        # Se for cartão, inserir em installments (parcela única)
-        if card_id:
-            db.execute("""
-                INSERT INTO installments (
-                    id, user_id, tenant_id, card_id, category_id,
-                    description, installment_number, total_installments,
-                    value, due_date, status, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, 1, 1, ?, ?, 'Pendente', CURRENT_TIMESTAMP)
-            """, (
-                transaction_id,
-                user['id'],
-                user['tenant_id'],
-                card_id,
-                category_id,
-                f"{data.get('description', 'Via WhatsApp')} - {payment_method['name']}",
-                data.get('amount', 0),
-                data.get('date', datetime.now().strftime('%Y-%m-%d'))
-            ))
+        # Inserir transação + saldo da conta no mesmo commit (services/transaction_service);
+        # conta/categoria criadas acima nesta conexão entram no mesmo commit
+        with transaction_service.unit_of_work(db) as uow:
+            description = f"{data.get('description', 'Via WhatsApp')} - {payment_method['name']}"
+            transaction_date = data.get('date', datetime.now().strftime('%Y-%m-%d'))
             
-            # Atualizar limite usado do cartão
-            db.execute("""
-                UPDATE cards
-                SET used_limit = COALESCE(used_limit, 0) + ?
-                WHERE id = ?
-            """, (data.get('amount', 0), card_id))
-            
-        else:
-            # Inserir em transactions (conta bancária)
-            db.execute("""
-                INSERT INTO transactions (
-                    id, user_id, tenant_id, account_id, category_id,
-                    description, value, type, date, status, is_fixed, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'Pago', 0, CURRENT_TIMESTAMP)
-            """, (
-                transaction_id,
-                user['id'],
-                user['tenant_id'],
-                account_id,
-                category_id,
-                f"{data.get('description', 'Via WhatsApp')} - {payment_method['name']}",
-                data.get('amount', 0),
-                data.get('type', 'Despesa'),
-                data.get('date', datetime.now().strftime('%Y-%m-%d'))
-            ))
-            
-            # Atualizar saldo da conta
-            if data.get('type') == 'Receita':
-                db.execute("""
-                    UPDATE accounts
-                    SET current_balance = current_balance + ?
-                    WHERE id = ?
-                """, (data.get('amount', 0), account_id))
-            else:  # Despesa
-                db.execute("""
-                    UPDATE accounts
-                    SET current_balance = current_balance - ?
-                    WHERE id = ?
-                """, (data.get('amount', 0), account_id))
-        
-        db.commit()
+            # Se for cartão, lançar na fatura (o ledger de faturas é atualizado por trigger)
+            if card_id:
+                card = db.execute("SELECT account_id FROM cards WHERE id = ?", (card_id,)).fetchone()
+                transaction_id = uow.add(
+                    user_id=user['id'], tenant_id=user['tenant_id'], account_id=card['account_id'],
+                    card_id=card_id, category_id=category_id, description=description,
+                    value=data.get('amount', 0), type='Despesa', date=transaction_date,
+                    status='Pendente', is_fixed=0, payment_method='credito'
+                )
+            else:
+                # Conta bancária: lançamento pago, debitado/creditado no saldo
+                transaction_id = uow.add(
+                    user_id=user['id'], tenant_id=user['tenant_id'], account_id=account_id,
+                    category_id=category_id, description=description, value=data.get('amount', 0),
+                    type=data.get('type', 'Despesa'), date=transaction_date, status='Pago', is_fixed=0
+                )
         db.close()
         
         whatsapp_logger.info(f"✅ Transação inserida: {transaction_id} ({payment_method['type']}: {payment_method['name']})")
@@ -3502,13 +3506,16 @@ def get_notifications():
     limit = request.args.get('limit', 50, type=int)
     
     center = NotificationCenter()
-    notifications = center.get_user_notifications(user['id'], status=status, limit=limit)
+    page = center.get_notifications_page(user['id'], status=status, limit=limit,
+                                         cursor=request.args.get('cursor'))
     unread_count = center.get_unread_count(user['id'])
     
     return jsonify({
         'success': True,
-        'notifications': notifications,
-        'unread_count': unread_count
+        'notifications': page['notifications'],
+        'unread_count': unread_count,
+        'next_cursor': page['next_cursor'],
+        'has_more': page['has_more']
     })
 
 @app.route('/api/notifications', methods=['POST'])
@@ -3696,18 +3703,28 @@ def api_profile():
         data = request.json
         
         try:
+            owner = phone_directory.owner(db, data.get('phone'))
+            if owner and owner != user['id']:
+                return jsonify({
+                    'success': False,
+                    'message': 'WhatsApp já está em uso'
+                }), 400
+            
             db.execute("""
                 UPDATE users 
-                SET name = ?, phone = ?, birthdate = ?, bio = ?
+                SET name = ?, phone = ?, phone_normalized = ?, birthdate = ?, bio = ?
                 WHERE id = ?
             """, (
                 data.get('name'),
                 data.get('phone'),
+                normalize_phone(data.get('phone')),
                 data.get('birthdate'),
                 data.get('bio'),
                 user['id']
             ))
             db.commit()
+            phone_directory.invalidate(user['id'], phones=[data.get('phone')] if data.get('phone') else [])
+            refresh_principal(user['id'])
             
             return jsonify({
                 'success': True,
@@ -3804,9 +3821,9 @@ def api_delete_account():
         }), 400
     
     # Verificar senha
-    user_data = db.execute("SELECT password FROM users WHERE id = ?", (user['id'],)).fetchone()
+    user_data = db.execute("SELECT password_hash FROM users WHERE id = ?", (user['id'],)).fetchone()
     
-    if not check_password_hash(user_data['password'], password):
+    if not user_data or not check_password_hash(user_data['password_hash'], password):
         return jsonify({
             'success': False,
             'message': 'Senha incorreta'
@@ -3823,6 +3840,7 @@ def api_delete_account():
         db.execute("DELETE FROM user_preferences WHERE user_id = ?", (user['id'],))
         db.execute("DELETE FROM users WHERE id = ?", (user['id'],))
         db.commit()
+        principal_cache.invalidate(user['id'])
         
         # Limpar sessão
         session.clear()
@@ -3848,6 +3866,13 @@ if __name__ == '__main__':
         init_db()
         seed_default_data()
     
+    # Ledger de faturas dos cartões (tabela + triggers; preenche na primeira vez)
+    db = get_db()
+    card_ledger.ensure_schema(db)
+    # Change log da sincronização delta (/api/sync): triggers antes das primeiras escritas
+    change_log.ensure_schema(db)
+    db.close()
+    
     # Iniciar scheduler de transações recorrentes
     from scheduler import start_scheduler
     start_scheduler()
@@ -0,0 +1,12 @@
+"""
+Benchmarks dos caminhos quentes do BWS Finance
+
+Gera um banco sintético determinístico (vários tenants, milhares de transações)
+e mede dashboard, listagem, importação de extratos, jobs agendados e chat da IA
+com os provedores externos substituídos por fakes locais.
+
+Uso:
+    python -m benchmarks                        # todos os cenários
+    python -m benchmarks dashboard import_ofx   # só alguns
+    python -m benchmarks --compare benchmarks/results/<commit>.json
+"""
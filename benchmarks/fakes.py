@@ -0,0 +1,167 @@
+"""
+Fakes locais para os provedores de rede usados pelos benchmarks
+
+Nenhum cenário sai da máquina: toda requisição HTTP feita com requests (inclusive
+as sessões TimedSession dos conectores e do WhatsApp) é respondida por um
+adapter em memória, o SMTP é substituído por um servidor de mentira e o
+cliente do GPT devolve uma resposta fixa. A latência simulada é opcional e
+igual para todos os provedores, para que os números continuem comparáveis.
+"""
+
+import json
+import smtplib
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+
+# Respostas mínimas no formato que cada provedor devolve
+RESPONSES = {
+    'brapi.dev': {'results': [{'symbol': 'PETR4', 'regularMarketPrice': 38.5,
+                               'regularMarketChangePercent': 0.8}]},
+    'query1.finance.yahoo.com': {'quoteResponse': {'result': [{'symbol': 'PETR4.SA',
+                                                               'regularMarketPrice': 38.5}]}},
+    'api.coingecko.com': {'bitcoin': {'brl': 350000.0}},
+    'statusinvest.com.br': [{'prices': [{'price': 38.5, 'date': '01/01/25 00:00'}]}],
+}
+DEFAULT_RESPONSE = {'success': True}
+
+GPT_REPLY = json.dumps({
+    'intent': 'advice',
+    'response': 'Seus gastos com alimentação subiram este mês. Que tal definir um limite? 💡'
+}, ensure_ascii=False)
+
+
+class FakeTransport(BaseAdapter):
+    """Adapter do requests que responde localmente e conta as chamadas por host"""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        host = urlparse(request.url).hostname or ''
+        with self._lock:
+            self.calls[host] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps(RESPONSES.get(host, DEFAULT_RESPONSE)).encode()
+        response.encoding = 'utf-8'
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+class FakeSMTP:
+    """Substituto de smtplib.SMTP/SMTP_SSL que só conta as mensagens"""
+
+    sent = Counter()
+    latency = 0.0
+
+    def __init__(self, host='', port=0, *args, **kwargs):
+        self.host = host
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.quit()
+
+    def starttls(self, *args, **kwargs):
+        pass
+
+    def login(self, *args, **kwargs):
+        pass
+
+    def send_message(self, msg, *args, **kwargs):
+        if FakeSMTP.latency:
+            time.sleep(FakeSMTP.latency)
+        FakeSMTP.sent[self.host] += 1
+
+    def sendmail(self, *args, **kwargs):
+        self.send_message(None)
+
+    def quit(self):
+        pass
+
+
+class _Message:
+    def __init__(self, content):
+        self.content = content
+
+
+class _Choice:
+    def __init__(self, content):
+        self.message = _Message(content)
+
+
+class _Completion:
+    def __init__(self, content):
+        self.choices = [_Choice(content)]
+
+
+class FakeGPT:
+    """Cliente no formato do OpenAI (client.chat.completions.create)"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return _Completion(GPT_REPLY)
+
+
+@contextmanager
+def offline(latency: float = 0.0):
+    """
+    Desvia requests, SMTP e GPT para os fakes enquanto o bloco executa
+
+    Args:
+        latency: Latência simulada (segundos) por chamada externa
+
+    Yields:
+        Dict com os fakes instalados ('http', 'smtp', 'gpt')
+    """
+    transport = FakeTransport(latency)
+    gpt = FakeGPT(latency)
+    FakeSMTP.sent = Counter()
+    FakeSMTP.latency = latency
+
+    original_adapter = requests.Session.get_adapter
+    original_smtp, original_smtp_ssl = smtplib.SMTP, smtplib.SMTP_SSL
+
+    from modules import gpt_assistant
+    original_gpt = (gpt_assistant.USE_GPT, getattr(gpt_assistant, 'client_gpt', None))
+
+    requests.Session.get_adapter = lambda self, url: transport
+    smtplib.SMTP = smtplib.SMTP_SSL = FakeSMTP
+    gpt_assistant.USE_GPT, gpt_assistant.client_gpt = True, gpt
+    try:
+        yield {'http': transport, 'smtp': FakeSMTP, 'gpt': gpt}
+    finally:
+        requests.Session.get_adapter = original_adapter
+        smtplib.SMTP, smtplib.SMTP_SSL = original_smtp, original_smtp_ssl
+        gpt_assistant.USE_GPT, gpt_assistant.client_gpt = original_gpt
+
+
+def outbound_calls(fakes) -> int:
+    """Total de chamadas externas registradas pelos fakes"""
+    return sum(fakes['http'].calls.values()) + sum(fakes['smtp'].sent.values()) + fakes['gpt'].calls
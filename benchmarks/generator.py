@@ -0,0 +1,381 @@
+"""
+Gerador determinístico de dados sintéticos para os benchmarks
+
+Cria um banco SQLite com N tenants (usuários, contas, cartões e categorias) e
+M transações com distribuições realistas: comerciantes em cauda longa (poucos
+muito frequentes, muitos raros), recorrências mensais (salário, aluguel,
+assinaturas, contas de consumo) e compras parceladas no cartão.
+
+A mesma semente sempre gera o mesmo banco, então os números de dois commits
+diferentes são comparáveis.
+"""
+
+import os
+import random
+import sqlite3
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# O schema de produção é o database_schema.sql mais as migrações aplicadas ao
+# longo do tempo; algumas tabelas foram recriadas com outro formato por elas.
+REPLACED_TABLES = ('investments', 'installments', 'notifications')
+
+SCHEMA_FILES = (
+    'migration_investments.sql',
+    'migrations/create_notifications_tables.sql',
+)
+
+# Colunas adicionadas por scripts avulsos (add_payment_method_column.py,
+# scripts/add_used_limit_column.py...). A tabela notifications recebe também as
+# colunas da central de notificações (migrations/add_notifications_tables.sql),
+# sem NOT NULL, para que os dois serviços consigam gravar nela.
+COLUMN_PATCHES = (
+    "ALTER TABLE transactions ADD COLUMN payment_method TEXT DEFAULT 'debito'",
+    "ALTER TABLE transactions ADD COLUMN installment_id TEXT",
+    "ALTER TABLE transactions ADD COLUMN installment_number INTEGER",
+    "ALTER TABLE cards ADD COLUMN used_limit REAL DEFAULT 0",
+    "ALTER TABLE notifications ADD COLUMN category TEXT",
+    "ALTER TABLE notifications ADD COLUMN related_type TEXT",
+    "ALTER TABLE notifications ADD COLUMN related_id TEXT",
+    "ALTER TABLE notifications ADD COLUMN metadata TEXT",
+    "ALTER TABLE notification_logs ADD COLUMN sent_at DATETIME",
+    "ALTER TABLE notification_logs ADD COLUMN delivered_at DATETIME",
+)
+
+LATE_SCHEMA_FILES = (
+    'migrations/add_notifications_tables.sql',
+    'migration_installments.sql',
+    'migration_recurring_columns.sql',
+    'migrations/add_user_preferences.sql',
+    'migrations/add_transactions_keyset_indexes.sql',
+)
+
+LATE_COLUMN_PATCHES = (
+    "ALTER TABLE installments ADD COLUMN total_value REAL",
+)
+
+# (nome, tipo, ícone, cor)
+CATEGORIES = (
+    ('Alimentação', 'Despesa', '🍔', '#ef4444'),
+    ('Mercado', 'Despesa', '🛒', '#f97316'),
+    ('Transporte', 'Despesa', '🚗', '#eab308'),
+    ('Moradia', 'Despesa', '🏠', '#84cc16'),
+    ('Saúde', 'Despesa', '💊', '#22c55e'),
+    ('Lazer', 'Despesa', '🎬', '#14b8a6'),
+    ('Educação', 'Despesa', '📚', '#06b6d4'),
+    ('Assinaturas', 'Despesa', '📺', '#3b82f6'),
+    ('Compras', 'Despesa', '🛍️', '#8b5cf6'),
+    ('Contas', 'Despesa', '💡', '#d946ef'),
+    ('Salário', 'Receita', '💰', '#10b981'),
+    ('Freelance', 'Receita', '💻', '#0ea5e9'),
+    ('Rendimentos', 'Receita', '📈', '#6366f1'),
+)
+
+# (descrição, categoria, valor mínimo, valor máximo); a ordem define o peso (Zipf)
+MERCHANTS = (
+    ('IFOOD *RESTAURANTE', 'Alimentação', 25, 120),
+    ('UBER *TRIP', 'Transporte', 9, 60),
+    ('SUPERMERCADO PAO DE ACUCAR', 'Mercado', 40, 650),
+    ('PADARIA PAO QUENTE', 'Alimentação', 8, 45),
+    ('POSTO SHELL', 'Transporte', 80, 320),
+    ('FARMACIA DROGASIL', 'Saúde', 15, 220),
+    ('MERCADO LIVRE', 'Compras', 30, 900),
+    ('AMAZON MARKETPLACE', 'Compras', 25, 700),
+    ('RESTAURANTE OUTBACK', 'Alimentação', 90, 380),
+    ('99 *POP', 'Transporte', 8, 45),
+    ('CINEMARK', 'Lazer', 30, 120),
+    ('LOJAS RENNER', 'Compras', 60, 500),
+    ('MAGAZINE LUIZA', 'Compras', 80, 2500),
+    ('ESTACIONAMENTO ESTAPAR', 'Transporte', 10, 40),
+    ('STEAM GAMES', 'Lazer', 20, 250),
+    ('LIVRARIA CULTURA', 'Educação', 35, 180),
+    ('PET SHOP COBASI', 'Compras', 40, 350),
+    ('HOSPITAL SAO LUIZ', 'Saúde', 150, 1200),
+)
+
+# (descrição, categoria, tipo, valor, dia)
+RECURRING = (
+    ('Salário', 'Salário', 'Receita', 8500.0, 5),
+    ('Aluguel', 'Moradia', 'Despesa', 2200.0, 10),
+    ('Condomínio', 'Moradia', 'Despesa', 650.0, 10),
+    ('CEMIG ENERGIA', 'Contas', 'Despesa', 240.0, 15),
+    ('CLARO INTERNET', 'Contas', 'Despesa', 119.9, 20),
+    ('NETFLIX.COM', 'Assinaturas', 'Despesa', 55.9, 12),
+    ('SPOTIFY', 'Assinaturas', 'Despesa', 21.9, 18),
+    ('ACADEMIA SMARTFIT', 'Saúde', 'Despesa', 129.9, 2),
+)
+
+CARD_BRANDS = ('Visa', 'Mastercard', 'Elo')
+BANKS = ('Itaú', 'Nubank', 'Bradesco', 'Inter', 'Santander')
+
+DEFAULTS = {
+    'tenants': 3,
+    'users_per_tenant': 2,
+    'transactions': 20000,
+    'months': 12,
+    'seed': 42,
+}
+
+
+def _uid(rng: random.Random) -> str:
+    """UUID derivado da semente (uuid4 quebraria o determinismo)"""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _weights(n: int) -> List[float]:
+    return [1.0 / (rank + 1) for rank in range(n)]
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    return date(year, month, min(day.day, 28))
+
+
+def create_schema(conn: sqlite3.Connection):
+    """Aplica o schema base e as migrações na ordem em que chegaram à produção"""
+    def run_file(path):
+        with open(os.path.join(ROOT, path), 'r', encoding='utf-8') as f:
+            conn.executescript(f.read())
+
+    run_file('database_schema.sql')
+    for table in REPLACED_TABLES:
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    for path in SCHEMA_FILES:
+        run_file(path)
+    for statement in COLUMN_PATCHES:
+        conn.execute(statement)
+    for path in LATE_SCHEMA_FILES:
+        run_file(path)
+    for statement in LATE_COLUMN_PATCHES:
+        conn.execute(statement)
+    conn.commit()
+
+
+def generate(db_path: str, tenants: int = None, users_per_tenant: int = None,
+             transactions: int = None, months: int = None, seed: int = None,
+             today: date = None) -> Dict:
+    """
+    Gera o banco sintético
+
+    Args:
+        db_path: Arquivo SQLite de destino (sobrescrito)
+        tenants: Número de tenants
+        users_per_tenant: Usuários por tenant
+        transactions: Total aproximado de transações (dividido entre usuários)
+        months: Meses de histórico até hoje
+        seed: Semente do gerador
+        today: Data de referência (padrão: hoje)
+
+    Returns:
+        Dict com os parâmetros usados e os IDs gerados (para os cenários)
+    """
+    params = dict(DEFAULTS)
+    params.update({k: v for k, v in {
+        'tenants': tenants, 'users_per_tenant': users_per_tenant,
+        'transactions': transactions, 'months': months, 'seed': seed
+    }.items() if v is not None})
+
+    rng = random.Random(params['seed'])
+    today = today or date.today()
+    start = _add_months(today.replace(day=1), -(params['months'] - 1))
+    span_days = max((today - start).days, 1)
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = sqlite3.connect(db_path)
+    create_schema(conn)
+
+    dataset = {'params': params, 'today': today.isoformat(), 'tenants': [], 'users': []}
+    n_users = params['tenants'] * params['users_per_tenant']
+    per_user = max(params['transactions'] // max(n_users, 1), 1)
+    merchant_weights = _weights(len(MERCHANTS))
+    rows = []
+
+    for t in range(params['tenants']):
+        tenant_id = _uid(rng)
+        conn.execute("INSERT INTO tenants (id, name, subdomain) VALUES (?, ?, ?)",
+                     (tenant_id, f"Tenant {t + 1}", f"tenant{t + 1}"))
+        dataset['tenants'].append(tenant_id)
+
+        categories = {}
+        for name, ctype, icon, color in CATEGORIES:
+            categories[name] = _uid(rng)
+            conn.execute("""
+                INSERT INTO categories (id, tenant_id, name, type, icon, color)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (categories[name], tenant_id, name, ctype, icon, color))
+
+        for u in range(params['users_per_tenant']):
+            user_id = _uid(rng)
+            conn.execute("""
+                INSERT INTO users (id, tenant_id, email, password_hash, name, phone)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (user_id, tenant_id, f"user{t + 1}.{u + 1}@bench.local", 'x',
+                  f"Usuário {t + 1}.{u + 1}", f"+55319{rng.randint(10000000, 99999999)}"))
+            conn.execute("""
+                INSERT INTO user_notifications_settings
+                    (user_id, tenant_id, threshold_low_balance, invoice_alert_days, opt_in_email)
+                VALUES (?, ?, ?, ?, 1)
+            """, (user_id, tenant_id, 500.0, '10,5,3,1,0'))
+
+            first_row = len(rows)
+            accounts = []
+            for name, atype in (('Conta Corrente', 'Corrente'), ('Poupança', 'Poupança')):
+                account_id = _uid(rng)
+                balance = round(rng.uniform(-300, 15000), 2)
+                conn.execute("""
+                    INSERT INTO accounts (id, user_id, tenant_id, name, type, bank, initial_balance, current_balance)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (account_id, user_id, tenant_id, name, atype, rng.choice(BANKS), balance, balance))
+                accounts.append(account_id)
+
+            cards = []
+            for c in range(rng.randint(1, 2)):
+                card_id = _uid(rng)
+                conn.execute("""
+                    INSERT INTO cards (id, account_id, user_id, tenant_id, name, last_digits, brand,
+                                       limit_amount, closing_day, due_day, used_limit)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (card_id, accounts[0], user_id, tenant_id, f"Cartão {c + 1}",
+                      f"{rng.randint(0, 9999):04d}", rng.choice(CARD_BRANDS), rng.choice((3000, 8000, 15000)),
+                      rng.randint(1, 28), rng.randint(1, 28), round(rng.uniform(200, 2500), 2)))
+                cards.append(card_id)
+
+            # Recorrências: parte delas vence hoje (trabalho para execute_recurring_transactions)
+            recurring_due = 0
+            for description, category, rtype, value, day in RECURRING:
+                due_today = rng.random() < 0.5
+                recurring_due += due_today
+                next_execution = today if due_today else _add_months(today, 1).replace(day=min(day, 28))
+                conn.execute("""
+                    INSERT INTO recurring_transactions
+                        (id, user_id, tenant_id, account_id, category_id, type, description, value,
+                         frequency, start_date, next_date, day_of_month, day_of_execution, next_execution)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'monthly', ?, ?, ?, ?, ?)
+                """, (_uid(rng), user_id, tenant_id, accounts[0], categories[category], rtype, description,
+                      value, start.isoformat(), next_execution.isoformat(), day, day, next_execution.isoformat()))
+
+                # Histórico já lançado pelas recorrências
+                month = start
+                while month <= today:
+                    posted = month.replace(day=min(day, 28))
+                    if posted <= today:
+                        rows.append((_uid(rng), user_id, tenant_id, accounts[0], categories[category], None,
+                                     rtype, f"{description} (Recorrente)", value, posted.isoformat(), 'Pago', 1,
+                                     'debito', None, None))
+                    month = _add_months(month, 1)
+
+            # Compras parceladas no cartão (um parcelamento a cada ~30 lançamentos)
+            for _ in range(max(per_user // 30, 1)):
+                description, category, low, high = rng.choices(MERCHANTS[6:13], k=1)[0]
+                count = rng.choice((2, 3, 4, 6, 10, 12))
+                total = round(rng.uniform(high, high * 3), 2)
+                first = start + timedelta(days=rng.randrange(span_days))
+                installment_id = _uid(rng)
+                card_id = rng.choice(cards)
+                conn.execute("""
+                    INSERT INTO installments (id, user_id, tenant_id, card_id, category_id, description,
+                                              total_amount, total_value, installment_count, installment_value,
+                                              first_due_date)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (installment_id, user_id, tenant_id, card_id, categories[category], description,
+                      total, total, count, round(total / count, 2), first.isoformat()))
+                for number in range(1, count + 1):
+                    due = _add_months(first, number - 1)
+                    rows.append((_uid(rng), user_id, tenant_id, accounts[0], categories[category], card_id,
+                                 'Despesa', f"{description} - Parcela {number}/{count}", round(total / count, 2),
+                                 due.isoformat(), 'Pago' if due <= today else 'Pendente', 0, 'credito',
+                                 installment_id, number))
+
+            # Receitas variáveis
+            for _ in range(max(per_user // 50, 1)):
+                day = start + timedelta(days=rng.randrange(span_days + 1))
+                category = rng.choice(('Freelance', 'Rendimentos'))
+                rows.append((_uid(rng), user_id, tenant_id, accounts[1], categories[category], None,
+                             'Receita', category, round(rng.uniform(100, 3000), 2), day.isoformat(),
+                             'Pago', 0, 'debito', None, None))
+
+            # Gastos avulsos no débito e no cartão (completam a cota do usuário)
+            for _ in range(max(per_user - (len(rows) - first_row), 0)):
+                description, category, low, high = rng.choices(MERCHANTS, weights=merchant_weights, k=1)[0]
+                day = start + timedelta(days=rng.randrange(span_days + 1))
+                card_id = rng.choice(cards) if rng.random() < 0.45 else None
+                rows.append((_uid(rng), user_id, tenant_id, accounts[0], categories[category], card_id,
+                             'Despesa', description, round(rng.uniform(low, high), 2), day.isoformat(),
+                             'Pago', 0, 'credito' if card_id else 'debito', None, None))
+
+            dataset['users'].append({
+                'id': user_id, 'tenant_id': tenant_id, 'accounts': accounts, 'cards': cards,
+                'categories': categories, 'recurring_due': recurring_due
+            })
+
+    conn.executemany("""
+        INSERT INTO transactions (id, user_id, tenant_id, account_id, category_id, card_id, type,
+                                  description, value, date, status, is_fixed, payment_method,
+                                  installment_id, installment_number, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (row + (f"{row[9]} 12:00:00",) for row in rows))
+    conn.commit()
+
+    # Ledger de faturas já no banco limpo (os cenários restauram esta cópia)
+    from services.card_ledger import CardLedger
+    CardLedger(db_path).ensure_schema(conn)
+
+    conn.execute("ANALYZE")
+    conn.close()
+
+    dataset['transactions'] = len(rows)
+    return dataset
+
+
+def statement_rows(count: int, seed: int = 7, today: date = None) -> List[Tuple[str, str, float]]:
+    """Linhas de extrato (data, descrição, valor com sinal) para os cenários de importação"""
+    rng = random.Random(seed)
+    today = today or date.today()
+    weights = _weights(len(MERCHANTS))
+    rows = []
+    for i in range(count):
+        day = today - timedelta(days=rng.randrange(365))
+        if rng.random() < 0.08:
+            rows.append((day.isoformat(), rng.choice(('PIX RECEBIDO', 'TED RECEBIDA', 'SALARIO')),
+                         round(rng.uniform(100, 5000), 2)))
+        else:
+            description, _, low, high = rng.choices(MERCHANTS, weights=weights, k=1)[0]
+            # Sufixo mantém as linhas distintas (sem cair na checagem de duplicata)
+            rows.append((day.isoformat(), f"{description} {i:05d}", -round(rng.uniform(low, high), 2)))
+    return rows
+
+
+def write_ofx(path: str, rows: List[Tuple[str, str, float]]):
+    """Extrato OFX (XML) no formato lido por BankStatementImporter.parse_ofx"""
+    entries = []
+    for i, (day, description, amount) in enumerate(rows):
+        entries.append(
+            "<STMTTRN>"
+            f"<TRNTYPE>{'CREDIT' if amount > 0 else 'DEBIT'}</TRNTYPE>"
+            f"<DTPOSTED>{day.replace('-', '')}120000</DTPOSTED>"
+            f"<TRNAMT>{amount:.2f}</TRNAMT>"
+            f"<FITID>{i:08d}</FITID>"
+            f"<MEMO>{description}</MEMO>"
+            "</STMTTRN>"
+        )
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\n\n")
+        f.write("<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>")
+        f.write("\n".join(entries))
+        f.write("</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>")
+
+
+def write_csv(path: str, rows: List[Tuple[str, str, float]]):
+    """Extrato CSV no padrão dos bancos brasileiros (ponto e vírgula, vírgula decimal)"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("Data;Descrição;Valor;Tipo\n")
+        for day, description, amount in rows:
+            value = f"{amount:.2f}".replace('.', ',')
+            kind = 'Entrada' if amount > 0 else 'Saída'
+            f.write(f"{datetime.strptime(day, '%Y-%m-%d'):%d/%m/%Y};{description};{value};{kind}\n")
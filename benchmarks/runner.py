@@ -0,0 +1,246 @@
+"""
+Execução dos cenários e relatório JSON comparável entre commits
+
+O relatório guarda o commit, os parâmetros do gerador e, por cenário, a
+distribuição dos tempos (mediana, p95, mínimo, máximo), as consultas SQL feitas
+em conexões instrumentadas (services.metrics) e as chamadas externas que
+chegaram aos fakes. Com --compare, imprime a variação da mediana contra um
+relatório anterior.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks import fakes
+from benchmarks.generator import DEFAULTS, generate
+from benchmarks.scenarios import SCENARIOS, BenchContext
+
+REPORT_VERSION = 1
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+logger = logging.getLogger('benchmarks')
+
+
+def git_commit() -> Dict:
+    """Commit atual (e se há alterações não commitadas)"""
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    try:
+        return {'sha': git('rev-parse', 'HEAD') or None, 'dirty': bool(git('status', '--porcelain', '-uno'))}
+    except OSError:
+        return {'sha': None, 'dirty': None}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por interpolação linear (igual ao numpy.percentile padrão)"""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def _sql_queries() -> float:
+    from services import metrics
+    return sum(series[-1] for series in metrics.registry.histograms['db_query_duration_seconds'].values())
+
+
+def measure(ctx: BenchContext, name: str, runs: int, warmup: int, offline) -> Dict:
+    """Executa um cenário (aquecimento + execuções medidas)"""
+    spec = SCENARIOS[name]
+    result = {'description': spec['description'], 'runs': runs}
+    devnull = open(os.devnull, 'w')
+    try:
+        with contextlib.redirect_stdout(devnull):
+            if spec['mutates']:
+                ctx.restore()
+            run = spec['setup'](ctx)
+            for _ in range(warmup):
+                if spec['mutates']:
+                    ctx.restore()
+                run()
+
+            timings, queries, outbound = [], 0.0, 0
+            for _ in range(runs):
+                if spec['mutates']:
+                    ctx.restore()
+                queries_before, outbound_before = _sql_queries(), fakes.outbound_calls(offline)
+                start = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - start) * 1000)
+                queries += _sql_queries() - queries_before
+                outbound += fakes.outbound_calls(offline) - outbound_before
+    except ImportError as e:
+        # Dependência opcional ausente (ex.: scikit-learn para o chat da IA)
+        result['skipped'] = f"{type(e).__name__}: {e}"
+        return result
+    except Exception as e:
+        logger.exception(f"[ERRO] Cenário {name} falhou")
+        result['error'] = f"{type(e).__name__}: {e}"
+        return result
+    finally:
+        devnull.close()
+
+    result.update({
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'min_ms': round(min(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'sql_queries': round(queries / runs, 1),
+        'outbound_calls': round(outbound / runs, 1),
+    })
+    return result
+
+
+def run(scenarios: Optional[List[str]] = None, runs: int = 5, warmup: int = 1, latency: float = 0.0,
+        workdir: Optional[str] = None, **params) -> Dict:
+    """
+    Gera o banco sintético e executa os cenários
+
+    Args:
+        scenarios: Nomes dos cenários (padrão: todos)
+        runs: Execuções medidas por cenário
+        warmup: Execuções descartadas antes da medição
+        latency: Latência simulada por chamada externa (segundos)
+        workdir: Diretório de trabalho (padrão: temporário, removido ao final)
+        **params: Parâmetros do gerador (tenants, users_per_tenant, transactions, months, seed)
+
+    Returns:
+        Relatório (dict serializável em JSON)
+    """
+    names = list(scenarios or SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"Cenários desconhecidos: {', '.join(unknown)}")
+
+    temporary = workdir is None
+    workdir = os.path.abspath(workdir or tempfile.mkdtemp(prefix='bws-bench-'))
+    os.makedirs(workdir, exist_ok=True)
+    previous_cwd = os.getcwd()
+
+    # Os módulos abrem 'bws_finance.db', 'ai_history.db' e 'logs/' relativos ao diretório atual
+    os.chdir(workdir)
+    os.makedirs('logs', exist_ok=True)
+    os.environ['AUTO_NOTIFICATIONS_ENABLED'] = 'false'
+    logging.basicConfig(level=logging.INFO, handlers=[logging.FileHandler(os.path.join(workdir, 'bench.log'))],
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    try:
+        started = time.perf_counter()
+        dataset = generate(os.path.join(workdir, 'bws_finance.db'), **params)
+        generate_seconds = time.perf_counter() - started
+
+        ctx = BenchContext(workdir, dataset)
+        ctx.snapshot()
+
+        report = {
+            'version': REPORT_VERSION,
+            'commit': git_commit(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'platform': platform.platform(),
+            },
+            'params': dict(dataset['params'], runs=runs, warmup=warmup, latency=latency),
+            'dataset': {
+                'tenants': len(dataset['tenants']),
+                'users': len(dataset['users']),
+                'transactions': dataset['transactions'],
+                'generate_seconds': round(generate_seconds, 2),
+            },
+            'scenarios': {},
+        }
+
+        with fakes.offline(latency) as offline:
+            for name in names:
+                report['scenarios'][name] = measure(ctx, name, runs, warmup, offline)
+        return report
+    finally:
+        os.chdir(previous_cwd)
+        if temporary:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(report: Dict, baseline: Dict) -> List[Dict]:
+    """Variação da mediana de cada cenário em relação ao relatório base"""
+    rows = []
+    for name, current in report['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name, {})
+        row = {'scenario': name, 'median_ms': current.get('median_ms'), 'baseline_ms': before.get('median_ms')}
+        if row['median_ms'] is not None and row['baseline_ms']:
+            row['change_pct'] = round((row['median_ms'] - row['baseline_ms']) / row['baseline_ms'] * 100, 1)
+        rows.append(row)
+    return rows
+
+
+def print_report(report: Dict, comparison: Optional[List[Dict]] = None):
+    changes = {row['scenario']: row for row in comparison or []}
+    print(f"\n📊 Benchmarks @ {(report['commit']['sha'] or '?')[:10]}"
+          f"{' (alterações locais)' if report['commit']['dirty'] else ''} — "
+          f"{report['dataset']['transactions']} transações, {report['dataset']['users']} usuários\n")
+    print(f"{'cenário':<22}{'mediana':>12}{'p95':>12}{'sql':>8}{'externas':>10}{'vs base':>10}")
+    for name, result in report['scenarios'].items():
+        if 'error' in result or 'skipped' in result:
+            print(f"{name:<22}  {'❌ ' + result['error'] if 'error' in result else '⏭️  ' + result['skipped']}")
+            continue
+        change = changes.get(name, {}).get('change_pct')
+        print(f"{name:<22}{result['median_ms']:>10.1f}ms{result['p95_ms']:>10.1f}ms"
+              f"{result['sql_queries']:>8g}{result['outbound_calls']:>10g}"
+              f"{(f'{change:+.1f}%' if change is not None else '-'):>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmarks dos caminhos quentes')
+    parser.add_argument('scenarios', nargs='*', help=f"Cenários (padrão: todos): {', '.join(SCENARIOS)}")
+    parser.add_argument('--tenants', type=int, default=DEFAULTS['tenants'])
+    parser.add_argument('--users-per-tenant', type=int, default=DEFAULTS['users_per_tenant'])
+    parser.add_argument('--transactions', type=int, default=DEFAULTS['transactions'])
+    parser.add_argument('--months', type=int, default=DEFAULTS['months'])
+    parser.add_argument('--seed', type=int, default=DEFAULTS['seed'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latência simulada das chamadas externas')
+    parser.add_argument('--workdir', help='Mantém o banco e os arquivos gerados neste diretório')
+    parser.add_argument('--output', help='Arquivo do relatório (padrão: benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='Relatório base para comparar as medianas')
+    args = parser.parse_args(argv)
+
+    report = run(args.scenarios, runs=args.runs, warmup=args.warmup, latency=args.latency_ms / 1000,
+                 workdir=args.workdir, tenants=args.tenants, users_per_tenant=args.users_per_tenant,
+                 transactions=args.transactions, months=args.months, seed=args.seed)
+
+    comparison = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            comparison = compare(report, json.load(f))
+        report['baseline'] = {'file': args.compare, 'scenarios': comparison}
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{(report['commit']['sha'] or 'local')[:10]}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print_report(report, comparison)
+    print(f"\n💾 Relatório salvo em {os.path.relpath(output)}")
+    return 1 if any('error' in result for result in report['scenarios'].values()) else 0
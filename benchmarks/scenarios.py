@@ -0,0 +1,234 @@
+"""
+Cenários dos benchmarks (caminhos quentes da aplicação)
+
+Cada cenário recebe o BenchContext, prepara o que precisa fora da medição e
+devolve a função que será cronometrada. Cenários que gravam no banco
+(mutates=True) rodam sempre sobre uma cópia limpa do banco sintético.
+"""
+
+import os
+import shutil
+import sqlite3
+from collections import OrderedDict
+from typing import Callable, Dict
+
+from benchmarks.generator import statement_rows, write_csv, write_ofx
+
+SCENARIOS: 'OrderedDict[str, Dict]' = OrderedDict()
+
+IMPORT_ROWS = 10000
+
+CHAT_MESSAGES = (
+    'qual meu saldo?',
+    'quanto gastei esse mês?',
+    'quanto recebi de receita?',
+    'como estão meus investimentos?',
+    'em qual categoria eu mais gasto?',
+    'compare com o mês passado',
+)
+
+ASSISTANT_MESSAGES = (
+    'gastei 45 no mercado',
+    'saldo',
+    'recebi 1200 de freelance',
+    'oi',
+    'vale a pena antecipar as parcelas do cartão ou investir a diferença?',
+    'gastei 45 no mercado',
+)
+
+
+def scenario(name: str, description: str, mutates: bool = False):
+    """Registra um cenário (a função recebe o contexto e devolve o callable medido)"""
+    def decorator(setup: Callable):
+        SCENARIOS[name] = {'setup': setup, 'description': description, 'mutates': mutates}
+        return setup
+    return decorator
+
+
+class BenchContext:
+    """Diretório de trabalho, banco sintético e helpers compartilhados pelos cenários"""
+
+    def __init__(self, workdir: str, dataset: Dict):
+        self.workdir = workdir
+        self.dataset = dataset
+        self.db_path = os.path.join(workdir, 'bws_finance.db')
+        self.pristine_path = os.path.join(workdir, 'pristine.db')
+        self.user = dataset['users'][0]
+        self._app = None
+
+    def snapshot(self):
+        """Guarda a cópia limpa do banco gerado"""
+        shutil.copyfile(self.db_path, self.pristine_path)
+
+    def restore(self):
+        """Volta o banco ao estado gerado (antes de cada execução de cenário que grava)"""
+        for suffix in ('-wal', '-shm', '-journal'):
+            if os.path.exists(self.db_path + suffix):
+                os.remove(self.db_path + suffix)
+        shutil.copyfile(self.pristine_path, self.db_path)
+
+    @property
+    def app(self):
+        if self._app is None:
+            from app import app
+            app.config['DATABASE'] = self.db_path
+            app.config['TESTING'] = True
+            self._app = app
+        return self._app
+
+    def client(self):
+        """Test client do Flask já autenticado como o usuário de referência"""
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = self.user['id']
+            session['tenant_id'] = self.user['tenant_id']
+        return client
+
+    def db(self):
+        """Conexão instrumentada, como a do get_db() dos blueprints"""
+        from services import metrics
+        conn = metrics.connect(self.db_path, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+
+def _get(client, path: str, clear_fragments: bool = True):
+    def run():
+        if clear_fragments:
+            from services.render_cache import fragment_cache
+            fragment_cache.clear()
+        response = client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} retornou HTTP {response.status_code}")
+    return run
+
+
+# ==================== PÁGINAS E API ====================
+
+@scenario('dashboard', 'GET /dashboard sem cache de fragmentos (render completo)')
+def dashboard(ctx: BenchContext):
+    return _get(ctx.client(), '/dashboard')
+
+
+@scenario('dashboard_cached', 'GET /dashboard com o cache de fragmentos aquecido')
+def dashboard_cached(ctx: BenchContext):
+    client = ctx.client()
+    _get(client, '/dashboard')()
+    return _get(client, '/dashboard', clear_fragments=False)
+
+
+@scenario('api_dashboard', 'GET /api/dashboard (JSON do painel)')
+def api_dashboard(ctx: BenchContext):
+    return _get(ctx.client(), '/api/dashboard')
+
+
+@scenario('all_transactions', 'GET /transactions (primeira página)')
+def all_transactions(ctx: BenchContext):
+    return _get(ctx.client(), '/transactions')
+
+
+# ==================== IMPORTAÇÃO DE EXTRATO ====================
+
+def _import(ctx: BenchContext, path: str, parse: str):
+    from services.bank_importer import BankStatementImporter
+
+    def run():
+        importer = BankStatementImporter(ctx.user['id'], ctx.user['tenant_id'])
+        transactions = getattr(importer, parse)(path)
+        if len(transactions) != IMPORT_ROWS:
+            raise RuntimeError(f"{parse} leu {len(transactions)} de {IMPORT_ROWS} linhas")
+        conn = ctx.db()
+        try:
+            importer.import_transactions(transactions, ctx.user['accounts'][0], conn)
+            conn.commit()
+        finally:
+            conn.close()
+    return run
+
+
+@scenario('import_ofx', f'Parse + BankStatementImporter.import_transactions de {IMPORT_ROWS} linhas OFX',
+          mutates=True)
+def import_ofx(ctx: BenchContext):
+    path = os.path.join(ctx.workdir, 'extrato.ofx')
+    write_ofx(path, statement_rows(IMPORT_ROWS))
+    return _import(ctx, path, 'parse_ofx')
+
+
+@scenario('import_csv', f'Parse + BankStatementImporter.import_transactions de {IMPORT_ROWS} linhas CSV',
+          mutates=True)
+def import_csv(ctx: BenchContext):
+    path = os.path.join(ctx.workdir, 'extrato.csv')
+    write_csv(path, statement_rows(IMPORT_ROWS))
+    return _import(ctx, path, 'parse_csv')
+
+
+# ==================== JOBS ====================
+
+@scenario('execute_recurring', 'execute_recurring_transactions (recorrências vencidas hoje)', mutates=True)
+def execute_recurring(ctx: BenchContext):
+    from routes.recurring import execute_recurring_transactions
+    expected = sum(user['recurring_due'] for user in ctx.dataset['users'])
+
+    def run():
+        executed = execute_recurring_transactions()
+        if executed != expected:
+            raise RuntimeError(f"executou {executed} de {expected} recorrências")
+    return run
+
+
+@scenario('check_due_invoices', 'AutoNotificationService.check_due_invoices', mutates=True)
+def check_due_invoices(ctx: BenchContext):
+    from services.auto_notifications import AutoNotificationService
+    return AutoNotificationService(ctx.db_path).check_due_invoices
+
+
+@scenario('check_low_balance', 'AutoNotificationService.check_low_balance', mutates=True)
+def check_low_balance(ctx: BenchContext):
+    from services.auto_notifications import AutoNotificationService
+    return AutoNotificationService(ctx.db_path).check_low_balance
+
+
+@scenario('weekly_reports', 'AutoNotificationService.send_periodic_reports (insights de todos os usuários)',
+          mutates=True)
+def weekly_reports(ctx: BenchContext):
+    from services.auto_notifications import AutoNotificationService
+    return AutoNotificationService(ctx.db_path).send_periodic_reports
+
+
+# ==================== IA ====================
+
+@scenario('notification_insights', 'NotificationAI: insights + relatório mensal de um usuário')
+def notification_insights(ctx: BenchContext):
+    from services.notification_ai import NotificationAI
+    ai = NotificationAI(ctx.db_path)
+
+    def run():
+        ai.analyze_spending_patterns(ctx.user['id'])
+        ai.generate_monthly_report(ctx.user['id'])
+    return run
+
+
+@scenario('ai_chat', 'Chat da IA: dados do banco + AIChat.process_message')
+def ai_chat(ctx: BenchContext):
+    from services.ai_core import BWSInsightAI
+    from services.ai_chat import AIChat
+    user_id, tenant_id = ctx.user['id'], ctx.user['tenant_id']
+
+    def run():
+        ai = BWSInsightAI(user_id=user_id, tenant_id=tenant_id)
+        chat = AIChat(ai)
+        for message in CHAT_MESSAGES:
+            chat.process_message(message, ai.fetch_financial_data_direct(user_id, tenant_id))
+    return run
+
+
+@scenario('whatsapp_assistant', 'Assistente do WhatsApp: roteador local/cache + GPT (fake)')
+def whatsapp_assistant(ctx: BenchContext):
+    from modules.gpt_assistant import GPTFinanceAssistant
+    user_id, tenant_id = ctx.user['id'], ctx.user['tenant_id']
+
+    def run():
+        assistant = GPTFinanceAssistant()
+        for message in ASSISTANT_MESSAGES:
+            assistant.process_message(message, user_id, tenant_id)
+    return run
@@ -0,0 +1,70 @@
+-- =====================================================
+-- Contadores de notificações por usuário + índices de keyset
+-- =====================================================
+-- total/unread mantidos por triggers em qualquer escrita na tabela
+-- notifications (criação, leitura, marcar todas, exclusão), de qualquer
+-- worker: o sino lê uma linha em vez de contar o histórico inteiro.
+
+BEGIN IMMEDIATE;
+
+CREATE TABLE IF NOT EXISTS notification_counters (
+    user_id TEXT PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0,
+    unread INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+-- Preenche a partir do histórico só na primeira aplicação (antes dos triggers existirem)
+INSERT OR IGNORE INTO notification_counters (user_id, total, unread)
+SELECT user_id, COUNT(*), SUM(CASE WHEN status = 'unread' THEN 1 ELSE 0 END)
+FROM notifications
+WHERE NOT EXISTS (
+    SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_notification_counters_insert'
+)
+GROUP BY user_id;
+
+CREATE TRIGGER IF NOT EXISTS trg_notification_counters_insert
+AFTER INSERT ON notifications
+BEGIN
+    INSERT INTO notification_counters (user_id, total, unread)
+    VALUES (NEW.user_id, 1, CASE WHEN NEW.status = 'unread' THEN 1 ELSE 0 END)
+    ON CONFLICT(user_id) DO UPDATE SET
+        total = total + 1,
+        unread = unread + excluded.unread;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_notification_counters_delete
+AFTER DELETE ON notifications
+BEGIN
+    UPDATE notification_counters SET
+        total = total - 1,
+        unread = unread - CASE WHEN OLD.status = 'unread' THEN 1 ELSE 0 END
+    WHERE user_id = OLD.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_notification_counters_update
+AFTER UPDATE OF status, user_id ON notifications
+WHEN OLD.status IS NOT NEW.status OR OLD.user_id IS NOT NEW.user_id
+BEGIN
+    UPDATE notification_counters SET
+        total = total - 1,
+        unread = unread - CASE WHEN OLD.status = 'unread' THEN 1 ELSE 0 END
+    WHERE user_id = OLD.user_id;
+    INSERT INTO notification_counters (user_id, total, unread)
+    VALUES (NEW.user_id, 1, CASE WHEN NEW.status = 'unread' THEN 1 ELSE 0 END)
+    ON CONFLICT(user_id) DO UPDATE SET
+        total = total + 1,
+        unread = unread + excluded.unread;
+END;
+
+-- Linhas sem created_at quebrariam a comparação (created_at, id) < (?, ?)
+UPDATE notifications SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL;
+
+-- Listagem por cursor (created_at DESC, id DESC), com e sem filtro de status;
+-- cobre também as contagens por status
+CREATE INDEX IF NOT EXISTS idx_notifications_user_status_keyset
+    ON notifications(user_id, status, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_notifications_user_keyset
+    ON notifications(user_id, created_at DESC, id DESC);
+
+COMMIT;
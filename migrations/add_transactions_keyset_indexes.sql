@@ -0,0 +1,11 @@
+-- Índices para paginação por cursor (keyset) da listagem de transações
+-- Ordem: date DESC, created_at DESC, id DESC
+
+-- Linhas antigas sem created_at quebrariam a comparação (date, created_at, id) < (?, ?, ?)
+UPDATE transactions SET created_at = date || ' 00:00:00' WHERE created_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_user_keyset
+    ON transactions(user_id, tenant_id, date DESC, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_account_keyset
+    ON transactions(account_id, date DESC, created_at DESC, id DESC);
@@ -0,0 +1,303 @@
+"""
+Fast Intent - Entendimento de mensagens em camadas
+Resolve localmente (regras + NLPClassifier) as mensagens triviais do WhatsApp
+e só escala para o GPT as ambíguas.
+
+Camadas:
+1. Cache LRU: mensagem normalizada (+ data do dia) -> intent já interpretado
+2. Parser local com score de confiança (sem rede)
+3. LLM (GPT) para o que ficou abaixo do limiar
+"""
+import os
+import re
+import time
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from modules.nlp_classifier import NLPClassifier
+
+logger = logging.getLogger(__name__)
+
+# =========================================
+# REGRAS
+# =========================================
+
+EXPENSE_VERBS = ('gastei', 'paguei', 'comprei', 'gasto', 'pagamento', 'pago', 'torrei')
+INCOME_VERBS = ('recebi', 'ganhei', 'caiu', 'entrou', 'recebimento', 'vendi')
+
+# Negações e hipóteses ("não gastei", "se eu pagar", "vou comprar"): sempre para o GPT
+NEGATION_WORDS = ('nao', 'nunca', 'nem')
+HYPOTHETICAL_WORDS = ('se', 'caso', 'vou', 'vamos', 'pretendo')
+
+# Multiplicadores reconhecidos depois do número ("2 mil", "1,5 mil", "3k")
+AMOUNT_MULTIPLIERS = {'mil': 1000, 'k': 1000}
+
+INCOME_CATEGORIES = {
+    'salario': 'Salário',
+    'freela': 'Freelance',
+    'freelance': 'Freelance',
+    'dividendo': 'Dividendos',
+    'dividendos': 'Dividendos',
+    'reembolso': 'Reembolso',
+    'bonus': 'Bônus',
+    'comissao': 'Comissão',
+    'aluguel': 'Aluguel Recebido',
+}
+
+# (intent, action, padrões) - padrões sobre o texto normalizado, sem acento
+COMMAND_RULES: List[Tuple[str, Optional[str], Tuple[str, ...]]] = [
+    ('query', 'get_balance', (r'^saldos?$', r'^(qual|quanto)( e)? (o )?(meu )?saldo$',
+                              r'^quanto (eu )?tenho( na conta)?$', r'^ver saldo$')),
+    ('query', 'get_monthly_expenses', (r'^extrato$', r'^quanto (eu )?gastei( esse mes| este mes| no mes)?$',
+                                       r'^resumo( do mes)?$', r'^gastos( do mes)?$')),
+    ('advice', None, (r'^dica$', r'^(me )?(da|de) uma dica( financeira)?$', r'^dica financeira$')),
+    ('help', None, (r'^ajuda$', r'^help$', r'^comandos$', r'^menu$', r'^me ajuda$')),
+    ('greeting', None, (r'^(oi|ola|opa|eai|e ai|hey|bom dia|boa tarde|boa noite)( tudo bem)?$',)),
+]
+
+_DATE_TOKEN = re.compile(r'\b\d{1,2}[/-]\d{1,2}(?:[/-]\d{2,4})?\b|\bdia\s+\d{1,2}\b')
+_AMOUNT_TOKEN = re.compile(
+    r'(?<![\w.,])(\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?|\d+(?:[.,]\d{1,2})?)(?![\w.,]?\d)'
+    r'(?:\s?(mil|k)\b)?'
+)
+# Outras unidades depois do número (milhão, parcelas, peso...): valor incerto
+_UNIT_SUFFIX = re.compile(r'\s?(?:mi|milha?o|milhoes|bi|bilha?o|bilhoes|x|vezes|parcelas?|kg|g|km|l|litros?)\b')
+
+
+def normalize_message(text: str) -> str:
+    """Minúsculas, sem acentos, sem pontuação (exceto em números) e espaços únicos"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r'r\$', ' ', text)
+    text = re.sub(r'[^\w\s.,/-]|(?<!\d)[.,/-]|[.,/-](?!\d)', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def parse_amount(token: str) -> Optional[float]:
+    """Converte '1.500,90', '50,5', '50.50' ou '1500' para float"""
+    if ',' in token:
+        token = token.replace('.', '').replace(',', '.')
+    elif re.fullmatch(r'\d{1,3}(?:\.\d{3})+', token):
+        token = token.replace('.', '')
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+
+class FastIntentParser:
+    """Parser local de intents com score de confiança"""
+
+    def __init__(self, classifier: NLPClassifier = None):
+        self.classifier = classifier or NLPClassifier()
+        self.commands = [(intent, action, [re.compile(p) for p in patterns])
+                         for intent, action, patterns in COMMAND_RULES]
+
+    def parse(self, text: str, normalized: str = None) -> Dict:
+        """
+        Interpreta a mensagem sem rede
+
+        Returns:
+            Dict no mesmo formato do GPT (intent, type, amount, ...) com
+            'confidence' entre 0 e 1
+        """
+        normalized = normalized if normalized is not None else normalize_message(text)
+
+        for intent, action, patterns in self.commands:
+            if any(p.match(normalized) for p in patterns):
+                result = {'intent': intent, 'confidence': 0.95}
+                if action:
+                    result['action'] = action
+                return result
+
+        return self._parse_transaction(text, normalized)
+
+    @staticmethod
+    def _extract_amounts(normalized: str) -> Tuple[set, bool]:
+        """Valores da mensagem (com mil/k aplicados) e se algum vem seguido de outra unidade"""
+        without_dates = _DATE_TOKEN.sub(' ', normalized)
+        amounts, has_unit = set(), False
+        for match in _AMOUNT_TOKEN.finditer(without_dates):
+            amount = parse_amount(match.group(1))
+            if not amount:
+                continue
+            if match.group(2):
+                amount = round(amount * AMOUNT_MULTIPLIERS[match.group(2)], 2)
+            elif _UNIT_SUFFIX.match(without_dates, match.end()):
+                has_unit = True
+            amounts.add(amount)
+        return amounts, has_unit
+
+    def _parse_transaction(self, text: str, normalized: str) -> Dict:
+        words = normalized.split()
+        amounts, has_unit = self._extract_amounts(normalized)
+
+        is_income = any(w in INCOME_VERBS for w in words)
+        is_expense = any(w in EXPENSE_VERBS for w in words)
+
+        if not amounts:
+            return {'intent': 'unknown', 'confidence': 0.0}
+
+        if is_income and not is_expense:
+            tx_type = 'Receita'
+            category = next((c for k, c in INCOME_CATEGORIES.items() if k in words), 'Outros')
+        else:
+            tx_type = 'Despesa'
+            category = self.classifier.extract_category(text)
+
+        confidence = 0.4 if len(amounts) == 1 else 0.1
+        if is_income != is_expense:
+            confidence += 0.3
+        if category != 'Outros':
+            confidence += 0.2
+        if len(words) <= 12:
+            confidence += 0.1
+        if '?' in text:
+            confidence -= 0.4
+        if has_unit:
+            confidence -= 0.4
+        if any(w in NEGATION_WORDS or w in HYPOTHETICAL_WORDS for w in words):
+            confidence = 0.0
+
+        return {
+            'intent': 'transaction',
+            'type': tx_type,
+            'amount': max(amounts),
+            'description': text.strip()[:200],
+            'category': category,
+            'date': self.classifier.extract_date(text),
+            'account': self.classifier.extract_account(text),
+            'confidence': round(max(confidence, 0.0), 2)
+        }
+
+
+class IntentCache:
+    """Cache LRU thread-safe de mensagem normalizada -> intent interpretado"""
+
+    def __init__(self, max_size: int = 2048):
+        self.max_size = max_size
+        self._data: 'OrderedDict[tuple, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[Dict]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return dict(value) if value is not None else None
+
+    def put(self, key: tuple, value: Dict):
+        with self._lock:
+            self._data[key] = dict(value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TieredIntentRouter:
+    """
+    Roteia cada mensagem pela camada mais barata que resolve com confiança
+
+    Args:
+        llm_handler: função (text, user_id, tenant_id) -> Dict (chamada ao GPT)
+        fallback_handler: função (text) -> Dict usada quando não há LLM
+        threshold: confiança mínima para responder localmente
+    """
+
+    CACHEABLE_INTENTS = ('transaction', 'query', 'advice', 'help', 'greeting')
+
+    def __init__(
+        self,
+        llm_handler: Optional[Callable[[str, str, Optional[str]], Dict]],
+        fallback_handler: Callable[[str], Dict],
+        threshold: float = None,
+        cache_size: int = None,
+        parser: FastIntentParser = None
+    ):
+        self.llm_handler = llm_handler
+        self.fallback_handler = fallback_handler
+        self.threshold = threshold if threshold is not None else float(os.getenv('AI_FAST_PATH_THRESHOLD', 0.8))
+        self.parser = parser or FastIntentParser()
+        self.cache = IntentCache(cache_size or int(os.getenv('AI_INTENT_CACHE_SIZE', 2048)))
+        self._lock = threading.Lock()
+        self.metrics = {
+            'messages': 0,
+            'cache_hits': 0,
+            'fast_path_hits': 0,
+            'llm_calls': 0,
+            'fallback_calls': 0,
+            'fast_path_ms_total': 0.0,
+            'llm_ms_total': 0.0,
+        }
+        # Estimativa até a primeira chamada real ao LLM
+        self.llm_latency_estimate_ms = float(os.getenv('AI_LLM_LATENCY_ESTIMATE_MS', 1500))
+
+    def _count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self.metrics[key] += value
+
+    def route(self, text: str, user_id: str = 'default', tenant_id: Optional[str] = None) -> Dict:
+        """Interpreta a mensagem pela camada mais barata possível"""
+        started = time.perf_counter()
+        normalized = normalize_message(text)
+        key = (datetime.now().strftime('%Y-%m-%d'), normalized)
+        self._count(messages=1)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            cached['source'] = 'cache'
+            self._count(cache_hits=1, fast_path_ms_total=(time.perf_counter() - started) * 1000)
+            return cached
+
+        local = self.parser.parse(text, normalized)
+        if local.get('confidence', 0) >= self.threshold:
+            local['source'] = 'local'
+            self.cache.put(key, local)
+            self._count(fast_path_hits=1, fast_path_ms_total=(time.perf_counter() - started) * 1000)
+            logger.info(f"⚡ Fast-path: {local['intent']} (confiança {local['confidence']})")
+            return local
+
+        if self.llm_handler is None:
+            self._count(fallback_calls=1)
+            result = self.fallback_handler(text)
+            result['source'] = 'fallback'
+            return result
+
+        llm_started = time.perf_counter()
+        result = self.llm_handler(text, user_id, tenant_id)
+        self._count(llm_calls=1, llm_ms_total=(time.perf_counter() - llm_started) * 1000)
+
+        result.setdefault('source', 'llm')
+        # Extrações de transação independem do contexto da conversa
+        if result.get('intent') == 'transaction' and result.get('confidence', 0) >= self.threshold:
+            self.cache.put(key, {k: v for k, v in result.items() if k != 'raw_response'})
+
+        return result
+
+    def get_metrics(self) -> Dict:
+        """Taxa de acerto do fast-path e latência economizada"""
+        with self._lock:
+            m = dict(self.metrics)
+
+        local_answers = m['cache_hits'] + m['fast_path_hits']
+        avg_llm_ms = m['llm_ms_total'] / m['llm_calls'] if m['llm_calls'] else self.llm_latency_estimate_ms
+        avg_fast_ms = m['fast_path_ms_total'] / local_answers if local_answers else 0.0
+
+        return {
+            **m,
+            'cache_size': len(self.cache),
+            'threshold': self.threshold,
+            'fast_path_hit_rate': round(local_answers / m['messages'], 4) if m['messages'] else 0.0,
+            'avg_llm_ms': round(avg_llm_ms, 2),
+            'avg_fast_path_ms': round(avg_fast_ms, 3),
+            'latency_saved_ms': round(local_answers * max(avg_llm_ms - avg_fast_ms, 0), 2),
+            'llm_latency_measured': m['llm_calls'] > 0
+        }
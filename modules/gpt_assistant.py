@@ -9,6 +9,9 @@ from datetime import datetime
 from typing import Dict, Optional, List
 from dotenv import load_dotenv
 
+from services.conversation_store import conversation_store
+from modules.fast_intent import TieredIntentRouter
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
@@ -104,39 +107,50 @@ class GPTFinanceAssistant:
     
     def __init__(self):
         self.use_gpt = USE_GPT
-        self.conversation_history: Dict[str, List] = {}  # Histórico por usuário
-        self.max_history = 10  # Últimas 10 mensagens
+        self.history = conversation_store  # Histórico compartilhado (LRU + SQLite)
+        self.max_history_tokens = int(os.getenv('AI_HISTORY_MAX_TOKENS', 1500))
+        # Parser local + cache antes de qualquer chamada ao GPT
+        self.router = TieredIntentRouter(
+            llm_handler=self._process_with_gpt if self.use_gpt else None,
+            fallback_handler=self._fallback_processing
+        )
         
-    def process_message(self, text: str, user_id: str = 'default') -> Dict:
+    def process_message(self, text: str, user_id: str = 'default', tenant_id: Optional[str] = None) -> Dict:
         """
-        Processa mensagem do usuário com GPT
+        Processa mensagem do usuário
+        
+        Mensagens triviais ("gastei 50 no mercado", "saldo") são resolvidas
+        localmente; só as ambíguas vão para o GPT.
         
         Args:
             text: Mensagem do usuário
-            user_id: ID do usuário (número WhatsApp)
+            user_id: ID do usuário (ou número WhatsApp, se não cadastrado)
+            tenant_id: ID do tenant do usuário
             
         Returns:
             Dict com intent e dados extraídos
         """
-        logger.info(f"🤖 Processando mensagem com GPT: {text[:100]}...")
+        result = self.router.route(text, user_id, tenant_id)
         
-        if not self.use_gpt:
-            return self._fallback_processing(text)
+        if result.get('source') in ('local', 'cache'):
+            # Mantém o contexto da conversa para as próximas chamadas ao GPT
+            self.history.append(user_id, tenant_id, text, json.dumps(result, ensure_ascii=False),
+                                {'channel': 'whatsapp', 'intent': result.get('intent'), 'source': result['source']})
+        
+        return result
+    
+    def _process_with_gpt(self, text: str, user_id: str, tenant_id: Optional[str]) -> Dict:
+        """Interpreta a mensagem com o GPT (usando o histórico da conversa)"""
+        logger.info(f"🤖 Processando mensagem com GPT: {text[:100]}...")
         
         try:
-            # Preparar histórico
-            if user_id not in self.conversation_history:
-                self.conversation_history[user_id] = []
-            
-            history = self.conversation_history[user_id]
-            
             # Construir mensagens
             messages = [
-                {"role": "system", "content": SYSTEM_PROMPT.format(today=datetime.now().strftime('%Y-%m-%d'))}
+                {"role": "system", "content": SYSTEM_PROMPT.replace('{today}', datetime.now().strftime('%Y-%m-%d'))}
             ]
             
-            # Adicionar histórico recente
-            messages.extend(history[-self.max_history:])
+            # Adicionar histórico recente (dentro do TTL e do orçamento de tokens)
+            messages.extend(self.history.get_window(user_id, tenant_id, self.max_history_tokens))
             
             # Adicionar mensagem atual
             messages.append({"role": "user", "content": text})
@@ -152,18 +166,14 @@ class GPTFinanceAssistant:
             assistant_message = response.choices[0].message.content
             logger.info(f"✅ Resposta GPT: {assistant_message[:200]}...")
             
-            # Atualizar histórico
-            history.append({"role": "user", "content": text})
-            history.append({"role": "assistant", "content": assistant_message})
-            
-            # Limpar histórico antigo
-            if len(history) > self.max_history * 2:
-                self.conversation_history[user_id] = history[-self.max_history * 2:]
-            
             # Parse resposta
             result = self._parse_gpt_response(assistant_message)
             result['raw_response'] = assistant_message
             
+            # Atualizar histórico
+            self.history.append(user_id, tenant_id, text, assistant_message,
+                                {'channel': 'whatsapp', 'intent': result.get('intent')})
+            
             return result
             
         except Exception as e:
@@ -267,10 +277,9 @@ Dê uma dica motivacional e prática em até 3 linhas. Use emojis."""
         import random
         return random.choice(tips)
     
-    def clear_history(self, user_id: str):
+    def clear_history(self, user_id: str, tenant_id: Optional[str] = None):
         """Limpa histórico de conversa do usuário"""
-        if user_id in self.conversation_history:
-            del self.conversation_history[user_id]
+        if self.history.clear(user_id, tenant_id):
             logger.info(f"🗑️ Histórico limpo para {user_id}")
 
 
@@ -285,18 +294,19 @@ gpt_assistant = GPTFinanceAssistant()
 # FUNÇÕES AUXILIARES
 # =========================================
 
-def process_whatsapp_message(text: str, user_id: str) -> Dict:
+def process_whatsapp_message(text: str, user_id: str, tenant_id: Optional[str] = None) -> Dict:
     """
     Função principal para processar mensagem do WhatsApp
     
     Args:
         text: Mensagem do usuário
-        user_id: Número do WhatsApp
+        user_id: ID do usuário (ou número do WhatsApp)
+        tenant_id: ID do tenant do usuário
         
     Returns:
         Dict com dados processados
     """
-    return gpt_assistant.process_message(text, user_id)
+    return gpt_assistant.process_message(text, user_id, tenant_id)
 
 
 def generate_tip(user_data: Dict) -> str:
@@ -304,9 +314,9 @@ def generate_tip(user_data: Dict) -> str:
     return gpt_assistant.generate_financial_tip(user_data)
 
 
-def clear_user_history(user_id: str):
+def clear_user_history(user_id: str, tenant_id: Optional[str] = None):
     """Limpa histórico de conversa"""
-    gpt_assistant.clear_history(user_id)
+    gpt_assistant.clear_history(user_id, tenant_id)
 
 
 # =========================================
@@ -11,6 +11,13 @@ import uuid
 from datetime import datetime
 from decimal import Decimal
 
+from services import metrics
+from services.principal import principal_for
+from services.transaction_queries import (
+    DEFAULT_PAGE_SIZE, fetch_page, fetch_totals, encode_cursor, clamp_limit, ensure_indexes,
+    build_where as build_transaction_where
+)
+
 accounts_bp = Blueprint('accounts', __name__, url_prefix='/api/accounts')
 
 # =====================================================
@@ -19,7 +26,7 @@ accounts_bp = Blueprint('accounts', __name__, url_prefix='/api/accounts')
 
 def get_db():
     """Conecta ao banco de dados"""
-    db = sqlite3.connect('bws_finance.db')
+    db = metrics.connect('bws_finance.db')
     db.row_factory = sqlite3.Row
     return db
 
@@ -48,10 +55,8 @@ def require_auth(f):
         
         request.user_id = user_id
         
-        # Buscar tenant_id do usuário
-        db = get_db()
-        user = db.execute("SELECT tenant_id FROM users WHERE id = ?", (request.user_id,)).fetchone()
-        db.close()
+        # Buscar tenant_id do usuário (g.principal ou cache de principais)
+        user = principal_for(request.user_id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -330,8 +335,11 @@ def delete_account(account_id):
 @require_auth
 def get_account_transactions(account_id):
     """
-    GET /api/accounts/:id/transactions?date_from=&date_to=&page=1&limit=50
-    Lista transações de uma conta
+    GET /api/accounts/:id/transactions?date_from=&date_to=&cursor=&limit=50
+    Lista transações de uma conta, paginadas por cursor (keyset)
+    
+    O parâmetro legado page=N continua aceito, mas o cursor retornado em
+    pagination.next_cursor não degrada em páginas profundas.
     """
     db = get_db()
     
@@ -346,57 +354,58 @@ def get_account_transactions(account_id):
         return jsonify({'error': 'Account not found'}), 404
     
     # Filtros
-    date_from = request.args.get('date_from')
-    date_to = request.args.get('date_to')
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 50))
-    offset = (page - 1) * limit
-    
-    # Query base
-    query = """
-        SELECT t.*, c.name as category_name, c.icon as category_icon, c.color as category_color
-        FROM transactions t
-        LEFT JOIN categories c ON t.category_id = c.id
-        WHERE t.account_id = ?
-    """
-    params = [account_id]
-    
-    if date_from:
-        query += " AND t.date >= ?"
-        params.append(date_from)
-    
-    if date_to:
-        query += " AND t.date <= ?"
-        params.append(date_to)
-    
-    query += " ORDER BY t.date DESC, t.created_at DESC LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
-    
-    transactions = db.execute(query, params).fetchall()
-    
-    # Total count
-    count_query = "SELECT COUNT(*) as total FROM transactions WHERE account_id = ?"
-    count_params = [account_id]
-    
-    if date_from:
-        count_query += " AND date >= ?"
-        count_params.append(date_from)
-    if date_to:
-        count_query += " AND date <= ?"
-        count_params.append(date_to)
-    
-    total = db.execute(count_query, count_params).fetchone()['total']
+    filters = {
+        'account_id': account_id,
+        'start_date': request.args.get('date_from'),
+        'end_date': request.args.get('date_to')
+    }
+    # Mesmo teto de fetch_page, para a fronteira e o total de páginas baterem
+    limit = clamp_limit(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int))
+    cursor = request.args.get('cursor')
+    page = request.args.get('page', type=int)
+    
+    result = None
+    if page and page > 1 and not cursor:
+        # Compatibilidade: converte a página pedida em cursor (avança só pela chave do índice)
+        # A migração antes da fronteira: created_at NULL viraria um cursor inválido
+        ensure_indexes(db)
+        where, params = build_transaction_where(request.user_id, request.tenant_id, filters)
+        boundary = db.execute(f"""
+            SELECT t.date, t.created_at, t.id FROM transactions t
+            WHERE {where}
+            ORDER BY t.date DESC, t.created_at DESC, t.id DESC
+            LIMIT 1 OFFSET ?
+        """, params + [(page - 1) * limit - 1]).fetchone()
+        if boundary:
+            cursor = encode_cursor(boundary)
+        else:
+            # Página além da última: lista vazia (sem cursor voltaria à primeira)
+            result = {'transactions': [], 'next_cursor': None, 'has_more': False}
+    
+    if result is None:
+        result = fetch_page(db, request.user_id, request.tenant_id, filters, cursor=cursor, limit=limit)
+    
+    # Total count (uma agregação; omitido na rolagem por cursor)
+    total = None
+    if not request.args.get('cursor'):
+        total = fetch_totals(db, request.user_id, request.tenant_id, filters)['total_transactions']
     
     db.close()
     
+    pagination = {
+        'limit': limit,
+        'next_cursor': result['next_cursor'],
+        'has_more': result['has_more']
+    }
+    if page:
+        pagination['page'] = page
+    if total is not None:
+        pagination['total'] = total
+        pagination['pages'] = (total + limit - 1) // limit
+    
     return jsonify({
-        'transactions': [dict(t) for t in transactions],
-        'pagination': {
-            'page': page,
-            'limit': limit,
-            'total': total,
-            'pages': (total + limit - 1) // limit
-        }
+        'transactions': result['transactions'],
+        'pagination': pagination
     }), 200
 
 @accounts_bp.route('/<account_id>/recalculate', methods=['POST'])
@@ -125,6 +125,23 @@ def get_conversation_history():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@ai_bp.route('/history', methods=['DELETE'])
+@login_required_api
+def clear_conversation_history():
+    """
+    DELETE /api/ai/history
+    Apaga o histórico de conversas (web e WhatsApp) do usuário
+    """
+    try:
+        from modules.gpt_assistant import clear_user_history
+        
+        clear_user_history(session.get('user_id'), session.get('tenant_id'))
+        
+        return jsonify({'success': True})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @ai_bp.route('/alerts', methods=['GET'])
 @login_required_api
 def get_alerts():
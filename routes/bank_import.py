@@ -11,7 +11,9 @@ from datetime import datetime
 from functools import wraps
 
 # Importar módulo de importação
+from services import metrics
 from services.bank_importer import BankStatementImporter, detect_file_type
+from services.transaction_service import transaction_service
 
 # Configuração
 UPLOAD_FOLDER = 'temp_uploads'
@@ -44,7 +46,7 @@ def allowed_file(filename):
 def get_db():
     """Importa e retorna conexão com banco de dados"""
     import sqlite3
-    conn = sqlite3.connect('bws_finance.db')
+    conn = metrics.connect('bws_finance.db')
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -175,41 +177,39 @@ def import_manual():
         # Importar transações
         auto_categorize = request.form.get('auto_categorize', 'true').lower() == 'true'
         
-        # Se for cartão, passar card_id nas transações
-        if import_type == 'card':
-            # Adicionar card_id em cada transação
-            for txn in transactions:
-                txn['card_id'] = card_id
-                txn['payment_method'] = 'credit_card'
-            result = importer.import_transactions(transactions, None, db, auto_categorize)
-        else:
-            result = importer.import_transactions(transactions, account_id, db, auto_categorize)
+        # Transações, saldo da conta e log de importação em um único commit;
+        # a IA é avisada depois, pela fila pós-commit (services/transaction_service)
+        with transaction_service.unit_of_work(db) as uow:
+            # Se for cartão, passar card_id nas transações
+            if import_type == 'card':
+                # Adicionar card_id em cada transação
+                for txn in transactions:
+                    txn['card_id'] = card_id
+                    txn['payment_method'] = 'credit_card'
+                result = importer.import_transactions(transactions, None, db, auto_categorize, uow=uow)
+            else:
+                result = importer.import_transactions(transactions, account_id, db, auto_categorize, uow=uow)
             
-            # Atualizar saldo da conta (apenas para contas bancárias)
-            from routes.accounts import recalculate_account_balance
-            recalculate_account_balance(account_id)
-        
-        # Registrar log de importação
-        import_id = str(uuid.uuid4())
-        log_account_id = account_id if import_type == 'account' else None
-        log_card_id = card_id if import_type == 'card' else None
-        db.execute("""
-            INSERT INTO import_logs (
-                id, user_id, tenant_id, account_id, card_id,
-                file_name, file_type, total_transactions, 
-                imported_transactions, duplicated_transactions, 
-                created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        """, (
-            import_id, user_id, tenant_id, log_account_id, log_card_id,
-            filename, file_type, result['total'],
-            result['imported'], result['duplicated']
-        ))
-        db.commit()
-        
-        # Notificar IA
-        target_id = card_id if import_type == 'card' else account_id
-        _notify_ai_import(user_id, tenant_id, target_id, result)
+            # Registrar log de importação
+            import_id = str(uuid.uuid4())
+            log_account_id = account_id if import_type == 'account' else None
+            log_card_id = card_id if import_type == 'card' else None
+            db.execute("""
+                INSERT INTO import_logs (
+                    id, user_id, tenant_id, account_id, card_id,
+                    file_name, file_type, total_transactions, 
+                    imported_transactions, duplicated_transactions, 
+                    created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, (
+                import_id, user_id, tenant_id, log_account_id, log_card_id,
+                filename, file_type, result['total'],
+                result['imported'], result['duplicated']
+            ))
+            
+            # Notificar IA
+            target_id = card_id if import_type == 'card' else account_id
+            uow.after_commit(_notify_ai_import, user_id, tenant_id, target_id, dict(result))
         
         return jsonify({
             'success': True,
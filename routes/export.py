@@ -0,0 +1,84 @@
+"""
+Rotas de Exportação de Transações
+Blueprint Flask para /api/export
+"""
+
+from flask import Blueprint, request, jsonify, session, Response
+from functools import wraps
+
+from services.principal import principal_for
+from services.transaction_queries import parse_filters
+from services.ledger_export import (
+    EXPORT_FORMATS, export_transactions, export_filename
+)
+
+DB_PATH = 'bws_finance.db'
+
+export_bp = Blueprint('export', __name__, url_prefix='/api/export')
+
+
+def login_required_api(f):
+    """Decorator para verificar login em rotas API"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'error': 'Não autenticado'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def is_admin(user_id: str) -> bool:
+    principal = principal_for(user_id)
+    return bool(principal and principal['is_admin'])
+
+
+@export_bp.route('', methods=['GET'])
+@login_required_api
+def export_ledger():
+    """
+    GET /api/export
+    Exporta as transações em streaming
+
+    Query Params:
+        format: csv (padrão), ofx ou ndjson
+        gzip: 1 para comprimir a saída (.gz)
+        scope: user (padrão) ou tenant (somente admin)
+        start_date/date_from, end_date/date_to, account_id, card_id,
+        category, type: mesmos filtros de /api/transactions
+    """
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Formato inválido. Use: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    scope = request.args.get('scope', 'user')
+
+    user_id = session['user_id']
+    tenant_id = session['tenant_id']
+
+    if scope == 'tenant':
+        if not is_admin(user_id):
+            return jsonify({'error': 'Admin access required'}), 403
+        user_id = None
+    elif scope != 'user':
+        return jsonify({'error': 'scope deve ser user ou tenant'}), 400
+
+    body = export_transactions(
+        DB_PATH,
+        tenant_id,
+        user_id=user_id,
+        filters=parse_filters(request.args),
+        fmt=fmt,
+        compress=compress
+    )
+
+    filename = export_filename(fmt, compress)
+    response = Response(
+        body,
+        mimetype='application/gzip' if compress else EXPORT_FORMATS[fmt]['mimetype'],
+        direct_passthrough=True
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -16,13 +16,20 @@ from flask import Blueprint, request, jsonify, session
 import sqlite3
 import uuid
 from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
+
+from services import metrics
+from services.installment_schedule import (
+    AMORTIZATION_SYSTEMS, SYSTEM_SIMPLE, build_schedule, write_schedules,
+    pay_pending, cancel_pending
+)
+from services.principal import principal_for
+from services.transaction_service import transaction_service
 
 installments_bp = Blueprint('installments', __name__)
 
 def get_db():
     """Conecta ao banco de dados"""
-    db = sqlite3.connect('bws_finance.db')
+    db = metrics.connect('bws_finance.db')
     db.row_factory = sqlite3.Row
     return db
 
@@ -33,29 +40,35 @@ def require_auth():
         return None
     return user_id
 
-def calculate_installment_value(total_amount, installment_count, interest_rate=0):
+def calculate_installment_value(total_amount, installment_count, interest_rate=0, system=SYSTEM_SIMPLE):
     """
-    Calcula o valor de cada parcela com juros simples
+    Calcula o valor da (primeira) parcela
     
     Args:
         total_amount: Valor total da compra
         installment_count: Número de parcelas
         interest_rate: Taxa de juros mensal (ex: 2.5 para 2.5%)
+        system: Sistema de amortização ('simples', 'price' ou 'sac')
     
     Returns:
-        float: Valor de cada parcela
+        float: Valor de cada parcela (no SAC, o valor da primeira)
     """
-    if interest_rate > 0:
+    if system == SYSTEM_SIMPLE:
         # Juros simples: valor_parcela = (total * (1 + taxa * periodo)) / parcelas
         total_with_interest = total_amount * (1 + (interest_rate / 100) * installment_count)
         return round(total_with_interest / installment_count, 2)
-    else:
-        return round(total_amount / installment_count, 2)
+    
+    schedule = build_schedule(total_amount, installment_count,
+                              datetime.now().strftime('%Y-%m-%d'), interest_rate, system)
+    return schedule[0]['value']
 
 def generate_installment_transactions(db, installment_id, installment_data):
     """
     Gera N transações para o parcelamento
     
+    O cronograma inteiro é calculado em memória e gravado com um único
+    executemany (ver services.installment_schedule).
+    
     Args:
         db: Conexão do banco de dados
         installment_id: ID do grupo de parcelamento
@@ -64,68 +77,66 @@ def generate_installment_transactions(db, installment_id, installment_data):
     Returns:
         list: Lista de IDs das transações criadas
     """
-    cursor = db.cursor()
-    transaction_ids = []
+    schedule = installment_data.get('schedule') or build_schedule(
+        installment_data['total_amount'],
+        installment_data['installment_count'],
+        installment_data['first_due_date'],
+        installment_data.get('interest_rate', 0),
+        installment_data.get('amortization_system', SYSTEM_SIMPLE)
+    )
     
-    first_due_date = datetime.strptime(installment_data['first_due_date'], '%Y-%m-%d')
-    installment_value = installment_data['installment_value']
-    card_id = installment_data.get('card_id')
+    return write_schedules(db, [(installment_id, installment_data, schedule)])[installment_id]
+
+def validate_installment_payload(data):
+    """
+    Valida o corpo de criação de um parcelamento
     
-    # Se tem cartão, deduzir o valor total do limite disponível
-    if card_id:
-        total_amount = installment_data['total_amount']
-        cursor.execute("""
-            UPDATE cards 
-            SET used_limit = COALESCE(used_limit, 0) + ?
-            WHERE id = ?
-        """, (total_amount, card_id))
-    
-    for i in range(1, installment_data['installment_count'] + 1):
-        # Calcula a data de vencimento de cada parcela (mensal)
-        due_date = first_due_date + relativedelta(months=(i - 1))
-        
-        # Ajuste para última parcela (pode ter centavos a mais devido a arredondamento)
-        if i == installment_data['installment_count']:
-            # Recalcula para garantir que soma total = total_amount
-            cursor.execute("""
-                SELECT COALESCE(SUM(value), 0) as total_paid
-                FROM transactions
-                WHERE installment_id = ?
-            """, (installment_id,))
-            total_paid = cursor.fetchone()['total_paid']
-            installment_value = round(installment_data['total_amount'] - total_paid, 2)
-        
-        transaction_id = str(uuid.uuid4())
-        description = f"{installment_data['description']} ({i}/{installment_data['installment_count']})"
-        
-        cursor.execute("""
-            INSERT INTO transactions (
-                id, user_id, tenant_id, account_id, card_id, category_id,
-                type, description, value, date, due_date, status, 
-                installment_id, installment_number, created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            transaction_id,
-            installment_data['user_id'],
-            installment_data['tenant_id'],
-            installment_data.get('account_id'),
-            installment_data.get('card_id'),
-            installment_data.get('category_id'),
-            'Despesa',
-            description,
-            installment_value,
-            due_date.strftime('%Y-%m-%d'),
-            due_date.strftime('%Y-%m-%d'),
-            'Pendente',
-            installment_id,
-            i,
-            datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        ))
-        
-        transaction_ids.append(transaction_id)
-    
-    db.commit()
-    return transaction_ids
+    Returns:
+        str: Mensagem de erro, ou None se válido
+    """
+    if not data.get('description'):
+        return 'Descrição é obrigatória'
+    
+    if not data.get('total_amount') or data['total_amount'] <= 0:
+        return 'Valor total deve ser maior que zero'
+    
+    if not data.get('installment_count') or data['installment_count'] < 2:
+        return 'Número de parcelas deve ser no mínimo 2'
+    
+    if not data.get('first_due_date'):
+        return 'Data do primeiro vencimento é obrigatória'
+    
+    if data.get('amortization_system', SYSTEM_SIMPLE) not in AMORTIZATION_SYSTEMS:
+        return f"Sistema de amortização deve ser um de: {', '.join(AMORTIZATION_SYSTEMS)}"
+    
+    return None
+
+def insert_installment_record(cursor, installment_id, user_id, tenant_id, data, installment_value):
+    """Insere o registro do grupo de parcelamento"""
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    cursor.execute("""
+        INSERT INTO installments (
+            id, user_id, tenant_id, account_id, card_id, category_id,
+            description, total_amount, installment_count, installment_value,
+            interest_rate, first_due_date, current_status, created_at, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        installment_id,
+        user_id,
+        tenant_id,
+        data.get('account_id'),
+        data.get('card_id'),
+        data.get('category_id'),
+        data['description'],
+        data['total_amount'],
+        data['installment_count'],
+        installment_value,
+        data.get('interest_rate', 0),
+        data['first_due_date'],
+        'active',
+        now,
+        now
+    ))
 
 # ==================== ENDPOINTS ====================
 
@@ -141,6 +152,7 @@ def create_installment():
         "total_amount": 3000.00,
         "installment_count": 10,
         "interest_rate": 0,  // opcional, juros mensal em %
+        "amortization_system": "simples",  // opcional: simples, price ou sac
         "first_due_date": "2025-01-15",
         "account_id": "uuid",  // opcional
         "card_id": "uuid",  // opcional
@@ -154,32 +166,26 @@ def create_installment():
     data = request.get_json()
     
     # Validações
-    if not data.get('description'):
-        return jsonify({'error': 'Descrição é obrigatória'}), 400
-    
-    if not data.get('total_amount') or data['total_amount'] <= 0:
-        return jsonify({'error': 'Valor total deve ser maior que zero'}), 400
-    
-    if not data.get('installment_count') or data['installment_count'] < 2:
-        return jsonify({'error': 'Número de parcelas deve ser no mínimo 2'}), 400
+    error = validate_installment_payload(data)
+    if error:
+        return jsonify({'error': error}), 400
     
-    if not data.get('first_due_date'):
-        return jsonify({'error': 'Data do primeiro vencimento é obrigatória'}), 400
-    
-    # Calcular valor da parcela
-    installment_value = calculate_installment_value(
+    # Calcular cronograma completo
+    schedule = build_schedule(
         data['total_amount'],
         data['installment_count'],
-        data.get('interest_rate', 0)
+        data['first_due_date'],
+        data.get('interest_rate', 0),
+        data.get('amortization_system', SYSTEM_SIMPLE)
     )
+    installment_value = schedule[0]['value']
     
     db = get_db()
     cursor = db.cursor()
     
     try:
         # Buscar tenant_id do usuário
-        cursor.execute("SELECT tenant_id FROM users WHERE id = ?", (user_id,))
-        user = cursor.fetchone()
+        user = principal_for(user_id)
         if not user:
             return jsonify({'error': 'Usuário não encontrado'}), 404
         tenant_id = user['tenant_id']
@@ -210,49 +216,23 @@ def create_installment():
             if not cursor.fetchone():
                 return jsonify({'error': 'Categoria não encontrada'}), 404
         
-        # Criar registro do parcelamento
-        installment_id = str(uuid.uuid4())
-        cursor.execute("""
-            INSERT INTO installments (
-                id, user_id, tenant_id, account_id, card_id, category_id,
-                description, total_amount, installment_count, installment_value,
-                interest_rate, first_due_date, current_status, created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            installment_id,
-            user_id,
-            tenant_id,
-            data.get('account_id'),
-            data.get('card_id'),
-            data.get('category_id'),
-            data['description'],
-            data['total_amount'],
-            data['installment_count'],
-            installment_value,
-            data.get('interest_rate', 0),
-            data['first_due_date'],
-            'active',
-            datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        ))
-        
-        # Gerar transações
-        installment_data = {
-            'user_id': user_id,
-            'tenant_id': tenant_id,
-            'account_id': data.get('account_id'),
-            'card_id': data.get('card_id'),
-            'category_id': data.get('category_id'),
-            'description': data['description'],
-            'total_amount': data['total_amount'],
-            'installment_count': data['installment_count'],
-            'installment_value': installment_value,
-            'first_due_date': data['first_due_date']
-        }
-        
-        transaction_ids = generate_installment_transactions(db, installment_id, installment_data)
-        
-        db.commit()
+        # Registro do parcelamento + parcelas em um único commit (unidade de trabalho)
+        with transaction_service.unit_of_work(db):
+            installment_id = str(uuid.uuid4())
+            insert_installment_record(cursor, installment_id, user_id, tenant_id, data, installment_value)
+            
+            # Gerar transações
+            installment_data = {
+                'user_id': user_id,
+                'tenant_id': tenant_id,
+                'account_id': data.get('account_id'),
+                'card_id': data.get('card_id'),
+                'category_id': data.get('category_id'),
+                'description': data['description'],
+                'schedule': schedule
+            }
+            
+            transaction_ids = generate_installment_transactions(db, installment_id, installment_data)
         
         return jsonify({
             'success': True,
@@ -267,6 +247,105 @@ def create_installment():
     finally:
         db.close()
 
+@installments_bp.route('/api/installments/bulk', methods=['POST'])
+def create_installments_bulk():
+    """
+    POST /api/installments/bulk
+    Cria vários parcelamentos de uma vez (importação em lote)
+    
+    Todos os cronogramas são calculados em memória e as parcelas de todos os
+    parcelamentos são gravadas com um único executemany, em uma transação.
+    
+    Body:
+    {
+        "installments": [ { ...mesmo formato de POST /api/installments... } ]
+    }
+    """
+    user_id = require_auth()
+    if not user_id:
+        return jsonify({'error': 'Não autenticado'}), 401
+    
+    data = request.get_json() or {}
+    items = data.get('installments') or []
+    
+    if not items:
+        return jsonify({'error': 'Nenhum parcelamento informado'}), 400
+    
+    # Validar tudo antes de tocar no banco
+    for index, item in enumerate(items):
+        error = validate_installment_payload(item)
+        if error:
+            return jsonify({'error': error, 'index': index}), 400
+    
+    db = get_db()
+    cursor = db.cursor()
+    
+    try:
+        user = principal_for(user_id)
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+        tenant_id = user['tenant_id']
+        
+        # Validar contas/cartões/categorias referenciados em uma consulta por tabela
+        # (categorias são do tenant; contas e cartões, do usuário)
+        for table, field, label, scope, scope_params in (
+            ('accounts', 'account_id', 'Conta', 'user_id = ? AND tenant_id = ?', (user_id, tenant_id)),
+            ('cards', 'card_id', 'Cartão', 'user_id = ? AND tenant_id = ?', (user_id, tenant_id)),
+            ('categories', 'category_id', 'Categoria', 'tenant_id = ?', (tenant_id,)),
+        ):
+            wanted = {item[field] for item in items if item.get(field)}
+            if not wanted:
+                continue
+            placeholders = ','.join('?' * len(wanted))
+            cursor.execute(f"""
+                SELECT id FROM {table}
+                WHERE id IN ({placeholders}) AND {scope}
+            """, [*wanted, *scope_params])
+            missing = wanted - {row['id'] for row in cursor.fetchall()}
+            if missing:
+                return jsonify({'error': f'{label} não encontrado(a) ou não pertence ao usuário: {sorted(missing)[0]}'}), 404
+        
+        plans = []
+        created = []
+        for item in items:
+            schedule = build_schedule(
+                item['total_amount'],
+                item['installment_count'],
+                item['first_due_date'],
+                item.get('interest_rate', 0),
+                item.get('amortization_system', SYSTEM_SIMPLE)
+            )
+            installment_id = str(uuid.uuid4())
+            insert_installment_record(cursor, installment_id, user_id, tenant_id, item, schedule[0]['value'])
+            plans.append((installment_id, {
+                'user_id': user_id,
+                'tenant_id': tenant_id,
+                'account_id': item.get('account_id'),
+                'card_id': item.get('card_id'),
+                'category_id': item.get('category_id'),
+                'description': item['description']
+            }, schedule))
+            created.append({'installment_id': installment_id, 'installment_count': len(schedule)})
+        
+        with transaction_service.unit_of_work(db):
+            ids_by_installment = write_schedules(db, plans)
+        
+        for entry in created:
+            entry['transaction_ids'] = ids_by_installment[entry['installment_id']]
+        
+        return jsonify({
+            'success': True,
+            'installments': created,
+            'count': len(created),
+            'message': f'{len(created)} parcelamentos criados'
+        }), 201
+        
+    except Exception as e:
+        db.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        db.close()
+
 @installments_bp.route('/api/installments', methods=['GET'])
 def list_installments():
     """
@@ -286,8 +365,7 @@ def list_installments():
     
     try:
         # Buscar tenant_id
-        cursor.execute("SELECT tenant_id FROM users WHERE id = ?", (user_id,))
-        user = cursor.fetchone()
+        user = principal_for(user_id)
         if not user:
             return jsonify({'error': 'Usuário não encontrado'}), 404
         tenant_id = user['tenant_id']
@@ -335,8 +413,7 @@ def get_installment(installment_id):
     
     try:
         # Buscar tenant_id
-        cursor.execute("SELECT tenant_id FROM users WHERE id = ?", (user_id,))
-        user = cursor.fetchone()
+        user = principal_for(user_id)
         if not user:
             return jsonify({'error': 'Usuário não encontrado'}), 404
         tenant_id = user['tenant_id']
@@ -393,8 +470,7 @@ def update_installment(installment_id):
     
     try:
         # Buscar tenant_id
-        cursor.execute("SELECT tenant_id FROM users WHERE id = ?", (user_id,))
-        user = cursor.fetchone()
+        user = principal_for(user_id)
         if not user:
             return jsonify({'error': 'Usuário não encontrado'}), 404
         tenant_id = user['tenant_id']
@@ -458,15 +534,14 @@ def cancel_installment(installment_id):
     
     try:
         # Buscar tenant_id
-        cursor.execute("SELECT tenant_id FROM users WHERE id = ?", (user_id,))
-        user = cursor.fetchone()
+        user = principal_for(user_id)
         if not user:
             return jsonify({'error': 'Usuário não encontrado'}), 404
         tenant_id = user['tenant_id']
         
-        # Verificar se parcelamento existe e buscar card_id
+        # Verificar se parcelamento existe
         cursor.execute("""
-            SELECT id, card_id FROM installments
+            SELECT id FROM installments
             WHERE id = ? AND user_id = ? AND tenant_id = ?
         """, (installment_id, user_id, tenant_id))
         
@@ -474,41 +549,17 @@ def cancel_installment(installment_id):
         if not installment:
             return jsonify({'error': 'Parcelamento não encontrado'}), 404
         
-        card_id = installment['card_id']
-        
-        # Se tem cartão, calcular valor a devolver (soma das parcelas pendentes)
-        if card_id:
-            cursor.execute("""
-                SELECT COALESCE(SUM(value), 0) as total_pending
-                FROM transactions
-                WHERE installment_id = ? AND status = 'Pendente'
-            """, (installment_id,))
-            total_pending = cursor.fetchone()['total_pending']
+        with transaction_service.unit_of_work(db):
+            # Deletar parcelas pendentes (set-based; a fatura do cartão é ajustada por trigger;
+            # pendentes não afetam o saldo da conta)
+            deleted_count, _ = cancel_pending(db, installment_id)
             
-            # Devolver o limite do cartão
-            if total_pending > 0:
-                cursor.execute("""
-                    UPDATE cards 
-                    SET used_limit = COALESCE(used_limit, 0) - ?
-                    WHERE id = ?
-                """, (total_pending, card_id))
-        
-        # Deletar transações pendentes
-        cursor.execute("""
-            DELETE FROM transactions
-            WHERE installment_id = ? AND status = 'Pendente'
-        """, (installment_id,))
-        
-        deleted_count = cursor.rowcount
-        
-        # Marcar parcelamento como cancelado
-        cursor.execute("""
-            UPDATE installments
-            SET current_status = 'cancelled', updated_at = ?
-            WHERE id = ?
-        """, (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), installment_id))
-        
-        db.commit()
+            # Marcar parcelamento como cancelado
+            cursor.execute("""
+                UPDATE installments
+                SET current_status = 'cancelled', updated_at = ?
+                WHERE id = ?
+            """, (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), installment_id))
         
         return jsonify({
             'success': True,
@@ -536,8 +587,7 @@ def pay_all_installments(installment_id):
     
     try:
         # Buscar tenant_id
-        cursor.execute("SELECT tenant_id FROM users WHERE id = ?", (user_id,))
-        user = cursor.fetchone()
+        user = principal_for(user_id)
         if not user:
             return jsonify({'error': 'Usuário não encontrado'}), 404
         tenant_id = user['tenant_id']
@@ -552,45 +602,18 @@ def pay_all_installments(installment_id):
         if not installment:
             return jsonify({'error': 'Parcelamento não encontrado'}), 404
         
-        account_id = installment['account_id']
-        
-        # Buscar transações pendentes
-        cursor.execute("""
-            SELECT id, value FROM transactions
-            WHERE installment_id = ? AND status = 'Pendente'
-        """, (installment_id,))
-        
-        pending_transactions = cursor.fetchall()
+        # Marcar todas as pendentes como pagas (set-based) e debitar a conta no mesmo commit
+        with transaction_service.unit_of_work(db) as uow:
+            paid_count, total_paid = pay_pending(db, installment_id)
+            uow.adjust_balance(installment['account_id'], -total_paid)
         
-        if not pending_transactions:
+        if not paid_count:
             return jsonify({'message': 'Não há parcelas pendentes'}), 200
         
-        # Marcar todas como pagas
-        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        total_paid = 0
-        
-        for transaction in pending_transactions:
-            cursor.execute("""
-                UPDATE transactions
-                SET status = 'Pago', paid_at = ?
-                WHERE id = ?
-            """, (now, transaction['id']))
-            total_paid += transaction['value']
-        
-        # Atualizar saldo da conta (se houver)
-        if account_id:
-            cursor.execute("""
-                UPDATE accounts
-                SET current_balance = current_balance - ?
-                WHERE id = ?
-            """, (total_paid, account_id))
-        
-        db.commit()
-        
         return jsonify({
             'success': True,
-            'message': f'{len(pending_transactions)} parcelas pagas. Total: R$ {total_paid:.2f}',
-            'transactions_paid': len(pending_transactions),
+            'message': f'{paid_count} parcelas pagas. Total: R$ {total_paid:.2f}',
+            'transactions_paid': paid_count,
             'total_amount': total_paid
         }), 200
         
@@ -615,8 +638,7 @@ def get_installment_schedule(installment_id):
     
     try:
         # Buscar tenant_id
-        cursor.execute("SELECT tenant_id FROM users WHERE id = ?", (user_id,))
-        user = cursor.fetchone()
+        user = principal_for(user_id)
         if not user:
             return jsonify({'error': 'Usuário não encontrado'}), 404
         tenant_id = user['tenant_id']
@@ -8,6 +8,10 @@ from datetime import datetime, timedelta
 import sqlite3
 from functools import wraps
 
+from services import metrics
+from services.fixed_income_accrual import fixed_income_accrual, INDEXERS
+from services.quote_service import quote_service
+
 investments_bp = Blueprint('investments', __name__)
 
 # Constante do banco
@@ -22,45 +26,19 @@ def require_auth(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def calculate_simple_interest(principal, rate, days):
-    """
-    Calcula juros simples
-    J = P * i * t
+def apply_projection(investments):
     """
-    years = days / 365.0
-    interest = principal * (rate / 100) * years
-    return interest
-
-def calculate_compound_interest(principal, rate, days):
+    Preenche calculated_current_value/calculated_earned com o rendimento
+    projetado até hoje (dias úteis, a partir da última apropriação)
     """
-    Calcula juros compostos
-    M = P * (1 + i)^t
-    J = M - P
-    """
-    years = days / 365.0
-    final_amount = principal * ((1 + rate / 100) ** years)
-    interest = final_amount - principal
-    return interest
-
-def calculate_investment_value(investment):
-    """
-    Calcula o valor atual de um investimento baseado em juros
-    """
-    principal = investment['total_invested']
-    rate = investment['interest_rate']
-    interest_type = investment['interest_type']
-    start_date = datetime.fromisoformat(investment['start_date'])
-    days = (datetime.now() - start_date).days
-    
-    if days <= 0:
-        return principal
-    
-    if interest_type == 'simple':
-        interest = calculate_simple_interest(principal, rate, days)
-    else:  # compound
-        interest = calculate_compound_interest(principal, rate, days)
+    active = [inv for inv in investments if inv['investment_status'] == 'active']
+    projected = fixed_income_accrual.project(active) if active else {}
     
-    return principal + interest
+    for inv in active:
+        result = projected.get(inv['id'])
+        calculated_value = result['new_value'] if result else inv['current_value']
+        inv['calculated_current_value'] = round(calculated_value, 2)
+        inv['calculated_earned'] = round(calculated_value - inv['total_invested'], 2)
 
 # =====================================================
 # ENDPOINTS
@@ -74,7 +52,7 @@ def list_investments():
         user_id = session['user_id']
         tenant_id = session['tenant_id']
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = metrics.connect(DB_PATH)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -86,16 +64,11 @@ def list_investments():
         """, (user_id, tenant_id))
         
         investments = [dict(row) for row in cursor.fetchall()]
-        
-        # Calcular valor atual baseado em juros
-        for inv in investments:
-            if inv['investment_status'] == 'active':
-                calculated_value = calculate_investment_value(inv)
-                inv['calculated_current_value'] = round(calculated_value, 2)
-                inv['calculated_earned'] = round(calculated_value - inv['total_invested'], 2)
-        
         conn.close()
         
+        # Valor atual projetado (uma passada para todas as posições)
+        apply_projection(investments)
+        
         return jsonify({
             'investments': investments,
             'total': len(investments)
@@ -112,7 +85,7 @@ def get_investment(investment_id):
         user_id = session['user_id']
         tenant_id = session['tenant_id']
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = metrics.connect(DB_PATH)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -128,14 +101,10 @@ def get_investment(investment_id):
             return jsonify({'error': 'Investimento não encontrado'}), 404
         
         investment = dict(investment)
+        conn.close()
         
         # Calcular valor atual
-        if investment['investment_status'] == 'active':
-            calculated_value = calculate_investment_value(investment)
-            investment['calculated_current_value'] = round(calculated_value, 2)
-            investment['calculated_earned'] = round(calculated_value - investment['total_invested'], 2)
-        
-        conn.close()
+        apply_projection([investment])
         
         return jsonify(investment), 200
         
@@ -174,7 +143,17 @@ def create_investment():
         if interest_type not in ['simple', 'compound']:
             return jsonify({'error': 'Tipo de juros inválido'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
+        # Indexador (PRE, CDI, SELIC, IPCA) e percentual do índice (ex.: 110% do CDI)
+        indexer = (data.get('indexer') or 'PRE').upper()
+        if indexer not in INDEXERS:
+            return jsonify({'error': 'Indexador inválido'}), 400
+        
+        indexer_percent = float(data.get('indexer_percent') or 100)
+        if indexer_percent <= 0:
+            return jsonify({'error': 'Percentual do indexador deve ser positivo'}), 400
+        
+        conn = metrics.connect(DB_PATH)
+        fixed_income_accrual.ensure_schema(conn)
         cursor = conn.cursor()
         
         # Inserir investimento
@@ -183,8 +162,8 @@ def create_investment():
                 tenant_id, user_id, name, investment_type, amount,
                 interest_rate, interest_type, start_date, maturity_date,
                 current_value, total_invested, total_earned,
-                investment_status, description
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                investment_status, description, indexer, indexer_percent
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             tenant_id,
             user_id,
@@ -199,7 +178,9 @@ def create_investment():
             amount,  # total_invested inicial = amount
             0,  # total_earned inicial = 0
             'active',
-            data.get('description', '')
+            data.get('description', ''),
+            indexer,
+            indexer_percent
         ))
         
         investment_id = cursor.lastrowid
@@ -241,7 +222,7 @@ def update_investment(investment_id):
         tenant_id = session['tenant_id']
         data = request.json
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = metrics.connect(DB_PATH)
         cursor = conn.cursor()
         
         # Verificar se existe e pertence ao usuário
@@ -315,7 +296,7 @@ def delete_investment(investment_id):
         user_id = session['user_id']
         tenant_id = session['tenant_id']
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = metrics.connect(DB_PATH)
         cursor = conn.cursor()
         
         # Verificar se existe
@@ -352,7 +333,7 @@ def get_investment_history(investment_id):
         user_id = session['user_id']
         tenant_id = session['tenant_id']
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = metrics.connect(DB_PATH)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -401,7 +382,7 @@ def deposit_investment(investment_id):
         if amount <= 0:
             return jsonify({'error': 'Valor deve ser positivo'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = metrics.connect(DB_PATH)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -473,7 +454,7 @@ def withdraw_investment(investment_id):
         if amount <= 0:
             return jsonify({'error': 'Valor deve ser positivo'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = metrics.connect(DB_PATH)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -540,80 +521,35 @@ def withdraw_investment(investment_id):
 @investments_bp.route('/api/investments/<int:investment_id>/calculate-interest', methods=['POST'])
 @require_auth
 def calculate_interest(investment_id):
-    """Calcula e aplica os juros acumulados"""
+    """Apropria os rendimentos desde a última apropriação (dias úteis)"""
     try:
         user_id = session['user_id']
         tenant_id = session['tenant_id']
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Buscar investimento
-        cursor.execute("""
-            SELECT * FROM investments
-            WHERE id = ? AND user_id = ? AND tenant_id = ? AND investment_status = 'active'
-        """, (investment_id, user_id, tenant_id))
-        
-        investment = cursor.fetchone()
-        if not investment:
-            conn.close()
-            return jsonify({'error': 'Investimento não encontrado ou inativo'}), 404
-        
-        investment = dict(investment)
-        
-        # Calcular juros
-        principal = investment['total_invested']
-        rate = investment['interest_rate']
-        interest_type = investment['interest_type']
-        start_date = datetime.fromisoformat(investment['start_date'])
-        days = (datetime.now() - start_date).days
+        stats = fixed_income_accrual.run(
+            investment_ids=[investment_id],
+            user_id=user_id,
+            tenant_id=tenant_id
+        )
         
-        if days <= 0:
-            conn.close()
-            return jsonify({'error': 'Investimento ainda não rendeu'}), 400
+        if stats['positions'] == 0:
+            return jsonify({'error': 'Investimento de renda fixa não encontrado ou inativo'}), 404
         
-        if interest_type == 'simple':
-            interest = calculate_simple_interest(principal, rate, days)
-        else:  # compound
-            interest = calculate_compound_interest(principal, rate, days)
+        if stats['conflicts']:
+            return jsonify({'error': 'Investimento apropriado por outra execução; tente novamente'}), 409
         
-        new_current_value = principal + interest
-        new_total_earned = interest
+        if not stats['results']:
+            return jsonify({'error': 'Nenhum dia útil a apropriar (ou taxa do índice indisponível)'}), 400
         
-        # Atualizar investimento
-        cursor.execute("""
-            UPDATE investments
-            SET current_value = ?,
-                total_earned = ?
-            WHERE id = ?
-        """, (new_current_value, new_total_earned, investment_id))
-        
-        # Registrar no histórico
-        cursor.execute("""
-            INSERT INTO investment_history (
-                investment_id, date, operation_type, amount,
-                balance_before, balance_after, interest_earned, description
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            investment_id,
-            datetime.now().isoformat(),
-            'interest',
-            interest,
-            investment['current_value'],
-            new_current_value,
-            interest,
-            f'Juros {interest_type} de {days} dias'
-        ))
-        
-        conn.commit()
-        conn.close()
+        result = stats['results'][0]
         
         return jsonify({
             'message': 'Juros calculados e aplicados',
-            'interest_earned': round(interest, 2),
-            'new_value': round(new_current_value, 2),
-            'days': days
+            'interest_earned': result['interest'],
+            'new_value': result['new_value'],
+            'days': result['business_days'],
+            'accrual_from': result['accrual_from'],
+            'accrual_to': result['accrual_to']
         }), 200
         
     except Exception as e:
@@ -625,59 +561,42 @@ def get_quote(ticker):
     """
     Busca cotação em tempo real de um ativo (ação, cripto, etc)
     Rota pública (não requer autenticação) para uso no formulário
+    
+    Respostas recentes vêm do cache; buscas simultâneas do mesmo ticker são
+    coalescidas e cada cliente tem um limite de consultas que vão à rede.
     """
     try:
-        from services.api_connectors import InvestmentAPIFactory
-        
-        # Remover espaços
-        ticker = ticker.strip().upper()
-        
-        # Detectar tipo de ativo
-        crypto_keywords = ['BITCOIN', 'BTC', 'ETHEREUM', 'ETH', 'BNB', 'CARDANO', 'ADA', 
-                          'SOLANA', 'SOL', 'XRP', 'RIPPLE', 'DOGE', 'DOGECOIN', 
-                          'USDT', 'USDC', 'MATIC', 'POLYGON']
-        
-        is_crypto = any(keyword in ticker for keyword in crypto_keywords)
-        
-        if is_crypto:
-            # Buscar como criptomoeda
-            data = InvestmentAPIFactory.get_investment_data('Criptomoedas', ticker)
+        client = f"user:{session['user_id']}" if 'user_id' in session else f"ip:{request.remote_addr}"
+        payload, status, source = quote_service.get_quote(ticker, client)
+        
+        response = jsonify(payload)
+        response.status_code = status
+        response.headers['X-Cache'] = source
+        if status == 429:
+            response.headers['Retry-After'] = str(payload['retry_after'])
         else:
-            # Buscar como ação com múltiplos fallbacks
-            data = InvestmentAPIFactory.get_stock_with_fundamentals(ticker)
-        
-        if not data or not data.get('price') or data.get('price', 0) <= 0:
-            return jsonify({
-                'success': False,
-                'error': 'Ativo não encontrado ou cotação indisponível'
-            }), 404
-        
-        # Determinar tipo de ativo
-        asset_type = data.get('asset_type', '')  # 'FII', 'Ação', etc
-        
-        # Se não veio asset_type, tentar detectar pelo ticker
-        if not asset_type:
-            if is_crypto:
-                asset_type = 'crypto'
-            elif ticker.endswith('11'):
-                asset_type = 'FII'
-            else:
-                asset_type = 'Ação'
-        
-        return jsonify({
-            'success': True,
-            'ticker': ticker,
-            'name': data.get('name', ticker),
-            'price': round(data.get('price', 0), 2),
-            'change': round(data.get('change', 0), 2),
-            'change_percent': round(data.get('change_percent', 0), 2),
-            'type': 'crypto' if is_crypto else 'stock',
-            'asset_type': asset_type,  # 'FII', 'Ação', 'crypto'
-            'currency': 'BRL'
-        }), 200
+            response.headers['Cache-Control'] = f'private, max-age={quote_service.ttl}'
+        return response
         
     except Exception as e:
         return jsonify({
             'success': False,
             'error': f'Erro ao buscar cotação: {str(e)}'
         }), 500
+
+
+@investments_bp.route('/api/tickers/search', methods=['GET'])
+def search_tickers():
+    """
+    Autocomplete de tickers da B3 a partir da lista local (sem rede)
+    Query params: q (prefixo do ticker ou parte do nome), limit (padrão 10)
+    """
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    
+    response = jsonify({
+        'success': True,
+        'results': quote_service.index.search(query, limit) if query else []
+    })
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response
@@ -3,7 +3,7 @@ Notifications API Routes
 Endpoints REST para gerenciar notificações
 
 Endpoints:
-- GET /api/notifications - Lista notificações (paginação)
+- GET /api/notifications - Lista notificações (paginação por cursor; ?page=N legado)
 - POST /api/notifications/send - Força envio de notificação
 - PATCH /api/notifications/<id>/read - Marca como lida
 - GET /api/notifications/health - Health check
@@ -11,14 +11,20 @@ Endpoints:
 - PUT /api/notifications/settings - Atualiza preferências
 """
 
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, request, jsonify, session
 from datetime import datetime
 import sqlite3
 import json
 import logging
 
 # Importar service
+from services import metrics
 from services.auto_notifications import notification_service
+from services.notification_center import (
+    MAX_PAGE_SIZE, decode_cursor, encode_cursor, get_counters,
+    ensure_schema as ensure_notification_schema
+)
+from services.principal import principal_for
 
 logger = logging.getLogger('notifications.routes')
 
@@ -28,7 +34,7 @@ notifications_bp = Blueprint('notifications', __name__, url_prefix='/api/notific
 
 def get_db():
     """Retorna conexão com banco"""
-    return sqlite3.connect('bws_finance.db')
+    return metrics.connect('bws_finance.db')
 
 
 def require_auth(f):
@@ -46,93 +52,104 @@ def require_auth(f):
 @require_auth
 def list_notifications():
     """
-    Lista notificações do usuário
+    Lista notificações do usuário (paginação por cursor)
     
     Query params:
-        - page: Página (default: 1)
-        - per_page: Itens por página (default: 20)
+        - cursor: Cursor devolvido pela página anterior (next_cursor)
+        - page: Página (legado, via OFFSET; ignorado se houver cursor)
+        - per_page: Itens por página (default: 20, máx: 100)
         - status: Filtrar por status (pending, sent, failed, read)
         - event_type: Filtrar por tipo
     
+    Cada página continua da última notificação vista (created_at, id), sem
+    OFFSET. Os totais vêm de notification_counters (mantidos por trigger) e
+    cada linha é serializada em JSON pelo próprio SQLite, então o meta não é
+    decodificado em Python.
+    
+    Clientes antigos continuam usando ?page=N: a página é lida com OFFSET e,
+    quando os contadores não cobrem o filtro, o total vem de um COUNT.
+    
     Returns:
         {
             "notifications": [...],
-            "total": int,
-            "page": int,
+            "total": int | null (sem filtro, status=unread ou ?page),
+            "unread": int,
+            "page": int | null (null ao navegar por cursor),
             "per_page": int,
-            "pages": int
+            "pages": int | null (null quando o total é null),
+            "next_cursor": str | null,
+            "has_more": bool
         }
     """
     user_id = session.get('user_id')
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 20))
+    per_page = max(1, min(int(request.args.get('per_page', 20)), MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor')
+    legacy_page = 'page' in request.args and not cursor
+    page = max(1, int(request.args.get('page', 1))) if not cursor else None
     status = request.args.get('status')
     event_type = request.args.get('event_type')
     
     db = get_db()
-    cursor = db.cursor()
+    ensure_notification_schema(db)
     
-    # Query base
-    query = """
-        SELECT id, user_id, title, message, event_type, channel,
-               priority, status, meta, created_at, sent_at, read_at
-        FROM notifications
-        WHERE user_id = ?
-    """
+    where = "user_id = ?"
     params = [user_id]
     
     # Filtros
     if status:
-        query += " AND status = ?"
+        where += " AND status = ?"
         params.append(status)
     
     if event_type:
-        query += " AND event_type = ?"
+        where += " AND event_type = ?"
         params.append(event_type)
     
-    # Contar total
-    count_query = query.replace(
-        "SELECT id, user_id, title, message, event_type, channel, priority, status, meta, created_at, sent_at, read_at",
-        "SELECT COUNT(*)"
-    )
-    cursor.execute(count_query, params)
-    total = cursor.fetchone()[0]
-    
-    # Paginação
-    query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-    params.extend([per_page, (page - 1) * per_page])
-    
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    
-    notifications = []
-    for row in rows:
-        notifications.append({
-            'id': row[0],
-            'user_id': row[1],
-            'title': row[2],
-            'message': row[3],
-            'event_type': row[4],
-            'channel': row[5],
-            'priority': row[6],
-            'status': row[7],
-            'meta': json.loads(row[8]) if row[8] else None,
-            'created_at': row[9],
-            'sent_at': row[10],
-            'read_at': row[11]
-        })
-    
+    position = decode_cursor(cursor)
+    if position:
+        where += " AND (created_at, id) < (?, ?)"
+        params.extend(position)
+    
+    # Uma linha a mais indica se existe próxima página
+    rows = db.execute(f"""
+        SELECT created_at, id, json_object(
+            'id', id, 'user_id', user_id, 'title', title, 'message', message,
+            'event_type', event_type, 'channel', channel, 'priority', priority,
+            'status', status,
+            'meta', CASE WHEN json_valid(meta) THEN json(meta) END,
+            'created_at', created_at, 'sent_at', sent_at, 'read_at', read_at
+        )
+        FROM notifications
+        WHERE {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ? OFFSET ?
+    """, params + [per_page + 1, (page - 1) * per_page if legacy_page else 0]).fetchall()
+    
+    counters = get_counters(db, user_id)
+    
+    if not status and not event_type:
+        total = counters['total']
+    elif status == 'unread' and not event_type:
+        total = counters['unread']
+    elif legacy_page:
+        total = db.execute(f"SELECT COUNT(*) FROM notifications WHERE {where}", params).fetchone()[0]
+    else:
+        total = None
     db.close()
     
-    pages = (total + per_page - 1) // per_page
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
     
-    return jsonify({
-        'notifications': notifications,
+    body = json.dumps({
         'total': total,
+        'unread': counters['unread'],
         'page': page,
         'per_page': per_page,
-        'pages': pages
+        'pages': (total + per_page - 1) // per_page if total is not None else None,
+        'next_cursor': encode_cursor(rows[-1][0], rows[-1][1]) if has_more else None,
+        'has_more': has_more
     })
+    notifications = ','.join(row[2] for row in rows)
+    return Response('{"notifications":[' + notifications + '],' + body[1:], mimetype='application/json')
 
 
 @notifications_bp.route('/send', methods=['POST'])
@@ -172,17 +189,11 @@ def force_send():
     params = data.get('params', {})
     
     # Buscar tenant_id do usuário
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute("SELECT tenant_id, name FROM users WHERE id = ?", (user_id,))
-    row = cursor.fetchone()
-    
-    if not row:
-        db.close()
+    principal = principal_for(user_id)
+    if not principal:
         return jsonify({'error': 'Usuário não encontrado'}), 404
     
-    tenant_id, user_name = row
-    db.close()
+    tenant_id, user_name = principal['tenant_id'], principal['name']
     
     # Templates de mensagens
     templates = {
@@ -317,22 +328,24 @@ def health_check():
         {
             "status": "healthy",
             "scheduler_running": bool,
+            "scheduler_leader": bool,
             "jobs_count": int,
             "whatsapp_available": bool,
             "email_available": bool
         }
     """
-    from services.whatsapp_sender import whatsapp_sender
-    from services.email_sender import email_sender
+    from services.auto_notifications import whatsapp_sender, email_sender
     
-    is_running = notification_service.scheduler.running if notification_service.scheduler else False
-    jobs = notification_service.scheduler.get_jobs() if is_running else []
+    runner = notification_service.runner
+    is_running = runner.running
+    jobs = [j for j in runner.get_status(history=0)['jobs'] if j['registered_here']] if is_running else []
     
     return jsonify({
         'status': 'healthy',
         'scheduler_running': is_running,
+        'scheduler_leader': runner.is_leader,
         'jobs_count': len(jobs),
-        'jobs': [{'name': j.name, 'next_run': str(j.next_run_time)} for j in jobs],
+        'jobs': [{'name': j['name'], 'next_run': j['next_run_at']} for j in jobs],
         'whatsapp_available': whatsapp_sender is not None,
         'email_available': email_sender is not None
     })
@@ -385,9 +398,8 @@ def update_settings():
     cursor = db.cursor()
     
     # Buscar tenant_id
-    cursor.execute("SELECT tenant_id FROM users WHERE id = ?", (user_id,))
-    row = cursor.fetchone()
-    tenant_id = row[0] if row else None
+    principal = principal_for(user_id)
+    tenant_id = principal['tenant_id'] if principal else None
     
     # Verificar se já existe registro
     cursor.execute("SELECT id FROM user_notifications_settings WHERE user_id = ?", (user_id,))
@@ -459,6 +471,7 @@ def update_settings():
     
     db.commit()
     db.close()
+    notification_service.preferences.invalidate(user_id)
     
     return jsonify({
         'success': True,
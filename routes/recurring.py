@@ -4,6 +4,8 @@ API REST para gerenciar transações automáticas (salário, aluguel, assinatura
 """
 
 from flask import Blueprint, request, jsonify, session
+from services import metrics
+from services.transaction_service import transaction_service
 import sqlite3
 import uuid
 from datetime import datetime, timedelta
@@ -17,7 +19,7 @@ recurring_bp = Blueprint('recurring', __name__, url_prefix='/api/recurring')
 
 def get_db():
     """Conecta ao banco de dados"""
-    db = sqlite3.connect('bws_finance.db')
+    db = metrics.connect('bws_finance.db')
     db.row_factory = sqlite3.Row
     return db
 
@@ -443,7 +445,7 @@ def execute_recurring_transactions():
     """
     Processa todas as transações recorrentes que devem ser executadas hoje
     
-    Chamado pelo agendador (APScheduler)
+    Chamado pelo agendador (services/job_runner.py)
     """
     db = get_db()
     today = datetime.now().date().strftime('%Y-%m-%d')
@@ -457,42 +459,27 @@ def execute_recurring_transactions():
     """, (today, today)).fetchall()
     
     executed_count = 0
+    paid_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    # Todas as recorrências do dia em uma unidade de trabalho: saldos acumulados
+    # por conta e aplicados em um único commit
+    uow = transaction_service.unit_of_work(db)
     
     for recurring in recurrings:
         try:
-            # Criar transação
-            transaction_id = str(uuid.uuid4())
-            
-            db.execute("""
-                INSERT INTO transactions (
-                    id, user_id, tenant_id, account_id, category_id,
-                    type, description, value, date, status, paid_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'Pago', CURRENT_TIMESTAMP)
-            """, (
-                transaction_id,
-                recurring['user_id'],
-                recurring['tenant_id'],
-                recurring['account_id'],
-                recurring['category_id'],
-                recurring['type'],
-                f"{recurring['description']} (Recorrente)",
-                recurring['value'],
-                today
-            ))
-            
-            # Atualizar saldo da conta manualmente (mesma conexão)
-            if recurring['type'] == 'Receita':
-                db.execute("""
-                    UPDATE accounts 
-                    SET current_balance = current_balance + ?
-                    WHERE id = ?
-                """, (recurring['value'], recurring['account_id']))
-            else:  # Despesa
-                db.execute("""
-                    UPDATE accounts 
-                    SET current_balance = current_balance - ?
-                    WHERE id = ?
-                """, (recurring['value'], recurring['account_id']))
+            # Criar transação (o saldo da conta entra no delta da unidade de trabalho)
+            uow.add(
+                user_id=recurring['user_id'],
+                tenant_id=recurring['tenant_id'],
+                account_id=recurring['account_id'],
+                category_id=recurring['category_id'],
+                type=recurring['type'],
+                description=f"{recurring['description']} (Recorrente)",
+                value=recurring['value'],
+                date=today,
+                status='Pago',
+                paid_at=paid_at
+            )
             
             # Calcular próxima execução
             start_date = datetime.strptime(recurring['start_date'], '%Y-%m-%d')
@@ -511,7 +498,7 @@ def execute_recurring_transactions():
             print(f"❌ Erro ao executar recorrência {recurring['id']}: {e}")
             continue
     
-    db.commit()
+    uow.commit()
     db.close()
     
     print(f"✅ Executadas {executed_count} transações recorrentes")
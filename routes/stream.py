@@ -0,0 +1,54 @@
+"""
+Rotas de Eventos em Tempo Real (SSE)
+Blueprint Flask para /api/stream
+"""
+
+from flask import Blueprint, request, jsonify, session, Response
+from functools import wraps
+
+from services.event_stream import event_stream, StreamLimitReached
+
+stream_bp = Blueprint('stream', __name__, url_prefix='/api/stream')
+
+
+def login_required_api(f):
+    """Decorator para verificar login em rotas API"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'error': 'Não autenticado'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@stream_bp.route('', methods=['GET'])
+@login_required_api
+def stream_events():
+    """
+    Canal SSE do usuário: eventos quote, portfolio, notification e resync
+
+    Retomada: o navegador reenvia o header Last-Event-ID ao reconectar
+    (ou ?last_event_id= na primeira conexão).
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    try:
+        event_stream.open()
+    except StreamLimitReached:
+        response = jsonify({'error': 'Limite de conexões em tempo real atingido'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+
+    response = Response(
+        event_stream.stream(session['user_id'], last_event_id),
+        mimetype='text/event-stream'
+    )
+    response.call_on_close(event_stream.release)
+    response.headers['Cache-Control'] = 'no-cache, no-store'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx: não bufferizar o stream
+    return response
@@ -0,0 +1,54 @@
+"""
+Rotas de Sincronização Delta (réplica offline do PWA)
+Blueprint Flask para /api/sync
+"""
+
+from flask import Blueprint, request, jsonify, session
+from functools import wraps
+
+from services.change_log import PAGE_SIZE, change_log
+
+sync_bp = Blueprint('sync', __name__, url_prefix='/api/sync')
+
+
+def login_required_api(f):
+    """Decorator para verificar login em rotas API"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'error': 'Não autenticado'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@sync_bp.route('', methods=['GET'])
+@login_required_api
+def sync_changes():
+    """
+    GET /api/sync?since=<cursor>&limit=500
+    Alterações desde o cursor (upserts com a linha atual e tombstones)
+
+    Sem cursor, com cursor inválido ou anterior à compactação, devolve a
+    ressincronização completa (full_resync=true; reset=true na primeira
+    página). Repetir com since=cursor enquanto has_more for true.
+
+    Returns:
+        {
+            "success": true,
+            "changes": [{"entity": "transactions", "id": "...", "op": "upsert", "data": {...}},
+                        {"entity": "cards", "id": "...", "op": "delete"}],
+            "cursor": str,
+            "has_more": bool,
+            "full_resync": bool,
+            "reset": bool
+        }
+    """
+    page = change_log.page(
+        session['tenant_id'],
+        session['user_id'],
+        cursor=request.args.get('since'),
+        limit=request.args.get('limit', PAGE_SIZE, type=int)
+    )
+    response = jsonify({'success': True, **page})
+    response.headers['Cache-Control'] = 'no-store'
+    return response
@@ -3,10 +3,14 @@ WhatsApp GPT Integration API
 Endpoint para receber mensagens do WhatsApp e processar com GPT
 """
 from flask import Blueprint, request, jsonify, session
+from services import metrics
+from services.transaction_service import transaction_service
+from services.phone_directory import phone_directory
+from services.principal import current_principal
 import sqlite3
 import logging
 from datetime import datetime
-from modules.gpt_assistant import process_whatsapp_message, generate_tip
+from modules.gpt_assistant import process_whatsapp_message, generate_tip, gpt_assistant
 from modules.nlp_classifier import NLPClassifier
 
 whatsapp_gpt_bp = Blueprint('whatsapp_gpt', __name__, url_prefix='/api/whatsapp')
@@ -18,23 +22,13 @@ logger = logging.getLogger(__name__)
 
 def get_db():
     """Conecta ao banco de dados"""
-    db = sqlite3.connect('bws_finance.db')
+    db = metrics.connect('bws_finance.db')
     db.row_factory = sqlite3.Row
     return db
 
 def get_user_by_phone(phone: str):
-    """Busca usuário pelo telefone do WhatsApp"""
-    db = get_db()
-    # Normalizar telefone (remover caracteres especiais)
-    phone_clean = ''.join(filter(str.isdigit, phone))
-    
-    user = db.execute(
-        "SELECT * FROM users WHERE phone LIKE ? AND active = 1",
-        (f'%{phone_clean[-9:]}%',)  # Últimos 9 dígitos
-    ).fetchone()
-    db.close()
-    
-    return dict(user) if user else None
+    """Busca usuário pelo telefone do WhatsApp (índice E.164 + cache, services/phone_directory)"""
+    return phone_directory.resolve(phone)
 
 # =========================================
 # ENDPOINTS
@@ -83,8 +77,8 @@ Até já! 👋"""
         
         logger.info(f"✅ Usuário encontrado: {user['name']} (ID: {user['id']})")
         
-        # Processar mensagem com GPT
-        result = process_whatsapp_message(message, phone)
+        # Processar mensagem com GPT (histórico compartilhado com /api/ai/history)
+        result = process_whatsapp_message(message, user['id'], user['tenant_id'])
         
         logger.info(f"🤖 Intent detectado: {result.get('intent')}")
         
@@ -204,30 +198,20 @@ def create_transaction(user: dict, data: dict) -> dict:
         if not account:
             return {'success': False, 'error': 'Nenhuma conta encontrada'}
         
-        # Inserir transação
-        import uuid
-        transaction_id = str(uuid.uuid4())
-        
-        db.execute("""
-            INSERT INTO transactions (
-                id, user_id, tenant_id, type, value, description, 
-                category_id, account_id, date, status, is_fixed
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            transaction_id,
-            user['id'],
-            user['tenant_id'],
-            data['type'],
-            data['amount'],
-            data.get('description', '')[:200],
-            category_id,
-            account['id'],
-            data.get('date', datetime.now().strftime('%Y-%m-%d')),
-            'Pago',
-            0
-        ))
-        
-        db.commit()
+        # Inserir transação + saldo da conta em um commit
+        with transaction_service.unit_of_work(db) as uow:
+            transaction_id = uow.add(
+                user_id=user['id'],
+                tenant_id=user['tenant_id'],
+                type=data['type'],
+                value=data['amount'],
+                description=data.get('description', '')[:200],
+                category_id=category_id,
+                account_id=account['id'],
+                date=data.get('date', datetime.now().strftime('%Y-%m-%d')),
+                status='Pago',
+                is_fixed=0
+            )
         db.close()
         
         return {'success': True, 'transaction_id': transaction_id}
@@ -327,6 +311,24 @@ def format_balance(accounts: list) -> str:
 # COMANDO PARA TESTAR
 # =========================================
 
+@whatsapp_gpt_bp.route('/ai-stats', methods=['GET'])
+def ai_stats():
+    """
+    Métricas do pipeline de entendimento (fast-path x GPT)
+
+    Só para admin logado ou pela regra do /metrics (METRICS_TOKEN/localhost)
+    """
+    principal = current_principal()
+    if not (principal and principal['is_admin']):
+        denied = metrics.scrape_denied(request)
+        if denied:
+            return jsonify({'error': 'Não autorizado'}), denied
+    return jsonify({
+        'success': True,
+        'intent_router': gpt_assistant.router.get_metrics(),
+        'conversation_store': gpt_assistant.history.get_stats()
+    })
+
 @whatsapp_gpt_bp.route('/test', methods=['GET'])
 def test_endpoint():
     """Endpoint de teste"""
@@ -9,6 +9,9 @@ import traceback
 # Adicionar diretório ao path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# Antes de importar o app: o limite de streams SSE é derivado das threads
+os.environ.setdefault('WEB_THREADS', '4')
+
 try:
     print("\n[INIT] Carregando Flask app...")
     from app import app
@@ -28,7 +31,7 @@ try:
     
     # Iniciar servidor Waitress
     print("[INIT] Iniciando servidor Waitress na porta 5000...")
-    serve(app, host='127.0.0.1', port=5000, threads=4)
+    serve(app, host='127.0.0.1', port=5000, threads=int(os.environ['WEB_THREADS']))
     
 except Exception as e:
     print(f"\n[ERRO] Falha ao iniciar servidor:")
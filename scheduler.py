@@ -1,66 +1,113 @@
 """
 SCHEDULER - Agendador de Tarefas Automáticas
 Executa transações recorrentes diariamente às 00:01
+
+Os jobs são registrados no job runner (services/job_runner.py): com vários
+workers do gunicorn, só o líder executa cada horário.
 """
 
-from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime
 
-scheduler = BackgroundScheduler()
+from services.job_runner import job_runner
 
-def start_scheduler():
-    """Inicia o agendador"""
+def run_recurring_transactions():
+    """Import tardio: o módulo só é carregado quando o job executa"""
     from routes.recurring import execute_recurring_transactions
+    return execute_recurring_transactions()
+
+def run_investments_update():
+    """Import tardio (yfinance é opcional)"""
     from services.investment_updater import update_all_investments
-    
+    return update_all_investments()
+
+def run_fixed_income_accrual():
+    """Apropriação noturna de renda fixa (incremental, segura para recuperar)"""
+    from services.fixed_income_accrual import run_nightly_accrual
+    return run_nightly_accrual()
+
+def run_retention():
+    """Arquivamento e compactação do histórico (orçamento de tempo limitado)"""
+    from services.retention import run_nightly_retention
+    return run_nightly_retention()
+
+def run_change_log_compaction():
+    """Compactação do change log da sincronização delta"""
+    from services.change_log import run_nightly_compaction
+    return run_nightly_compaction()
+
+def register_jobs():
+    """Registra os jobs deste módulo no job runner (idempotente)"""
     # Executar transações recorrentes todos os dias às 00:01
-    scheduler.add_job(
-        func=execute_recurring_transactions,
-        trigger=CronTrigger(hour=0, minute=1),
-        id='execute_recurring_transactions',
+    # (recupera a execução se o servidor estava fora do ar à meia-noite)
+    job_runner.register(
+        'execute_recurring_transactions',
+        run_recurring_transactions,
+        CronTrigger(hour=0, minute=1),
         name='Execute Recurring Transactions',
-        replace_existing=True
+        misfire_grace_seconds=23 * 3600
     )
-    
+
     # Atualizar investimentos todos os dias às 08:00
-    scheduler.add_job(
-        func=update_all_investments,
-        trigger=CronTrigger(hour=8, minute=0),
-        id='update_investments',
-        name='Update Investments Quotes',
-        replace_existing=True
+    job_runner.register(
+        'update_investments',
+        run_investments_update,
+        CronTrigger(hour=8, minute=0),
+        name='Update Investments Quotes'
+    )
+
+    # Apropriar rendimentos de renda fixa todos os dias às 01:00
+    job_runner.register(
+        'accrue_fixed_income',
+        run_fixed_income_accrual,
+        CronTrigger(hour=1, minute=0),
+        name='Accrue Fixed Income',
+        misfire_grace_seconds=23 * 3600
+    )
+
+    # Arquivar/compactar histórico de notificações e da IA todos os dias às 03:30
+    job_runner.register(
+        'retention',
+        run_retention,
+        CronTrigger(hour=3, minute=30),
+        name='Archive and Compact History',
+        misfire_grace_seconds=23 * 3600
+    )
+
+    # Compactar o change log da sincronização (/api/sync) todos os dias às 04:00
+    job_runner.register(
+        'compact_change_log',
+        run_change_log_compaction,
+        CronTrigger(hour=4, minute=0),
+        name='Compact Sync Change Log',
+        misfire_grace_seconds=23 * 3600
     )
-    
-    # Também permitir execução manual a cada 1 hora (para testes)
-    # scheduler.add_job(
-    #     func=execute_recurring_transactions,
-    #     trigger='interval',
-    #     hours=1,
-    #     id='execute_recurring_hourly',
-    #     name='Execute Recurring Hourly (Test)',
-    #     replace_existing=True
-    # )
-    
-    scheduler.start()
+
+def start_scheduler():
+    """Inicia o agendador"""
+    register_jobs()
+    job_runner.start()
     print("[OK] Scheduler iniciado! Transacoes recorrentes serao executadas as 00:01")
     print("[OK] Atualizacao de investimentos agendada para 08:00")
+    print("[OK] Apropriacao de renda fixa agendada para 01:00")
+    print("[OK] Retencao/arquivamento do historico agendado para 03:30")
+    print("[OK] Compactacao do change log de sincronizacao agendada para 04:00")
 
 def stop_scheduler():
     """Para o agendador"""
-    scheduler.shutdown()
+    job_runner.stop()
     print("[STOP] Scheduler parado")
 
 def trigger_manual_execution():
     """Executa manualmente (para testes)"""
-    from routes.recurring import execute_recurring_transactions
+    register_jobs()
     print("[RUN] Executando transacoes recorrentes manualmente...")
-    count = execute_recurring_transactions()
+    count = job_runner.run_now('execute_recurring_transactions')
     return count
 
 def trigger_investments_update():
     """Atualiza investimentos manualmente"""
-    from services.investment_updater import update_all_investments
+    register_jobs()
     print("[UPDATE] Atualizando investimentos manualmente...")
-    stats = update_all_investments()
+    stats = job_runner.run_now('update_investments')
     return stats
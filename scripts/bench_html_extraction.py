@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark da extração de HTML do Investidor10 sobre páginas salvas
+
+Uso:
+    python scripts/bench_html_extraction.py [pagina.html ...] [--runs 20]
+
+Sem argumentos usa investidor10_debug.html. Compara cada backend instalado
+com a referência "árvore completa" (BeautifulSoup + html.parser, o caminho
+antigo do conector), quando o bs4 está disponível.
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from services.html_extraction import available_backends, extract_investidor10
+
+
+def full_tree_parse(html):
+    """Referência: parse da página inteira como o conector fazia antes"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    return len(soup.find_all('div', class_='_card'))
+
+
+def measure(fn, html, runs):
+    fn(html)  # aquecimento
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(html)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da extração de HTML')
+    parser.add_argument('pages', nargs='*', default=[os.path.join(ROOT, 'investidor10_debug.html')])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    candidates = [(name, lambda html, name=name: extract_investidor10(html, backend=name))
+                  for name in available_backends()]
+    try:
+        import bs4  # noqa: F401
+        candidates.append(('bs4 (árvore completa)', full_tree_parse))
+    except ImportError:
+        print("bs4 não instalado: referência 'árvore completa' omitida")
+
+    for page in args.pages:
+        with open(page, 'r', encoding='utf-8') as f:
+            html = f.read()
+
+        print("=" * 60)
+        print(f"{os.path.basename(page)} ({len(html) / 1024:.0f} KB, {args.runs} execuções)")
+        print("=" * 60)
+
+        results = {}
+        for name, fn in candidates:
+            median, best = measure(fn, html, args.runs)
+            print(f"  {name:<24} mediana {median:8.2f} ms   melhor {best:8.2f} ms")
+            if not name.startswith('bs4'):
+                results[name] = extract_investidor10(html, backend=name)
+
+        # Todos os backends devem extrair exatamente os mesmos valores
+        reference = next(iter(results.values()))
+        divergent = [name for name, result in results.items() if result != reference]
+        print(f"\n  Preço: R$ {reference['price']:.2f} | DY: {reference['dy']:.2f}% | P/L: {reference['pl']:.2f}")
+        print("  ✅ Backends concordam" if not divergent else f"  ❌ Divergência: {', '.join(divergent)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Build dos arquivos estáticos: fingerprint, pré-compressão e manifesto
+
+Uso:
+    python scripts/build_assets.py
+
+Gera static/dist/ (recriado a cada execução). Rodar antes de subir o
+servidor; sem static/dist os templates usam os arquivos originais.
+"""
+
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from services.static_assets import BROTLI_SUPPORT, DIST_DIR, build
+
+
+def main():
+    manifest = build()
+
+    raw = sum(s['raw'] for s in manifest['sizes'].values())
+    gz = sum(s.get('gz', s['raw']) for s in manifest['sizes'].values())
+    print(f"✅ {len(manifest['assets'])} assets em {os.path.relpath(DIST_DIR, ROOT)} (versão {manifest['version']})")
+    print(f"   {raw / 1024:.1f} KB originais | {gz / 1024:.1f} KB com gzip")
+    if not BROTLI_SUPPORT:
+        print("   ⚠️ brotli não instalado: apenas variantes .gz")
+
+
+if __name__ == '__main__':
+    main()
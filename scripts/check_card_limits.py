@@ -1,4 +1,10 @@
+import os
 import sqlite3
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.card_ledger import card_ledger
 
 conn = sqlite3.connect('bws_finance.db')
 conn.row_factory = sqlite3.Row
@@ -8,11 +14,12 @@ print("=" * 60)
 print("VERIFICAÇÃO DE LIMITES DOS CARTÕES")
 print("=" * 60)
 
-cards = cursor.execute('''
-    SELECT id, name, limit_amount, used_limit 
+# Limite usado = faturas ainda não vencidas (ledger por ciclo)
+cards = card_ledger.annotate(conn, cursor.execute('''
+    SELECT id, name, limit_amount, closing_day, due_day
     FROM cards 
     WHERE active = 1
-''').fetchall()
+''').fetchall())
 
 if not cards:
     print("❌ Nenhum cartão ativo encontrado")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Migração: telefone normalizado (E.164) dos usuários
+
+Uso:
+    python scripts/migrate_phone_normalized.py [--db bws_finance.db]
+
+Cria users.phone_normalized (índice único), o trigger que marca telefones
+alterados fora do app para renormalização e preenche os existentes. Telefones
+inválidos ou duplicados ficam sem valor e são listados para correção manual.
+O app faz o mesmo na primeira resolução de remetente; o script permite rodar
+antes do deploy e conferir o resultado.
+"""
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from services.phone_directory import PhoneDirectory, mask_phone
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Normaliza os telefones dos usuários')
+    parser.add_argument('--db', default='bws_finance.db')
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("MIGRAÇÃO: Telefone normalizado (E.164)")
+    print("=" * 60)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Banco de dados não encontrado: {args.db}")
+        return 1
+
+    directory = PhoneDirectory(args.db)
+    conn = directory.get_db()
+    try:
+        directory.ensure_schema(conn)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+        if 'phone_normalized' not in columns:
+            print("❌ Tabela users sem a coluna phone (rode scripts/apply_preferences_migration.py antes)")
+            return 1
+        total, normalized = conn.execute("""
+            SELECT COUNT(*), COUNT(phone_normalized) FROM users WHERE phone IS NOT NULL AND phone != ''
+        """).fetchone()
+        pending = conn.execute("""
+            SELECT id, name, phone FROM users
+            WHERE phone_normalized IS NULL AND phone IS NOT NULL AND phone != ''
+        """).fetchall()
+    finally:
+        conn.close()
+
+    print(f"✅ {normalized}/{total} telefones normalizados")
+    for row in pending:
+        print(f"⚠️ {row['name']} ({row['id']}): {mask_phone(row['phone'])} inválido ou duplicado")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,72 +1,74 @@
-import sqlite3
-from datetime import datetime
-
-conn = sqlite3.connect('bws_finance.db')
-conn.row_factory = sqlite3.Row
-cursor = conn.cursor()
-
-print("=" * 60)
-print("RECALCULANDO LIMITES DOS CARTÕES")
-print("=" * 60)
-
-# Buscar todos os cartões ativos
-cards = cursor.execute('SELECT id, name FROM cards WHERE active = 1').fetchall()
-
-for card in cards:
-    card_id = card['id']
-    card_name = card['name']
-    
-    # Calcular total usado (transações tipo Despesa com este cartão)
-    result = cursor.execute('''
-        SELECT COALESCE(SUM(value), 0) as total_used
-        FROM transactions
-        WHERE card_id = ? AND type = 'Despesa'
-    ''', (card_id,)).fetchone()
-    
-    total_used = result['total_used']
-    
-    # Atualizar o used_limit
-    cursor.execute('''
-        UPDATE cards
-        SET used_limit = ?
-        WHERE id = ?
-    ''', (total_used, card_id))
-    
-    print(f"💳 {card_name}: R$ {total_used:.2f} usado")
-
-conn.commit()
-print("\n✅ Limites recalculados com sucesso!")
-
-# Mostrar resultado final
-print("\n" + "=" * 60)
-print("LIMITES ATUALIZADOS:")
-print("=" * 60)
-
-cards = cursor.execute('''
-    SELECT name, limit_amount, used_limit 
-    FROM cards 
-    WHERE active = 1
-''').fetchall()
-
-for card in cards:
-    limit_amount = card['limit_amount'] or 0
-    used_limit = card['used_limit'] or 0
-    available = limit_amount - used_limit
-    percent = (used_limit / limit_amount * 100) if limit_amount > 0 else 0
-    
-    print(f"\n💳 {card['name']}")
-    print(f"   Limite Total: R$ {limit_amount:.2f}")
-    print(f"   Usado: R$ {used_limit:.2f} ({percent:.1f}%)")
-    print(f"   Disponível: R$ {available:.2f}")
-    
-    if available < 0:
-        print("   ⚠️ CRÍTICO: Limite ultrapassado!")
-    elif percent > 80:
-        print("   ⚠️ ATENÇÃO: Limite quase esgotado!")
-    elif percent > 50:
-        print("   ⚡ Aviso: Mais de 50% do limite usado")
-    else:
-        print("   ✅ Limite saudável")
-
-conn.close()
-print("\n" + "=" * 60)
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Verificação (e reparo) do ledger de faturas dos cartões
+
+Uso:
+    python scripts/recalculate_card_limits.py [--repair] [--batch-size 200] [--db bws_finance.db]
+
+Compara os totais por ciclo (card_cycles) com a soma das transações, em lotes
+de cartões. Com --repair, recalcula apenas os cartões divergentes. Os totais
+são mantidos por triggers; divergência indica escrita fora do SQLite (ex.:
+restauração parcial de backup) e deve ser rara.
+"""
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from services.card_ledger import VERIFY_BATCH_SIZE, CardLedger
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Verifica o ledger de faturas dos cartões')
+    parser.add_argument('--repair', action='store_true', help='Recalcula os cartões divergentes')
+    parser.add_argument('--batch-size', type=int, default=VERIFY_BATCH_SIZE)
+    parser.add_argument('--db', default='bws_finance.db')
+    args = parser.parse_args(argv)
+
+    ledger = CardLedger(args.db)
+
+    print("=" * 60)
+    print("VERIFICANDO FATURAS DOS CARTÕES" + (" (REPARO)" if args.repair else ""))
+    print("=" * 60)
+
+    stats = ledger.verify(repair=args.repair, batch_size=args.batch_size)
+    print(f"💳 {stats['cards']} cartões, {stats['cycles']} ciclos conferidos")
+
+    if stats['mismatched']:
+        print(f"⚠️ {len(stats['mismatched'])} cartões divergentes: {', '.join(stats['mismatched'][:20])}")
+    if args.repair:
+        print(f"🔧 {stats['repaired']} cartões recalculados, {stats['orphans']} ciclos órfãos removidos")
+
+    # Resumo do limite dos cartões ativos
+    conn = ledger.get_db()
+    cards = conn.execute("""
+        SELECT id, name, limit_amount, closing_day, due_day FROM cards WHERE active = 1
+    """).fetchall()
+    summaries = ledger.summaries(conn, cards)
+    conn.close()
+
+    for card in cards:
+        summary = summaries[card['id']]
+        limit_amount = summary['limit']
+        percent = (summary['used'] / limit_amount * 100) if limit_amount > 0 else 0
+        print(f"\n💳 {card['name']}")
+        print(f"   Limite Total: R$ {limit_amount:.2f}")
+        print(f"   Usado: R$ {summary['used']:.2f} ({percent:.1f}%)")
+        print(f"   Disponível: R$ {summary['available']:.2f}")
+        print(f"   Fatura atual: R$ {summary['current_invoice']['total']:.2f} "
+              f"(vence {summary['current_invoice']['due_date']})")
+
+    print("\n" + "=" * 60)
+    if stats['mismatched'] and not args.repair:
+        print("❌ Divergências encontradas. Rode com --repair para corrigir.")
+        return 1
+    print("✅ Ledger de faturas consistente!")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
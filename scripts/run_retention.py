@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Retenção e compactação do histórico (notificações, logs de envio, IA)
+
+Uso:
+    python scripts/run_retention.py [--time-budget 60] [--batch-size 1000] [--enable-incremental-vacuum]
+
+Arquiva as linhas vencidas de cada política em data/archive/, compacta os
+logs de envio em agregados diários e devolve as páginas livres com
+incremental_vacuum. --enable-incremental-vacuum converte os bancos para
+auto_vacuum=INCREMENTAL antes (VACUUM completo: rodar em janela de
+manutenção, uma única vez).
+"""
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from services.retention import (
+    BATCH_SIZE, TIME_BUDGET_SECONDS, VACUUM_SECONDS, RetentionManager, enable_incremental_vacuum
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Arquiva e compacta o histórico')
+    parser.add_argument('--db', default='bws_finance.db')
+    parser.add_argument('--ai-db', default='ai_history.db')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--time-budget', type=float, default=TIME_BUDGET_SECONDS)
+    parser.add_argument('--vacuum-seconds', type=float, default=VACUUM_SECONDS)
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='Converte os bancos para auto_vacuum=INCREMENTAL (VACUUM completo)')
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("RETENÇÃO E COMPACTAÇÃO DO HISTÓRICO")
+    print("=" * 60)
+
+    if args.enable_incremental_vacuum:
+        for db_path in (args.db, args.ai_db):
+            if os.path.exists(db_path):
+                result = enable_incremental_vacuum(db_path)
+                print(f"🧹 {db_path}: auto_vacuum=INCREMENTAL ({result['bytes_reclaimed'] / 1024:.0f} KB devolvidos)")
+
+    manager = RetentionManager(args.db, args.ai_db)
+    report = manager.run(batch_size=args.batch_size, time_budget=args.time_budget,
+                         vacuum_seconds=args.vacuum_seconds)
+
+    for result in report['tables']:
+        line = f"📦 {result['table']}: {result['archived']} linhas arquivadas"
+        if result['action'] == 'compact':
+            line += f", {result['compacted']} agregados diários"
+        if result.get('error'):
+            line += f" ❌ {result['error']}"
+        print(line)
+
+    for db_path, vacuum in report['vacuum'].items():
+        print(f"🧹 {db_path}: {vacuum['bytes_reclaimed'] / 1024:.0f} KB devolvidos "
+              f"(auto_vacuum={vacuum['auto_vacuum']}, {vacuum['freelist_after']} páginas livres restantes)")
+
+    print("\n" + "=" * 60)
+    if not report['done']:
+        print(f"⏱️ Orçamento de tempo esgotado em {report['seconds']}s; o restante fica para a próxima execução.")
+        return 1
+    print(f"✅ Retenção concluída em {report['seconds']}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -36,7 +36,7 @@ def run():
     print('[WAITRESS] Serving BWS Finance...')
     print(f'[WAITRESS] Listening on http://{START_HOST}:{START_PORT}')
     # Thread pool size can be tuned later if needed
-    serve(app, host=START_HOST, port=START_PORT, threads=8)
+    serve(app, host=START_HOST, port=START_PORT, threads=int(os.getenv('WEB_THREADS', 8)))
 
 
 if __name__ == '__main__':
@@ -354,23 +354,9 @@ class BWSInsightAI:
         return anomalies
     
     def save_conversation(self, user_message: str, ai_response: str, context: Dict = None):
-        """Salva conversa no histórico"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO ai_conversations (user_id, tenant_id, user_message, ai_response, context)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
-            self.user_id,
-            self.tenant_id,
-            user_message,
-            ai_response,
-            json.dumps(context) if context else None
-        ))
-        
-        conn.commit()
-        conn.close()
+        """Salva conversa no histórico (compartilhado com o assistente do WhatsApp)"""
+        from services.conversation_store import conversation_store
+        conversation_store.append(self.user_id, self.tenant_id, user_message, ai_response, context)
     
     def save_insight(self, insight_type: str, insight_text: str, data: Dict = None, severity: str = 'low'):
         """Salva insight gerado"""
@@ -393,19 +379,6 @@ class BWSInsightAI:
         conn.close()
     
     def get_conversation_history(self, limit: int = 10) -> List[Dict]:
-        """Recupera histórico de conversas"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT * FROM ai_conversations
-            WHERE user_id = ? AND tenant_id = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        """, (self.user_id, self.tenant_id, limit))
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [dict(row) for row in rows]
+        """Recupera histórico de conversas (filtrado por user_id e tenant_id)"""
+        from services.conversation_store import conversation_store
+        return conversation_store.get_history(self.user_id, self.tenant_id, limit)
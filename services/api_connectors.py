@@ -3,11 +3,17 @@ API Connectors - Conexão com APIs externas para investimentos
 Suporta: Yahoo Finance, CoinGecko, Tesouro Direto
 """
 
+import os
 import requests
 import json
 from datetime import datetime
 import logging
 
+from services.html_extraction import extract_investidor10, INDICATOR_FIELDS
+from services.metrics import TimedSession
+from services.page_cache import page_cache
+from services.provider_router import ProviderRouter, ProviderError
+
 # Configurar logging
 logging.basicConfig(
     filename='investments.log',
@@ -18,8 +24,11 @@ logging.basicConfig(
 class APIConnector:
     """Classe base para conectores de API"""
     
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self.last_error = None  # preenchido quando a falha é do provedor (não "ativo inexistente")
+        # Duração das chamadas em /metrics por provedor (yahoofinance, brapi, investidor10...)
+        self.session = TimedSession(type(self).__name__.replace('Connector', '').lower())
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
@@ -60,7 +69,7 @@ class YahooFinanceConnector(APIConnector):
                 'fields': 'regularMarketPrice,regularMarketPreviousClose,regularMarketChange,regularMarketChangePercent,longName,shortName'
             }
             
-            response = self.session.get(self.BASE_URL, params=params, timeout=10)
+            response = self.session.get(self.BASE_URL, params=params, timeout=self.timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -88,6 +97,7 @@ class YahooFinanceConnector(APIConnector):
             return None
             
         except Exception as e:
+            self.last_error = str(e)
             self.log_api_call('Yahoo Finance', symbol, False, str(e))
             return None
 
@@ -114,7 +124,9 @@ class BrapiConnector(APIConnector):
             
             print(f"🔍 Buscando {ticker} via Brapi...")
             
-            response = self.session.get(url, timeout=10)
+            # Plano gratuito da Brapi exige token (sem ele a API responde 401)
+            params = {'token': os.getenv('BRAPI_TOKEN')} if os.getenv('BRAPI_TOKEN') else None
+            response = self.session.get(url, params=params, timeout=self.timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -142,6 +154,7 @@ class BrapiConnector(APIConnector):
             return None
             
         except Exception as e:
+            self.last_error = str(e)
             print(f"❌ Erro Brapi para {ticker}: {e}")
             self.log_api_call('Brapi', ticker, False, str(e))
             return None
@@ -152,8 +165,8 @@ class StatusInvestConnector(APIConnector):
     
     BASE_URL = "https://statusinvest.com.br"
     
-    def __init__(self):
-        super().__init__()
+    def __init__(self, timeout=10):
+        super().__init__(timeout)
         # Headers mais completos para Status Invest
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -197,7 +210,7 @@ class StatusInvestConnector(APIConnector):
                     'type': '2'  # Tipo 2 para ações
                 }
             
-            response = self.session.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=self.timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -224,6 +237,7 @@ class StatusInvestConnector(APIConnector):
             return None
             
         except Exception as e:
+            self.last_error = str(e)
             print(f"❌ Erro Status Invest para {ticker}: {e}")
             self.log_api_call('Status Invest', ticker, False, str(e))
             return None
@@ -295,7 +309,7 @@ class CoinGeckoConnector(APIConnector):
                 'include_last_updated_at': 'true'
             }
             
-            response = self.session.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=self.timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -336,7 +350,7 @@ class CoinGeckoConnector(APIConnector):
                 'include_market_cap': 'true'
             }
             
-            response = self.session.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=self.timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -384,7 +398,7 @@ class TesouroDirectoConnector(APIConnector):
             dict com taxa, preço, vencimento
         """
         try:
-            response = self.session.get(self.BASE_URL, timeout=10)
+            response = self.session.get(self.BASE_URL, timeout=self.timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -425,7 +439,7 @@ class TesouroDirectoConnector(APIConnector):
     def get_all_bonds(self):
         """Retorna todos os títulos disponíveis"""
         try:
-            response = self.session.get(self.BASE_URL, timeout=10)
+            response = self.session.get(self.BASE_URL, timeout=self.timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -458,8 +472,8 @@ class Investidor10Connector(APIConnector):
     
     BASE_URL = "https://investidor10.com.br/acoes"
     
-    def __init__(self):
-        super().__init__()
+    def __init__(self, timeout=10):
+        super().__init__(timeout)
         # Headers específicos para o Investidor10
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -467,6 +481,7 @@ class Investidor10Connector(APIConnector):
             'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
             'Referer': 'https://investidor10.com.br/',
         })
+        self.pages = page_cache
     
     def get_stock_data(self, ticker):
         """
@@ -498,17 +513,16 @@ class Investidor10Connector(APIConnector):
                     (f"{self.BASE_URL}/{ticker.lower()}", "Ação")
                 ]
             
-            response = None
+            html = None
             asset_type = None
             
-            # Tentar cada URL até encontrar
+            # Tentar cada URL até encontrar (GET condicional se a página já foi baixada)
             for url, type_name in urls_to_try:
                 try:
                     print(f"🔍 Tentando {ticker} como {type_name} no Investidor10...")
-                    response = self.session.get(url, timeout=10)
-                    response.raise_for_status()
+                    html, not_modified = self.pages.fetch(self.session, url, timeout=self.timeout)
                     asset_type = type_name
-                    print(f"✅ Encontrado como {type_name}")
+                    print(f"✅ Encontrado como {type_name}" + (" (304, cópia local)" if not_modified else ""))
                     break
                 except requests.exceptions.HTTPError as e:
                     if e.response.status_code in [404, 410]:
@@ -516,103 +530,23 @@ class Investidor10Connector(APIConnector):
                     else:
                         raise  # Outro erro HTTP
             
-            if not response or not response.ok:
+            if not html:
                 print(f"⚠️ {ticker} não encontrado no Investidor10")
                 self.log_api_call('Investidor10', ticker, False, 'Não encontrado em nenhum endpoint')
                 return None
             
-            # Parse HTML com BeautifulSoup
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(response.text, 'html.parser')
+            # Extração direcionada (só os nós de cotação e indicadores)
+            extracted = extract_investidor10(html)
             
-            # Extrair dados da página
             stock_data = {
                 'symbol': ticker,
-                'name': None,
-                'price': 0,
-                'change_percent': 0,
+                'name': extracted['name'],
+                'price': extracted['price'],
+                'change_percent': extracted['change_percent'],
                 'asset_type': asset_type,  # 'FII' ou 'Ação'
-                'dy': 0,  # Dividend Yield
-                'pl': 0,  # P/L
-                'pvp': 0,  # P/VP
-                'roe': 0,  # ROE
-                'roic': 0,  # ROIC
-                'liq_corrente': 0,  # Liquidez Corrente
-                'divida_liquida_ebitda': 0,
-                'margem_liquida': 0,
                 'last_update': datetime.now().isoformat()
             }
-            
-            # Nome da empresa (h2 com nome completo)
-            name_tag = soup.find('h2')
-            if name_tag:
-                stock_data['name'] = name_tag.text.strip()
-            else:
-                # Fallback: pegar do title
-                title_tag = soup.find('title')
-                if title_tag:
-                    stock_data['name'] = title_tag.text.split('-')[0].strip()
-            
-            # Preço atual - buscar pela classe 'value'
-            price_tag = soup.find('span', class_='value')
-            if price_tag:
-                price_text = price_tag.text.strip().replace('R$', '').replace('.', '').replace(',', '.').strip()
-                try:
-                    stock_data['price'] = float(price_text)
-                except:
-                    pass
-            
-            # Variação percentual - buscar em cards com classe 'pl' (variação 12M)
-            change_card = soup.find('div', class_='_card pl')
-            if change_card:
-                change_span = change_card.find('span', class_='_card-body')
-                if change_span:
-                    change_text = change_span.text.strip().replace('%', '').replace(',', '.').strip()
-                    try:
-                        stock_data['change_percent'] = float(change_text)
-                    except:
-                        pass
-            
-            # Indicadores fundamentalistas - buscar em todas as divs com classe '_card'
-            cards = soup.find_all('div', class_='_card')
-            
-            for card in cards:
-                # Pegar o título do card
-                header = card.find('div', class_='_card-header')
-                if not header:
-                    continue
-                
-                title = header.text.strip().upper()
-                
-                # Pegar o valor do card
-                body = card.find('span', class_='_card-body')
-                if not body:
-                    continue
-                
-                value_text = body.text.strip().replace('%', '').replace('R$', '').replace('.', '').replace(',', '.').strip()
-                
-                try:
-                    value = float(value_text)
-                    
-                    # Mapear títulos para campos
-                    if 'DY' in title or 'DIVIDEND' in title:
-                        stock_data['dy'] = value
-                    elif 'P/L' in title and 'EBITDA' not in title:
-                        stock_data['pl'] = value
-                    elif 'P/VP' in title or 'P / VP' in title:
-                        stock_data['pvp'] = value
-                    elif 'ROE' in title:
-                        stock_data['roe'] = value
-                    elif 'ROIC' in title:
-                        stock_data['roic'] = value
-                    elif 'LIQUIDEZ' in title and 'CORRENTE' in title:
-                        stock_data['liq_corrente'] = value
-                    elif 'EBITDA' in title and ('DIV' in title or 'DÍV' in title):
-                        stock_data['divida_liquida_ebitda'] = value
-                    elif 'MARGEM' in title and ('LÍQUIDA' in title or 'LIQUIDA' in title):
-                        stock_data['margem_liquida'] = value
-                except:
-                    pass
+            stock_data.update({field: extracted[field] for field in INDICATOR_FIELDS})
             
             # Log de sucesso
             if stock_data['price'] > 0:
@@ -629,10 +563,12 @@ class Investidor10Connector(APIConnector):
             if e.response.status_code in [404, 410]:
                 print(f"⚠️ {ticker} não encontrado no Investidor10 (HTTP {e.response.status_code})")
             else:
+                self.last_error = str(e)
                 print(f"❌ Erro HTTP ao buscar {ticker} no Investidor10: {e}")
             self.log_api_call('Investidor10', ticker, False, str(e))
             return None
         except Exception as e:
+            self.last_error = str(e)
             print(f"❌ Erro ao buscar {ticker} no Investidor10: {e}")
             self.log_api_call('Investidor10', ticker, False, str(e))
             return None
@@ -708,62 +644,62 @@ class InvestmentAPIFactory:
     def get_stock_with_fundamentals(symbol):
         """
         Busca dados de ação com múltiplos fallbacks
-        Prioridade: Investidor10 → Status Invest → Yahoo Finance
+        Ordem adaptativa (stock_router): começa por Investidor10 → Status Invest
+        → Yahoo Finance e passa a priorizar quem responde mais rápido e com
+        mais acertos; provedores com circuito aberto são pulados
         Args:
             symbol: código da ação (ex: PETR4)
         Returns:
             dict com price e dados da ação
         """
-        # 1ª tentativa: Investidor10 (mais completo - dados fundamentalistas)
-        inv10 = Investidor10Connector()
-        data = inv10.get_stock_data(symbol)
-        
-        if data and data.get('price', 0) > 0:
-            print(f"✅ Fonte: Investidor10")
-            return data
-        
-        # 2ª tentativa: Status Invest (brasileiro, confiável)
-        print(f"⚠️ Investidor10 falhou, tentando Status Invest...")
-        status = StatusInvestConnector()
-        status_data = status.get_stock_data(symbol)
-        
-        if status_data and status_data.get('price', 0) > 0:
-            print(f"✅ Fonte: Status Invest")
-            return status_data
+        order = [provider.name for provider in stock_router.ordered(symbol)]
+        data, source = stock_router.call(symbol, is_valid=_has_price)
         
-        # 3ª tentativa: Yahoo Finance (fallback final)
-        # BRAPI DESATIVADA - estava retornando 401 Unauthorized
-        print(f"⚠️ Status Invest falhou, tentando Yahoo Finance...")
-        yahoo = YahooFinanceConnector()
-        yahoo_data = yahoo.get_stock_data(symbol)
+        if not data:
+            print(f"❌ Todas as fontes falharam para {symbol}")
+            return None
         
-        if yahoo_data and yahoo_data.get('price', 0) > 0:
-            # Tentar buscar apenas fundamentalistas do Investidor10 para complementar
-            fundamentals = inv10.get_stock_fundamentals(symbol)
-            
+        # Preço de outra fonte: complementar com fundamentalistas do Investidor10
+        # se ele ainda não foi tentado nesta busca
+        tried = order[:order.index(source) + 1]
+        if 'investidor10' not in tried:
+            fundamentals = stock_router.call_provider('investidor10', symbol, is_valid=_has_price)
             if fundamentals:
-                # Mesclar dados: preço do Yahoo + fundamentalistas do Investidor10
-                yahoo_data.update(fundamentals)
-            
-            print(f"✅ Fonte: Yahoo Finance")
-            return yahoo_data
-        
-        # 4ª tentativa: Se for FII, tentar com variações do ticker no Yahoo
-        if symbol.upper().endswith('11'):
-            print(f"⚠️ Tentando variações para FII {symbol}...")
-            
-            # Tentar com diferentes sufixos
-            variations = [
-                f"{symbol}B.SA",  # Alguns FIIs têm sufixo B
-                f"{symbol}F.SA",  # Alguns FIIs têm sufixo F
-            ]
-            
-            for variation in variations:
-                print(f"   Tentando: {variation}")
-                yahoo_data = yahoo.get_stock_data(variation.replace('.SA', ''))
-                if yahoo_data and yahoo_data.get('price', 0) > 0:
-                    print(f"✅ Fonte: Yahoo Finance ({variation})")
-                    return yahoo_data
+                data.update({field: fundamentals[field] for field in INDICATOR_FIELDS})
         
-        print(f"❌ Todas as fontes falharam para {symbol}")
+        print(f"✅ Fonte: {source}")
+        return data
+
+
+def _has_price(data):
+    return bool(data) and data.get('price', 0) > 0
+
+
+def _connector_provider(connector_class, method='get_stock_data', symbol_variants=None):
+    """Adapta um conector ao contrato do ProviderRouter: falha do provedor vira ProviderError"""
+    def fetch(symbol, timeout):
+        connector = connector_class(timeout=timeout)
+        for variant in (symbol_variants(symbol) if symbol_variants else [symbol]):
+            data = getattr(connector, method)(variant)
+            if _has_price(data):
+                return data
+            if connector.last_error:
+                raise ProviderError(connector.last_error)
         return None
+    return fetch
+
+
+# Roteador de cotações de ações/FIIs (estado por processo)
+stock_router = ProviderRouter('stocks')
+stock_router.register('investidor10', _connector_provider(Investidor10Connector), priority=0)
+stock_router.register('statusinvest', _connector_provider(StatusInvestConnector), priority=1)
+stock_router.register('yahoo', _connector_provider(YahooFinanceConnector), priority=2)
+if os.getenv('BRAPI_TOKEN'):
+    stock_router.register('brapi', _connector_provider(BrapiConnector), priority=3)
+# Alguns FIIs só existem no Yahoo com sufixo B/F
+stock_router.register(
+    'yahoo_fii_variations',
+    _connector_provider(YahooFinanceConnector, symbol_variants=lambda s: [f"{s}B", f"{s}F"]),
+    priority=4,
+    accepts=lambda s: s.upper().endswith('11')
+)
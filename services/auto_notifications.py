@@ -3,7 +3,7 @@ Auto Notifications Service
 Sistema de notificações automáticas para BWS Finance
 
 Features:
-- Scheduler (APScheduler) para jobs recorrentes
+- Jobs recorrentes via job runner (um único executor entre os workers)
 - Checagem de faturas vencendo (3, 2, 1, 0 dias)
 - Resumo mensal de gastos
 - Alertas de investimentos
@@ -19,9 +19,12 @@ import logging
 import sqlite3
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Any
-from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
+from services.card_ledger import card_ledger
+from services.job_runner import job_runner
+from services.notification_preferences import preferences_for
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -53,8 +56,10 @@ class AutoNotificationService:
     
     def __init__(self, db_path: str = 'bws_finance.db'):
         self.db_path = db_path
-        self.scheduler = BackgroundScheduler()
+        self.runner = job_runner
+        self.job_ids: List[str] = []
         self.enabled = os.getenv('AUTO_NOTIFICATIONS_ENABLED', 'true').lower() == 'true'
+        self.preferences = preferences_for(db_path)
         
     def get_db(self):
         """Retorna conexão com banco de dados"""
@@ -68,55 +73,9 @@ class AutoNotificationService:
             user_id: ID do usuário
             
         Returns:
-            Dict com preferências ou defaults
+            Dict com preferências ou defaults (cache por processo)
         """
-        db = self.get_db()
-        cursor = db.cursor()
-        
-        cursor.execute("""
-            SELECT notify_whatsapp, notify_email, notify_dashboard,
-                   threshold_low_balance, investment_alert_pct,
-                   do_not_disturb_start, do_not_disturb_end,
-                   invoice_alert_days, weekly_summary, monthly_summary,
-                   opt_in_whatsapp, opt_in_email
-            FROM user_notifications_settings
-            WHERE user_id = ?
-        """, (user_id,))
-        
-        row = cursor.fetchone()
-        db.close()
-        
-        if row:
-            return {
-                'notify_whatsapp': bool(row[0]),
-                'notify_email': bool(row[1]),
-                'notify_dashboard': bool(row[2]),
-                'threshold_low_balance': row[3],
-                'investment_alert_pct': row[4],
-                'do_not_disturb_start': row[5],
-                'do_not_disturb_end': row[6],
-                'invoice_alert_days': row[7],
-                'weekly_summary': bool(row[8]),
-                'monthly_summary': bool(row[9]),
-                'opt_in_whatsapp': bool(row[10]),
-                'opt_in_email': bool(row[11])
-            }
-        
-        # Defaults
-        return {
-            'notify_whatsapp': True,
-            'notify_email': True,
-            'notify_dashboard': True,
-            'threshold_low_balance': 100.00,
-            'investment_alert_pct': 3.0,
-            'do_not_disturb_start': None,
-            'do_not_disturb_end': None,
-            'invoice_alert_days': '3,1,0',
-            'weekly_summary': True,
-            'monthly_summary': True,
-            'opt_in_whatsapp': False,
-            'opt_in_email': False
-        }
+        return self.preferences.get_settings(user_id)
     
     def is_do_not_disturb(self, user_id: str) -> bool:
         """
@@ -360,39 +319,36 @@ class AutoNotificationService:
         # Buscar usuários ativos
         cursor.execute("SELECT id, tenant_id, name, phone FROM users WHERE active = 1")
         users = cursor.fetchall()
+        settings_by_user = self.preferences.get_settings_many(user[0] for user in users)
         
         today = datetime.now().date()
         
         for user_id, tenant_id, user_name, user_phone in users:
-            settings = self.get_user_settings(user_id)
+            settings = settings_by_user[user_id]
             alert_days = [int(d) for d in settings['invoice_alert_days'].split(',')]
             
-            # Buscar cartões do usuário
+            # Buscar cartões do usuário e a próxima fatura a vencer de cada um (ledger por ciclo)
             cursor.execute("""
-                SELECT c.id, c.name, c.due_day, c.used_limit
+                SELECT c.id, c.name, c.limit_amount, c.closing_day, c.due_day
                 FROM cards c
                 WHERE c.user_id = ? AND c.active = 1
             """, (user_id,))
             
-            cards = cursor.fetchall()
+            cards = [dict(zip(('id', 'name', 'limit_amount', 'closing_day', 'due_day'), row))
+                     for row in cursor.fetchall()]
+            invoices = card_ledger.summaries(db, cards, today)
             
-            for card_id, card_name, due_day, used_limit in cards:
-                if not due_day:
+            for card in cards:
+                card_id, card_name = card['id'], card['name']
+                if not card['due_day']:
                     continue
                 
-                # Calcular próximo vencimento
-                current_month = today.month
-                current_year = today.year
-                
-                due_date = datetime(current_year, current_month, due_day).date()
-                
-                if due_date < today:
-                    # Próximo mês
-                    if current_month == 12:
-                        due_date = datetime(current_year + 1, 1, due_day).date()
-                    else:
-                        due_date = datetime(current_year, current_month + 1, due_day).date()
+                invoice = invoices[card_id]['due_invoice']
+                invoice_total = invoice['total']
+                if not invoice_total:
+                    continue
                 
+                due_date = datetime.strptime(invoice['due_date'], '%Y-%m-%d').date()
                 days_until_due = (due_date - today).days
                 
                 # Verificar se deve enviar alerta
@@ -403,14 +359,14 @@ class AutoNotificationService:
                     if days_until_due == 0:
                         message = (
                             f"⚠️ *VENCE HOJE!*\n\n"
-                            f"Sua fatura do cartão *{card_name}* no valor de R$ {used_limit:.2f} vence hoje.\n\n"
+                            f"Sua fatura do cartão *{card_name}* no valor de R$ {invoice_total:.2f} vence hoje.\n\n"
                             f"Não esqueça de pagar para evitar juros!"
                         )
                     else:
                         first_name = user_name.split()[0] if user_name else 'Usuário'
                         message = (
                             f"🚨 Olá {first_name}! Sua fatura do cartão *{card_name}* vence em *{days_until_due} dias* "
-                            f"(R$ {used_limit:.2f}).\n\n"
+                            f"(R$ {invoice_total:.2f}).\n\n"
                             f"Deseja registrar o pagamento agora? Responda 'Sim' para marcar como pago."
                         )
                     
@@ -425,7 +381,8 @@ class AutoNotificationService:
                         meta={
                             'card_id': card_id,
                             'card_name': card_name,
-                            'amount': used_limit,
+                            'amount': invoice_total,
+                            'cycle': invoice['cycle'],
                             'due_date': due_date.isoformat(),
                             'days_until_due': days_until_due
                         }
@@ -478,9 +435,10 @@ class AutoNotificationService:
         # Buscar usuários ativos
         cursor.execute("SELECT id, tenant_id, name FROM users WHERE active = 1")
         users = cursor.fetchall()
+        settings_by_user = self.preferences.get_settings_many(user[0] for user in users)
         
         for user_id, tenant_id, user_name in users:
-            settings = self.get_user_settings(user_id)
+            settings = settings_by_user[user_id]
             threshold = settings['threshold_low_balance']
             
             # Buscar contas com saldo baixo
@@ -539,78 +497,91 @@ class AutoNotificationService:
         """
         logger.info("📄 Enviando relatórios periódicos...")
         
-        # TODO: Implementar relatórios
+        db = self.get_db()
+        cursor = db.cursor()
+        
+        # Usuários ativos com resumo semanal habilitado (sem configuração = habilitado)
+        cursor.execute("""
+            SELECT u.id, u.tenant_id, u.name
+            FROM users u
+            LEFT JOIN user_notifications_settings s ON s.user_id = u.id
+            WHERE u.active = 1 AND COALESCE(s.weekly_summary, 1) = 1
+        """)
+        users = {user_id: (tenant_id, user_name) for user_id, tenant_id, user_name in cursor.fetchall()}
+        db.close()
+        
+        # Insights de todos os usuários em lote (uma leitura por lote, services/spending_features)
+        from services.notification_ai import NotificationAI
+        insights_by_user = NotificationAI(self.db_path).analyze_users(list(users), days=7)
         
-        logger.info("✅ Relatórios enviados")
+        sent = 0
+        for user_id, insights in insights_by_user.items():
+            if not insights:
+                continue
+            
+            tenant_id, user_name = users[user_id]
+            first_name = user_name.split()[0] if user_name else 'Usuário'
+            highlights = "\n".join(f"• {insight['title']}: {insight['message']}" for insight in insights[:3])
+            
+            notification_id = self.create_notification(
+                user_id=user_id,
+                tenant_id=tenant_id,
+                title=f"Resumo semanal: {len(insights)} insights",
+                message=f"📊 Olá {first_name}! Destaques da sua semana:\n\n{highlights}",
+                event_type='weekly_report',
+                channel='both',
+                priority='low',
+                meta={'insights': [insight['type'] for insight in insights]}
+            )
+            self.send_notification(notification_id)
+            sent += 1
+        
+        logger.info(f"✅ Relatórios enviados: {sent}")
     
     # ==================== INICIALIZAÇÃO ====================
     
     def start(self):
-        """Inicializa o scheduler com todos os jobs"""
+        """
+        Registra os jobs de notificação no job runner
+
+        O runner é iniciado pelo app (junto com os jobs de scheduler.py), então
+        desabilitar as notificações não para os demais jobs.
+        """
         if not self.enabled:
             logger.info("⚠️  Auto notifications desabilitado via config")
             return
         
-        logger.info("🚀 Iniciando Auto Notification Service...")
-        
-        # Job 1: Verificar faturas vencendo (diário às 09:00)
-        self.scheduler.add_job(
-            self.check_due_invoices,
-            CronTrigger(hour=9, minute=0),
-            id='check_due_invoices',
-            name='Verificar faturas vencendo',
-            replace_existing=True
-        )
-        
-        # Job 2: Verificar gastos mensais (diário às 07:00)
-        self.scheduler.add_job(
-            self.check_monthly_spending,
-            CronTrigger(hour=7, minute=0),
-            id='check_monthly_spending',
-            name='Verificar gastos mensais',
-            replace_existing=True
-        )
-        
-        # Job 3: Verificar investimentos (diário às 08:05)
-        self.scheduler.add_job(
-            self.check_investment_updates,
-            CronTrigger(hour=8, minute=5),
-            id='check_investment_updates',
-            name='Verificar atualizações de investimentos',
-            replace_existing=True
-        )
-        
-        # Job 4: Verificar saldos baixos (diário às 06:00)
-        self.scheduler.add_job(
-            self.check_low_balance,
-            CronTrigger(hour=6, minute=0),
-            id='check_low_balance',
-            name='Verificar saldos baixos',
-            replace_existing=True
-        )
-        
-        # Job 5: Relatórios periódicos (domingos às 18:00)
-        self.scheduler.add_job(
-            self.send_periodic_reports,
-            CronTrigger(day_of_week='sun', hour=18, minute=0),
-            id='send_periodic_reports',
-            name='Enviar relatórios periódicos',
-            replace_existing=True
-        )
-        
-        # Iniciar scheduler
-        self.scheduler.start()
-        
-        jobs = self.scheduler.get_jobs()
-        logger.info(f"✅ Scheduler ativo com {len(jobs)} jobs:")
-        for job in jobs:
-            logger.info(f"  - {job.name} (próxima execução: {job.next_run_time})")
+        logger.info("🚀 Registrando jobs do Auto Notification Service...")
+        
+        # (job_id, método, horário, nome)
+        jobs = [
+            ('check_due_invoices', self.check_due_invoices,
+             CronTrigger(hour=9, minute=0), 'Verificar faturas vencendo'),
+            ('check_monthly_spending', self.check_monthly_spending,
+             CronTrigger(hour=7, minute=0), 'Verificar gastos mensais'),
+            ('check_investment_updates', self.check_investment_updates,
+             CronTrigger(hour=8, minute=5), 'Verificar atualizações de investimentos'),
+            ('check_low_balance', self.check_low_balance,
+             CronTrigger(hour=6, minute=0), 'Verificar saldos baixos'),
+            ('send_periodic_reports', self.send_periodic_reports,
+             CronTrigger(day_of_week='sun', hour=18, minute=0), 'Enviar relatórios periódicos'),
+        ]
+        
+        for job_id, func, trigger, name in jobs:
+            self.runner.register(job_id, func, trigger, name=name)
+        self.job_ids = [job_id for job_id, _, _, _ in jobs]
+        
+        logger.info(f"✅ {len(jobs)} jobs de notificação registrados:")
+        for job in self.runner.get_status(history=0)['jobs']:
+            if job['id'] in self.job_ids:
+                logger.info(f"  - {job['name']} (próxima execução: {job['next_run_at']} UTC)")
     
     def stop(self):
-        """Para o scheduler"""
-        if self.scheduler.running:
-            self.scheduler.shutdown()
-            logger.info("⏹️  Scheduler parado")
+        """Remove os jobs de notificação deste processo (o runner segue com os demais)"""
+        for job_id in self.job_ids:
+            self.runner.unregister(job_id)
+        self.job_ids = []
+        logger.info("⏹️  Jobs de notificação removidos")
     
     def run_job_now(self, job_name: str):
         """Executa um job manualmente (para testes)"""
@@ -622,7 +593,10 @@ class AutoNotificationService:
             'send_periodic_reports': self.send_periodic_reports
         }
         
-        if job_name in jobs:
+        if job_name in self.runner.jobs:
+            logger.info(f"▶️  Executando job manual: {job_name}")
+            self.runner.run_now(job_name)
+        elif job_name in jobs:
             logger.info(f"▶️  Executando job manual: {job_name}")
             jobs[job_name]()
         else:
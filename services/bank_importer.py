@@ -12,6 +12,8 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional
 import xml.etree.ElementTree as ET
 
+from services.transaction_service import transaction_service
+
 # Bibliotecas para PDF (instalar: pip install PyMuPDF pypdf2)
 try:
     import fitz  # PyMuPDF
@@ -333,7 +335,8 @@ class BankStatementImporter:
         except:
             return 0.0
     
-    def import_transactions(self, transactions: List[Dict[str, Any]], account_id: str, db_connection, auto_categorize: bool = True):
+    def import_transactions(self, transactions: List[Dict[str, Any]], account_id: str, db_connection,
+                            auto_categorize: bool = True, uow=None):
         """
         Importa transações para o banco de dados
         
@@ -342,7 +345,13 @@ class BankStatementImporter:
             account_id: ID da conta bancária destino (ou None para cartões)
             db_connection: Conexão com banco de dados
             auto_categorize: Se True, tenta categorizar automaticamente
+            uow: Unidade de trabalho do chamador (services/transaction_service);
+                 sem ela, uma nova é aberta sobre db_connection e confirmada ao final
         """
+        own_uow = uow is None
+        if own_uow:
+            uow = transaction_service.unit_of_work(db_connection)
+
         # Comentado temporariamente - usar AIChat se necessário
         # from services.ai_chat import FinancialChatProcessor
         
@@ -402,19 +411,13 @@ class BankStatementImporter:
                 # Obter payment_method da transação ou usar padrão
                 payment_method = trans.get('payment_method', 'credit_card' if trans_card_id else 'debito')
                 
-                # Inserir transação
-                transaction_id = str(uuid.uuid4())
-                db_connection.execute("""
-                    INSERT INTO transactions (
-                        id, user_id, tenant_id, account_id, card_id, category_id, 
-                        type, description, value, date, status, 
-                        is_fixed, payment_method, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                """, (
-                    transaction_id, self.user_id, self.tenant_id, trans_account_id, trans_card_id, category_id,
-                    trans['type'], trans['description'], trans['value'], trans['date'], 'Pago',
-                    0, payment_method
-                ))
+                # Inserir transação (saldo da conta pelo delta da unidade de trabalho)
+                transaction_id = uow.add(
+                    user_id=self.user_id, tenant_id=self.tenant_id, account_id=trans_account_id,
+                    card_id=trans_card_id, category_id=category_id, type=trans['type'],
+                    description=trans['description'], value=trans['value'], date=trans['date'],
+                    status='Pago', is_fixed=0, payment_method=payment_method
+                )
                 
                 imported += 1
                 print(f"     ✅ IMPORTADA (ID: {transaction_id[:8]}...)")
@@ -424,7 +427,8 @@ class BankStatementImporter:
                 print(f"     ❌ ERRO: {str(e)}")
                 self.errors.append(f"Erro ao importar '{trans.get('description', 'N/A')}': {str(e)}")
         
-        db_connection.commit()
+        if own_uow:
+            uow.commit()
         
         # Atualizar estatísticas
         self.stats['imported'] = imported
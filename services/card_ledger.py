@@ -0,0 +1,407 @@
+"""
+Card Ledger - Faturas de cartão de crédito por ciclo
+
+Cada compra no cartão cai no ciclo (fatura) definido pelo closing_day do
+cartão: compras até o dia do fechamento entram na fatura que fecha naquele
+mês, as posteriores na do mês seguinte. A fatura vence no due_day seguinte
+ao fechamento.
+
+- card_cycles: total (em centavos) e quantidade de lançamentos por
+  (cartão, ciclo), mantidos por triggers em transactions a cada
+  INSERT/UPDATE/DELETE, de qualquer caminho de código ou worker
+  (formulário, WhatsApp, parcelamentos, importação de extrato)
+- mudar o closing_day de um cartão redistribui os lançamentos dele nos
+  ciclos dentro do próprio trigger
+- limite usado = faturas ainda não vencidas (fechada aguardando pagamento,
+  atual e futuras, incluindo parcelas pendentes); leituras tocam só essas
+  poucas linhas pela chave primária
+- verify(): compara os ciclos com a soma das transações em lotes de cartões
+  e, com repair=True, recalcula os cartões divergentes
+
+Substitui o cards.used_limit ajustado por deltas (e o recalculo periódico de
+scripts/recalculate_card_limits.py).
+"""
+
+import logging
+import sqlite3
+import threading
+from calendar import monthrange
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger('card_ledger')
+
+DEFAULT_CLOSING_DAY = 31   # sem closing_day: fecha no último dia do mês
+DEFAULT_DUE_DAY = 10
+VERIFY_BATCH_SIZE = 200
+
+# Lançamentos que compõem a fatura (mesma regra dos triggers e do verify)
+_COUNTS = "{t}.card_id IS NOT NULL AND {t}.type = 'Despesa' AND COALESCE({t}.status, '') != 'Cancelado'"
+
+
+def _cycle_sql(day: str, closing_day: str) -> str:
+    """Expressão SQL do ciclo ('YYYY-MM' do mês de fechamento) de uma data"""
+    return (f"CASE WHEN CAST(strftime('%d', {day}) AS INTEGER) <= COALESCE({closing_day}, {DEFAULT_CLOSING_DAY}) "
+            f"THEN strftime('%Y-%m', {day}) "
+            f"ELSE strftime('%Y-%m', {day}, 'start of month', '+1 month') END")
+
+
+def _cents_sql(value: str) -> str:
+    return f"CAST(ROUND({value} * 100) AS INTEGER)"
+
+
+def _to_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def _add_month(year: int, month: int, months: int = 1) -> Tuple[int, int]:
+    month += months
+    return year + (month - 1) // 12, (month - 1) % 12 + 1
+
+
+def _clamped(year: int, month: int, day: int) -> date:
+    return date(year, month, min(day, monthrange(year, month)[1]))
+
+
+def cycle_for(day, closing_day: Optional[int]) -> str:
+    """Ciclo ('YYYY-MM' do mês de fechamento) em que cai uma compra"""
+    day = _to_date(day)
+    if day.day <= (closing_day or DEFAULT_CLOSING_DAY):
+        return f"{day.year:04d}-{day.month:02d}"
+    year, month = _add_month(day.year, day.month)
+    return f"{year:04d}-{month:02d}"
+
+
+def cycle_dates(cycle: str, closing_day: Optional[int], due_day: Optional[int]) -> Tuple[date, date]:
+    """(data de fechamento, data de vencimento) de um ciclo"""
+    closing_day = closing_day or DEFAULT_CLOSING_DAY
+    due_day = due_day or DEFAULT_DUE_DAY
+    year, month = int(cycle[:4]), int(cycle[5:7])
+    closing = _clamped(year, month, closing_day)
+    if due_day <= closing_day:
+        year, month = _add_month(year, month)
+    return closing, _clamped(year, month, due_day)
+
+
+class CardLedger:
+    """Totais das faturas por ciclo, mantidos por triggers no SQLite"""
+
+    def __init__(self, db_path: str = 'bws_finance.db'):
+        self.db_path = db_path
+        self._ready = set()   # arquivos de banco já preparados neste processo
+        self._lock = threading.Lock()
+
+    def get_db(self):
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # =====================================================
+    # SCHEMA
+    # =====================================================
+
+    def ensure_schema(self, conn=None):
+        """
+        Cria a tabela e os triggers (uma vez por processo e arquivo de banco)
+
+        Na criação da tabela, preenche os ciclos a partir das transações
+        existentes na mesma transação, para não perder escritas concorrentes.
+        Se a conexão já tiver uma transação aberta, o trabalho entra nela.
+        """
+        own = conn is None
+        conn = conn or self.get_db()
+        try:
+            database = conn.execute("PRAGMA database_list").fetchone()[2]
+            if database in self._ready:
+                return
+            with self._lock:
+                existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+                if not {'cards', 'transactions'} <= existing:
+                    return  # Banco ainda não inicializado
+
+                outer = conn.in_transaction
+                if not outer:
+                    conn.execute("BEGIN IMMEDIATE")
+                # Conferido depois do BEGIN IMMEDIATE: outro worker pode ter criado antes
+                created = not conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'card_cycles'"
+                ).fetchone()
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS card_cycles (
+                        card_id TEXT NOT NULL,
+                        cycle TEXT NOT NULL,
+                        total_cents INTEGER NOT NULL DEFAULT 0,
+                        transaction_count INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (card_id, cycle)
+                    ) WITHOUT ROWID
+                """)
+                self._create_triggers(conn)
+                if created:
+                    conn.execute(f"""
+                        INSERT INTO card_cycles (card_id, cycle, total_cents, transaction_count)
+                        {self._aggregate_sql()}
+                    """)
+                if not outer:
+                    conn.commit()
+                if database:   # bancos em memória não têm arquivo: prepara a cada conexão
+                    self._ready.add(database)
+                logger.info(f"[OK] Ledger de faturas {'criado' if created else 'verificado'}")
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"[ERRO] Falha ao criar ledger de faturas: {e}")
+        finally:
+            if own:
+                conn.close()
+
+    @staticmethod
+    def _aggregate_sql(where: str = '') -> str:
+        """SELECT (card_id, ciclo, centavos, quantidade) recalculado das transações"""
+        return f"""
+            SELECT t.card_id, {_cycle_sql('t.date', 'c.closing_day')} AS cycle,
+                   SUM({_cents_sql('t.value')}), COUNT(*)
+            FROM transactions t
+            JOIN cards c ON c.id = t.card_id
+            WHERE {_COUNTS.format(t='t')} {where}
+            GROUP BY t.card_id, cycle
+        """
+
+    @staticmethod
+    def _create_triggers(conn):
+        add = f"""
+            INSERT INTO card_cycles (card_id, cycle, total_cents, transaction_count)
+            SELECT NEW.card_id, {_cycle_sql('NEW.date', 'c.closing_day')}, {_cents_sql('NEW.value')}, 1
+            FROM cards c
+            WHERE c.id = NEW.card_id AND {_COUNTS.format(t='NEW')}
+            ON CONFLICT(card_id, cycle) DO UPDATE SET
+                total_cents = total_cents + excluded.total_cents,
+                transaction_count = transaction_count + 1;
+        """
+        remove = f"""
+            UPDATE card_cycles SET
+                total_cents = total_cents - {_cents_sql('OLD.value')},
+                transaction_count = transaction_count - 1
+            WHERE {_COUNTS.format(t='OLD')} AND card_id = OLD.card_id
+              AND cycle = (SELECT {_cycle_sql('OLD.date', 'c.closing_day')} FROM cards c WHERE c.id = OLD.card_id);
+            DELETE FROM card_cycles WHERE card_id = OLD.card_id AND transaction_count <= 0;
+        """
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_card_ledger_insert
+            AFTER INSERT ON transactions WHEN NEW.card_id IS NOT NULL
+            BEGIN {add} END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_card_ledger_delete
+            AFTER DELETE ON transactions WHEN OLD.card_id IS NOT NULL
+            BEGIN {remove} END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_card_ledger_update
+            AFTER UPDATE OF card_id, type, value, date, status ON transactions
+            WHEN OLD.card_id IS NOT NULL OR NEW.card_id IS NOT NULL
+            BEGIN {remove} {add} END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_card_ledger_closing_day
+            AFTER UPDATE OF closing_day ON cards
+            WHEN COALESCE(OLD.closing_day, 0) != COALESCE(NEW.closing_day, 0)
+            BEGIN
+                DELETE FROM card_cycles WHERE card_id = NEW.id;
+                INSERT INTO card_cycles (card_id, cycle, total_cents, transaction_count)
+                SELECT t.card_id, {_cycle_sql('t.date', 'NEW.closing_day')}, SUM({_cents_sql('t.value')}), COUNT(*)
+                FROM transactions t
+                WHERE t.card_id = NEW.id AND {_COUNTS.format(t='t')}
+                GROUP BY 1, 2;
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_card_ledger_card_delete
+            AFTER DELETE ON cards
+            BEGIN
+                DELETE FROM card_cycles WHERE card_id = OLD.id;
+            END
+        """)
+
+    # =====================================================
+    # LEITURA
+    # =====================================================
+
+    def summaries(self, conn, cards: Iterable, today: Optional[date] = None) -> Dict[str, Dict]:
+        """
+        Faturas e limite de vários cartões com uma única consulta
+
+        Args:
+            conn: Conexão SQLite
+            cards: Linhas/dicts com id, limit_amount, closing_day e due_day
+            today: Data de referência (padrão: hoje)
+
+        Returns:
+            dict: card_id -> resumo (ver _summarize)
+        """
+        self.ensure_schema(conn)
+        today = _to_date(today or date.today())
+        cards = [dict(card) for card in cards]
+        if not cards:
+            return {}
+
+        # Um ciclo que fecha no mês M vence no máximo em M+1: ciclos anteriores já venceram
+        year, month = _add_month(today.year, today.month, -1)
+        placeholders = ','.join('?' * len(cards))
+        rows = conn.execute(f"""
+            SELECT card_id, cycle, total_cents, transaction_count
+            FROM card_cycles
+            WHERE card_id IN ({placeholders}) AND cycle >= ?
+            ORDER BY card_id, cycle
+        """, [card['id'] for card in cards] + [f"{year:04d}-{month:02d}"]).fetchall()
+
+        cycles: Dict[str, List[Tuple[str, int, int]]] = {}
+        for row in rows:
+            cycles.setdefault(row[0], []).append((row[1], row[2], row[3]))
+
+        return {card['id']: self._summarize(card, cycles.get(card['id'], []), today) for card in cards}
+
+    @staticmethod
+    def _summarize(card: Dict, cycles: List[Tuple[str, int, int]], today: date) -> Dict:
+        closing_day, due_day = card.get('closing_day'), card.get('due_day')
+        current_cycle = cycle_for(today, closing_day)
+        totals = {cycle: (cents, count) for cycle, cents, count in cycles}
+
+        def invoice(cycle):
+            closing, due = cycle_dates(cycle, closing_day, due_day)
+            cents, count = totals.get(cycle, (0, 0))
+            return {
+                'cycle': cycle,
+                'closing_date': closing.isoformat(),
+                'due_date': due.isoformat(),
+                'total': cents / 100,
+                'transactions': count,
+                'status': 'open' if cycle == current_cycle else ('future' if cycle > current_cycle else 'closed')
+            }
+
+        current = invoice(current_cycle)
+        year, month = int(current_cycle[:4]), int(current_cycle[5:7])
+        previous = invoice('%04d-%02d' % _add_month(year, month, -1))
+        closed = previous if date.fromisoformat(previous['due_date']) >= today and previous['transactions'] else None
+        upcoming = [invoice(cycle) for cycle in sorted(totals) if cycle > current_cycle]
+
+        used_cents = sum(cents for cycle, (cents, _) in totals.items()
+                         if cycle >= current_cycle or (closed and cycle == closed['cycle']))
+        limit = card.get('limit_amount') or 0
+
+        return {
+            'card_id': card['id'],
+            'limit': limit,
+            'used': used_cents / 100,
+            'available': round(limit - used_cents / 100, 2),
+            'closed_invoice': closed,
+            'current_invoice': current,
+            'next_invoices': upcoming,
+            # Próxima fatura a vencer: a fechada (se ainda não venceu) ou a atual
+            'due_invoice': closed or current
+        }
+
+    def annotate(self, conn, cards: Iterable, today: Optional[date] = None) -> List[Dict]:
+        """
+        Cartões como dicts com used_limit/available_limit vindos do ledger
+
+        Mantém as chaves usadas pelos templates e pelo frontend e acrescenta
+        a fatura atual, a próxima a vencer e as futuras.
+        """
+        cards = [dict(card) for card in cards]
+        ledger = self.summaries(conn, cards, today)
+        for card in cards:
+            summary = ledger[card['id']]
+            card.update({
+                'used_limit': summary['used'],
+                'available_limit': summary['available'],
+                'current_invoice': summary['current_invoice'],
+                'due_invoice': summary['due_invoice'],
+                'next_invoices': summary['next_invoices']
+            })
+        return cards
+
+    def summary(self, card_id: str, today: Optional[date] = None) -> Optional[Dict]:
+        """Resumo de um cartão (abre a própria conexão)"""
+        conn = self.get_db()
+        try:
+            card = conn.execute("""
+                SELECT id, limit_amount, closing_day, due_day FROM cards WHERE id = ?
+            """, (card_id,)).fetchone()
+            return self.summaries(conn, [card], today)[card_id] if card else None
+        finally:
+            conn.close()
+
+    # =====================================================
+    # VERIFICAÇÃO
+    # =====================================================
+
+    def verify(self, repair: bool = False, batch_size: int = VERIFY_BATCH_SIZE) -> Dict:
+        """
+        Confere os ciclos contra a soma das transações, em lotes de cartões
+
+        Cada lote é lido (e, com repair, reescrito) dentro de uma transação,
+        então escritas concorrentes não geram falsos positivos.
+
+        Args:
+            repair: Recalcula os cartões com divergência
+            batch_size: Cartões por lote
+
+        Returns:
+            dict: cards, cycles, mismatched (ids dos cartões), repaired, orphans
+        """
+        conn = self.get_db()
+        stats = {'cards': 0, 'cycles': 0, 'mismatched': [], 'repaired': 0, 'orphans': 0}
+        try:
+            self.ensure_schema(conn)
+            card_ids = [row[0] for row in conn.execute("SELECT id FROM cards ORDER BY id")]
+
+            for start in range(0, len(card_ids), batch_size):
+                batch = card_ids[start:start + batch_size]
+                placeholders = ','.join('?' * len(batch))
+                conn.execute("BEGIN IMMEDIATE" if repair else "BEGIN")
+
+                expected = {(row[0], row[1]): (row[2], row[3]) for row in conn.execute(
+                    self._aggregate_sql(f"AND t.card_id IN ({placeholders})"), batch)}
+                actual = {(row[0], row[1]): (row[2], row[3]) for row in conn.execute(f"""
+                    SELECT card_id, cycle, total_cents, transaction_count
+                    FROM card_cycles WHERE card_id IN ({placeholders})
+                """, batch)}
+
+                mismatched = sorted({key[0] for key in expected.keys() | actual.keys()
+                                     if expected.get(key) != actual.get(key)})
+                stats['cards'] += len(batch)
+                stats['cycles'] += len(expected)
+                stats['mismatched'].extend(mismatched)
+
+                if repair and mismatched:
+                    marks = ','.join('?' * len(mismatched))
+                    conn.execute(f"DELETE FROM card_cycles WHERE card_id IN ({marks})", mismatched)
+                    conn.execute(f"""
+                        INSERT INTO card_cycles (card_id, cycle, total_cents, transaction_count)
+                        {self._aggregate_sql(f"AND t.card_id IN ({marks})")}
+                    """, mismatched)
+                    stats['repaired'] += len(mismatched)
+                conn.commit()
+
+            if repair:
+                cursor = conn.execute("DELETE FROM card_cycles WHERE card_id NOT IN (SELECT id FROM cards)")
+                stats['orphans'] = cursor.rowcount
+                conn.commit()
+
+            level = logging.WARNING if stats['mismatched'] else logging.INFO
+            logger.log(level, f"[OK] Ledger de faturas verificado: {stats['cards']} cartões, "
+                              f"{len(stats['mismatched'])} divergentes, {stats['repaired']} reparados")
+            return stats
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"[ERRO] Falha ao verificar ledger de faturas: {e}")
+            raise
+        finally:
+            conn.close()
+
+
+# Instância global
+card_ledger = CardLedger()
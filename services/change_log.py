@@ -0,0 +1,334 @@
+"""
+Change Log - Registro de alterações por tenant e feed de sincronização delta
+
+Triggers em transactions, accounts, cards, categories, investments e
+notifications gravam em change_log uma linha por escrita (upsert ou
+delete), de qualquer caminho de código ou worker, na mesma transação da
+escrita. seq (AUTOINCREMENT) cresce monotonicamente, então dentro de cada
+tenant também: é o cursor do cliente.
+
+GET /api/sync?since=<cursor> devolve, em páginas:
+
+- modo delta: as entradas com seq > cursor do tenant (e do usuário, ou sem
+  usuário, como categorias), uma por entidade (a mais recente), com a
+  linha atual nos upserts e só entity/id nas remoções (tombstones)
+- modo snapshot (ressincronização completa): sem cursor, cursor inválido
+  ou anterior ao piso de compactação do tenant, pagina as tabelas inteiras
+  do usuário (reset=true na primeira página: o cliente limpa a réplica) e
+  termina com um cursor delta a partir do seq lido antes do snapshot, então
+  escritas concorrentes chegam na sequência
+
+compact() (job noturno) remove entradas superadas por uma mais recente da
+mesma entidade (seguro a qualquer momento) e tombstones antigos; o maior
+seq removido vira o piso do tenant (change_log_floor), e cursores abaixo
+dele recebem a ressincronização completa.
+"""
+
+import os
+import json
+import base64
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from services import metrics
+
+logger = logging.getLogger('change_log')
+
+# Entidades sincronizadas (todas com id e tenant_id; categories sem user_id)
+SYNC_ENTITIES = ('transactions', 'accounts', 'cards', 'categories', 'investments', 'notifications')
+
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 2000
+TOMBSTONE_DAYS = int(os.getenv('CHANGE_LOG_TOMBSTONE_DAYS', 30))
+
+
+def encode_cursor(user_id: str, position: list) -> str:
+    """Cursor opaco do usuário: ['d', seq] (delta) ou ['s', seq, entidade, último id] (snapshot)"""
+    raw = json.dumps([str(user_id)] + position, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, user_id: str) -> Optional[list]:
+    """
+    Decodifica o cursor; retorna None se estiver ausente, inválido ou for de
+    outro usuário (réplica de outro login no mesmo navegador)
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        owner, *position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if owner != str(user_id):
+            return None
+        if position[0] == 'd' and len(position) == 2:
+            return ['d', int(position[1])]
+        if position[0] == 's' and len(position) == 4 and 0 <= int(position[2]) < len(SYNC_ENTITIES):
+            return ['s', int(position[1]), int(position[2]), position[3]]
+    except Exception:
+        pass
+    return None
+
+
+class ChangeLog:
+    """Tabela de alterações mantida por triggers + leitura paginada do feed"""
+
+    def __init__(self, db_path: str = 'bws_finance.db'):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._ready = set()
+        # entidade -> tem coluna user_id (por arquivo de banco)
+        self._entities: Dict[str, Dict[str, bool]] = {}
+
+    def get_db(self):
+        conn = metrics.connect(self.db_path, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # =====================================================
+    # SCHEMA
+    # =====================================================
+
+    def ensure_schema(self, conn) -> Dict[str, bool]:
+        """
+        Cria change_log, o piso por tenant e os triggers das entidades
+        existentes (uma vez por processo e arquivo de banco)
+
+        Returns:
+            {entidade: tem user_id} das entidades sincronizadas neste banco
+        """
+        database = conn.execute("PRAGMA database_list").fetchone()[2]
+        if database in self._ready:
+            return self._entities[database]
+        with self._lock:
+            if database in self._ready:
+                return self._entities[database]
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS change_log (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tenant_id TEXT,
+                    user_id TEXT,
+                    entity TEXT NOT NULL,
+                    entity_id TEXT NOT NULL,
+                    op TEXT NOT NULL CHECK(op IN ('upsert', 'delete')),
+                    changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                );
+                CREATE INDEX IF NOT EXISTS idx_change_log_tenant_seq ON change_log(tenant_id, seq);
+                CREATE INDEX IF NOT EXISTS idx_change_log_entity ON change_log(entity, entity_id, seq);
+
+                CREATE TABLE IF NOT EXISTS change_log_floor (
+                    tenant_id TEXT PRIMARY KEY,
+                    seq INTEGER NOT NULL DEFAULT 0
+                );
+            """)
+
+            entities = {}
+            existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for entity in SYNC_ENTITIES:
+                if entity not in existing:
+                    continue
+                columns = {row[1] for row in conn.execute(f"PRAGMA table_info({entity})")}
+                entities[entity] = 'user_id' in columns
+                for operation, row, op in (('INSERT', 'NEW', 'upsert'), ('UPDATE', 'NEW', 'upsert'),
+                                           ('DELETE', 'OLD', 'delete')):
+                    if entities[entity]:
+                        # notifications antigas têm tenant_id NULL: herda o do usuário
+                        owner = f"""COALESCE({row}.tenant_id, (SELECT tenant_id FROM users WHERE id = {row}.user_id)),
+                                    {row}.user_id"""
+                    else:
+                        owner = f"{row}.tenant_id, NULL"
+                    conn.execute(f"""
+                        CREATE TRIGGER IF NOT EXISTS trg_change_log_{entity}_{operation.lower()}
+                        AFTER {operation} ON {entity}
+                        BEGIN
+                            INSERT INTO change_log (tenant_id, user_id, entity, entity_id, op)
+                            VALUES ({owner}, '{entity}', {row}.id, '{op}');
+                        END
+                    """)
+            conn.commit()
+            self._entities[database] = entities
+            self._ready.add(database)
+            logger.info(f"[OK] Change log criado/verificado ({', '.join(entities)})")
+            return entities
+
+    # =====================================================
+    # FEED
+    # =====================================================
+
+    @staticmethod
+    def _floor(conn, tenant_id: str) -> int:
+        row = conn.execute("SELECT seq FROM change_log_floor WHERE tenant_id = ?", (tenant_id,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _rows_by_id(conn, entity: str, ids: List[str]) -> Dict[str, Dict]:
+        found = {}
+        for offset in range(0, len(ids), 500):
+            chunk = ids[offset:offset + 500]
+            rows = conn.execute(f"SELECT * FROM {entity} WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            for row in rows:
+                found[str(row['id'])] = dict(row)
+        return found
+
+    def _delta_page(self, conn, entities: Dict[str, bool], tenant_id: str, user_id: str,
+                    since: int, limit: int) -> Dict:
+        rows = conn.execute("""
+            SELECT seq, entity, entity_id, op FROM change_log
+            WHERE tenant_id = ? AND seq > ? AND (user_id IS NULL OR user_id = ?)
+            ORDER BY seq
+            LIMIT ?
+        """, (tenant_id, since, user_id, limit)).fetchall()
+
+        # Uma entrada por entidade: a mais recente da página
+        latest: 'OrderedDict[tuple, str]' = OrderedDict()
+        for row in rows:
+            if row['entity'] not in entities:
+                continue
+            key = (row['entity'], str(row['entity_id']))
+            latest.pop(key, None)
+            latest[key] = row['op']
+
+        upserts: Dict[str, List[str]] = {}
+        for (entity, entity_id), op in latest.items():
+            if op == 'upsert':
+                upserts.setdefault(entity, []).append(entity_id)
+        current = {entity: self._rows_by_id(conn, entity, ids) for entity, ids in upserts.items()}
+
+        changes = []
+        for (entity, entity_id), op in latest.items():
+            data = current.get(entity, {}).get(entity_id) if op == 'upsert' else None
+            if data is None:
+                # Removida depois da entrada (o tombstone vem adiante): já manda a remoção
+                changes.append({'entity': entity, 'id': entity_id, 'op': 'delete'})
+            else:
+                changes.append({'entity': entity, 'id': entity_id, 'op': 'upsert', 'data': data})
+
+        next_seq = rows[-1]['seq'] if rows else since
+        return {
+            'changes': changes,
+            'cursor': encode_cursor(user_id, ['d', next_seq]),
+            'has_more': len(rows) == limit,
+            'full_resync': False,
+            'reset': False
+        }
+
+    def _snapshot_page(self, conn, entities: Dict[str, bool], tenant_id: str, user_id: str,
+                       position: list, limit: int, reset: bool) -> Dict:
+        _, high_seq, entity_index, last_id = position
+        changes = []
+        while entity_index < len(SYNC_ENTITIES) and len(changes) < limit:
+            entity = SYNC_ENTITIES[entity_index]
+            if entity not in entities:
+                entity_index, last_id = entity_index + 1, None
+                continue
+            want = limit - len(changes)
+            sql = f"SELECT * FROM {entity} WHERE {'user_id' if entities[entity] else 'tenant_id'} = ?"
+            params = [user_id if entities[entity] else tenant_id]
+            if last_id is not None:
+                sql += " AND id > ?"
+                params.append(last_id)
+            rows = conn.execute(sql + " ORDER BY id LIMIT ?", params + [want]).fetchall()
+            for row in rows:
+                changes.append({'entity': entity, 'id': str(row['id']), 'op': 'upsert', 'data': dict(row)})
+            if len(rows) < want:
+                entity_index, last_id = entity_index + 1, None
+            else:
+                last_id = rows[-1]['id']
+
+        done = entity_index >= len(SYNC_ENTITIES)
+        return {
+            'changes': changes,
+            'cursor': encode_cursor(user_id, ['d', high_seq] if done else ['s', high_seq, entity_index, last_id]),
+            # Ao fim do snapshot o cliente continua pelo delta (escritas durante o snapshot)
+            'has_more': True,
+            'full_resync': True,
+            'reset': reset
+        }
+
+    def page(self, tenant_id: str, user_id: str, cursor: str = None, limit: int = PAGE_SIZE) -> Dict:
+        """
+        Próxima página do feed de sincronização do usuário
+
+        Returns:
+            dict com changes, cursor (para o próximo since), has_more,
+            full_resync (página de snapshot) e reset (limpar a réplica local)
+        """
+        limit = max(1, min(int(limit or PAGE_SIZE), MAX_PAGE_SIZE))
+        conn = self.get_db()
+        try:
+            entities = self.ensure_schema(conn)
+            position = decode_cursor(cursor, user_id)
+
+            if position and position[0] == 'd' and position[1] >= self._floor(conn, tenant_id):
+                return self._delta_page(conn, entities, tenant_id, user_id, position[1], limit)
+            if position and position[0] == 's' and position[1] >= self._floor(conn, tenant_id):
+                return self._snapshot_page(conn, entities, tenant_id, user_id, position, limit, reset=False)
+
+            # Ressincronização completa: o seq é lido antes das tabelas
+            high_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+            return self._snapshot_page(conn, entities, tenant_id, user_id,
+                                       ['s', high_seq, 0, None], limit, reset=True)
+        finally:
+            conn.close()
+
+    # =====================================================
+    # COMPACTAÇÃO
+    # =====================================================
+
+    def compact(self, now: datetime = None, tombstone_days: int = TOMBSTONE_DAYS) -> Dict:
+        """
+        Remove entradas superadas e tombstones antigos, subindo o piso dos tenants
+
+        Returns:
+            dict com superseded, tombstones e tenants (pisos atualizados)
+        """
+        conn = self.get_db()
+        try:
+            self.ensure_schema(conn)
+            cutoff = ((now or datetime.now()) - timedelta(days=tombstone_days)).strftime('%Y-%m-%d %H:%M:%S')
+
+            conn.execute("BEGIN IMMEDIATE")
+            superseded = conn.execute("""
+                DELETE FROM change_log
+                WHERE EXISTS (
+                    SELECT 1 FROM change_log newer
+                    WHERE newer.entity = change_log.entity
+                      AND newer.entity_id = change_log.entity_id
+                      AND newer.seq > change_log.seq
+                )
+            """).rowcount
+
+            floors = conn.execute("""
+                SELECT tenant_id, MAX(seq) FROM change_log
+                WHERE op = 'delete' AND changed_at < ?
+                GROUP BY tenant_id
+            """, (cutoff,)).fetchall()
+            conn.executemany("""
+                INSERT INTO change_log_floor (tenant_id, seq) VALUES (?, ?)
+                ON CONFLICT(tenant_id) DO UPDATE SET seq = MAX(seq, excluded.seq)
+            """, [(row[0], row[1]) for row in floors])
+            tombstones = conn.execute("""
+                DELETE FROM change_log WHERE op = 'delete' AND changed_at < ?
+            """, (cutoff,)).rowcount
+            conn.commit()
+
+            logger.info(f"[OK] Change log compactado: {superseded} superadas, {tombstones} tombstones")
+            return {'superseded': superseded, 'tombstones': tombstones, 'tenants': len(floors)}
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+def run_nightly_compaction() -> Dict:
+    """Job noturno: compacta o change log"""
+    return change_log.compact()
+
+
+# Instância global
+change_log = ChangeLog()
@@ -0,0 +1,287 @@
+"""
+Conversation Store - Memória de conversas compartilhada da IA
+
+Duas camadas:
+- Camada quente: LRU em memória, limitada por número de usuários e por
+  total de caracteres armazenados
+- Camada fria: tabela ai_conversations (ai_history.db), a mesma usada por
+  BWSInsightAI.save_conversation, compartilhada entre workers do gunicorn
+  e preservada entre reinícios
+
+Cada worker valida sua cópia quente com uma consulta MIN/MAX(id) coberta por
+índice antes de usá-la, então uma mensagem gravada por outro worker (ou um
+histórico apagado) é percebida na próxima leitura.
+
+A janela de contexto enviada ao modelo respeita um TTL (conversas antigas não
+voltam como contexto) e um orçamento aproximado de tokens.
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+logger = logging.getLogger('conversation_store')
+
+DEFAULT_DB_PATH = 'ai_history.db'
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa barata de tokens (~4 caracteres por token em português)"""
+    return len(text or '') // 4 + 1
+
+
+class ConversationStore:
+    """Histórico de conversas com cache LRU sobre SQLite"""
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_DB_PATH,
+        max_users: int = None,
+        max_chars: int = None,
+        max_exchanges: int = None,
+        ttl_seconds: int = None
+    ):
+        self.db_path = db_path
+        self.max_users = max_users or int(os.getenv('AI_HISTORY_MAX_USERS', 500))
+        self.max_chars = max_chars or int(os.getenv('AI_HISTORY_MAX_CHARS', 2_000_000))
+        self.max_exchanges = max_exchanges or int(os.getenv('AI_HISTORY_MAX_EXCHANGES', 10))
+        self.ttl = timedelta(seconds=ttl_seconds or int(os.getenv('AI_HISTORY_TTL_SECONDS', 6 * 3600)))
+
+        self._hot: 'OrderedDict[tuple, Dict]' = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'evictions': 0}
+
+        self._ensure_tables()
+
+    # =====================================================
+    # CAMADA FRIA (SQLite)
+    # =====================================================
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_tables(self):
+        """Garante a tabela de conversas (mesmo schema de BWSInsightAI) e o índice"""
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ai_conversations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT,
+                    tenant_id TEXT,
+                    user_message TEXT,
+                    ai_response TEXT,
+                    context TEXT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ai_conversations_user
+                ON ai_conversations(user_id, tenant_id, id)
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _cutoff(self) -> str:
+        """Limite inferior de timestamp (UTC, formato do CURRENT_TIMESTAMP)"""
+        return (datetime.utcnow() - self.ttl).strftime('%Y-%m-%d %H:%M:%S')
+
+    def _load_recent(self, conn, user_id: str, tenant_id: Optional[str], after_id: int = 0) -> List[Dict]:
+        """Carrega as trocas mais recentes (dentro do TTL) em ordem cronológica"""
+        rows = conn.execute("""
+            SELECT id, user_message, ai_response, timestamp
+            FROM ai_conversations
+            WHERE user_id = ? AND tenant_id IS ? AND id > ? AND timestamp >= ?
+            ORDER BY id DESC
+            LIMIT ?
+        """, (user_id, tenant_id, after_id, self._cutoff(), self.max_exchanges)).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    # =====================================================
+    # CAMADA QUENTE (LRU)
+    # =====================================================
+
+    @staticmethod
+    def _entry_chars(exchanges: List[Dict]) -> int:
+        return sum(len(e['user_message'] or '') + len(e['ai_response'] or '') for e in exchanges)
+
+    def _store_hot(self, key: tuple, exchanges: List[Dict]):
+        """Substitui a entrada quente e aplica os limites do LRU (chamar com lock)"""
+        old = self._hot.pop(key, None)
+        if old:
+            self._chars -= old['chars']
+
+        exchanges = exchanges[-self.max_exchanges:]
+        entry = {
+            'exchanges': exchanges,
+            'first_id': exchanges[0]['id'] if exchanges else None,
+            'last_id': exchanges[-1]['id'] if exchanges else 0,
+            'chars': self._entry_chars(exchanges)
+        }
+        self._hot[key] = entry
+        self._chars += entry['chars']
+
+        while self._hot and (len(self._hot) > self.max_users or self._chars > self.max_chars):
+            _, evicted = self._hot.popitem(last=False)
+            self._chars -= evicted['chars']
+            self.stats['evictions'] += 1
+
+        return entry
+
+    def _get_exchanges(self, user_id: str, tenant_id: Optional[str]) -> List[Dict]:
+        """Retorna as trocas recentes, validando a cópia quente contra o SQLite"""
+        key = (user_id, tenant_id)
+        conn = self._connect()
+        try:
+            with self._lock:
+                entry = self._hot.get(key)
+
+            if entry is None:
+                self.stats['misses'] += 1
+                exchanges = self._load_recent(conn, user_id, tenant_id)
+            else:
+                # Sonda coberta pelo índice: detecta gravações/remoções de outros workers
+                probe = conn.execute("""
+                    SELECT MIN(id), MAX(id) FROM ai_conversations
+                    WHERE user_id = ? AND tenant_id IS ? AND id >= ?
+                """, (user_id, tenant_id, entry['first_id'] or 0)).fetchone()
+                first_id, last_id = probe[0], probe[1] or 0
+
+                if entry['first_id'] is not None and first_id != entry['first_id']:
+                    self.stats['misses'] += 1
+                    exchanges = self._load_recent(conn, user_id, tenant_id)
+                elif last_id > entry['last_id']:
+                    self.stats['refreshes'] += 1
+                    exchanges = entry['exchanges'] + self._load_recent(conn, user_id, tenant_id, entry['last_id'])
+                else:
+                    self.stats['hits'] += 1
+                    exchanges = entry['exchanges']
+
+            with self._lock:
+                if entry is None or exchanges is not entry['exchanges']:
+                    entry = self._store_hot(key, exchanges)
+                else:
+                    self._hot.move_to_end(key)
+
+            cutoff = self._cutoff()
+            return [e for e in entry['exchanges'] if (e['timestamp'] or '') >= cutoff]
+        finally:
+            conn.close()
+
+    # =====================================================
+    # API PÚBLICA
+    # =====================================================
+
+    def append(
+        self,
+        user_id: str,
+        tenant_id: Optional[str],
+        user_message: str,
+        ai_response: str,
+        context: Dict = None
+    ) -> int:
+        """Grava uma troca (mensagem + resposta) e atualiza a camada quente"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute("""
+                INSERT INTO ai_conversations (user_id, tenant_id, user_message, ai_response, context)
+                VALUES (?, ?, ?, ?, ?)
+            """, (
+                user_id,
+                tenant_id,
+                user_message,
+                ai_response,
+                json.dumps(context) if context else None
+            ))
+            conn.commit()
+            row_id = cursor.lastrowid
+        finally:
+            conn.close()
+
+        # A próxima leitura revalida a entrada e traz também esta troca
+        return row_id
+
+    def get_window(
+        self,
+        user_id: str,
+        tenant_id: Optional[str] = None,
+        max_tokens: int = 1500
+    ) -> List[Dict]:
+        """
+        Monta a janela de contexto para o modelo
+
+        Percorre as trocas da mais recente para a mais antiga e para quando o
+        orçamento de tokens acaba. Trocas são mantidas inteiras (pergunta e
+        resposta juntas).
+
+        Returns:
+            Lista de mensagens no formato {"role", "content"} em ordem cronológica
+        """
+        window = []
+        budget = max_tokens
+
+        for exchange in reversed(self._get_exchanges(user_id, tenant_id)):
+            cost = estimate_tokens(exchange['user_message']) + estimate_tokens(exchange['ai_response'])
+            if cost > budget:
+                break
+            budget -= cost
+            window[:0] = [
+                {"role": "user", "content": exchange['user_message']},
+                {"role": "assistant", "content": exchange['ai_response']}
+            ]
+
+        return window
+
+    def get_history(self, user_id: str, tenant_id: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """Histórico completo (mais recente primeiro) para /api/ai/history"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("""
+                SELECT * FROM ai_conversations
+                WHERE user_id = ? AND tenant_id IS ?
+                ORDER BY id DESC
+                LIMIT ?
+            """, (user_id, tenant_id, limit)).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def clear(self, user_id: str, tenant_id: Optional[str] = None) -> int:
+        """Apaga o histórico do usuário nas duas camadas"""
+        with self._lock:
+            entry = self._hot.pop((user_id, tenant_id), None)
+            if entry:
+                self._chars -= entry['chars']
+
+        conn = self._connect()
+        try:
+            cursor = conn.execute("""
+                DELETE FROM ai_conversations
+                WHERE user_id = ? AND tenant_id IS ?
+            """, (user_id, tenant_id))
+            conn.commit()
+            logger.info(f"[OK] Histórico de conversa limpo para {user_id} ({cursor.rowcount} trocas)")
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict:
+        """Métricas da camada quente"""
+        with self._lock:
+            return {**self.stats, 'users': len(self._hot), 'chars': self._chars}
+
+
+# =========================================
+# INSTÂNCIA GLOBAL
+# =========================================
+
+conversation_store = ConversationStore()
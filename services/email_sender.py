@@ -4,6 +4,8 @@ import os
 import smtplib
 import logging
 import time
+
+from services.metrics import track_outbound
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from jinja2 import Environment, FileSystemLoader, select_autoescape
@@ -30,16 +32,17 @@ def send_email(to, subject, html_body, retries=3):
             part = MIMEText(html_body, 'html')
             msg.attach(part)
 
-            if SMTP_PORT == 465:
-                server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=10)
-            else:
-                server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10)
-                server.starttls()
+            with track_outbound('smtp'):
+                if SMTP_PORT == 465:
+                    server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=10)
+                else:
+                    server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10)
+                    server.starttls()
 
-            if SMTP_USER and SMTP_PASS:
-                server.login(SMTP_USER, SMTP_PASS)
-            server.sendmail(SMTP_FROM, [to], msg.as_string())
-            server.quit()
+                if SMTP_USER and SMTP_PASS:
+                    server.login(SMTP_USER, SMTP_PASS)
+                server.sendmail(SMTP_FROM, [to], msg.as_string())
+                server.quit()
             logger.info('Email sent to %s', to)
             return True
         except Exception as e:
@@ -126,7 +129,7 @@ class EmailSender:
                 msg.attach(MIMEText(body, 'plain'))
             
             # Conectar e enviar
-            with smtplib.SMTP(self.config['smtp_host'], self.config['smtp_port']) as server:
+            with track_outbound('smtp'), smtplib.SMTP(self.config['smtp_host'], self.config['smtp_port']) as server:
                 server.starttls()
                 server.login(self.config['smtp_user'], self.config['smtp_password'])
                 server.send_message(msg)
@@ -0,0 +1,275 @@
+"""
+Event Stream - Canal Server-Sent Events por usuário
+
+Os produtores (atualização de cotações, NotificationCenter) gravam eventos
+na tabela stream_events; cada conexão SSE lê os eventos do seu usuário com
+id maior que o último entregue. Assim:
+- eventos publicados em qualquer worker do gunicorn chegam a todos
+- o id global é o "id:" do SSE, e o navegador retoma de onde parou
+  (Last-Event-ID) ao reconectar
+- no mesmo processo a publicação acorda as conexões na hora; entre
+  processos a entrega acontece no próximo poll (SSE_POLL_SECONDS)
+
+Cada conexão dura no máximo SSE_MAX_STREAM_SECONDS e envia heartbeat a cada
+SSE_HEARTBEAT_SECONDS, para não prender threads do servidor indefinidamente
+nem ser derrubada por proxies ociosos.
+
+Cada stream aberto ocupa uma thread do worker (gthread/waitress) enquanto
+dura. Por isso o limite por processo fica abaixo de WEB_THREADS (as threads
+por worker configuradas no gunicorn/waitress), reservando
+SSE_RESERVED_THREADS para os requests normais; acima dele /api/stream
+responde 503 e o cliente tenta de novo mais tarde.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger('event_stream')
+
+# Compartilhado por todas as instâncias: publicar acorda as conexões do processo
+_wakeup = threading.Condition()
+
+WEB_THREADS = int(os.getenv('WEB_THREADS', 8))
+SSE_RESERVED_THREADS = int(os.getenv('SSE_RESERVED_THREADS', 2))
+
+
+def thread_stream_cap(threads: int = None, reserved: int = None) -> int:
+    """Máximo de streams por processo que ainda deixa threads para os requests normais"""
+    threads = threads or WEB_THREADS
+    reserved = SSE_RESERVED_THREADS if reserved is None else reserved
+    return max(1, threads - reserved)
+
+
+class StreamLimitReached(Exception):
+    """Limite de conexões SSE simultâneas neste processo"""
+
+
+class EventStream:
+    """Publicação e leitura de eventos por usuário"""
+
+    def __init__(
+        self,
+        db_path: str = 'bws_finance.db',
+        retention_minutes: int = None,
+        heartbeat_seconds: int = None,
+        max_stream_seconds: int = None,
+        poll_seconds: float = None,
+        max_streams: int = None
+    ):
+        self.db_path = db_path
+        self.retention_minutes = retention_minutes or int(os.getenv('SSE_RETENTION_MINUTES', 60))
+        self.heartbeat_seconds = heartbeat_seconds or int(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+        self.max_stream_seconds = max_stream_seconds or int(os.getenv('SSE_MAX_STREAM_SECONDS', 300))
+        self.poll_seconds = poll_seconds or float(os.getenv('SSE_POLL_SECONDS', 2))
+        # SSE_MAX_STREAMS só pode reduzir o teto dado pelas threads do worker
+        cap = thread_stream_cap()
+        self.max_streams = max_streams or min(int(os.getenv('SSE_MAX_STREAMS', cap)), cap)
+
+        self.active_streams = 0
+        self._schema_ready = False
+        self._published = 0
+        self._lock = threading.Lock()
+
+    def get_db(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        if not self._schema_ready:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS stream_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    tenant_id TEXT,
+                    event TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_stream_events_user
+                    ON stream_events(user_id, id);
+            """)
+            self._schema_ready = True
+        return conn
+
+    # =========================================
+    # PUBLICAÇÃO
+    # =========================================
+
+    def publish_many(self, events: List[Tuple[str, str, str, Dict]]) -> List[int]:
+        """
+        Publica eventos (user_id, tenant_id, event, data)
+
+        Deve ser chamado depois do commit do produtor: a gravação usa a
+        própria conexão e esperaria o lock de escrita da transação aberta.
+        """
+        if not events:
+            return []
+
+        now = datetime.now().isoformat()
+        conn = self.get_db()
+        try:
+            ids = []
+            for user_id, tenant_id, event, data in events:
+                cursor = conn.execute("""
+                    INSERT INTO stream_events (user_id, tenant_id, event, data, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (str(user_id), tenant_id, event, json.dumps(data, default=str), now))
+                ids.append(cursor.lastrowid)
+
+            with self._lock:
+                self._published += len(events)
+                prune = self._published >= 500
+                if prune:
+                    self._published = 0
+            if prune:
+                self._prune(conn)
+
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"[ERRO] Falha ao publicar eventos: {e}")
+            return []
+        finally:
+            conn.close()
+
+        with _wakeup:
+            _wakeup.notify_all()
+        return ids
+
+    def publish(self, user_id: str, tenant_id: str, event: str, data: Dict) -> Optional[int]:
+        ids = self.publish_many([(user_id, tenant_id, event, data)])
+        return ids[0] if ids else None
+
+    def _prune(self, conn):
+        cutoff = (datetime.now() - timedelta(minutes=self.retention_minutes)).isoformat()
+        conn.execute("DELETE FROM stream_events WHERE created_at < ?", (cutoff,))
+
+    # =========================================
+    # LEITURA
+    # =========================================
+
+    def fetch_since(self, user_id: str, last_id: int, limit: int = 100) -> List[Dict]:
+        conn = self.get_db()
+        try:
+            rows = conn.execute("""
+                SELECT id, event, data FROM stream_events
+                WHERE user_id = ? AND id > ?
+                ORDER BY id
+                LIMIT ?
+            """, (str(user_id), last_id, limit)).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def cursor_state(self) -> Tuple[int, int]:
+        """(menor id retido, maior id publicado) - globais"""
+        conn = self.get_db()
+        try:
+            row = conn.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM stream_events").fetchone()
+            return row[0], row[1]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def format_event(event_id: Optional[int], event: str, data: str) -> str:
+        lines = [f"id: {event_id}"] if event_id is not None else []
+        lines.append(f"event: {event}")
+        lines.extend(f"data: {line}" for line in data.splitlines() or [''])
+        return '\n'.join(lines) + '\n\n'
+
+    def open(self):
+        """Reserva uma vaga de conexão (levanta StreamLimitReached)"""
+        with self._lock:
+            if self.active_streams >= self.max_streams:
+                raise StreamLimitReached()
+            self.active_streams += 1
+
+    def release(self):
+        """Libera a vaga (chamado quando a resposta é fechada)"""
+        with self._lock:
+            self.active_streams = max(0, self.active_streams - 1)
+
+    def stream(self, user_id: str, last_event_id: Optional[int] = None) -> Iterator[str]:
+        """
+        Gerador SSE para o usuário
+
+        Sem last_event_id começa do momento atual; com ele, reenvia o que o
+        cliente perdeu. Se parte do intervalo já foi descartada pela
+        retenção, envia 'resync' para o cliente recarregar o estado.
+        """
+        oldest, newest = self.cursor_state()
+        if last_event_id is None or last_event_id > newest:
+            last_id = newest
+        else:
+            last_id = last_event_id
+            if oldest > last_event_id + 1:
+                yield self.format_event(newest, 'resync', json.dumps({'reason': 'expired'}))
+                last_id = newest
+
+        yield "retry: 3000\n\n"
+
+        started = last_beat = time.monotonic()
+        while time.monotonic() - started < self.max_stream_seconds:
+            events = self.fetch_since(user_id, last_id)
+            for row in events:
+                last_id = row['id']
+                yield self.format_event(row['id'], row['event'], row['data'])
+
+            if events:
+                last_beat = time.monotonic()
+                continue
+
+            if time.monotonic() - last_beat >= self.heartbeat_seconds:
+                last_beat = time.monotonic()
+                yield ": heartbeat\n\n"
+
+            with _wakeup:
+                _wakeup.wait(timeout=self.poll_seconds)
+
+
+# =========================================
+# HELPERS PARA OS PRODUTORES
+# =========================================
+
+def portfolio_event(conn, user_id: str, tenant_id: str, updated: int = 0, errors: int = 0) -> Tuple:
+    """Evento 'portfolio' com os totais atuais da carteira do usuário"""
+    row = conn.execute("""
+        SELECT COALESCE(SUM(current_value), 0), COALESCE(SUM(amount), 0), COUNT(*)
+        FROM investments
+        WHERE user_id = ? AND tenant_id = ? AND (investment_status = 'active' OR investment_status IS NULL)
+    """, (user_id, tenant_id)).fetchone()
+    total_current, total_invested, count = row[0], row[1], row[2]
+    profit_loss = total_current - total_invested
+    return (user_id, tenant_id, 'portfolio', {
+        'total_current': round(total_current, 2),
+        'total_invested': round(total_invested, 2),
+        'profit_loss': round(profit_loss, 2),
+        'profit_percent': round(profit_loss / total_invested * 100, 2) if total_invested > 0 else 0,
+        'total_investments': count,
+        'updated': updated,
+        'errors': errors,
+        'last_update': datetime.now().isoformat()
+    })
+
+
+def quote_event(user_id: str, tenant_id: str, investment_id, name: str, price: float,
+                quantity: float, amount: float, current_value: float) -> Tuple:
+    """Evento 'quote' com o delta de uma posição"""
+    profit = current_value - (amount or 0)
+    return (user_id, tenant_id, 'quote', {
+        'investment_id': investment_id,
+        'name': name,
+        'price': round(price, 2) if price else None,
+        'quantity': quantity,
+        'current_value': round(current_value, 2),
+        'profit': round(profit, 2),
+        'profit_percent': round(profit / amount * 100, 2) if amount else 0
+    })
+
+
+# Instância global
+event_stream = EventStream()
@@ -0,0 +1,449 @@
+"""
+Fixed Income Accrual - Motor de apropriação diária de renda fixa
+
+Carrega todas as posições ativas de renda fixa (CDB, LCI/LCA, Tesouro,
+Poupança) em arrays e aplica o rendimento em uma única passada vetorizada,
+sobre o calendário de dias úteis brasileiro (convenção 252).
+
+Indexadores suportados (coluna investments.indexer):
+- PRE (ou NULL): taxa pré-fixada em interest_rate (% a.a.)
+- CDI / SELIC: indexer_percent% do índice (ex.: 110% do CDI) + interest_rate
+  como spread opcional
+- IPCA: IPCA + interest_rate (híbrido)
+- Poupança: regra da poupança sobre a SELIC (0,5% a.m. se SELIC > 8,5% a.a.,
+  senão 70% da SELIC), sem TR; apropriada por dia útil
+
+As taxas dos índices vêm da tabela local investment_rates (% a.a. por data),
+preenchida por sync_rates() a partir das séries do Banco Central. Cada dia
+usa a última taxa conhecida.
+
+A apropriação é incremental: parte de last_accrual_date (ou start_date na
+primeira vez) até a data de referência, e grava tudo em lote.
+"""
+
+import os
+import math
+import time
+import sqlite3
+import logging
+import threading
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+from utils.business_days import BUSINESS_DAYS_PER_YEAR, business_days
+
+try:
+    import numpy as np
+    NUMPY_SUPPORT = True
+except ImportError:
+    NUMPY_SUPPORT = False
+
+logger = logging.getLogger('fixed_income_accrual')
+
+FIXED_INCOME_TYPES = ('CDB', 'LCI', 'LCA', 'Tesouro Direto', 'Poupança')
+INDEXERS = ('PRE', 'CDI', 'SELIC', 'IPCA')
+
+# Séries SGS do Banco Central (% a.a.)
+BCB_SERIES = {
+    'CDI': 4389,     # CDI anualizado base 252
+    'SELIC': 1178,   # SELIC anualizada base 252
+    'IPCA': 13522,   # IPCA acumulado em 12 meses (mensal)
+}
+BCB_URL = 'https://api.bcb.gov.br/dados/serie/bcdata.sgs.{code}/dados'
+
+POUPANCA_SELIC_THRESHOLD = 8.5
+POUPANCA_FIXED_ANNUAL = ((1.005 ** 12) - 1) * 100  # 0,5% a.m.
+
+
+def _to_date(value) -> Optional[date]:
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    return datetime.fromisoformat(str(value)[:10]).date()
+
+
+def position_kind(position: Dict) -> str:
+    """Indexador efetivo da posição"""
+    if position.get('investment_type') == 'Poupança':
+        return 'POUPANCA'
+    indexer = (position.get('indexer') or 'PRE').upper()
+    return indexer if indexer in INDEXERS else 'PRE'
+
+
+def _daily_log_factor(kind: str, annual_rate: float, percent: float) -> float:
+    """log do fator de um dia útil para uma taxa anual (%) do índice"""
+    if kind in ('CDI', 'SELIC'):
+        daily = (1 + annual_rate / 100) ** (1 / BUSINESS_DAYS_PER_YEAR) - 1
+        return math.log1p(daily * percent / 100)
+    if kind == 'POUPANCA':
+        annual = POUPANCA_FIXED_ANNUAL if annual_rate > POUPANCA_SELIC_THRESHOLD else 0.7 * annual_rate
+        return math.log1p(annual / 100) / BUSINESS_DAYS_PER_YEAR
+    return math.log1p(annual_rate / 100) / BUSINESS_DAYS_PER_YEAR  # IPCA
+
+
+class FixedIncomeAccrual:
+    """Apropriação de rendimentos de renda fixa em lote"""
+
+    def __init__(self, db_path: str = 'bws_finance.db'):
+        self.db_path = db_path
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    def get_db(self):
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # =====================================================
+    # SCHEMA
+    # =====================================================
+
+    def ensure_schema(self, conn=None):
+        """Cria a tabela de taxas e as colunas de apropriação (uma vez por processo)"""
+        if self._schema_ready:
+            return
+        with self._lock:
+            if self._schema_ready:
+                return
+            own = conn is None
+            conn = conn or self.get_db()
+            try:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS investment_rates (
+                        index_name TEXT NOT NULL,
+                        date DATE NOT NULL,
+                        annual_rate REAL NOT NULL,
+                        source TEXT DEFAULT 'manual',
+                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (index_name, date)
+                    )
+                """)
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(investments)")}
+                if columns:
+                    for name, ddl in (
+                        ('last_accrual_date', 'TEXT'),
+                        ('indexer', "TEXT DEFAULT 'PRE'"),
+                        ('indexer_percent', 'REAL DEFAULT 100'),
+                    ):
+                        if name not in columns:
+                            conn.execute(f"ALTER TABLE investments ADD COLUMN {name} {ddl}")
+                conn.commit()
+                self._schema_ready = True
+            finally:
+                if own:
+                    conn.close()
+
+    # =====================================================
+    # TAXAS
+    # =====================================================
+
+    def upsert_rates(self, conn, index_name: str, rates: Iterable[tuple], source: str = 'manual') -> int:
+        """Grava (data, taxa % a.a.) de um índice em lote"""
+        rows = [(index_name, str(day)[:10], float(rate), source) for day, rate in rates]
+        conn.executemany("""
+            INSERT INTO investment_rates (index_name, date, annual_rate, source)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(index_name, date) DO UPDATE SET
+                annual_rate = excluded.annual_rate,
+                source = excluded.source,
+                updated_at = CURRENT_TIMESTAMP
+        """, rows)
+        return len(rows)
+
+    def sync_rates(self, days: int = 45) -> Dict[str, int]:
+        """Baixa as taxas recentes do Banco Central (SGS) para a tabela local"""
+        end = date.today()
+        start = end - timedelta(days=days)
+        stats = {}
+        conn = self.get_db()
+        try:
+            self.ensure_schema(conn)
+            for index_name, code in BCB_SERIES.items():
+                try:
+                    response = requests.get(
+                        BCB_URL.format(code=code),
+                        params={
+                            'formato': 'json',
+                            'dataInicial': start.strftime('%d/%m/%Y'),
+                            'dataFinal': end.strftime('%d/%m/%Y')
+                        },
+                        timeout=10
+                    )
+                    response.raise_for_status()
+                    rates = [
+                        (datetime.strptime(item['data'], '%d/%m/%Y').date(), float(item['valor']))
+                        for item in response.json()
+                    ]
+                    stats[index_name] = self.upsert_rates(conn, index_name, rates, source='bcb')
+                except Exception as e:
+                    logger.error(f"[ERRO] Falha ao sincronizar {index_name}: {e}")
+                    stats[index_name] = 0
+            conn.commit()
+        finally:
+            conn.close()
+        logger.info(f"[OK] Taxas sincronizadas: {stats}")
+        return stats
+
+    def load_rates(self, conn, as_of: date) -> Dict[str, tuple]:
+        """{índice: (datas ordenadas, taxas)} até a data de referência"""
+        series: Dict[str, tuple] = {}
+        for row in conn.execute("""
+            SELECT index_name, date, annual_rate FROM investment_rates
+            WHERE date <= ?
+            ORDER BY index_name, date
+        """, (as_of.isoformat(),)):
+            dates, values = series.setdefault(row['index_name'], ([], []))
+            dates.append(_to_date(row['date']))
+            values.append(row['annual_rate'])
+        return series
+
+    # =====================================================
+    # CÁLCULO
+    # =====================================================
+
+    def _index_curve(self, kind: str, percent: float, calendar: List[date], series: Dict[str, tuple]):
+        """Log-fatores acumulados do índice sobre o calendário (len = dias + 1)"""
+        if kind == 'PRE':
+            return [0.0] * (len(calendar) + 1)
+
+        source = series.get('SELIC' if kind == 'POUPANCA' else kind)
+        if not source or not source[0]:
+            return None
+
+        dates, values = source
+        if NUMPY_SUPPORT:
+            positions = np.searchsorted(np.array(dates, dtype='datetime64[D]'),
+                                        np.array(calendar, dtype='datetime64[D]'), side='right') - 1
+            annual = np.array(values)[np.clip(positions, 0, None)]
+            if kind in ('CDI', 'SELIC'):
+                daily = np.log1p(((1 + annual / 100) ** (1 / BUSINESS_DAYS_PER_YEAR) - 1) * percent / 100)
+            elif kind == 'POUPANCA':
+                annual = np.where(annual > POUPANCA_SELIC_THRESHOLD, POUPANCA_FIXED_ANNUAL, 0.7 * annual)
+                daily = np.log1p(annual / 100) / BUSINESS_DAYS_PER_YEAR
+            else:
+                daily = np.log1p(annual / 100) / BUSINESS_DAYS_PER_YEAR
+            return np.concatenate(([0.0], np.cumsum(daily)))
+
+        curve = [0.0]
+        for day in calendar:
+            rate = values[max(bisect_right(dates, day) - 1, 0)]
+            curve.append(curve[-1] + _daily_log_factor(kind, rate, percent))
+        return curve
+
+    def compute(self, positions: List[Dict], as_of: date, series: Dict[str, tuple]) -> List[Dict]:
+        """
+        Calcula a apropriação de cada posição em (último dia apropriado, as_of]
+
+        Não grava nada; retorna uma lista de resultados com new_value,
+        interest e business_days por posição (posições sem dias úteis ou sem
+        taxa do índice ficam de fora).
+        """
+        prepared = []
+        for position in positions:
+            start = _to_date(position.get('last_accrual_date')) or _to_date(position.get('start_date'))
+            end = as_of
+            maturity = _to_date(position.get('maturity_date'))
+            if maturity and maturity < end:
+                end = maturity
+            if start is None or end <= start:
+                continue
+            kind = position_kind(position)
+            percent = float(position.get('indexer_percent') or 100) if kind in ('CDI', 'SELIC') else 100.0
+            prepared.append((position, start, end, kind, percent))
+
+        if not prepared:
+            return []
+
+        calendar = business_days(min(p[1] for p in prepared), as_of)
+
+        # Uma curva acumulada por (indexador, percentual)
+        groups: Dict[tuple, int] = {}
+        curves = []
+        group_of = []
+        for _, _, _, kind, percent in prepared:
+            key = (kind, percent)
+            if key not in groups:
+                groups[key] = len(curves)
+                curves.append(self._index_curve(kind, percent, calendar, series))
+            group_of.append(groups[key])
+
+        missing = {key[0] for key, idx in groups.items() if curves[idx] is None}
+        if missing:
+            logger.warning(f"[ERRO] Sem taxas locais para {', '.join(sorted(missing))}; posições ignoradas")
+
+        valid = [i for i, g in enumerate(group_of) if curves[g] is not None]
+        if not valid:
+            return []
+
+        rows = [prepared[i] for i in valid]
+        first_accrual = [not p[0].get('last_accrual_date') for p in rows]
+        starts = [bisect_right(calendar, p[1]) for p in rows]
+        ends = [bisect_right(calendar, p[2]) for p in rows]
+        spreads = [0.0 if p[3] == 'POUPANCA' else float(p[0].get('interest_rate') or 0) for p in rows]
+        simple = [p[3] == 'PRE' and p[0].get('interest_type') == 'simple' for p in rows]
+        invested = [float(p[0].get('total_invested') or 0) for p in rows]
+        # Primeira apropriação recalcula do início sobre o valor investido;
+        # as seguintes partem do valor atual (inclui aportes/resgates)
+        base = [inv if first else float(p[0].get('current_value') or 0)
+                for p, first, inv in zip(rows, first_accrual, invested)]
+
+        if NUMPY_SUPPORT:
+            width = len(calendar) + 1
+            matrix = np.vstack([np.asarray(c, dtype=float) if c is not None else np.zeros(width) for c in curves])
+            g = np.array([group_of[i] for i in valid])
+            s, e = np.array(starts), np.array(ends)
+            n = e - s
+            spread = np.array(spreads)
+            log_factor = matrix[g, e] - matrix[g, s] + n / BUSINESS_DAYS_PER_YEAR * np.log1p(spread / 100)
+            base_arr = np.array(base)
+            compound_value = base_arr * np.exp(log_factor)
+            simple_value = base_arr + np.array(invested) * spread / 100 * n / BUSINESS_DAYS_PER_YEAR
+            new_values = np.where(np.array(simple), simple_value, compound_value).tolist()
+            days = n.tolist()
+        else:
+            new_values, days = [], []
+            for i, (idx, s, e) in enumerate(zip(valid, starts, ends)):
+                curve = curves[group_of[idx]]
+                n = e - s
+                if simple[i]:
+                    value = base[i] + invested[i] * spreads[i] / 100 * n / BUSINESS_DAYS_PER_YEAR
+                else:
+                    log_factor = curve[e] - curve[s] + n / BUSINESS_DAYS_PER_YEAR * math.log1p(spreads[i] / 100)
+                    value = base[i] * math.exp(log_factor)
+                new_values.append(value)
+                days.append(n)
+
+        results = []
+        for p, value, n in zip(rows, new_values, days):
+            position = p[0]
+            previous = float(position.get('current_value') or 0)
+            results.append({
+                'id': position['id'],
+                'accrual_from': p[1].isoformat(),
+                'accrual_to': p[2].isoformat(),
+                'business_days': int(n),
+                'kind': p[3],
+                'previous_value': previous,
+                'new_value': round(value, 2),
+                'interest': round(value - previous, 2)
+            })
+        return results
+
+    def project(self, positions: List[Dict], as_of: date = None) -> Dict:
+        """Valor projetado até hoje, sem gravar (para listagens)"""
+        as_of = as_of or date.today()
+        conn = self.get_db()
+        try:
+            self.ensure_schema(conn)
+            series = self.load_rates(conn, as_of)
+        finally:
+            conn.close()
+        return {r['id']: r for r in self.compute(positions, as_of, series)}
+
+    # =====================================================
+    # EXECUÇÃO EM LOTE
+    # =====================================================
+
+    def run(
+        self,
+        as_of: date = None,
+        investment_ids: List[int] = None,
+        user_id: str = None,
+        tenant_id: str = None
+    ) -> Dict:
+        """
+        Apropria os rendimentos até as_of (padrão: hoje) e grava em lote
+
+        Returns:
+            Estatísticas da execução e os resultados por posição
+        """
+        started = time.perf_counter()
+        as_of = as_of or date.today()
+        conn = self.get_db()
+        try:
+            self.ensure_schema(conn)
+
+            placeholders = ','.join('?' * len(FIXED_INCOME_TYPES))
+            where = ["investment_status = 'active'", f"investment_type IN ({placeholders})"]
+            params: List = list(FIXED_INCOME_TYPES)
+            if investment_ids:
+                where.append(f"id IN ({','.join('?' * len(investment_ids))})")
+                params.extend(investment_ids)
+            if user_id:
+                where.append("user_id = ?")
+                params.append(user_id)
+            if tenant_id:
+                where.append("tenant_id = ?")
+                params.append(tenant_id)
+
+            positions = [dict(row) for row in conn.execute(f"""
+                SELECT id, investment_type, interest_rate, interest_type, start_date,
+                       maturity_date, current_value, total_invested, total_earned,
+                       last_accrual_date, indexer, indexer_percent
+                FROM investments
+                WHERE {' AND '.join(where)}
+            """, params)]
+
+            results = self.compute(positions, as_of, self.load_rates(conn, as_of))
+            previous = {p['id']: p['last_accrual_date'] for p in positions}
+
+            # Guarda otimista por posição: só aplica (e só registra no histórico)
+            # se ninguém apropriou a posição no meio tempo
+            applied = []
+            for r in results:
+                cursor = conn.execute("""
+                    UPDATE investments
+                    SET current_value = ?,
+                        total_earned = COALESCE(total_earned, 0) + ?,
+                        last_accrual_date = ?
+                    WHERE id = ? AND last_accrual_date IS ?
+                """, (r['new_value'], r['interest'], r['accrual_to'], r['id'], previous[r['id']]))
+                if cursor.rowcount == 1:
+                    applied.append(r)
+
+            conn.executemany("""
+                INSERT INTO investment_history (
+                    investment_id, date, operation_type, amount,
+                    balance_before, balance_after, interest_earned, description
+                ) VALUES (?, ?, 'interest', ?, ?, ?, ?, ?)
+            """, [(
+                r['id'], r['accrual_to'], r['interest'], r['previous_value'], r['new_value'], r['interest'],
+                f"Rendimento {r['kind']} de {r['business_days']} dias úteis ({r['accrual_from']} a {r['accrual_to']})"
+            ) for r in applied if r['interest']])
+
+            conn.commit()
+        finally:
+            conn.close()
+
+        stats = {
+            'as_of': as_of.isoformat(),
+            'positions': len(positions),
+            'accrued': len(applied),
+            'skipped': len(positions) - len(results),
+            'conflicts': len(results) - len(applied),
+            'total_interest': round(sum(r['interest'] for r in applied), 2),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+            'results': applied
+        }
+        logger.info(
+            f"[OK] Apropriação {stats['as_of']}: {stats['accrued']}/{stats['positions']} posições, "
+            f"R$ {stats['total_interest']} em {stats['elapsed_ms']}ms"
+        )
+        return stats
+
+
+def run_nightly_accrual() -> Dict:
+    """Job noturno: atualiza as taxas locais e apropria todas as posições"""
+    if os.getenv('INVESTMENT_RATES_SYNC', 'true').lower() == 'true':
+        fixed_income_accrual.sync_rates()
+    stats = fixed_income_accrual.run()
+    stats.pop('results')
+    return stats
+
+
+# Instância global
+fixed_income_accrual = FixedIncomeAccrual()
@@ -0,0 +1,309 @@
+"""
+HTML Extraction - Extração direcionada de cotação e indicadores do Investidor10
+
+Em vez de montar a árvore inteira da página (~1 MB) e percorrer todos os
+nós, cada backend visita só os nós que interessam:
+- h2.name-company (nome) e <title> (fallback)
+- #cards-ticker ._card: cabeçalho -> corpo (cotação, variação, P/L, DY...)
+- #table-indicators .cell: rótulo -> .value (ROE, ROIC, margens...)
+
+Backends, em ordem de preferência: selectolax, lxml, html.parser (stdlib).
+Todos produzem o mesmo resultado; o stdlib só tokeniza o trecho da página
+entre o nome da empresa e o fim da tabela de indicadores.
+"""
+
+import os
+import logging
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger('html_extraction')
+
+try:
+    from selectolax.parser import HTMLParser as SelectolaxParser
+    SELECTOLAX_SUPPORT = True
+except ImportError:
+    SELECTOLAX_SUPPORT = False
+
+try:
+    import lxml.html
+    LXML_SUPPORT = True
+except ImportError:
+    LXML_SUPPORT = False
+
+BACKENDS = ['selectolax', 'lxml', 'stdlib']
+
+# Indicadores fundamentalistas extraídos (0 quando ausentes na página)
+INDICATOR_FIELDS = ['dy', 'pl', 'pvp', 'roe', 'roic', 'liq_corrente', 'divida_liquida_ebitda', 'margem_liquida']
+
+
+def available_backends() -> List[str]:
+    available = {'selectolax': SELECTOLAX_SUPPORT, 'lxml': LXML_SUPPORT, 'stdlib': True}
+    return [name for name in BACKENDS if available[name]]
+
+
+def default_backend() -> str:
+    """Backend configurado em HTML_PARSER_BACKEND ou o mais rápido instalado"""
+    configured = os.getenv('HTML_PARSER_BACKEND', '').lower()
+    if configured in available_backends():
+        return configured
+    return available_backends()[0]
+
+
+def parse_number(text: str) -> Optional[float]:
+    """'R$ 1.234,56' / '-5,67%' -> float; None para '-' ou texto inválido"""
+    cleaned = (text or '').replace('%', '').replace('R$', '').replace('.', '').replace(',', '.').strip()
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def map_label(label: str) -> Optional[str]:
+    """Título do card/célula -> campo do stock_data"""
+    title = label.strip().upper()
+    if 'COTAÇÃO' in title or 'COTACAO' in title:
+        return 'price'
+    if 'VARIAÇÃO' in title or 'VARIACAO' in title:
+        return 'change_percent'
+    if 'DY' in title or 'DIVIDEND' in title:
+        return 'dy'
+    if 'P/L' in title and 'EBITDA' not in title:
+        return 'pl'
+    if 'P/VP' in title or 'P / VP' in title:
+        return 'pvp'
+    if 'ROIC' in title:
+        return 'roic'
+    if 'ROE' in title:
+        return 'roe'
+    if 'LIQUIDEZ' in title and 'CORRENTE' in title:
+        return 'liq_corrente'
+    if 'EBITDA' in title and ('DIV' in title or 'DÍV' in title):
+        return 'divida_liquida_ebitda'
+    if 'MARGEM' in title and ('LÍQUIDA' in title or 'LIQUIDA' in title):
+        return 'margem_liquida'
+    return None
+
+
+def _build(name: Optional[str], title: Optional[str], pairs: List[Tuple[str, str]]) -> Dict:
+    """Monta o resultado comum a todos os backends (o primeiro valor de cada campo vence)"""
+    if not name and title:
+        name = title.split('-')[0].strip()
+
+    result = {'name': ' '.join(name.split()) if name else None, 'price': 0, 'change_percent': 0}
+    result.update({field: 0 for field in INDICATOR_FIELDS})
+
+    seen = set()
+    for label, text in pairs:
+        field = map_label(label)
+        if not field or field in seen:
+            continue
+        value = parse_number(text)
+        if value is not None:
+            result[field] = value
+            seen.add(field)
+    return result
+
+
+# =========================================
+# BACKENDS
+# =========================================
+
+def _extract_selectolax(html: str) -> Dict:
+    tree = SelectolaxParser(html)
+    name = tree.css_first('h2.name-company') or tree.css_first('h2')
+    title = tree.css_first('title')
+
+    pairs = []
+    for card in tree.css('#cards-ticker ._card'):
+        header, body = card.css_first('._card-header'), card.css_first('._card-body')
+        if header and body:
+            pairs.append((header.text(), body.text()))
+    for cell in tree.css('#table-indicators .cell'):
+        label, value = cell.css_first('span'), cell.css_first('.value')
+        if label and value:
+            pairs.append((label.text(), value.text()))
+
+    return _build(name.text() if name else None, title.text() if title else None, pairs)
+
+
+def _extract_lxml(html: str) -> Dict:
+    tree = lxml.html.fromstring(html)
+
+    def has_class(name):
+        return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+    def first_text(node, path):
+        found = node.xpath(path)
+        return found[0].text_content() if found else None
+
+    name = first_text(tree, f"//h2[{has_class('name-company')}]") or first_text(tree, '//h2')
+    title = first_text(tree, '//title')
+
+    pairs = []
+    for card in tree.xpath(f"//*[@id='cards-ticker']//div[{has_class('_card')}]"):
+        header = first_text(card, f".//*[{has_class('_card-header')}]")
+        body = first_text(card, f".//*[{has_class('_card-body')}]")
+        if header is not None and body is not None:
+            pairs.append((header, body))
+    for cell in tree.xpath(f"//*[@id='table-indicators']//*[{has_class('cell')}]"):
+        label = first_text(cell, './/span')
+        value = first_text(cell, f".//*[{has_class('value')}]")
+        if label is not None and value is not None:
+            pairs.append((label, value))
+
+    return _build(name, title, pairs)
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class _Investidor10Parser(HTMLParser):
+    """Parser por eventos: acumula texto só dentro dos nós de interesse"""
+
+    VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack: List[Tuple[str, Optional[str]]] = []
+        self.name: Optional[str] = None
+        self.pairs: List[Tuple[str, str]] = []
+        self.label: Optional[str] = None
+        self.buffer: Optional[List[str]] = None
+        self.in_cards = False
+        self.in_table = False
+        self.cell_depth: Optional[int] = None
+
+    def _role(self, tag: str, attrs) -> Optional[str]:
+        attrs = dict(attrs)
+        classes = (attrs.get('class') or '').split()
+        element_id = attrs.get('id')
+
+        if element_id == 'cards-ticker':
+            return 'cards'
+        if element_id == 'table-indicators':
+            return 'table'
+        if self.name is None and tag == 'h2' and 'name-company' in classes:
+            return 'name'
+        if self.buffer is not None:
+            return None
+        if self.in_cards:
+            if '_card' in classes:
+                return 'item'
+            if '_card-header' in classes:
+                return 'label'
+            if '_card-body' in classes:
+                return 'value'
+        if self.in_table:
+            if 'cell' in classes:
+                return 'item'
+            if self.cell_depth is not None:
+                if tag == 'span' and self.label is None and len(self.stack) == self.cell_depth:
+                    return 'label'
+                if 'value' in classes and self.label is not None:
+                    return 'value'
+        return None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.VOID_TAGS:
+            return
+        role = self._role(tag, attrs)
+        self.stack.append((tag, role))
+
+        if role == 'cards':
+            self.in_cards = True
+        elif role == 'table':
+            self.in_table = True
+        elif role == 'item':
+            self.label = None
+            self.cell_depth = len(self.stack)
+        elif role in ('label', 'value', 'name'):
+            self.buffer = []
+
+    def handle_endtag(self, tag):
+        # Tolera HTML malformado: fecha até a última ocorrência da tag
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                break
+        else:
+            return
+        while len(self.stack) > index:
+            self._close(self.stack.pop()[1])
+
+    def _close(self, role: Optional[str]):
+        if role in ('label', 'value', 'name'):
+            text = ''.join(self.buffer or [])
+            self.buffer = None
+            if role == 'name':
+                self.name = text
+            elif role == 'label':
+                self.label = text
+            elif self.label is not None:
+                self.pairs.append((self.label, text))
+                self.label = None
+        elif role == 'item':
+            self.label = None
+            self.cell_depth = None
+        elif role == 'cards':
+            self.in_cards = False
+        elif role == 'table':
+            # Tabela de indicadores é o último trecho de interesse
+            raise _StopParsing()
+
+    def handle_data(self, data):
+        if self.buffer is not None:
+            self.buffer.append(data)
+
+
+def _extract_stdlib(html: str) -> Dict:
+    title = None
+    start = html.find('<title')
+    if start != -1:
+        end = html.find('</title>', start)
+        title = html[html.find('>', start) + 1:end] if end != -1 else None
+
+    # Começar no primeiro nó de interesse (pula <head>, scripts e menus)
+    markers = [html.find(marker) for marker in ('name-company', 'id="cards-ticker"', 'id="table-indicators"')]
+    markers = [position for position in markers if position != -1]
+    offset = html.rfind('<', 0, min(markers)) if markers else 0
+
+    parser = _Investidor10Parser()
+    try:
+        parser.feed(html[max(offset, 0):])
+        parser.close()
+    except _StopParsing:
+        pass
+
+    name = parser.name
+    if name is None:
+        start = html.find('<h2')
+        if start != -1:
+            end = html.find('</h2>', start)
+            name = html[html.find('>', start) + 1:end] if end != -1 else None
+
+    return _build(name, title, parser.pairs)
+
+
+_EXTRACTORS = {
+    'selectolax': _extract_selectolax,
+    'lxml': _extract_lxml,
+    'stdlib': _extract_stdlib,
+}
+
+
+def extract_investidor10(html: str, backend: str = None) -> Dict:
+    """
+    Extrai nome, cotação, variação e indicadores de uma página do Investidor10
+
+    Args:
+        html: página completa
+        backend: 'selectolax', 'lxml' ou 'stdlib' (padrão: o mais rápido instalado)
+    Returns:
+        dict com name, price, change_percent e os campos de INDICATOR_FIELDS
+    """
+    backend = backend or default_backend()
+    if backend not in available_backends():
+        raise ValueError(f"Backend de HTML indisponível: {backend}")
+    return _EXTRACTORS[backend](html)
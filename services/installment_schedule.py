@@ -0,0 +1,259 @@
+"""
+Installment Schedule - Motor de cronograma de parcelamentos
+
+Calcula o cronograma completo em memória (datas, valores, juros e amortização)
+e grava todas as parcelas de uma vez com executemany. Pagamento e cancelamento
+em lote usam UPDATE/DELETE baseados em conjunto (uma instrução por operação).
+
+Sistemas suportados:
+- simples: juros simples sobre o total (comportamento original do módulo)
+- price:   Tabela Price / sistema francês (parcelas fixas)
+- sac:     Sistema de Amortização Constante (parcelas decrescentes)
+
+Todos os valores são calculados em centavos inteiros, de modo que a soma das
+parcelas é sempre exatamente o total devido (a última parcela absorve o resto).
+"""
+
+import uuid
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from dateutil.relativedelta import relativedelta
+
+SYSTEM_SIMPLE = 'simples'
+SYSTEM_PRICE = 'price'
+SYSTEM_SAC = 'sac'
+
+AMORTIZATION_SYSTEMS = (SYSTEM_SIMPLE, SYSTEM_PRICE, SYSTEM_SAC)
+
+
+def _to_cents(value) -> int:
+    """Converte valor monetário para centavos (arredondamento comercial)"""
+    return int((Decimal(str(value)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def _round_cents(value: Decimal) -> int:
+    """Arredonda um Decimal (já em centavos) para inteiro"""
+    return int(value.quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def _split_evenly(total_cents: int, count: int) -> List[int]:
+    """Divide centavos em partes iguais; o resto vai um centavo para cada uma das primeiras"""
+    base, remainder = divmod(total_cents, count)
+    return [base + 1] * remainder + [base] * (count - remainder)
+
+
+def build_schedule(
+    total_amount: float,
+    installment_count: int,
+    first_due_date: str,
+    interest_rate: float = 0,
+    system: str = SYSTEM_SIMPLE
+) -> List[Dict]:
+    """
+    Monta o cronograma completo de um parcelamento em memória
+
+    Args:
+        total_amount: Valor financiado
+        installment_count: Número de parcelas
+        first_due_date: Vencimento da primeira parcela (YYYY-MM-DD)
+        interest_rate: Taxa de juros mensal em % (ex: 2.5)
+        system: 'simples', 'price' ou 'sac'
+
+    Returns:
+        list: Uma entrada por parcela com number, due_date, value,
+              principal, interest e balance (saldo devedor após a parcela)
+    """
+    if system not in AMORTIZATION_SYSTEMS:
+        raise ValueError(f"Sistema de amortização inválido: {system}")
+    if installment_count < 1:
+        raise ValueError("Número de parcelas deve ser maior que zero")
+
+    n = int(installment_count)
+    principal_cents = _to_cents(total_amount)
+    rate = Decimal(str(interest_rate or 0)) / 100
+
+    # Sem juros, os três sistemas coincidem
+    if rate == 0:
+        system = SYSTEM_SIMPLE
+
+    principals: List[int] = []
+    interests: List[int] = []
+
+    if system == SYSTEM_SIMPLE:
+        total_cents = _round_cents(Decimal(principal_cents) * (1 + rate * n))
+        values = _split_evenly(total_cents, n)
+        principals = _split_evenly(principal_cents, n)
+        interests = [v - p for v, p in zip(values, principals)]
+
+    elif system == SYSTEM_PRICE:
+        # PMT = P * i / (1 - (1 + i)^-n)
+        payment = _round_cents(Decimal(principal_cents) * rate / (1 - (1 + rate) ** -n))
+        balance = principal_cents
+        for i in range(n):
+            interest = _round_cents(Decimal(balance) * rate)
+            amortization = balance if i == n - 1 else min(payment - interest, balance)
+            principals.append(amortization)
+            interests.append(interest)
+            balance -= amortization
+
+    else:  # SAC
+        balance = principal_cents
+        for amortization in _split_evenly(principal_cents, n):
+            interests.append(_round_cents(Decimal(balance) * rate))
+            principals.append(amortization)
+            balance -= amortization
+
+    start = datetime.strptime(first_due_date, '%Y-%m-%d')
+    schedule = []
+    balance = principal_cents
+
+    for i in range(n):
+        balance -= principals[i]
+        schedule.append({
+            'number': i + 1,
+            'due_date': (start + relativedelta(months=i)).strftime('%Y-%m-%d'),
+            'value': (principals[i] + interests[i]) / 100,
+            'principal': principals[i] / 100,
+            'interest': interests[i] / 100,
+            'balance': balance / 100
+        })
+
+    return schedule
+
+
+def schedule_total(schedule: Sequence[Dict]) -> float:
+    """Soma exata (em centavos) dos valores de um cronograma"""
+    return sum(_to_cents(item['value']) for item in schedule) / 100
+
+
+def schedule_rows(
+    installment_id: str,
+    installment_data: Dict,
+    schedule: Sequence[Dict],
+    created_at: Optional[str] = None
+) -> Tuple[List[str], List[Tuple]]:
+    """
+    Converte um cronograma em linhas prontas para executemany
+
+    Returns:
+        tuple: (ids das transações, lista de tuplas de parâmetros)
+    """
+    created_at = created_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    count = len(schedule)
+    ids = []
+    rows = []
+
+    for item in schedule:
+        transaction_id = str(uuid.uuid4())
+        ids.append(transaction_id)
+        rows.append((
+            transaction_id,
+            installment_data['user_id'],
+            installment_data['tenant_id'],
+            installment_data.get('account_id'),
+            installment_data.get('card_id'),
+            installment_data.get('category_id'),
+            'Despesa',
+            f"{installment_data['description']} ({item['number']}/{count})",
+            item['value'],
+            item['due_date'],
+            item['due_date'],
+            'Pendente',
+            installment_id,
+            item['number'],
+            created_at
+        ))
+
+    return ids, rows
+
+
+INSERT_INSTALLMENT_TRANSACTION_SQL = """
+    INSERT INTO transactions (
+        id, user_id, tenant_id, account_id, card_id, category_id,
+        type, description, value, date, due_date, status,
+        installment_id, installment_number, created_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def write_schedules(db, plans: Iterable[Tuple[str, Dict, Sequence[Dict]]]) -> Dict[str, List[str]]:
+    """
+    Grava as parcelas de um ou mais parcelamentos com um único executemany
+
+    Cada parcela no cartão entra na fatura do seu ciclo pelos triggers do
+    ledger de faturas (services/card_ledger). Não faz commit.
+
+    Args:
+        db: Conexão SQLite
+        plans: Iterável de (installment_id, installment_data, schedule)
+
+    Returns:
+        dict: installment_id -> lista de ids das transações criadas
+    """
+    created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    all_rows = []
+    ids_by_installment = {}
+
+    for installment_id, installment_data, schedule in plans:
+        ids, rows = schedule_rows(installment_id, installment_data, schedule, created_at)
+        ids_by_installment[installment_id] = ids
+        all_rows.extend(rows)
+
+    db.executemany(INSERT_INSTALLMENT_TRANSACTION_SQL, all_rows)
+    return ids_by_installment
+
+
+def _pending_summary(db, installment_id: str) -> Tuple[int, float]:
+    """Conta e soma as parcelas pendentes em uma única agregação"""
+    row = db.execute("""
+        SELECT COUNT(*), COALESCE(SUM(value), 0)
+        FROM transactions
+        WHERE installment_id = ? AND status = 'Pendente'
+    """, (installment_id,)).fetchone()
+    return row[0], round(row[1], 2)
+
+
+def pay_pending(db, installment_id: str, paid_at: Optional[str] = None) -> Tuple[int, float]:
+    """
+    Marca todas as parcelas pendentes como pagas com um único UPDATE
+
+    O débito do total pago na conta fica com o chamador (adjust_balance da
+    unidade de trabalho). Não faz commit.
+
+    Returns:
+        tuple: (quantidade de parcelas pagas, total pago)
+    """
+    count, total = _pending_summary(db, installment_id)
+    if count == 0:
+        return 0, 0.0
+
+    paid_at = paid_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    db.execute("""
+        UPDATE transactions
+        SET status = 'Pago', paid_at = ?
+        WHERE installment_id = ? AND status = 'Pendente'
+    """, (paid_at, installment_id))
+
+    return count, total
+
+
+def cancel_pending(db, installment_id: str) -> Tuple[int, float]:
+    """
+    Remove todas as parcelas pendentes com um único DELETE
+
+    As faturas do cartão são ajustadas pelos triggers do ledger
+    (services/card_ledger). Não faz commit.
+
+    Returns:
+        tuple: (quantidade de parcelas removidas, total devolvido)
+    """
+    count, total = _pending_summary(db, installment_id)
+
+    cursor = db.execute("""
+        DELETE FROM transactions
+        WHERE installment_id = ? AND status = 'Pendente'
+    """, (installment_id,))
+
+    return cursor.rowcount, total
@@ -12,6 +12,8 @@ from datetime import datetime
 from typing import Dict, Optional, List
 import os
 
+from services.event_stream import event_stream, quote_event, portfolio_event
+
 # ===============================================
 # CONFIGURAÇÃO DE LOGS
 # ===============================================
@@ -250,11 +252,12 @@ def update_all_investments() -> Dict[str, int]:
         'failed': 0,
         'skipped': 0
     }
+    events = []
     
     try:
         # Buscar todos os investimentos ativos
         investments = cursor.execute("""
-            SELECT id, name, investment_type, amount, current_value
+            SELECT id, user_id, tenant_id, name, investment_type, amount, current_value
             FROM investments
             WHERE investment_status = 'active' OR investment_status IS NULL
         """).fetchall()
@@ -307,11 +310,20 @@ def update_all_investments() -> Dict[str, int]:
                 """, (result['current_value'], inv_id))
                 
                 stats['success'] += 1
+                events.append(quote_event(
+                    investment['user_id'], investment['tenant_id'], inv_id, inv_name,
+                    result.get('current_price'), None, initial_amount, result['current_value']
+                ))
             else:
                 stats['failed'] += 1
         
         conn.commit()
         
+        # Enviar os novos valores (e totais por carteira) às páginas abertas via SSE
+        owners = {(e[0], e[1]) for e in events}
+        events.extend(portfolio_event(conn, user_id, tenant_id) for user_id, tenant_id in owners)
+        event_stream.publish_many(events)
+        
         logger.info("=" * 60)
         logger.info(f"✅ Atualização concluída!")
         logger.info(f"   Total: {stats['total']} | Sucesso: {stats['success']} | Falhas: {stats['failed']}")
@@ -0,0 +1,449 @@
+"""
+Job Runner - Agendamento seguro com vários workers (gunicorn)
+
+Cada processo registra seus jobs, mas só o líder os executa. A liderança é
+um lease na tabela scheduler_leases: o líder o renova a cada tick e, se o
+processo morrer, outro worker assume quando o lease expirar.
+
+Recursos:
+- Job store persistente (scheduled_jobs): próxima execução sobrevive a
+  reinícios, e execuções perdidas dentro da janela de tolerância são
+  recuperadas (uma vez, não uma por horário perdido)
+- Cada execução é reivindicada com compare-and-set em next_run_at, então nem
+  uma troca de líder no meio de um tick duplica um job
+- Histórico (job_runs) com status, erro e duração
+- Limite de execuções simultâneas por job (max_instances)
+
+Os horários usam o CronTrigger do APScheduler, só para calcular a próxima
+execução.
+"""
+
+import os
+import uuid
+import socket
+import atexit
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from apscheduler.triggers.cron import CronTrigger
+
+logger = logging.getLogger('job_runner')
+
+LEASE_NAME = 'scheduler'
+TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+HISTORY_PER_JOB = 200
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _ts(value: datetime) -> str:
+    """Datetime (com fuso) -> texto UTC comparável lexicograficamente"""
+    return value.astimezone(timezone.utc).strftime(TS_FORMAT)
+
+
+def _parse_ts(value: str) -> datetime:
+    return datetime.strptime(value, TS_FORMAT).replace(tzinfo=timezone.utc)
+
+
+class JobRunner:
+    """Executor de jobs com eleição de líder via lease no SQLite"""
+
+    def __init__(
+        self,
+        db_path: str = 'bws_finance.db',
+        lease_seconds: int = None,
+        tick_seconds: int = None,
+        max_workers: int = None
+    ):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds or int(os.getenv('JOB_LEASE_SECONDS', 60))
+        self.tick_seconds = tick_seconds or int(os.getenv('JOB_RUNNER_TICK_SECONDS', 15))
+        self.max_workers = max_workers or int(os.getenv('JOB_RUNNER_WORKERS', 4))
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self.jobs: Dict[str, Dict] = {}
+        self.is_leader = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self._ensure_tables()
+
+    # =====================================================
+    # BANCO
+    # =====================================================
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_tables(self):
+        conn = self._connect()
+        try:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS scheduler_leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT,
+                    acquired_at DATETIME,
+                    expires_at DATETIME
+                );
+
+                CREATE TABLE IF NOT EXISTS scheduled_jobs (
+                    id TEXT PRIMARY KEY,
+                    name TEXT,
+                    schedule TEXT,
+                    next_run_at DATETIME,
+                    last_run_at DATETIME,
+                    max_instances INTEGER DEFAULT 1,
+                    misfire_grace_seconds INTEGER,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                );
+
+                CREATE TABLE IF NOT EXISTS job_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    holder TEXT,
+                    trigger TEXT,
+                    scheduled_for DATETIME,
+                    started_at DATETIME,
+                    finished_at DATETIME,
+                    duration_ms REAL,
+                    status TEXT CHECK(status IN ('running', 'success', 'error', 'missed')),
+                    error TEXT
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_job_runs_job ON job_runs(job_id, id);
+                CREATE INDEX IF NOT EXISTS idx_job_runs_running ON job_runs(job_id, status, started_at);
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    # =====================================================
+    # REGISTRO
+    # =====================================================
+
+    def register(
+        self,
+        job_id: str,
+        func: Callable,
+        trigger: CronTrigger,
+        name: str = None,
+        max_instances: int = 1,
+        misfire_grace_seconds: int = 6 * 3600,
+        max_runtime_seconds: int = 3600
+    ):
+        """
+        Registra (ou atualiza) um job neste processo e no job store
+
+        Args:
+            trigger: CronTrigger com o horário do job
+            max_instances: execuções simultâneas permitidas (em todo o cluster)
+            misfire_grace_seconds: atraso máximo para recuperar uma execução perdida
+            max_runtime_seconds: após esse tempo uma execução 'running' é
+                considerada abandonada (processo morto) e não conta no limite
+        """
+        schedule = str(trigger)
+        with self._lock:
+            self.jobs[job_id] = {
+                'id': job_id,
+                'func': func,
+                'trigger': trigger,
+                'name': name or job_id,
+                'max_instances': max_instances,
+                'misfire_grace_seconds': misfire_grace_seconds,
+                'max_runtime_seconds': max_runtime_seconds
+            }
+
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT schedule, next_run_at FROM scheduled_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+
+            if row is None or row['schedule'] != schedule or not row['next_run_at']:
+                # Job novo ou horário alterado: agenda a partir de agora
+                next_run = trigger.get_next_fire_time(None, _utcnow())
+                conn.execute("""
+                    INSERT INTO scheduled_jobs (id, name, schedule, next_run_at, max_instances, misfire_grace_seconds)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        name = excluded.name,
+                        schedule = excluded.schedule,
+                        next_run_at = excluded.next_run_at,
+                        max_instances = excluded.max_instances,
+                        misfire_grace_seconds = excluded.misfire_grace_seconds,
+                        updated_at = CURRENT_TIMESTAMP
+                """, (job_id, name or job_id, schedule, _ts(next_run) if next_run else None,
+                      max_instances, misfire_grace_seconds))
+            else:
+                conn.execute("""
+                    UPDATE scheduled_jobs
+                    SET name = ?, max_instances = ?, misfire_grace_seconds = ?
+                    WHERE id = ?
+                """, (name or job_id, max_instances, misfire_grace_seconds, job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    # =====================================================
+    # LIDERANÇA
+    # =====================================================
+
+    def unregister(self, job_id: str):
+        """Remove o job deste processo (o job store continua com ele para os demais)"""
+        with self._lock:
+            self.jobs.pop(job_id, None)
+
+    def try_acquire_lease(self, now: datetime = None) -> bool:
+        """Adquire ou renova o lease; retorna True se este processo é o líder"""
+        now = now or _utcnow()
+        expires = now + timedelta(seconds=self.lease_seconds)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR IGNORE INTO scheduler_leases (name, holder, acquired_at, expires_at) VALUES (?, NULL, NULL, ?)",
+                (LEASE_NAME, _ts(now))
+            )
+            cursor = conn.execute("""
+                UPDATE scheduler_leases
+                SET holder = ?,
+                    acquired_at = CASE WHEN holder = ? THEN acquired_at ELSE ? END,
+                    expires_at = ?
+                WHERE name = ? AND (holder = ? OR holder IS NULL OR expires_at <= ?)
+            """, (self.holder, self.holder, _ts(now), _ts(expires), LEASE_NAME, self.holder, _ts(now)))
+            conn.commit()
+            leader = cursor.rowcount == 1
+        finally:
+            conn.close()
+
+        if leader != self.is_leader:
+            logger.info(f"[OK] Job runner {self.holder}: {'assumiu a liderança' if leader else 'deixou de ser líder'}")
+        self.is_leader = leader
+        return leader
+
+    def release_lease(self):
+        """Libera o lease (parada limpa) para outro worker assumir já no próximo tick"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE scheduler_leases SET holder = NULL, expires_at = ? WHERE name = ? AND holder = ?",
+                (_ts(_utcnow()), LEASE_NAME, self.holder)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        self.is_leader = False
+
+    # =====================================================
+    # EXECUÇÃO
+    # =====================================================
+
+    def _running_count(self, conn, job: Dict, now: datetime) -> int:
+        """Execuções em andamento no cluster (ignora registros abandonados)"""
+        stale_before = now - timedelta(seconds=job['max_runtime_seconds'])
+        return conn.execute("""
+            SELECT COUNT(*) FROM job_runs
+            WHERE job_id = ? AND status = 'running' AND started_at > ?
+        """, (job['id'], _ts(stale_before))).fetchone()[0]
+
+    def _claim_due(self, now: datetime) -> List[tuple]:
+        """Reivindica os jobs vencidos (compare-and-set em next_run_at)"""
+        claimed = []
+        conn = self._connect()
+        try:
+            due = conn.execute(
+                "SELECT id, next_run_at FROM scheduled_jobs WHERE next_run_at <= ? ORDER BY next_run_at",
+                (_ts(now),)
+            ).fetchall()
+
+            for row in due:
+                job = self.jobs.get(row['id'])
+                if job is None:
+                    continue  # registrado em outro processo
+
+                scheduled_for = row['next_run_at']
+                # +1s: um disparo exatamente em 'now' não pode ser reagendado para 'now'
+                next_run = job['trigger'].get_next_fire_time(None, now + timedelta(seconds=1))
+                cursor = conn.execute("""
+                    UPDATE scheduled_jobs SET next_run_at = ?
+                    WHERE id = ? AND next_run_at = ?
+                """, (_ts(next_run) if next_run else None, job['id'], scheduled_for))
+                conn.commit()
+                if cursor.rowcount != 1:
+                    continue  # outro líder já reivindicou
+
+                late = (now - _parse_ts(scheduled_for)).total_seconds()
+                if late > job['misfire_grace_seconds']:
+                    self._record_skip(conn, job['id'], scheduled_for, f"perdido ({int(late)}s de atraso)")
+                    logger.warning(f"[ERRO] Job {job['id']} perdido: {int(late)}s além do horário")
+                    continue
+
+                if self._running_count(conn, job, now) >= job['max_instances']:
+                    self._record_skip(conn, job['id'], scheduled_for, 'limite de execuções simultâneas')
+                    logger.warning(f"[ERRO] Job {job['id']} ignorado: já em execução")
+                    continue
+
+                claimed.append((job, scheduled_for, 'catch-up' if late > self.tick_seconds * 2 else 'schedule'))
+        finally:
+            conn.close()
+        return claimed
+
+    def _record_skip(self, conn, job_id: str, scheduled_for: str, reason: str):
+        now = _ts(_utcnow())
+        conn.execute("""
+            INSERT INTO job_runs (job_id, holder, trigger, scheduled_for, started_at, finished_at, duration_ms, status, error)
+            VALUES (?, ?, 'schedule', ?, ?, ?, 0, 'missed', ?)
+        """, (job_id, self.holder, scheduled_for, now, now, reason))
+        conn.commit()
+
+    def _execute(self, job: Dict, trigger: str, scheduled_for: Optional[str] = None) -> Any:
+        """Executa o job gravando início, fim, duração e erro no histórico"""
+        started = _utcnow()
+        conn = self._connect()
+        try:
+            run_id = conn.execute("""
+                INSERT INTO job_runs (job_id, holder, trigger, scheduled_for, started_at, status)
+                VALUES (?, ?, ?, ?, ?, 'running')
+            """, (job['id'], self.holder, trigger, scheduled_for, _ts(started))).lastrowid
+            conn.execute("UPDATE scheduled_jobs SET last_run_at = ? WHERE id = ?", (_ts(started), job['id']))
+            conn.commit()
+        finally:
+            conn.close()
+
+        status, error, result = 'success', None, None
+        try:
+            result = job['func']()
+            return result
+        except Exception as e:
+            status, error = 'error', str(e)[:1000]
+            logger.error(f"[ERRO] Job {job['id']} falhou: {e}")
+            if trigger == 'manual':
+                raise
+        finally:
+            duration_ms = (_utcnow() - started).total_seconds() * 1000
+            conn = self._connect()
+            try:
+                conn.execute("""
+                    UPDATE job_runs SET finished_at = ?, duration_ms = ?, status = ?, error = ?
+                    WHERE id = ?
+                """, (_ts(_utcnow()), round(duration_ms, 1), status, error, run_id))
+                conn.execute("""
+                    DELETE FROM job_runs
+                    WHERE job_id = ? AND id <= (
+                        SELECT id FROM job_runs WHERE job_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+                    )
+                """, (job['id'], job['id'], HISTORY_PER_JOB))
+                conn.commit()
+            finally:
+                conn.close()
+
+            if status == 'success':
+                logger.info(f"[OK] Job {job['id']} concluído em {duration_ms:.0f}ms ({trigger})")
+
+    def tick(self, now: datetime = None) -> int:
+        """Um ciclo: renova o lease e, se líder, dispara os jobs vencidos"""
+        now = now or _utcnow()
+        if not self.try_acquire_lease(now):
+            return 0
+
+        claimed = self._claim_due(now)
+        for job, scheduled_for, trigger in claimed:
+            if self._executor is not None:
+                self._executor.submit(self._execute, job, trigger, scheduled_for)
+            else:
+                self._execute(job, trigger, scheduled_for)
+        return len(claimed)
+
+    def run_now(self, job_id: str) -> Any:
+        """Executa um job registrado imediatamente, no processo atual (manual)"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Job '{job_id}' não registrado")
+        return self._execute(job, 'manual')
+
+    # =====================================================
+    # CICLO DE VIDA
+    # =====================================================
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"[ERRO] Tick do job runner falhou: {e}")
+            self._stop.wait(self.tick_seconds)
+
+    def start(self):
+        """Inicia o loop em background (idempotente)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+            self._thread = threading.Thread(target=self._loop, name='job-runner', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+        logger.info(f"[OK] Job runner iniciado ({self.holder}, {len(self.jobs)} jobs)")
+
+    def stop(self):
+        """Para o loop e libera o lease"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self.is_leader:
+            self.release_lease()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # =====================================================
+    # CONSULTA
+    # =====================================================
+
+    def get_status(self, history: int = 10) -> Dict:
+        """Jobs, próximas execuções, líder atual e histórico recente"""
+        conn = self._connect()
+        try:
+            lease = conn.execute(
+                "SELECT holder, acquired_at, expires_at FROM scheduler_leases WHERE name = ?", (LEASE_NAME,)
+            ).fetchone()
+            jobs = []
+            for row in conn.execute("SELECT * FROM scheduled_jobs ORDER BY next_run_at").fetchall():
+                runs = conn.execute("""
+                    SELECT trigger, scheduled_for, started_at, finished_at, duration_ms, status, error, holder
+                    FROM job_runs WHERE job_id = ? ORDER BY id DESC LIMIT ?
+                """, (row['id'], history)).fetchall()
+                jobs.append({
+                    **dict(row),
+                    'registered_here': row['id'] in self.jobs,
+                    'runs': [dict(r) for r in runs]
+                })
+            return {
+                'holder': self.holder,
+                'is_leader': self.is_leader,
+                'leader': dict(lease) if lease else None,
+                'jobs': jobs
+            }
+        finally:
+            conn.close()
+
+
+# =========================================
+# INSTÂNCIA GLOBAL
+# =========================================
+
+job_runner = JobRunner()
@@ -0,0 +1,348 @@
+"""
+Ledger Export - Exportação de transações em streaming (CSV, OFX, NDJSON)
+
+As linhas saem de um cursor SQLite lido em lotes (fetchmany) e são
+serializadas por geradores, então a memória usada é constante: uma
+exportação de 1 milhão de linhas nunca vira uma lista em Python.
+
+Opcionalmente a saída é comprimida em gzip à medida que é gerada.
+"""
+
+import io
+import csv
+import json
+import zlib
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+
+from services import metrics
+from services.transaction_queries import build_where
+
+logger = logging.getLogger('ledger_export')
+
+EXPORT_FORMATS = {
+    'csv': {'mimetype': 'text/csv; charset=utf-8', 'extension': 'csv'},
+    'ofx': {'mimetype': 'application/x-ofx', 'extension': 'ofx'},
+    'ndjson': {'mimetype': 'application/x-ndjson', 'extension': 'ndjson'},
+}
+
+FETCH_BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+
+CSV_COLUMNS = [
+    'data', 'descricao', 'valor', 'tipo', 'categoria', 'conta',
+    'cartao', 'status', 'vencimento', 'pago_em', 'id'
+]
+
+EXPORT_SQL = """
+    SELECT
+        t.id,
+        t.user_id,
+        t.date,
+        t.description,
+        t.value,
+        t.type,
+        t.status,
+        t.due_date,
+        t.paid_at,
+        t.notes,
+        t.account_id,
+        t.card_id,
+        t.created_at,
+        c.name as category_name,
+        a.name as account_name,
+        a.bank as account_bank,
+        cards.name as card_name,
+        u.email as user_email
+    FROM transactions t
+    LEFT JOIN categories c ON t.category_id = c.id
+    LEFT JOIN accounts a ON t.account_id = a.id
+    LEFT JOIN cards ON t.card_id = cards.id
+    LEFT JOIN users u ON t.user_id = u.id
+    WHERE {where}
+    ORDER BY {order}
+"""
+
+
+# =========================================
+# LEITURA
+# =========================================
+
+def iter_rows(db_path: str, user_id: Optional[str], tenant_id: str, filters: Dict = None,
+              order: str = 't.date, t.created_at, t.id') -> Iterator[sqlite3.Row]:
+    """
+    Percorre as transações dos filtros ativos sem materializar o resultado
+
+    A conexão é aberta e fechada pelo próprio gerador, então ela vive
+    exatamente enquanto a resposta estiver sendo transmitida (inclusive se o
+    cliente desconectar no meio).
+    """
+    where, params = build_where(user_id, tenant_id, filters or {})
+    conn = metrics.connect(db_path, timeout=30.0)
+    conn.row_factory = sqlite3.Row
+    count = 0
+    try:
+        cursor = conn.execute(EXPORT_SQL.format(where=where, order=order), params)
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+            count += len(rows)
+    finally:
+        conn.close()
+        logger.info(f"[OK] Exportação: {count} transações lidas (tenant {tenant_id})")
+
+
+def _signed_value(row) -> float:
+    """Despesas saem negativas, como nos extratos bancários"""
+    value = float(row['value'] or 0)
+    return -abs(value) if row['type'] == 'Despesa' else abs(value)
+
+
+# =========================================
+# SERIALIZADORES
+# =========================================
+
+def _buffered(parts: Iterable[str]) -> Iterator[str]:
+    """Agrupa pedaços pequenos em blocos de ~CHUNK_SIZE caracteres"""
+    buffer = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+# Início de célula que Excel/Sheets interpretam como fórmula
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_text(value) -> str:
+    """Texto livre (importações, WhatsApp) sem virar fórmula na planilha"""
+    text = str(value or '')
+    return "'" + text if text.startswith(_FORMULA_PREFIXES) else text
+
+
+def generate_csv(rows: Iterable, include_user: bool = False) -> Iterator[str]:
+    """CSV com ';' e vírgula decimal (abre direto no Excel em pt-BR)"""
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=';', lineterminator='\r\n')
+
+    def take():
+        value = out.getvalue()
+        out.seek(0)
+        out.truncate()
+        return value
+
+    header = CSV_COLUMNS + (['usuario'] if include_user else [])
+    yield '\ufeff'  # BOM: acentos corretos no Excel
+    writer.writerow(header)
+    yield take()
+
+    for row in rows:
+        line = [
+            row['date'],
+            _csv_text(row['description']),
+            f"{_signed_value(row):.2f}".replace('.', ','),
+            _csv_text(row['type']),
+            _csv_text(row['category_name']),
+            _csv_text(row['account_name']),
+            _csv_text(row['card_name']),
+            _csv_text(row['status']),
+            row['due_date'] or '',
+            row['paid_at'] or '',
+            row['id'],
+        ]
+        if include_user:
+            line.append(_csv_text(row['user_email'] or row['user_id']))
+        writer.writerow(line)
+        yield take()
+
+
+def generate_ndjson(rows: Iterable, include_user: bool = False) -> Iterator[str]:
+    """Um objeto JSON por linha"""
+    for row in rows:
+        item = {
+            'id': row['id'],
+            'date': row['date'],
+            'description': row['description'],
+            'value': float(row['value'] or 0),
+            'type': row['type'],
+            'status': row['status'],
+            'category': row['category_name'],
+            'account_id': row['account_id'],
+            'account': row['account_name'],
+            'card_id': row['card_id'],
+            'card': row['card_name'],
+            'due_date': row['due_date'],
+            'paid_at': row['paid_at'],
+            'notes': row['notes'],
+            'created_at': row['created_at'],
+        }
+        if include_user:
+            item['user_id'] = row['user_id']
+            item['user_email'] = row['user_email']
+        yield json.dumps(item, ensure_ascii=False) + '\n'
+
+
+def _ofx_text(value) -> str:
+    return (str(value or '')
+            .replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;'))
+
+
+def _ofx_date(value) -> str:
+    """'2025-01-31' ou '2025-01-31 10:00:00' -> '20250131' / '20250131100000'"""
+    digits = ''.join(ch for ch in str(value or '') if ch.isdigit())
+    return digits[:14] or datetime.now().strftime('%Y%m%d')
+
+
+# Ordem do OFX: contas bancárias, depois cartões (cada um vira um extrato)
+OFX_ORDER = """
+    CASE WHEN t.card_id IS NULL THEN 0 ELSE 1 END,
+    COALESCE(t.card_id, t.account_id), t.date, t.created_at, t.id
+"""
+
+
+def generate_ofx(rows: Iterable, include_user: bool = False) -> Iterator[str]:
+    """
+    OFX 1.02 com tags fechadas (lido também pelo nosso BankStatementImporter)
+
+    As linhas devem vir na ordem de OFX_ORDER: cada conta vira um STMTRS em
+    BANKMSGSRSV1 e cada cartão um CCSTMTRS em CREDITCARDMSGSRSV1. Linhas
+    sem conta nem cartão não têm extrato onde entrar e ficam de fora.
+    """
+    now = datetime.now().strftime('%Y%m%d%H%M%S')
+    yield (
+        'OFXHEADER:100\r\nDATA:OFXSGML\r\nVERSION:102\r\nSECURITY:NONE\r\n'
+        'ENCODING:UTF-8\r\nCHARSET:NONE\r\nCOMPRESSION:NONE\r\nOLDFILEUID:NONE\r\n'
+        'NEWFILEUID:NONE\r\n\r\n'
+        '<OFX>\n<SIGNONMSGSRSV1><SONRS><STATUS><CODE>0</CODE><SEVERITY>INFO</SEVERITY></STATUS>'
+        f'<DTSERVER>{now}</DTSERVER><LANGUAGE>POR</LANGUAGE></SONRS></SIGNONMSGSRSV1>\n'
+        '<BANKMSGSRSV1>\n'
+    )
+
+    current = None  # ('bank' | 'card', id) do extrato aberto
+    skipped = 0
+    for row in rows:
+        if row['card_id']:
+            statement = ('card', row['card_id'])
+        elif row['account_id']:
+            statement = ('bank', row['account_id'])
+        else:
+            skipped += 1
+            continue
+
+        if statement != current:
+            if current is not None:
+                yield ('</BANKTRANLIST></STMTRS></STMTTRNRS>\n' if current[0] == 'bank'
+                       else '</BANKTRANLIST></CCSTMTRS></CCSTMTTRNRS>\n')
+            if statement[0] == 'card' and (current is None or current[0] == 'bank'):
+                yield '</BANKMSGSRSV1>\n<CREDITCARDMSGSRSV1>\n'
+            current = statement
+            if statement[0] == 'bank':
+                yield (
+                    '<STMTTRNRS><TRNUID>0</TRNUID><STATUS><CODE>0</CODE><SEVERITY>INFO</SEVERITY></STATUS>'
+                    '<STMTRS><CURDEF>BRL</CURDEF>'
+                    f'<BANKACCTFROM><BANKID>{_ofx_text(row["account_bank"])}</BANKID>'
+                    f'<ACCTID>{_ofx_text(statement[1])}</ACCTID><ACCTTYPE>CHECKING</ACCTTYPE></BANKACCTFROM>\n'
+                    '<BANKTRANLIST>\n'
+                )
+            else:
+                yield (
+                    '<CCSTMTTRNRS><TRNUID>0</TRNUID><STATUS><CODE>0</CODE><SEVERITY>INFO</SEVERITY></STATUS>'
+                    '<CCSTMTRS><CURDEF>BRL</CURDEF>'
+                    f'<CCACCTFROM><ACCTID>{_ofx_text(statement[1])}</ACCTID></CCACCTFROM>\n'
+                    '<BANKTRANLIST>\n'
+                )
+
+        amount = _signed_value(row)
+        yield (
+            '<STMTTRN>'
+            f'<TRNTYPE>{"CREDIT" if amount >= 0 else "DEBIT"}</TRNTYPE>'
+            f'<DTPOSTED>{_ofx_date(row["date"])}</DTPOSTED>'
+            f'<TRNAMT>{amount:.2f}</TRNAMT>'
+            f'<FITID>{_ofx_text(row["id"])}</FITID>'
+            f'<NAME>{_ofx_text(row["category_name"] or row["type"])[:32]}</NAME>'
+            f'<MEMO>{_ofx_text(row["description"])}</MEMO>'
+            '</STMTTRN>\n'
+        )
+
+    if current is None or current[0] == 'bank':
+        if current is not None:
+            yield '</BANKTRANLIST></STMTRS></STMTTRNRS>\n'
+        yield '</BANKMSGSRSV1>\n</OFX>\n'
+    else:
+        yield '</BANKTRANLIST></CCSTMTRS></CCSTMTTRNRS>\n</CREDITCARDMSGSRSV1>\n</OFX>\n'
+    if skipped:
+        logger.info(f"[OK] OFX: {skipped} transações sem conta nem cartão ficaram de fora")
+
+
+GENERATORS = {
+    'csv': generate_csv,
+    'ofx': generate_ofx,
+    'ndjson': generate_ndjson,
+}
+
+
+# =========================================
+# COMPRESSÃO
+# =========================================
+
+def gzip_stream(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    """Comprime em gzip à medida que os blocos chegam"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def encode_stream(chunks: Iterable[str]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield chunk.encode('utf-8')
+
+
+# =========================================
+# API PÚBLICA
+# =========================================
+
+def export_transactions(
+    db_path: str,
+    tenant_id: str,
+    user_id: Optional[str] = None,
+    filters: Dict = None,
+    fmt: str = 'csv',
+    compress: bool = False
+) -> Iterator[bytes]:
+    """
+    Gerador de bytes com a exportação completa
+
+    Args:
+        user_id: None exporta o tenant inteiro (somente admin)
+        fmt: 'csv', 'ofx' ou 'ndjson'
+        compress: comprime a saída em gzip
+    """
+    if fmt not in GENERATORS:
+        raise ValueError(f"Formato inválido: {fmt}")
+
+    # OFX agrupa por conta/cartão (um extrato por conta ou cartão)
+    order = OFX_ORDER if fmt == 'ofx' else 't.date, t.created_at, t.id'
+    rows = iter_rows(db_path, user_id, tenant_id, filters, order)
+    chunks = _buffered(GENERATORS[fmt](rows, include_user=user_id is None))
+
+    return gzip_stream(chunks) if compress else encode_stream(chunks)
+
+
+def export_filename(fmt: str, compress: bool = False) -> str:
+    name = f"transacoes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{EXPORT_FORMATS[fmt]['extension']}"
+    return name + '.gz' if compress else name
@@ -0,0 +1,459 @@
+"""
+Metrics - Instrumentação de desempenho por requisição
+
+- http_request_duration_seconds{method, route, status}: latência por rota
+  (regra do Flask, não a URL, para não explodir a cardinalidade)
+- db_query_duration_seconds{route} e db_statements_total{route}: cada
+  execute das conexões de get_db() é cronometrado; o trace callback do
+  sqlite3 conta todas as instruções executadas, inclusive as de
+  executescript e de triggers
+- slow query log (logs/slow_queries.log) com SQL normalizado acima de
+  SLOW_QUERY_MS
+- http_client_duration_seconds{provider, outcome}: chamadas externas
+  (conectores de cotação, servidor WhatsApp, SMTP)
+
+Cada worker do gunicorn grava um snapshot em METRICS_DIR; /metrics soma
+os snapshots de todos os workers no formato texto do Prometheus.
+
+Server-Timing: com SERVER_TIMING_ENABLED=true, a requisição que enviar
+o header X-Server-Timing: 1 recebe app/db/http no header Server-Timing.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import sqlite3
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger('metrics')
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'false').lower() == 'true'
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join('logs', 'metrics'))
+SNAPSHOT_INTERVAL_SECONDS = float(os.getenv('METRICS_SNAPSHOT_SECONDS', 10))
+STALE_SNAPSHOT_SECONDS = float(os.getenv('METRICS_STALE_SECONDS', 3600))
+
+
+# =========================================
+# REGISTRO
+# =========================================
+
+class MetricsRegistry:
+    """Contadores e histogramas com labels, em memória do processo"""
+
+    def __init__(self):
+        self.help: Dict[str, Tuple[str, str]] = {}   # nome -> (tipo, descrição)
+        self.buckets: Dict[str, Tuple[float, ...]] = {}
+        self.counters: Dict[str, Dict[Tuple, float]] = {}
+        self.histograms: Dict[str, Dict[Tuple, list]] = {}  # labels -> [contagens por bucket..., soma, total]
+        self.label_names: Dict[str, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str, labels: Tuple[str, ...]):
+        self.help[name] = ('counter', description)
+        self.label_names[name] = labels
+        self.counters[name] = {}
+
+    def histogram(self, name: str, description: str, labels: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.help[name] = ('histogram', description)
+        self.label_names[name] = labels
+        self.buckets[name] = buckets
+        self.histograms[name] = {}
+
+    def inc(self, name: str, labels: Tuple, value: float = 1):
+        with self._lock:
+            series = self.counters[name]
+            series[labels] = series.get(labels, 0) + value
+
+    def observe(self, name: str, labels: Tuple, value: float):
+        buckets = self.buckets[name]
+        with self._lock:
+            series = self.histograms[name].get(labels)
+            if series is None:
+                series = self.histograms[name][labels] = [0] * (len(buckets) + 2)
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self) -> Dict:
+        """Estado serializável (labels como listas) para somar entre workers"""
+        with self._lock:
+            return {
+                'counters': {name: [[list(labels), value] for labels, value in series.items()]
+                             for name, series in self.counters.items()},
+                'histograms': {name: [[list(labels), list(values)] for labels, values in series.items()]
+                               for name, series in self.histograms.items()}
+            }
+
+    def render(self, snapshots) -> str:
+        """Formato texto do Prometheus somando os snapshots"""
+        counters: Dict[str, Dict[Tuple, float]] = {name: {} for name in self.counters}
+        histograms: Dict[str, Dict[Tuple, list]] = {name: {} for name in self.histograms}
+        for snapshot in snapshots:
+            for name, series in snapshot.get('counters', {}).items():
+                if name not in counters:
+                    continue
+                for labels, value in series:
+                    key = tuple(labels)
+                    counters[name][key] = counters[name].get(key, 0) + value
+            for name, series in snapshot.get('histograms', {}).items():
+                if name not in histograms:
+                    continue
+                for labels, values in series:
+                    key = tuple(labels)
+                    current = histograms[name].get(key)
+                    if current is None or len(current) != len(values):
+                        histograms[name][key] = list(values)
+                    else:
+                        histograms[name][key] = [a + b for a, b in zip(current, values)]
+
+        lines = []
+        for name in sorted(self.help):
+            kind, description = self.help[name]
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            label_names = self.label_names[name]
+            if kind == 'counter':
+                for labels, value in sorted(counters[name].items()):
+                    lines.append(f"{name}{_labels(label_names, labels)} {_number(value)}")
+                continue
+
+            buckets = self.buckets[name]
+            for labels, values in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, count in zip(buckets, values):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(label_names + ('le',), labels + (_number(bound),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(label_names + ('le',), labels + ('+Inf',))} {values[-1]}")
+                lines.append(f"{name}_sum{_labels(label_names, labels)} {_number(values[-2])}")
+                lines.append(f"{name}_count{_labels(label_names, labels)} {values[-1]}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) and not float(value).is_integer() else str(int(value))
+
+
+def create_registry() -> MetricsRegistry:
+    registry = MetricsRegistry()
+    registry.histogram('http_request_duration_seconds', 'Latência das requisições HTTP por rota',
+                       ('method', 'route', 'status'), REQUEST_BUCKETS)
+    registry.histogram('db_query_duration_seconds', 'Tempo de execute() das consultas SQLite',
+                       ('route',), QUERY_BUCKETS)
+    registry.counter('db_statements_total', 'Instruções SQLite executadas (trace callback)', ('route',))
+    registry.counter('db_slow_queries_total', 'Consultas acima de SLOW_QUERY_MS', ('route',))
+    registry.histogram('http_client_duration_seconds', 'Chamadas HTTP/SMTP externas por provedor',
+                       ('provider', 'outcome'), REQUEST_BUCKETS)
+    return registry
+
+
+registry = create_registry()
+
+
+# =========================================
+# CONTEXTO DA REQUISIÇÃO
+# =========================================
+
+class RequestStats:
+    """Acumulado da requisição atual (para o Server-Timing)"""
+
+    __slots__ = ('route', 'started', 'db_seconds', 'db_statements', 'http_seconds', 'http_calls')
+
+    def __init__(self, route: str):
+        self.route = route
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.db_statements = 0
+        self.http_seconds = 0.0
+        self.http_calls = 0
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar('request_stats', default=None)
+
+
+def _route() -> str:
+    stats = _current.get()
+    return stats.route if stats else 'background'
+
+
+# =========================================
+# SQLITE
+# =========================================
+
+_slow_logger = logging.getLogger('slow_queries')
+_slow_logger.propagate = False
+_slow_logger_ready = False
+
+
+def _slow_log(message: str):
+    global _slow_logger_ready
+    if not _slow_logger_ready:
+        try:
+            os.makedirs('logs', exist_ok=True)
+            handler = RotatingFileHandler(os.path.join('logs', 'slow_queries.log'),
+                                          maxBytes=5 * 1024 * 1024, backupCount=3, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+            _slow_logger.addHandler(handler)
+        except OSError as e:
+            logger.error(f"[ERRO] Slow query log indisponível: {e}")
+        _slow_logger_ready = True
+    _slow_logger.warning(message)
+
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Remove literais e espaços para agrupar consultas iguais no slow log"""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _IN_LIST.sub('(?...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def record_query(sql: str, seconds: float):
+    route = _route()
+    registry.observe('db_query_duration_seconds', (route,), seconds)
+    stats = _current.get()
+    if stats:
+        stats.db_seconds += seconds
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        registry.inc('db_slow_queries_total', (route,))
+        _slow_log(f"{seconds * 1000:.1f}ms [{route}] {normalize_sql(sql)}")
+
+
+def _on_statement(sql: str):
+    """Trace callback: chamado pelo SQLite para cada instrução executada"""
+    registry.inc('db_statements_total', (_route(),))
+    stats = _current.get()
+    if stats:
+        stats.db_statements += 1
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_query(sql, time.perf_counter() - start)
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            record_query(sql_script, time.perf_counter() - start)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Conexão com tempo por execute e contagem de instruções via trace callback"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_on_statement)
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # Os atalhos da conexão passam pelo cursor instrumentado
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def connect(database: str, **kwargs) -> sqlite3.Connection:
+    """sqlite3.connect com instrumentação (usado pelos get_db())"""
+    return sqlite3.connect(database, factory=InstrumentedConnection, **kwargs)
+
+
+# =========================================
+# HTTP / SMTP EXTERNOS
+# =========================================
+
+def record_outbound(provider: str, outcome: str, seconds: float):
+    registry.observe('http_client_duration_seconds', (provider, outcome), seconds)
+    stats = _current.get()
+    if stats:
+        stats.http_seconds += seconds
+        stats.http_calls += 1
+
+
+@contextmanager
+def track_outbound(provider: str):
+    """with track_outbound('smtp'): ... - cronometra um bloco de chamada externa"""
+    start = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        record_outbound(provider, outcome, time.perf_counter() - start)
+
+
+class TimedSession(requests.Session):
+    """requests.Session que registra a duração de cada chamada por provedor"""
+
+    def __init__(self, provider: str):
+        super().__init__()
+        self.provider = provider
+
+    def request(self, method, url, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.Timeout:
+            record_outbound(self.provider, 'timeout', time.perf_counter() - start)
+            raise
+        except requests.exceptions.RequestException:
+            record_outbound(self.provider, 'error', time.perf_counter() - start)
+            raise
+        record_outbound(self.provider, f"{response.status_code // 100}xx", time.perf_counter() - start)
+        return response
+
+
+# =========================================
+# SNAPSHOTS ENTRE WORKERS
+# =========================================
+
+_last_snapshot = 0.0
+
+
+def write_snapshot(force: bool = False):
+    """Grava o snapshot deste processo (no máximo a cada METRICS_SNAPSHOT_SECONDS)"""
+    global _last_snapshot
+    now = time.monotonic()
+    if not force and now - _last_snapshot < SNAPSHOT_INTERVAL_SECONDS:
+        return
+    _last_snapshot = now
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(registry.snapshot(), f)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.error(f"[ERRO] Falha ao gravar snapshot de métricas: {e}")
+
+
+def collect() -> str:
+    """Métricas de todos os workers (snapshot atual deste + arquivos dos outros)"""
+    snapshots = [registry.snapshot()]
+    own = f"{os.getpid()}.json"
+    try:
+        names = os.listdir(METRICS_DIR)
+    except OSError:
+        names = []
+    for name in names:
+        if not name.endswith('.json') or name == own:
+            continue
+        path = os.path.join(METRICS_DIR, name)
+        try:
+            if time.time() - os.path.getmtime(path) > STALE_SNAPSHOT_SECONDS:
+                os.remove(path)  # worker encerrado
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return registry.render(snapshots)
+
+
+# =========================================
+# FLASK
+# =========================================
+
+def scrape_denied(request) -> Optional[int]:
+    """
+    Regra de acesso do /metrics e das demais métricas internas
+
+    Com METRICS_TOKEN definido exige "Authorization: Bearer <token>"; sem
+    ele, só responde para localhost.
+
+    Returns:
+        None se autorizado, senão o status HTTP da recusa (401/403)
+    """
+    token = os.getenv('METRICS_TOKEN')
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return 401
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        return 403
+    return None
+
+
+def init_app(app):
+    """Registra o middleware de latência por rota e o Server-Timing"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_metrics():
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.request_stats = RequestStats(route)
+        g.request_stats_token = _current.set(g.request_stats)
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        stats = g.get('request_stats')
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.started
+        registry.observe('http_request_duration_seconds',
+                         (request.method, stats.route, str(response.status_code)), elapsed)
+
+        if SERVER_TIMING_ENABLED and request.headers.get('X-Server-Timing') == '1':
+            response.headers['Server-Timing'] = ', '.join([
+                f"app;dur={elapsed * 1000:.1f}",
+                f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_statements} consultas"',
+                f'http;dur={stats.http_seconds * 1000:.1f};desc="{stats.http_calls} chamadas"'
+            ])
+        write_snapshot()
+        return response
+
+    @app.teardown_request
+    def _clear_request_metrics(exc=None):
+        token = g.pop('request_stats_token', None)
+        if token is not None:
+            _current.reset(token)
@@ -6,11 +6,13 @@ Camada de IA para análise financeira e geração de notificações inteligentes
 """
 
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 import logging
 import re
 
+from services.spending_features import extract_many
+
 logger = logging.getLogger('notification_ai')
 
 
@@ -22,71 +24,26 @@ class NotificationAI:
     def __init__(self, db_path: str = 'bws_finance.db'):
         self.db_path = db_path
     
-    def analyze_spending_patterns(self, user_id: str, days: int = 30) -> List[Dict]:
+    def analyze_spending_patterns(self, user_id: str, days: int = 30, today: Optional[date] = None) -> List[Dict]:
         """
         Analisa padrões de gastos e gera insights
         
+        Lê a janela recente do usuário uma única vez (services/spending_features)
+        e deriva todos os insights dos atributos extraídos.
+        
         Args:
             user_id: ID do usuário
             days: Período de análise em dias
+            today: Data de referência (padrão: hoje)
         
         Returns:
             Lista de insights detectados
         """
-        insights = []
         conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
         
         try:
-            # Data inicial
-            start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-            
-            # 1. Detectar gastos duplicados
-            duplicates = cursor.execute("""
-                SELECT 
-                    description, 
-                    value, 
-                    date, 
-                    COUNT(*) as count
-                FROM transactions
-                WHERE user_id = ? 
-                  AND type = 'Despesa'
-                  AND date >= ?
-                  AND status = 'Pago'
-                GROUP BY description, value, date
-                HAVING COUNT(*) > 1
-            """, (user_id, start_date)).fetchall()
-            
-            for dup in duplicates:
-                insights.append({
-                    'type': 'duplicate',
-                    'severity': 'medium',
-                    'title': 'Possível Gasto Duplicado',
-                    'message': f"Detectamos {dup['count']} transações idênticas de R$ {dup['value']:.2f} em '{dup['description']}' no dia {dup['date']}.",
-                    'suggestion': "Verifique se não houve cobrança duplicada.",
-                    'data': dict(dup)
-                })
-            
-            # 2. Comparar gastos com período anterior
-            comparison = self._compare_periods(user_id, days)
-            if comparison:
-                insights.append(comparison)
-            
-            # 3. Detectar categoria com maior crescimento
-            category_growth = self._detect_category_growth(user_id, days)
-            if category_growth:
-                insights.append(category_growth)
-            
-            # 4. Identificar gastos incomuns
-            unusual = self._detect_unusual_expenses(user_id)
-            insights.extend(unusual)
-            
-            # 5. Verificar metas de economia
-            savings_check = self._check_savings_goal(user_id)
-            if savings_check:
-                insights.append(savings_check)
-            
+            features = extract_many(conn, [user_id], today, days)[user_id]
+            insights = self.build_insights(features)
             logger.info(f"[AI] {len(insights)} insights gerados para {user_id}")
             return insights
         
@@ -96,326 +53,210 @@ class NotificationAI:
         finally:
             conn.close()
     
-    def _compare_periods(self, user_id: str, days: int) -> Optional[Dict]:
-        """Compara gastos do período atual com anterior"""
+    def analyze_users(self, user_ids: List[str], days: int = 30,
+                      today: Optional[date] = None) -> Dict[str, List[Dict]]:
+        """
+        Insights de vários usuários em lote (uma consulta por lote de usuários)
+        
+        Returns:
+            dict: user_id -> lista de insights
+        """
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         
         try:
-            # Período atual
-            start_current = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-            current = cursor.execute("""
-                SELECT COALESCE(SUM(value), 0) as total
-                FROM transactions
-                WHERE user_id = ? 
-                  AND type = 'Despesa'
-                  AND date >= ?
-                  AND status = 'Pago'
-            """, (user_id, start_current)).fetchone()
-            
-            # Período anterior
-            start_previous = (datetime.now() - timedelta(days=days*2)).strftime('%Y-%m-%d')
-            end_previous = start_current
-            previous = cursor.execute("""
-                SELECT COALESCE(SUM(value), 0) as total
-                FROM transactions
-                WHERE user_id = ? 
-                  AND type = 'Despesa'
-                  AND date >= ?
-                  AND date < ?
-                  AND status = 'Pago'
-            """, (user_id, start_previous, end_previous)).fetchone()
-            
-            current_total = current[0]
-            previous_total = previous[0]
-            
-            if previous_total > 0:
-                change_pct = ((current_total - previous_total) / previous_total) * 100
-                
-                if abs(change_pct) >= 15:  # Mudança significativa (15%+)
-                    if change_pct > 0:
-                        return {
-                            'type': 'spending_increase',
-                            'severity': 'high' if change_pct > 30 else 'medium',
-                            'title': 'Aumento nos Gastos Detectado',
-                            'message': f"Seus gastos aumentaram {change_pct:.1f}% em relação ao período anterior (R$ {previous_total:.2f} → R$ {current_total:.2f}).",
-                            'suggestion': "Analise suas despesas recentes e identifique onde você pode economizar.",
-                            'data': {
-                                'current': current_total,
-                                'previous': previous_total,
-                                'change_pct': change_pct
-                            }
-                        }
-                    else:
-                        return {
-                            'type': 'spending_decrease',
-                            'severity': 'low',
-                            'title': 'Parabéns! Gastos Reduzidos',
-                            'message': f"Você economizou {abs(change_pct):.1f}% em relação ao período anterior (R$ {previous_total:.2f} → R$ {current_total:.2f}).",
-                            'suggestion': "Continue assim! Mantenha o controle financeiro.",
-                            'data': {
-                                'current': current_total,
-                                'previous': previous_total,
-                                'change_pct': change_pct
-                            }
-                        }
-            
-            return None
+            features = extract_many(conn, user_ids, today, days)
+            insights = {user_id: self.build_insights(user_features) for user_id, user_features in features.items()}
+            logger.info(f"[AI] Insights gerados para {len(insights)} usuários")
+            return insights
         
         except Exception as e:
-            logger.error(f"[ERRO] Falha ao comparar períodos: {e}")
-            return None
+            logger.error(f"[ERRO] Falha na análise em lote: {e}")
+            return {}
         finally:
             conn.close()
     
-    def _detect_category_growth(self, user_id: str, days: int) -> Optional[Dict]:
-        """Detecta categoria com maior crescimento"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+    def build_insights(self, features: Dict) -> List[Dict]:
+        """Monta os insights a partir dos atributos de spending_features.extract"""
+        insights = []
         
-        try:
-            # Gastos por categoria (período atual)
-            start_current = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-            current = cursor.execute("""
-                SELECT 
-                    c.name as category,
-                    COALESCE(SUM(t.value), 0) as total
-                FROM transactions t
-                JOIN categories c ON t.category_id = c.id
-                WHERE t.user_id = ?
-                  AND t.type = 'Despesa'
-                  AND t.date >= ?
-                  AND t.status = 'Pago'
-                GROUP BY c.name
-            """, (user_id, start_current)).fetchall()
-            
-            # Gastos por categoria (período anterior)
-            start_previous = (datetime.now() - timedelta(days=days*2)).strftime('%Y-%m-%d')
-            end_previous = start_current
-            previous = cursor.execute("""
-                SELECT 
-                    c.name as category,
-                    COALESCE(SUM(t.value), 0) as total
-                FROM transactions t
-                JOIN categories c ON t.category_id = c.id
-                WHERE t.user_id = ?
-                  AND t.type = 'Despesa'
-                  AND t.date >= ?
-                  AND t.date < ?
-                  AND t.status = 'Pago'
-                GROUP BY c.name
-            """, (user_id, start_previous, end_previous)).fetchall()
-            
-            # Criar mapas
-            current_map = {row['category']: row['total'] for row in current}
-            previous_map = {row['category']: row['total'] for row in previous}
-            
-            # Encontrar maior crescimento
-            max_growth = None
-            max_growth_pct = 0
-            
-            for category, current_value in current_map.items():
-                previous_value = previous_map.get(category, 0)
-                
-                if previous_value > 0:
-                    growth_pct = ((current_value - previous_value) / previous_value) * 100
-                    
-                    if growth_pct > max_growth_pct and growth_pct >= 30:
-                        max_growth_pct = growth_pct
-                        max_growth = {
-                            'category': category,
-                            'current': current_value,
-                            'previous': previous_value,
-                            'growth': growth_pct
-                        }
-            
-            if max_growth:
-                return {
-                    'type': 'category_growth',
-                    'severity': 'medium',
-                    'title': f"Aumento em {max_growth['category']}",
-                    'message': f"Seus gastos com {max_growth['category']} cresceram {max_growth['growth']:.1f}% (R$ {max_growth['previous']:.2f} → R$ {max_growth['current']:.2f}).",
-                    'suggestion': f"Revise seus gastos em {max_growth['category']} e veja onde pode cortar.",
-                    'data': max_growth
-                }
-            
-            return None
+        # 1. Detectar gastos duplicados
+        for dup in features['duplicates']:
+            insights.append({
+                'type': 'duplicate',
+                'severity': 'medium',
+                'title': 'Possível Gasto Duplicado',
+                'message': f"Detectamos {dup['count']} transações idênticas de R$ {dup['value']:.2f} em '{dup['description']}' no dia {dup['date']}.",
+                'suggestion': "Verifique se não houve cobrança duplicada.",
+                'data': dup
+            })
         
-        except Exception as e:
-            logger.error(f"[ERRO] Falha ao detectar crescimento de categoria: {e}")
-            return None
-        finally:
-            conn.close()
-    
-    def _detect_unusual_expenses(self, user_id: str) -> List[Dict]:
-        """Detecta gastos incomuns (outliers)"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        # 2. Comparar gastos com período anterior
+        comparison = self._compare_periods(features)
+        if comparison:
+            insights.append(comparison)
         
-        insights = []
+        # 3. Detectar categoria com maior crescimento
+        category_growth = self._detect_category_growth(features)
+        if category_growth:
+            insights.append(category_growth)
         
-        try:
-            # Buscar estatísticas dos últimos 90 dias
-            stats = cursor.execute("""
-                SELECT 
-                    AVG(value) as avg_value,
-                    MAX(value) as max_value,
-                    COUNT(*) as count
-                FROM transactions
-                WHERE user_id = ?
-                  AND type = 'Despesa'
-                  AND date >= date('now', '-90 days')
-                  AND status = 'Pago'
-            """, (user_id,)).fetchone()
-            
-            if not stats or stats['count'] < 10:
-                return []  # Poucos dados para análise
-            
-            avg = stats['avg_value']
-            threshold = avg * 3  # 3x a média
-            
-            # Buscar gastos recentes acima do threshold
-            unusual = cursor.execute("""
-                SELECT *
-                FROM transactions
-                WHERE user_id = ?
-                  AND type = 'Despesa'
-                  AND value > ?
-                  AND date >= date('now', '-7 days')
-                  AND status = 'Pago'
-                ORDER BY value DESC
-                LIMIT 3
-            """, (user_id, threshold)).fetchall()
-            
-            for expense in unusual:
-                insights.append({
-                    'type': 'unusual_expense',
-                    'severity': 'high',
-                    'title': 'Gasto Incomum Detectado',
-                    'message': f"Gasto de R$ {expense['value']:.2f} em '{expense['description']}' está muito acima da sua média (R$ {avg:.2f}).",
-                    'suggestion': "Confirme se este gasto estava planejado.",
-                    'data': dict(expense)
-                })
-            
-            return insights
+        # 4. Identificar gastos incomuns
+        insights.extend(self._detect_unusual_expenses(features))
         
-        except Exception as e:
-            logger.error(f"[ERRO] Falha ao detectar gastos incomuns: {e}")
-            return []
-        finally:
-            conn.close()
+        # 5. Verificar metas de economia
+        savings_check = self._check_savings_goal(features)
+        if savings_check:
+            insights.append(savings_check)
+        
+        return insights
     
-    def _check_savings_goal(self, user_id: str) -> Optional[Dict]:
-        """Verifica progresso em relação a meta de economia"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _compare_periods(self, features: Dict) -> Optional[Dict]:
+        """Compara gastos do período atual com anterior"""
+        current_total = features['period']['current']
+        previous_total = features['period']['previous']
         
-        try:
-            # Calcular saldo do mês atual
-            month_start = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-            
-            balance = cursor.execute("""
-                SELECT 
-                    COALESCE(SUM(CASE WHEN type = 'Receita' THEN value ELSE 0 END), 0) as income,
-                    COALESCE(SUM(CASE WHEN type = 'Despesa' THEN value ELSE 0 END), 0) as expenses
-                FROM transactions
-                WHERE user_id = ?
-                  AND date >= ?
-                  AND status = 'Pago'
-            """, (user_id, month_start)).fetchone()
-            
-            income = balance[0]
-            expenses = balance[1]
-            net = income - expenses
-            
-            if income > 0:
-                savings_rate = (net / income) * 100
-                
-                # Meta ideal: economizar 20%+
-                if savings_rate < 10:
+        if previous_total > 0:
+            change_pct = ((current_total - previous_total) / previous_total) * 100
+            
+            if abs(change_pct) >= 15:  # Mudança significativa (15%+)
+                data = {
+                    'current': current_total,
+                    'previous': previous_total,
+                    'change_pct': change_pct
+                }
+                if change_pct > 0:
                     return {
-                        'type': 'low_savings',
-                        'severity': 'high',
-                        'title': 'Taxa de Poupança Baixa',
-                        'message': f"Você está economizando apenas {savings_rate:.1f}% da sua renda este mês (R$ {net:.2f} de R$ {income:.2f}).",
-                        'suggestion': "Tente economizar pelo menos 20% da sua renda. Reduza gastos supérfluos.",
-                        'data': {
-                            'income': income,
-                            'expenses': expenses,
-                            'net': net,
-                            'rate': savings_rate
-                        }
+                        'type': 'spending_increase',
+                        'severity': 'high' if change_pct > 30 else 'medium',
+                        'title': 'Aumento nos Gastos Detectado',
+                        'message': f"Seus gastos aumentaram {change_pct:.1f}% em relação ao período anterior (R$ {previous_total:.2f} → R$ {current_total:.2f}).",
+                        'suggestion': "Analise suas despesas recentes e identifique onde você pode economizar.",
+                        'data': data
                     }
-                elif savings_rate >= 20:
+                else:
                     return {
-                        'type': 'good_savings',
+                        'type': 'spending_decrease',
                         'severity': 'low',
-                        'title': 'Excelente Taxa de Poupança!',
-                        'message': f"Parabéns! Você está economizando {savings_rate:.1f}% da sua renda (R$ {net:.2f} de R$ {income:.2f}).",
-                        'suggestion': "Continue assim! Considere investir esse valor.",
-                        'data': {
-                            'income': income,
-                            'expenses': expenses,
-                            'net': net,
-                            'rate': savings_rate
-                        }
+                        'title': 'Parabéns! Gastos Reduzidos',
+                        'message': f"Você economizou {abs(change_pct):.1f}% em relação ao período anterior (R$ {previous_total:.2f} → R$ {current_total:.2f}).",
+                        'suggestion': "Continue assim! Mantenha o controle financeiro.",
+                        'data': data
                     }
+        
+        return None
+    
+    def _detect_category_growth(self, features: Dict) -> Optional[Dict]:
+        """Detecta categoria com maior crescimento"""
+        current_map = features['categories']['current']
+        previous_map = features['categories']['previous']
+        
+        # Encontrar maior crescimento
+        max_growth = None
+        max_growth_pct = 0
+        
+        for category, current_value in current_map.items():
+            previous_value = previous_map.get(category, 0)
             
-            return None
+            if previous_value > 0:
+                growth_pct = ((current_value - previous_value) / previous_value) * 100
+                
+                if growth_pct > max_growth_pct and growth_pct >= 30:
+                    max_growth_pct = growth_pct
+                    max_growth = {
+                        'category': category,
+                        'current': current_value,
+                        'previous': previous_value,
+                        'growth': growth_pct
+                    }
         
-        except Exception as e:
-            logger.error(f"[ERRO] Falha ao verificar meta de economia: {e}")
+        if max_growth:
+            return {
+                'type': 'category_growth',
+                'severity': 'medium',
+                'title': f"Aumento em {max_growth['category']}",
+                'message': f"Seus gastos com {max_growth['category']} cresceram {max_growth['growth']:.1f}% (R$ {max_growth['previous']:.2f} → R$ {max_growth['current']:.2f}).",
+                'suggestion': f"Revise seus gastos em {max_growth['category']} e veja onde pode cortar.",
+                'data': max_growth
+            }
+        
+        return None
+    
+    def _detect_unusual_expenses(self, features: Dict) -> List[Dict]:
+        """
+        Detecta gastos incomuns (outliers) dos últimos 7 dias
+        
+        Usa escore robusto (mediana/MAD dos gastos de 90 dias): uma única compra
+        grande não infla a referência como acontecia com a regra de 3x a média.
+        """
+        outliers = features['outliers']
+        typical = outliers['median']
+        
+        return [{
+            'type': 'unusual_expense',
+            'severity': 'high',
+            'title': 'Gasto Incomum Detectado',
+            'message': f"Gasto de R$ {expense['value']:.2f} em '{expense['description']}' está muito acima do seu gasto típico (R$ {typical:.2f}).",
+            'suggestion': "Confirme se este gasto estava planejado.",
+            'data': expense
+        } for expense in outliers['items'][:3]]
+    
+    def _check_savings_goal(self, features: Dict) -> Optional[Dict]:
+        """Verifica progresso em relação a meta de economia"""
+        month = features['month']
+        income, expenses, net = month['income'], month['expenses'], month['net']
+        savings_rate = month['savings_rate']
+        
+        if savings_rate is None:
             return None
-        finally:
-            conn.close()
+        
+        data = {
+            'income': income,
+            'expenses': expenses,
+            'net': net,
+            'rate': savings_rate
+        }
+        
+        # Meta ideal: economizar 20%+
+        if savings_rate < 10:
+            return {
+                'type': 'low_savings',
+                'severity': 'high',
+                'title': 'Taxa de Poupança Baixa',
+                'message': f"Você está economizando apenas {savings_rate:.1f}% da sua renda este mês (R$ {net:.2f} de R$ {income:.2f}).",
+                'suggestion': "Tente economizar pelo menos 20% da sua renda. Reduza gastos supérfluos.",
+                'data': data
+            }
+        elif savings_rate >= 20:
+            return {
+                'type': 'good_savings',
+                'severity': 'low',
+                'title': 'Excelente Taxa de Poupança!',
+                'message': f"Parabéns! Você está economizando {savings_rate:.1f}% da sua renda (R$ {net:.2f} de R$ {income:.2f}).",
+                'suggestion': "Continue assim! Considere investir esse valor.",
+                'data': data
+            }
+        
+        return None
     
     def generate_monthly_report(self, user_id: str) -> Dict:
         """
         Gera relatório mensal completo com insights de IA
         
+        Resumo, top categorias e insights saem da mesma leitura das transações;
+        só os investimentos são consultados à parte.
+        
         Returns:
             Dicionário com resumo e insights
         """
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
         
         try:
-            # Período: mês atual
-            month_start = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-            
-            # Resumo financeiro
-            summary = cursor.execute("""
-                SELECT 
-                    COALESCE(SUM(CASE WHEN type = 'Receita' THEN value ELSE 0 END), 0) as income,
-                    COALESCE(SUM(CASE WHEN type = 'Despesa' THEN value ELSE 0 END), 0) as expenses,
-                    COUNT(CASE WHEN type = 'Despesa' THEN 1 END) as expense_count
-                FROM transactions
-                WHERE user_id = ?
-                  AND date >= ?
-                  AND status = 'Pago'
-            """, (user_id, month_start)).fetchone()
-            
-            # Top 5 categorias
-            top_categories = cursor.execute("""
-                SELECT 
-                    c.name,
-                    SUM(t.value) as total
-                FROM transactions t
-                JOIN categories c ON t.category_id = c.id
-                WHERE t.user_id = ?
-                  AND t.type = 'Despesa'
-                  AND t.date >= ?
-                  AND t.status = 'Pago'
-                GROUP BY c.name
-                ORDER BY total DESC
-                LIMIT 5
-            """, (user_id, month_start)).fetchall()
+            features = extract_many(conn, [user_id], days=30)[user_id]
+            month = features['month']
             
             # Investimentos (variação)
-            investments = cursor.execute("""
+            investments = conn.execute("""
                 SELECT 
                     COUNT(*) as count,
                     COALESCE(SUM(amount), 0) as invested,
@@ -426,22 +267,19 @@ class NotificationAI:
                   AND (investment_status = 'active' OR investment_status IS NULL)
             """, (user_id,)).fetchone()
             
-            # Insights de IA
-            insights = self.analyze_spending_patterns(user_id, days=30)
-            
             return {
                 'summary': {
-                    'income': summary['income'],
-                    'expenses': summary['expenses'],
-                    'balance': summary['income'] - summary['expenses'],
-                    'expense_count': summary['expense_count']
+                    'income': month['income'],
+                    'expenses': month['expenses'],
+                    'balance': month['net'],
+                    'expense_count': month['expense_count']
                 },
                 'top_categories': [
-                    {'name': row['name'], 'total': row['total']} 
-                    for row in top_categories
+                    {'name': name, 'total': total}
+                    for name, total in month['top_categories'][:5]
                 ],
                 'investments': dict(investments),
-                'insights': insights,
+                'insights': self.build_insights(features),
                 'month': datetime.now().strftime('%B/%Y')
             }
         
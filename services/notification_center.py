@@ -7,15 +7,76 @@ Sistema completo de notificações para BWS Finance
 
 import sqlite3
 import json
+import base64
+import threading
 from datetime import datetime, time as dt_time
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from enum import Enum
 import logging
 
+from services.event_stream import EventStream
+from services.notification_preferences import preferences_for
+
 # Configurar logger
 logger = logging.getLogger('notification_center')
 logger.setLevel(logging.INFO)
 
+# Schema + contadores/índices aplicados uma vez por processo e banco
+NOTIFICATION_MIGRATIONS = (
+    'migrations/add_notifications_tables.sql',
+    'migrations/add_notification_counters.sql',
+)
+MAX_PAGE_SIZE = 100
+
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+
+def ensure_schema(conn, db_path: str = 'bws_finance.db', migrations=NOTIFICATION_MIGRATIONS):
+    """Aplica as migrações de notificações (tabelas, contadores e índices) uma vez por processo"""
+    if db_path in _schema_ready:
+        return
+    with _schema_lock:
+        if db_path in _schema_ready:
+            return
+        for migration in migrations:
+            try:
+                with open(migration, 'r', encoding='utf-8') as f:
+                    conn.executescript(f.read())
+                conn.commit()
+                logger.info(f"[OK] Tabelas de notificações criadas/verificadas ({migration})")
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                logger.error(f"[ERRO] Falha ao aplicar {migration}: {e}")
+        _schema_ready.add(db_path)
+
+
+def encode_cursor(created_at, notification_id) -> str:
+    """Cursor opaco (created_at, id) da última notificação da página"""
+    raw = json.dumps([str(created_at), notification_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[str, int]]:
+    """Decodifica o cursor; retorna None se estiver ausente ou inválido"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, notification_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return str(created_at), int(notification_id)
+    except Exception:
+        return None
+
+
+def get_counters(conn, user_id: str) -> Dict[str, int]:
+    """Total e não lidas do usuário (uma linha de notification_counters)"""
+    row = conn.execute("""
+        SELECT total, unread FROM notification_counters WHERE user_id = ?
+    """, (user_id,)).fetchone()
+    return {'total': row[0], 'unread': row[1]} if row else {'total': 0, 'unread': 0}
+
 
 class NotificationCategory(Enum):
     """Categorias de notificações"""
@@ -50,22 +111,17 @@ class NotificationCenter:
     
     def __init__(self, db_path: str = 'bws_finance.db'):
         self.db_path = db_path
+        self.events = EventStream(db_path)
+        self.preferences = preferences_for(db_path)
         self._ensure_tables()
     
     def _ensure_tables(self):
-        """Garante que as tabelas de notificações existem"""
+        """Garante que as tabelas de notificações existem (uma vez por processo)"""
+        if self.db_path in _schema_ready:
+            return
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Ler e executar o schema
         try:
-            with open('migrations/add_notifications_tables.sql', 'r', encoding='utf-8') as f:
-                schema = f.read()
-                cursor.executescript(schema)
-            conn.commit()
-            logger.info("[OK] Tabelas de notificações criadas/verificadas")
-        except Exception as e:
-            logger.error(f"[ERRO] Falha ao criar tabelas: {e}")
+            ensure_schema(conn, self.db_path)
         finally:
             conn.close()
     
@@ -107,8 +163,11 @@ class NotificationCenter:
         cursor = conn.cursor()
         
         try:
+            # Preferências do usuário (cache; uma leitura para horário e canais)
+            prefs = self.get_user_preferences(user_id)
+            
             # Verificar se está em horário permitido
-            if not self._is_notification_time_allowed(user_id):
+            if not self._is_notification_time_allowed(user_id, prefs):
                 logger.info(f"[SKIP] Notificação para {user_id} fora do horário permitido")
                 return None
             
@@ -126,9 +185,6 @@ class NotificationCenter:
             
             notification_id = cursor.lastrowid
             
-            # Obter preferências do usuário
-            prefs = self.get_user_preferences(user_id)
-            
             # Enviar para canais externos
             for channel in channels:
                 if channel == NotificationChannel.SYSTEM:
@@ -147,6 +203,17 @@ class NotificationCenter:
             
             conn.commit()
             logger.info(f"[OK] Notificação #{notification_id} criada para {user_id}")
+            
+            # Sino das páginas abertas é atualizado via SSE
+            self.events.publish(user_id, tenant_id, 'notification', {
+                'id': notification_id,
+                'title': title,
+                'message': message,
+                'type': category.value,
+                'priority': priority.value,
+                'read': False,
+                'created_at': datetime.now().isoformat()
+            })
             return notification_id
             
         except Exception as e:
@@ -156,9 +223,10 @@ class NotificationCenter:
         finally:
             conn.close()
     
-    def _is_notification_time_allowed(self, user_id: str) -> bool:
+    def _is_notification_time_allowed(self, user_id: str, prefs: Dict = None) -> bool:
         """Verifica se está no horário permitido para notificações"""
-        prefs = self.get_user_preferences(user_id)
+        if prefs is None:
+            prefs = self.get_user_preferences(user_id)
         
         if not prefs:
             return True
@@ -252,7 +320,7 @@ class NotificationCenter:
         limit: int = 50
     ) -> List[Dict]:
         """
-        Busca notificações do usuário
+        Busca notificações do usuário (primeira página)
         
         Args:
             user_id: ID do usuário
@@ -262,9 +330,27 @@ class NotificationCenter:
         Returns:
             Lista de notificações
         """
+        return self.get_notifications_page(user_id, status=status, limit=limit)['notifications']
+    
+    def get_notifications_page(
+        self,
+        user_id: str,
+        status: str = None,
+        limit: int = 50,
+        cursor: str = None
+    ) -> Dict:
+        """
+        Página de notificações por cursor (created_at DESC, id DESC)
+        
+        Cada página é uma busca no índice a partir da última notificação vista,
+        sem OFFSET.
+        
+        Returns:
+            dict com 'notifications', 'next_cursor' e 'has_more'
+        """
+        limit = max(1, min(int(limit or 50), MAX_PAGE_SIZE))
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
         
         try:
             query = """
@@ -277,25 +363,37 @@ class NotificationCenter:
                 query += " AND status = ?"
                 params.append(status)
             
-            query += " ORDER BY created_at DESC LIMIT ?"
-            params.append(limit)
+            position = decode_cursor(cursor)
+            if position:
+                query += " AND (created_at, id) < (?, ?)"
+                params.extend(position)
+            
+            # Uma linha a mais indica se existe próxima página
+            query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+            params.append(limit + 1)
             
-            cursor.execute(query, params)
-            notifications = [dict(row) for row in cursor.fetchall()]
+            rows = conn.execute(query, params).fetchall()
+            has_more = len(rows) > limit
+            notifications = [dict(row) for row in rows[:limit]]
             
             # Parse metadata JSON
             for notif in notifications:
                 if notif.get('metadata'):
                     try:
                         notif['metadata'] = json.loads(notif['metadata'])
-                    except:
+                    except ValueError:
                         notif['metadata'] = {}
             
-            return notifications
+            last = notifications[-1] if notifications else None
+            return {
+                'notifications': notifications,
+                'next_cursor': encode_cursor(last['created_at'], last['id']) if has_more else None,
+                'has_more': has_more
+            }
         
         except Exception as e:
             logger.error(f"[ERRO] Falha ao buscar notificações: {e}")
-            return []
+            return {'notifications': [], 'next_cursor': None, 'has_more': False}
         finally:
             conn.close()
     
@@ -362,17 +460,11 @@ class NotificationCenter:
             conn.close()
     
     def get_unread_count(self, user_id: str) -> int:
-        """Retorna contador de não lidas"""
+        """Retorna contador de não lidas (mantido por trigger, sem COUNT)"""
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         
         try:
-            cursor.execute("""
-                SELECT COUNT(*) FROM notifications
-                WHERE user_id = ? AND status = 'unread'
-            """, (user_id,))
-            
-            return cursor.fetchone()[0]
+            return get_counters(conn, user_id)['unread']
         
         except Exception as e:
             logger.error(f"[ERRO] Falha ao contar não lidas: {e}")
@@ -381,25 +473,8 @@ class NotificationCenter:
             conn.close()
     
     def get_user_preferences(self, user_id: str) -> Dict:
-        """Busca preferências do usuário"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute("""
-                SELECT * FROM notification_preferences
-                WHERE user_id = ?
-            """, (user_id,))
-            
-            row = cursor.fetchone()
-            return dict(row) if row else {}
-        
-        except Exception as e:
-            logger.error(f"[ERRO] Falha ao buscar preferências: {e}")
-            return {}
-        finally:
-            conn.close()
+        """Busca preferências do usuário (cache por processo, services/notification_preferences)"""
+        return self.preferences.get(user_id)
     
     def update_preferences(self, user_id: str, preferences: Dict) -> bool:
         """Atualiza preferências do usuário"""
@@ -439,6 +514,7 @@ class NotificationCenter:
             
             cursor.execute(query, values)
             conn.commit()
+            self.preferences.invalidate(user_id)
             
             return cursor.rowcount > 0
         
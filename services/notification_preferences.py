@@ -0,0 +1,178 @@
+"""
+Notification Preferences - Preferências de notificação com cache por processo
+
+Duas tabelas de preferências convivem no banco:
+- notification_preferences: NotificationCenter (canais, limites de gasto
+  alto e de variação de investimento, horário de silêncio)
+- user_notifications_settings: AutoNotificationService (opt-in, não
+  perturbe, dias de alerta de fatura, resumos), com defaults quando o
+  usuário não tem linha
+
+As leituras passam por um cache local do processo com TTL; as rotas que
+gravam preferências chamam invalidate(user_id), e os outros workers veem a
+mudança em no máximo um TTL. get_many()/get_settings_many() carregam vários
+usuários com uma consulta por lote, para os jobs.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List
+
+logger = logging.getLogger('notification_preferences')
+
+BATCH_SIZE = 500
+
+DEFAULT_SETTINGS = {
+    'notify_whatsapp': True,
+    'notify_email': True,
+    'notify_dashboard': True,
+    'threshold_low_balance': 100.00,
+    'investment_alert_pct': 3.0,
+    'do_not_disturb_start': None,
+    'do_not_disturb_end': None,
+    'invoice_alert_days': '3,1,0',
+    'weekly_summary': True,
+    'monthly_summary': True,
+    'opt_in_whatsapp': False,
+    'opt_in_email': False
+}
+_BOOLEAN_SETTINGS = ('notify_whatsapp', 'notify_email', 'notify_dashboard', 'weekly_summary',
+                     'monthly_summary', 'opt_in_whatsapp', 'opt_in_email')
+
+
+class NotificationPreferences:
+    """Cache (TTL + invalidação explícita) das preferências de notificação"""
+
+    def __init__(self, db_path: str = 'bws_finance.db', ttl_seconds: float = None, max_entries: int = None):
+        self.db_path = db_path
+        self.ttl = ttl_seconds if ttl_seconds is not None else float(os.getenv('NOTIFICATION_PREFS_TTL_SECONDS', 60))
+        self.max_entries = max_entries or int(os.getenv('NOTIFICATION_PREFS_MAX_ENTRIES', 10000))
+
+        # (tipo, user_id) -> (expira_em, valor)
+        self._cache: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    # =====================================================
+    # CARGA (uma consulta por lote de usuários)
+    # =====================================================
+
+    @staticmethod
+    def _load_preferences(conn, user_ids: List[str]) -> Dict[str, Dict]:
+        placeholders = ','.join('?' * len(user_ids))
+        rows = conn.execute(f"""
+            SELECT * FROM notification_preferences
+            WHERE user_id IN ({placeholders})
+        """, user_ids).fetchall()
+        found = {row['user_id']: dict(row) for row in rows}
+        return {user_id: found.get(user_id, {}) for user_id in user_ids}
+
+    @staticmethod
+    def _load_settings(conn, user_ids: List[str]) -> Dict[str, Dict]:
+        placeholders = ','.join('?' * len(user_ids))
+        rows = conn.execute(f"""
+            SELECT * FROM user_notifications_settings
+            WHERE user_id IN ({placeholders})
+        """, user_ids).fetchall()
+
+        settings = {}
+        for row in rows:
+            # Colunas ausentes em bancos antigos ficam com o default
+            columns = row.keys()
+            values = {key: row[key] if key in columns else default for key, default in DEFAULT_SETTINGS.items()}
+            for key in _BOOLEAN_SETTINGS:
+                values[key] = bool(values[key])
+            settings[row['user_id']] = values
+        return {user_id: settings.get(user_id, dict(DEFAULT_SETTINGS)) for user_id in user_ids}
+
+    def _get_many(self, kind: str, user_ids: Iterable[str], loader: Callable, fallback: Dict) -> Dict[str, Dict]:
+        now = time.monotonic()
+        result, missing = {}, []
+        with self._lock:
+            for user_id in dict.fromkeys(user_ids):
+                entry = self._cache.get((kind, user_id))
+                if entry and entry[0] > now:
+                    result[user_id] = dict(entry[1])
+                else:
+                    missing.append(user_id)
+            self.stats['hits'] += len(result)
+            self.stats['misses'] += len(missing)
+
+        if not missing:
+            return result
+
+        loaded = {}
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            for offset in range(0, len(missing), BATCH_SIZE):
+                loaded.update(loader(conn, missing[offset:offset + BATCH_SIZE]))
+        except Exception as e:
+            # Sem cache em caso de erro (ex.: tabela ainda não criada)
+            logger.error(f"[ERRO] Falha ao buscar preferências ({kind}): {e}")
+            for user_id in missing:
+                result[user_id] = dict(fallback)
+            return result
+        finally:
+            conn.close()
+
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            if len(self._cache) + len(loaded) > self.max_entries:
+                self._cache = {key: entry for key, entry in self._cache.items() if entry[0] > now}
+                while self._cache and len(self._cache) + len(loaded) > self.max_entries:
+                    self._cache.pop(next(iter(self._cache)))
+            for user_id, value in loaded.items():
+                self._cache[(kind, user_id)] = (expires, value)
+                result[user_id] = dict(value)
+        return result
+
+    # =====================================================
+    # API PÚBLICA
+    # =====================================================
+
+    def get(self, user_id: str) -> Dict:
+        """Preferências do NotificationCenter ({} se o usuário não tem linha)"""
+        return self.get_many([user_id])[user_id]
+
+    def get_many(self, user_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Preferências do NotificationCenter de vários usuários"""
+        return self._get_many('preferences', user_ids, self._load_preferences, {})
+
+    def get_settings(self, user_id: str) -> Dict:
+        """Configurações do AutoNotificationService (com defaults)"""
+        return self.get_settings_many([user_id])[user_id]
+
+    def get_settings_many(self, user_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Configurações do AutoNotificationService de vários usuários"""
+        return self._get_many('settings', user_ids, self._load_settings, DEFAULT_SETTINGS)
+
+    def invalidate(self, user_id: str = None):
+        """Descarta o cache de um usuário (todas as tabelas) ou de todos"""
+        with self._lock:
+            if user_id is None:
+                self._cache.clear()
+            else:
+                for kind in ('preferences', 'settings'):
+                    self._cache.pop((kind, user_id), None)
+            self.stats['invalidations'] += 1
+
+
+_instances: Dict[str, NotificationPreferences] = {}
+_instances_lock = threading.Lock()
+
+
+def preferences_for(db_path: str = 'bws_finance.db') -> NotificationPreferences:
+    """Instância compartilhada por banco (serviços criados com o mesmo db_path dividem o cache)"""
+    key = os.path.abspath(db_path)
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = NotificationPreferences(db_path)
+        return _instances[key]
+
+
+# Instância global
+notification_preferences = preferences_for('bws_finance.db')
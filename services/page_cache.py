@@ -0,0 +1,125 @@
+"""
+Page Cache - Páginas de scraping com validadores HTTP (ETag / Last-Modified)
+
+Guarda o HTML bruto (comprimido) das páginas que enviam validadores, para
+que a próxima atualização faça um GET condicional: com 304 Not Modified a
+página não é baixada de novo e a extração roda sobre a cópia local.
+"""
+
+import os
+import zlib
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger('page_cache')
+
+
+class PageCache:
+    """Armazena páginas brutas com ETag/Last-Modified no SQLite"""
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or os.getenv('PAGE_CACHE_DB', 'bws_finance.db')
+        self._schema_ready = False
+
+    def get_db(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        if not self._schema_ready:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS scraped_pages (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    body BLOB NOT NULL,
+                    fetched_at TEXT NOT NULL,
+                    checked_at TEXT NOT NULL
+                )
+            """)
+            conn.commit()
+            self._schema_ready = True
+        return conn
+
+    def load(self, url: str) -> Optional[Dict]:
+        conn = self.get_db()
+        try:
+            row = conn.execute("SELECT * FROM scraped_pages WHERE url = ?", (url,)).fetchone()
+        finally:
+            conn.close()
+        if not row:
+            return None
+        page = dict(row)
+        page['body'] = zlib.decompress(page['body']).decode('utf-8')
+        return page
+
+    def save(self, url: str, body: str, etag: Optional[str], last_modified: Optional[str]):
+        now = datetime.now().isoformat()
+        conn = self.get_db()
+        try:
+            conn.execute("""
+                INSERT INTO scraped_pages (url, etag, last_modified, body, fetched_at, checked_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    etag = excluded.etag, last_modified = excluded.last_modified,
+                    body = excluded.body, fetched_at = excluded.fetched_at,
+                    checked_at = excluded.checked_at
+            """, (url, etag, last_modified, zlib.compress(body.encode('utf-8'), 6), now, now))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def touch(self, url: str):
+        conn = self.get_db()
+        try:
+            conn.execute("UPDATE scraped_pages SET checked_at = ? WHERE url = ?",
+                         (datetime.now().isoformat(), url))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def fetch(self, session, url: str, timeout: int = 10) -> Tuple[str, bool]:
+        """
+        GET condicional usando os validadores guardados
+
+        Args:
+            session: requests.Session do conector
+        Returns:
+            (html, not_modified) - not_modified=True quando veio da cópia local
+        Raises:
+            requests.exceptions.HTTPError para respostas 4xx/5xx
+        """
+        try:
+            cached = self.load(url)
+        except sqlite3.Error as e:
+            logger.error(f"[ERRO] Cache de páginas indisponível: {e}")
+            cached = None
+
+        headers = {}
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = session.get(url, headers=headers, timeout=timeout)
+
+        if response.status_code == 304 and cached:
+            self.touch(url)
+            return cached['body'], True
+
+        response.raise_for_status()
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            try:
+                self.save(url, response.text, etag, last_modified)
+            except sqlite3.Error as e:
+                logger.error(f"[ERRO] Falha ao guardar página {url}: {e}")
+
+        return response.text, False
+
+
+# Instância global
+page_cache = PageCache()
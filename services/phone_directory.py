@@ -0,0 +1,294 @@
+"""
+Phone Directory - Resolução do remetente do WhatsApp pelo telefone
+
+O telefone do usuário é gravado como digitado (users.phone) e também
+normalizado em E.164 (users.phone_normalized, índice único). Webhook do
+WhatsApp e rota do GPT resolvem o remetente pelo mesmo resolver:
+
+- busca indexada por phone_normalized (com e sem o nono dígito, para
+  celulares brasileiros que o WhatsApp entrega no formato antigo)
+- cache LRU local do processo (telefone -> usuário/tenant), com cache
+  negativo curto para remetentes desconhecidos
+- invalidate() nas rotas que alteram o telefone; os outros workers veem a
+  mudança em no máximo um TTL
+
+Telefones gravados fora do app (scripts) ficam com phone_normalized NULL
+(um trigger limpa o valor quando o phone muda sem ele) e são normalizados
+no próximo miss, por um índice parcial que só contém esses pendentes.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from services import metrics
+
+logger = logging.getLogger('phone_directory')
+
+DEFAULT_COUNTRY_CODE = os.getenv('PHONE_DEFAULT_COUNTRY_CODE', '55')
+
+_USER_COLUMNS = 'id, tenant_id, email, name, phone'
+
+
+def normalize_phone(phone, country_code: str = None) -> Optional[str]:
+    """
+    Normaliza um telefone para E.164 (+5511999999999)
+
+    Aceita formatação livre, sufixo do WhatsApp (@c.us), prefixo
+    internacional 00 e números nacionais (DDD + número, com ou sem 0),
+    que recebem o código do país padrão.
+
+    Returns:
+        Telefone em E.164 ou None se não parecer um telefone
+    """
+    if not phone:
+        return None
+    raw = str(phone).split('@')[0].strip()
+    digits = ''.join(ch for ch in raw if ch.isdigit())
+    if not raw.startswith('+'):
+        if digits.startswith('00'):
+            digits = digits[2:]
+        else:
+            national = digits[1:] if digits.startswith('0') else digits
+            if len(national) in (10, 11):
+                digits = (country_code or DEFAULT_COUNTRY_CODE) + national
+    if not 8 <= len(digits) <= 15 or digits.startswith('0'):
+        return None
+    return '+' + digits
+
+
+def phone_variants(normalized: str) -> List[str]:
+    """Formas equivalentes de um celular brasileiro (com e sem o nono dígito)"""
+    variants = [normalized]
+    if normalized.startswith('+55'):
+        national = normalized[3:]
+        if len(national) == 11 and national[2] == '9':
+            variants.append('+55' + national[:2] + national[3:])
+        elif len(national) == 10 and national[2] in '6789':
+            variants.append('+55' + national[:2] + '9' + national[2:])
+    return variants
+
+
+def mask_phone(phone: str) -> str:
+    """Telefone mascarado para logs (+55119****9999)"""
+    if not phone:
+        return ''
+    return phone[:-8] + '****' + phone[-4:] if len(phone) > 8 else '****'
+
+
+class PhoneDirectory:
+    """Resolver de remetentes (índice normalizado + LRU com cache negativo)"""
+
+    def __init__(self, db_path: str = 'bws_finance.db', max_entries: int = None,
+                 ttl_seconds: float = None, negative_ttl_seconds: float = None):
+        self.db_path = db_path
+        self.max_entries = max_entries or int(os.getenv('PHONE_CACHE_MAX_ENTRIES', 10000))
+        self.ttl = ttl_seconds if ttl_seconds is not None else float(os.getenv('PHONE_CACHE_TTL_SECONDS', 300))
+        self.negative_ttl = (negative_ttl_seconds if negative_ttl_seconds is not None
+                             else float(os.getenv('PHONE_CACHE_NEGATIVE_TTL_SECONDS', 60)))
+
+        # telefone normalizado -> (expira_em, usuário ou None)
+        self._cache: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._ready = set()
+        # Pendentes que não normalizam (inválidos/duplicados): não tentar de novo
+        self._skipped: Dict[str, str] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'negative_hits': 0, 'invalidations': 0}
+
+    def get_db(self):
+        conn = metrics.connect(self.db_path, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # =====================================================
+    # SCHEMA / BACKFILL
+    # =====================================================
+
+    def ensure_schema(self, conn):
+        """
+        Cria phone_normalized, o trigger e os índices, normalizando os
+        telefones existentes (uma vez por processo e arquivo de banco)
+
+        Se a conexão já tiver uma transação aberta, o trabalho entra nela.
+        """
+        database = conn.execute("PRAGMA database_list").fetchone()[2]
+        if database in self._ready:
+            return
+        with self._lock:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+            if 'phone' not in columns:
+                return  # Banco sem a migração de perfil (add_user_preferences)
+
+            outer = conn.in_transaction
+            if not outer:
+                conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Conferido depois do BEGIN IMMEDIATE: outro worker pode ter criado antes
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+                if 'phone_normalized' not in columns:
+                    conn.execute("ALTER TABLE users ADD COLUMN phone_normalized TEXT")
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS trg_users_phone_stale
+                    AFTER UPDATE OF phone ON users
+                    WHEN NEW.phone IS NOT OLD.phone AND NEW.phone_normalized IS OLD.phone_normalized
+                    BEGIN
+                        UPDATE users SET phone_normalized = NULL WHERE id = NEW.id;
+                    END
+                """)
+                conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_users_phone_pending ON users(id)
+                    WHERE phone_normalized IS NULL AND phone IS NOT NULL
+                """)
+                conn.execute("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_users_phone_normalized
+                    ON users(phone_normalized)
+                """)
+                # Duplicados ficam NULL (primeiro cadastro vence)
+                backfilled = self._backfill(conn)
+                if not outer:
+                    conn.commit()
+            except Exception:
+                if not outer:
+                    conn.rollback()
+                raise
+            self._ready.add(database)
+        if backfilled:
+            logger.info(f"[OK] phone_normalized preenchido para {backfilled} usuários")
+
+    def _backfill(self, conn) -> int:
+        """Normaliza os telefones pendentes (phone preenchido, phone_normalized NULL)"""
+        rows = conn.execute("""
+            SELECT id, phone FROM users
+            WHERE phone_normalized IS NULL AND phone IS NOT NULL
+            ORDER BY created_at, rowid
+        """).fetchall()
+
+        updates, batch = [], set()
+        for user_id, phone in rows:
+            if self._skipped.get(user_id) == phone:
+                continue
+            normalized = normalize_phone(phone)
+            duplicate = normalized is not None and (
+                any(variant in batch for variant in phone_variants(normalized))
+                or self._lookup(conn, normalized, active_only=False) is not None
+            )
+            if normalized is None or duplicate:
+                self._skipped[user_id] = phone
+                logger.warning(f"[ERRO] Telefone do usuário {user_id} não normalizado "
+                               f"({'duplicado' if duplicate else 'inválido'}: {mask_phone(phone)})")
+                continue
+            batch.add(normalized)
+            updates.append((normalized, user_id))
+
+        if updates:
+            conn.executemany("UPDATE users SET phone_normalized = ? WHERE id = ?", updates)
+        return len(updates)
+
+    def backfill_pending(self, conn) -> int:
+        """Normaliza telefones gravados fora do app; faz commit se houver mudanças"""
+        if conn.execute("""
+            SELECT 1 FROM users WHERE phone_normalized IS NULL AND phone IS NOT NULL LIMIT 1
+        """).fetchone() is None:
+            return 0
+        with self._lock:
+            count = self._backfill(conn)
+        if count:
+            conn.commit()
+        return count
+
+    # =====================================================
+    # LEITURA
+    # =====================================================
+
+    @staticmethod
+    def _lookup(conn, normalized: str, active_only: bool = True):
+        variants = phone_variants(normalized)
+        sql = f"""
+            SELECT {_USER_COLUMNS} FROM users
+            WHERE phone_normalized IN ({','.join('?' * len(variants))})
+        """
+        if active_only:
+            sql += " AND active = 1"
+        return conn.execute(sql + " LIMIT 1", variants).fetchone()
+
+    def owner(self, conn, phone: str) -> Optional[str]:
+        """ID do usuário (ativo ou não) que já usa o telefone, na conexão do chamador"""
+        normalized = normalize_phone(phone)
+        if normalized is None:
+            return None
+        self.ensure_schema(conn)
+        row = self._lookup(conn, normalized, active_only=False)
+        return row['id'] if row else None
+
+    def resolve(self, phone: str) -> Optional[Dict]:
+        """
+        Usuário ativo dono do telefone (id, tenant_id, email, name, phone)
+
+        Returns:
+            Dict do usuário ou None se o remetente não está cadastrado
+        """
+        normalized = normalize_phone(phone)
+        if normalized is None:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(normalized)
+            if entry and entry[0] > now:
+                self._cache.move_to_end(normalized)
+                if entry[1] is None:
+                    self.stats['negative_hits'] += 1
+                    return None
+                self.stats['hits'] += 1
+                return dict(entry[1])
+            self.stats['misses'] += 1
+
+        conn = self.get_db()
+        try:
+            self.ensure_schema(conn)
+            row = self._lookup(conn, normalized)
+            if row is None and self.backfill_pending(conn):
+                row = self._lookup(conn, normalized)
+        except Exception as e:
+            # Sem cache em caso de erro (ex.: banco ainda não inicializado)
+            logger.error(f"[ERRO] Falha ao resolver telefone {mask_phone(normalized)}: {e}")
+            return None
+        finally:
+            conn.close()
+
+        user = dict(row) if row else None
+        expires = time.monotonic() + (self.ttl if user else self.negative_ttl)
+        with self._lock:
+            self._cache[normalized] = (expires, user)
+            self._cache.move_to_end(normalized)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return dict(user) if user else None
+
+    def invalidate(self, user_id: str = None, phones: Iterable[str] = ()):
+        """
+        Descarta do cache o usuário (todas as entradas que apontam para ele) e
+        os telefones informados (inclusive entradas negativas); sem argumentos,
+        limpa tudo
+        """
+        with self._lock:
+            if user_id is None and not phones:
+                self._cache.clear()
+            else:
+                if user_id is not None:
+                    for key in [key for key, entry in self._cache.items()
+                                if entry[1] and entry[1]['id'] == user_id]:
+                        del self._cache[key]
+                for phone in phones:
+                    normalized = normalize_phone(phone)
+                    for variant in phone_variants(normalized) if normalized else ():
+                        self._cache.pop(variant, None)
+            self.stats['invalidations'] += 1
+
+
+# Instância global
+phone_directory = PhoneDirectory()
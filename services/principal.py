@@ -0,0 +1,155 @@
+"""
+Principal - Usuário autenticado resolvido uma vez por request
+
+O login grava na sessão (cookie assinado) os claims do usuário: user_id,
+tenant_id, user_name, is_admin e principal_version. A cada request,
+load_principal() resolve o principal e o publica em g.principal, para o
+app e todos os blueprints:
+
+- cache local do processo (LRU + TTL curto), chaveado por usuário e pela
+  versão da sessão; um hit não toca o banco
+- no miss, uma consulta por id com as colunas do perfil — nunca o
+  password_hash, que só é lido pelas rotas que conferem a senha
+- refresh_principal() nas rotas que alteram o perfil: gera nova versão na
+  sessão (os outros workers erram o cache e recarregam) e descarta a
+  entrada local; alterações feitas fora do app aparecem em no máximo um TTL
+
+Blueprints que recebem o user_id por parâmetro usam principal_for(), que
+reaproveita g.principal quando é o próprio usuário da sessão.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from flask import g, has_request_context, session
+
+from services import metrics
+
+logger = logging.getLogger('principal')
+
+PRINCIPAL_COLUMNS = 'id, tenant_id, email, name, is_admin, phone'
+
+
+def new_principal_version() -> int:
+    """Versão para os claims da sessão (login e alterações de perfil)"""
+    return time.time_ns() // 1000
+
+
+class PrincipalCache:
+    """Cache de principais por usuário (LRU + TTL, conferindo a versão da sessão)"""
+
+    def __init__(self, db_path: str = 'bws_finance.db', max_entries: int = None,
+                 ttl_seconds: float = None):
+        self.db_path = db_path
+        self.max_entries = max_entries or int(os.getenv('PRINCIPAL_CACHE_MAX_ENTRIES', 10000))
+        self.ttl = ttl_seconds if ttl_seconds is not None else float(os.getenv('PRINCIPAL_CACHE_TTL_SECONDS', 60))
+
+        # user_id -> (expira_em, versão, principal)
+        self._cache: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get_db(self):
+        conn = metrics.connect(self.db_path, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _load(self, user_id: str) -> Optional[Dict]:
+        conn = self.get_db()
+        try:
+            row = conn.execute(
+                f"SELECT {PRINCIPAL_COLUMNS} FROM users WHERE id = ?", (user_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return dict(row) if row else None
+
+    def get(self, user_id: str, version=None) -> Optional[Dict]:
+        """
+        Principal do usuário
+
+        Args:
+            user_id: ID do usuário
+            version: principal_version da sessão; None aceita qualquer versão
+                     em cache (user_id recebido por parâmetro)
+
+        Returns:
+            Dicionário com as colunas do perfil ou None se o usuário não existe
+        """
+        if not user_id:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(user_id)
+            if entry and entry[0] > now and (version is None or entry[1] == version):
+                self._cache.move_to_end(user_id)
+                self.stats['hits'] += 1
+                return entry[2]
+            self.stats['misses'] += 1
+
+        principal = self._load(user_id)
+        if principal is None:
+            return None  # Usuário removido: sem cache negativo, a sessão deixa de valer
+
+        with self._lock:
+            self._cache[user_id] = (now + self.ttl, version, principal)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id: str = None):
+        """Descarta o usuário do cache; sem argumentos, limpa tudo"""
+        with self._lock:
+            if user_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(user_id, None)
+            self.stats['invalidations'] += 1
+
+
+# Instância global
+principal_cache = PrincipalCache()
+
+
+def load_principal():
+    """before_request: resolve o usuário da sessão e publica em g.principal"""
+    user_id = session.get('user_id')
+    g.principal = principal_cache.get(user_id, session.get('principal_version')) if user_id else None
+
+
+def current_principal() -> Optional[Dict]:
+    """Principal do request atual (resolvido na primeira chamada se preciso)"""
+    if not has_request_context():
+        return None
+    if 'principal' not in g:
+        load_principal()
+    return g.principal
+
+
+def principal_for(user_id: str) -> Optional[Dict]:
+    """Principal de um user_id qualquer (o da sessão sai de g.principal)"""
+    principal = current_principal()
+    if principal and principal['id'] == user_id:
+        return principal
+    return principal_cache.get(user_id)
+
+
+def refresh_principal(user_id: str):
+    """
+    Após alterar o perfil: descarta o cache e, se for o usuário da sessão,
+    gera nova versão nos claims e recarrega g.principal
+    """
+    principal_cache.invalidate(user_id)
+    if has_request_context() and session.get('user_id') == user_id:
+        session['principal_version'] = new_principal_version()
+        g.pop('principal', None)
+        principal = current_principal()
+        if principal:
+            session['user_name'] = principal['name']
+            session['is_admin'] = principal['is_admin']
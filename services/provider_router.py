@@ -0,0 +1,263 @@
+"""
+Provider Router - Roteamento adaptativo entre fontes de cotação
+
+Para cada provedor registrado mantém uma janela das últimas chamadas
+(taxa de acerto, taxa de erro, latência p95) e um circuit breaker:
+- CLOSED: chamadas normais
+- OPEN: após N falhas consecutivas o provedor é pulado por um tempo
+  (dobrado a cada reabertura, até o máximo)
+- HALF_OPEN: passado o tempo, uma única chamada de teste decide se fecha
+  ou volta a abrir
+
+A ordem de tentativa é recalculada a cada busca pelo custo esperado
+(latência p95 / taxa de acerto) e o timeout de cada provedor acompanha a
+sua p95, para que um provedor lento ou fora do ar não custe 10s por busca.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('provider_router')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class ProviderError(Exception):
+    """Falha do provedor (rede, HTTP 5xx/401, resposta inválida) - conta para o breaker"""
+
+
+class CircuitBreaker:
+    """Circuit breaker com meia-abertura por chamada de teste"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float, max_reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.base_reset_seconds = reset_seconds
+        self.max_reset_seconds = max_reset_seconds
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.reset_seconds = self.base_reset_seconds
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                # Teste falhou: reabre com espera maior
+                self.reset_seconds = min(self.reset_seconds * 2, self.max_reset_seconds)
+                self._open()
+            elif self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+
+    def retry_in(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+
+class Provider:
+    """Provedor registrado com sua janela de estatísticas"""
+
+    def __init__(self, name: str, fn: Callable, priority: int, accepts: Callable[[str], bool],
+                 window: int, breaker: CircuitBreaker):
+        self.name = name
+        self.fn = fn
+        self.priority = priority
+        self.accepts = accepts
+        self.breaker = breaker
+        self.window = deque(maxlen=window)  # (outcome: 'hit' | 'miss' | 'error', latency_ms)
+        self.calls = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[str] = None
+        self.last_success_at: Optional[str] = None
+
+    def p95_ms(self) -> Optional[float]:
+        latencies = sorted(latency for _, latency in self.window)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))]
+
+    def rate(self, outcome: str) -> float:
+        """Fração da janela com o resultado (suavizada para janelas pequenas)"""
+        count = sum(1 for o, _ in self.window if o == outcome)
+        return (count + 1) / (len(self.window) + 2)
+
+
+class ProviderRouter:
+    """Tenta os provedores em ordem de custo esperado, respeitando os breakers"""
+
+    def __init__(
+        self,
+        name: str,
+        window: int = None,
+        failure_threshold: int = None,
+        reset_seconds: float = None,
+        default_timeout: float = 10,
+        min_timeout: float = None,
+        min_samples: int = 5,
+        cold_latency_ms: float = 1500,
+        latency_floor_ms: float = 50
+    ):
+        self.name = name
+        self.window = window or int(os.getenv('PROVIDER_STATS_WINDOW', 50))
+        self.failure_threshold = failure_threshold or int(os.getenv('PROVIDER_FAILURE_THRESHOLD', 3))
+        self.reset_seconds = reset_seconds or float(os.getenv('PROVIDER_OPEN_SECONDS', 60))
+        self.max_reset_seconds = float(os.getenv('PROVIDER_MAX_OPEN_SECONDS', 600))
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout or float(os.getenv('PROVIDER_MIN_TIMEOUT_SECONDS', 3))
+        self.min_samples = min_samples
+        self.cold_latency_ms = cold_latency_ms
+        self.latency_floor_ms = latency_floor_ms
+        self.providers: Dict[str, Provider] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, fn: Callable[[str, float], Optional[Dict]], priority: int,
+                 accepts: Callable[[str], bool] = None):
+        """
+        Registra um provedor
+
+        Args:
+            fn: fn(symbol, timeout) -> dict ou None (não encontrado);
+                levanta ProviderError em falha
+            priority: ordem inicial (menor = antes), usada enquanto não há amostras
+            accepts: filtro opcional de símbolos que o provedor atende
+        """
+        breaker = CircuitBreaker(self.failure_threshold, self.reset_seconds, self.max_reset_seconds)
+        self.providers[name] = Provider(name, fn, priority, accepts or (lambda symbol: True),
+                                        self.window, breaker)
+
+    # =========================================
+    # ORDENAÇÃO E TIMEOUT
+    # =========================================
+
+    def _latency_estimate(self, provider: Provider) -> float:
+        if len(provider.window) < self.min_samples:
+            return self.cold_latency_ms * (provider.priority + 1)
+        # Piso: respostas vazias instantâneas não devem parecer "baratas"
+        return max(provider.p95_ms(), self.latency_floor_ms)
+
+    def expected_cost(self, provider: Provider) -> float:
+        """Latência esperada até obter uma resposta útil"""
+        return self._latency_estimate(provider) / provider.rate('hit')
+
+    def timeout_for(self, provider: Provider) -> float:
+        if len(provider.window) < self.min_samples:
+            return self.default_timeout
+        return min(self.default_timeout, max(self.min_timeout, 3 * provider.p95_ms() / 1000))
+
+    def ordered(self, symbol: str = None) -> List[Provider]:
+        with self._lock:
+            candidates = [p for p in self.providers.values() if symbol is None or p.accepts(symbol)]
+            return sorted(candidates, key=lambda p: (self.expected_cost(p), p.priority))
+
+    # =========================================
+    # EXECUÇÃO
+    # =========================================
+
+    def _record(self, provider: Provider, outcome: str, latency_ms: float, error: str = None):
+        now = datetime.now().isoformat()
+        with self._lock:
+            provider.window.append((outcome, latency_ms))
+            provider.calls += 1
+            if outcome == 'error':
+                provider.errors += 1
+                provider.last_error, provider.last_error_at = error, now
+            else:
+                provider.last_success_at = now
+
+        if outcome == 'error':
+            provider.breaker.record_failure()
+            if provider.breaker.state == OPEN:
+                logger.error(f"[ERRO] {self.name}/{provider.name}: circuito aberto por "
+                             f"{provider.breaker.reset_seconds:.0f}s ({error})")
+        else:
+            provider.breaker.record_success()
+
+    def call_provider(self, name: str, symbol: str, is_valid: Callable[[Optional[Dict]], bool] = bool):
+        """Chama um provedor específico (se o breaker permitir) registrando o resultado"""
+        provider = self.providers[name]
+        if not provider.accepts(symbol) or not provider.breaker.allow():
+            return None
+
+        start = time.perf_counter()
+        try:
+            data = provider.fn(symbol, self.timeout_for(provider))
+        except Exception as e:
+            self._record(provider, 'error', (time.perf_counter() - start) * 1000, str(e))
+            return None
+
+        valid = is_valid(data)
+        self._record(provider, 'hit' if valid else 'miss', (time.perf_counter() - start) * 1000)
+        return data if valid else None
+
+    def call(self, symbol: str, is_valid: Callable[[Optional[Dict]], bool] = bool) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Busca o símbolo no primeiro provedor que responder com dados válidos
+
+        Returns:
+            (dados, nome do provedor) ou (None, None)
+        """
+        for provider in self.ordered(symbol):
+            data = self.call_provider(provider.name, symbol, is_valid)
+            if data is not None:
+                return data, provider.name
+        return None, None
+
+    def get_stats(self) -> Dict:
+        providers = []
+        for position, provider in enumerate(self.ordered()):
+            with self._lock:
+                p95 = provider.p95_ms()
+                providers.append({
+                    'name': provider.name,
+                    'position': position + 1,
+                    'priority': provider.priority,
+                    'state': provider.breaker.state,
+                    'retry_in_seconds': round(provider.breaker.retry_in(), 1),
+                    'consecutive_failures': provider.breaker.consecutive_failures,
+                    'samples': len(provider.window),
+                    'hit_rate': round(sum(1 for o, _ in provider.window if o == 'hit') / len(provider.window), 3) if provider.window else None,
+                    'error_rate': round(sum(1 for o, _ in provider.window if o == 'error') / len(provider.window), 3) if provider.window else None,
+                    'p95_ms': round(p95, 1) if p95 is not None else None,
+                    'timeout_seconds': round(self.timeout_for(provider), 1),
+                    'expected_cost_ms': round(self.expected_cost(provider), 1),
+                    'calls': provider.calls,
+                    'errors': provider.errors,
+                    'last_error': provider.last_error,
+                    'last_error_at': provider.last_error_at,
+                    'last_success_at': provider.last_success_at
+                })
+        return {'router': self.name, 'providers': providers}
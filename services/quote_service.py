@@ -0,0 +1,332 @@
+"""
+Quote Service - Cotações com cache, coalescência e limite por cliente
+
+Protege a rota pública /api/quote/<ticker>:
+- Cache TTL: respostas recentes (inclusive "não encontrado", com TTL menor)
+  não voltam à rede
+- Single-flight: requisições simultâneas do mesmo ticker esperam a mesma
+  busca em andamento em vez de disparar uma cadeia de scraping cada
+- Token bucket por cliente: só as buscas que iriam à rede consomem fichas
+- Índice local de tickers da B3 (data/b3_tickers.csv) para autocomplete,
+  sem nenhuma chamada externa
+"""
+
+import os
+import csv
+import time
+import logging
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('quote_service')
+
+TICKERS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'b3_tickers.csv')
+
+CRYPTO_KEYWORDS = ['BITCOIN', 'BTC', 'ETHEREUM', 'ETH', 'BNB', 'CARDANO', 'ADA',
+                   'SOLANA', 'SOL', 'XRP', 'RIPPLE', 'DOGE', 'DOGECOIN',
+                   'USDT', 'USDC', 'MATIC', 'POLYGON']
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize('NFKD', text or '').upper()
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+# =========================================
+# PRIMITIVAS
+# =========================================
+
+class TTLCache:
+    """Cache LRU thread-safe com expiração por entrada"""
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self._data: 'OrderedDict[str, Tuple[float, object]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SingleFlight:
+    """Garante uma única execução em andamento por chave"""
+
+    def __init__(self):
+        self._calls: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable) -> Tuple[object, bool]:
+        """
+        Executa fn() ou espera a execução já em andamento para a chave
+
+        Returns:
+            (resultado, shared) - shared=True quando o resultado veio de
+            outra requisição
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'event': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+
+        if not leader:
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result'], True
+
+        try:
+            call['result'] = fn()
+            return call['result'], False
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call['event'].set()
+
+
+class TokenBucketLimiter:
+    """Token bucket por cliente (capacidade = rajada, reposição contínua)"""
+
+    def __init__(self, rate_per_minute: float, burst: int, max_clients: int = 10000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: 'OrderedDict[str, List[float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, client: str, cost: float = 1.0) -> Tuple[bool, float]:
+        """Consome fichas; retorna (permitido, segundos até haver ficha)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (float(self.burst), now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[client] = [tokens, now]
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        retry_after = 0.0 if allowed else (cost - tokens) / self.rate
+        return allowed, retry_after
+
+
+# =========================================
+# ÍNDICE LOCAL DE TICKERS
+# =========================================
+
+class TickerIndex:
+    """Busca de tickers da B3 por prefixo do código ou trecho do nome"""
+
+    def __init__(self, path: str = TICKERS_FILE):
+        self.path = path
+        self.entries: List[Dict] = []
+        self._tickers: List[str] = []
+        self._by_ticker: Dict[str, Dict] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            entries = []
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for row in csv.DictReader(f, delimiter=';'):
+                        entries.append({
+                            'ticker': row['ticker'].strip().upper(),
+                            'name': row['name'].strip(),
+                            'type': row.get('type', '').strip()
+                        })
+            except FileNotFoundError:
+                logger.error(f"[ERRO] Lista de tickers não encontrada: {self.path}")
+
+            entries.sort(key=lambda e: e['ticker'])
+            for entry in entries:
+                entry['_name'] = _normalize(entry['name'])
+            self.entries = entries
+            self._tickers = [e['ticker'] for e in entries]
+            self._by_ticker = {e['ticker']: e for e in entries}
+            self._loaded = True
+            logger.info(f"[OK] Índice de tickers carregado ({len(entries)} ativos)")
+
+    def get(self, ticker: str) -> Optional[Dict]:
+        self._load()
+        return self._by_ticker.get(ticker.upper())
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Prefixo do ticker primeiro (busca binária), depois nome contendo o termo"""
+        self._load()
+        query = _normalize(query.strip())
+        if not query:
+            return []
+
+        results = []
+        seen = set()
+        start = bisect_left(self._tickers, query)
+        for ticker in self._tickers[start:]:
+            if not ticker.startswith(query) or len(results) >= limit:
+                break
+            results.append(self._by_ticker[ticker])
+            seen.add(ticker)
+
+        if len(results) < limit and len(query) >= 2:
+            for entry in self.entries:
+                if entry['ticker'] not in seen and query in entry['_name']:
+                    results.append(entry)
+                    if len(results) >= limit:
+                        break
+
+        return [{k: v for k, v in e.items() if not k.startswith('_')} for e in results]
+
+
+# =========================================
+# SERVIÇO DE COTAÇÕES
+# =========================================
+
+class QuoteService:
+    """Busca de cotações com cache, single-flight e rate limit"""
+
+    def __init__(
+        self,
+        fetcher: Callable[[str, bool], Optional[Dict]] = None,
+        ttl_seconds: int = None,
+        negative_ttl_seconds: int = None,
+        rate_per_minute: float = None,
+        burst: int = None
+    ):
+        self.fetcher = fetcher or self._fetch_from_providers
+        self.ttl = ttl_seconds or int(os.getenv('QUOTE_CACHE_TTL_SECONDS', 60))
+        self.negative_ttl = negative_ttl_seconds or int(os.getenv('QUOTE_NEGATIVE_TTL_SECONDS', 30))
+        self.cache = TTLCache(int(os.getenv('QUOTE_CACHE_MAX_SIZE', 1000)))
+        self.flights = SingleFlight()
+        self.limiter = TokenBucketLimiter(
+            rate_per_minute or float(os.getenv('QUOTE_RATE_LIMIT_PER_MINUTE', 20)),
+            burst or int(os.getenv('QUOTE_RATE_LIMIT_BURST', 5))
+        )
+        self.index = TickerIndex()
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'cache_hits': 0, 'coalesced': 0, 'fetches': 0, 'rate_limited': 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def is_crypto(ticker: str) -> bool:
+        return any(keyword in ticker for keyword in CRYPTO_KEYWORDS)
+
+    @staticmethod
+    def _fetch_from_providers(ticker: str, is_crypto: bool) -> Optional[Dict]:
+        """Cadeia de provedores (Investidor10 → Status Invest → Yahoo / CoinGecko)"""
+        from services.api_connectors import InvestmentAPIFactory
+
+        if is_crypto:
+            return InvestmentAPIFactory.get_investment_data('Criptomoedas', ticker)
+        return InvestmentAPIFactory.get_stock_with_fundamentals(ticker)
+
+    def _build_payload(self, ticker: str, is_crypto: bool, data: Optional[Dict]) -> Tuple[Dict, int]:
+        if not data or not data.get('price') or data.get('price', 0) <= 0:
+            return {
+                'success': False,
+                'error': 'Ativo não encontrado ou cotação indisponível'
+            }, 404
+
+        # Determinar tipo de ativo ('FII', 'Ação', 'crypto')
+        asset_type = data.get('asset_type', '')
+        if not asset_type:
+            known = self.index.get(ticker)
+            if is_crypto:
+                asset_type = 'crypto'
+            elif known and known['type'] in ('FII', 'Ação'):
+                asset_type = known['type']
+            elif ticker.endswith('11'):
+                asset_type = 'FII'
+            else:
+                asset_type = 'Ação'
+
+        return {
+            'success': True,
+            'ticker': ticker,
+            'name': data.get('name', ticker),
+            'price': round(data.get('price', 0), 2),
+            'change': round(data.get('change', 0), 2),
+            'change_percent': round(data.get('change_percent', 0), 2),
+            'type': 'crypto' if is_crypto else 'stock',
+            'asset_type': asset_type,
+            'currency': 'BRL'
+        }, 200
+
+    def get_quote(self, ticker: str, client: str) -> Tuple[Dict, int, str]:
+        """
+        Cotação do ticker para o cliente
+
+        Returns:
+            (payload, status HTTP, origem: HIT, MISS, COALESCED ou LIMITED)
+        """
+        ticker = ticker.strip().upper()
+        self._count('requests')
+
+        cached = self.cache.get(ticker)
+        if cached is not None:
+            self._count('cache_hits')
+            return cached[0], cached[1], 'HIT'
+
+        allowed, retry_after = self.limiter.allow(client)
+        if not allowed:
+            self._count('rate_limited')
+            return {
+                'success': False,
+                'error': 'Muitas consultas de cotação. Tente novamente em instantes.',
+                'retry_after': max(1, round(retry_after))
+            }, 429, 'LIMITED'
+
+        def fetch():
+            # Uma busca concorrente pode ter terminado entre a consulta ao cache e aqui
+            cached = self.cache.get(ticker)
+            if cached is not None:
+                return cached
+            self._count('fetches')
+            crypto = self.is_crypto(ticker)
+            result = self._build_payload(ticker, crypto, self.fetcher(ticker, crypto))
+            self.cache.set(ticker, result, self.ttl if result[1] == 200 else self.negative_ttl)
+            return result
+
+        (payload, status), shared = self.flights.do(ticker, fetch)
+        if shared:
+            self._count('coalesced')
+        return payload, status, 'COALESCED' if shared else 'MISS'
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, 'cache_size': len(self.cache), 'ttl_seconds': self.ttl}
+
+
+# Instância global
+quote_service = QuoteService()
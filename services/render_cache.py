@@ -0,0 +1,278 @@
+"""
+Render Cache - Cache de renderização das páginas pesadas
+
+- data_versions: versão por tenant incrementada por triggers em toda
+  escrita nas tabelas exibidas (transações, contas, investimentos...),
+  de qualquer caminho de código ou worker
+- {% cache 'nome', vary... %}: fragmentos Jinja guardados num LRU em
+  memória limitado por bytes, chave (usuário, tenant, versão, nome, vary)
+- cached_page: ETag por (usuário, URL, versão, build, dia); um GET com
+  If-None-Match igual responde 304 antes de executar as consultas da view
+- bytecode cache do Jinja em disco, para não recompilar os templates a
+  cada processo novo
+
+Como a versão faz parte da chave, nada precisa ser invalidado: entradas
+de versões antigas deixam de ser lidas e saem pelo LRU.
+"""
+
+import os
+import hashlib
+import logging
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+from flask import g, has_app_context, make_response, request, session
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+logger = logging.getLogger('render_cache')
+
+# Tabelas cujo conteúdo aparece nas páginas em cache (todas têm tenant_id)
+TRACKED_TABLES = (
+    'users', 'accounts', 'categories', 'cards', 'transactions',
+    'recurring_transactions', 'installments', 'investments', 'goals'
+)
+
+
+class FragmentCache:
+    """LRU de fragmentos renderizados com orçamento em bytes"""
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = max_bytes or int(os.getenv('FRAGMENT_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+        self.entries: OrderedDict = OrderedDict()  # key -> (html, tamanho)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[str]:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value: str):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old:
+                self.size -= old[1]
+            self.entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 3) if total else None
+            }
+
+
+class DataVersions:
+    """Versão dos dados por tenant, mantida por triggers no SQLite"""
+
+    def __init__(self, db_path: str = 'bws_finance.db'):
+        self.db_path = db_path
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def ensure_schema(self, conn):
+        """Cria a tabela e os triggers (uma vez por processo)"""
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS data_versions (
+                    tenant_id TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for table in TRACKED_TABLES:
+                if table not in existing:
+                    continue
+                for operation, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+                    conn.execute(f"""
+                        CREATE TRIGGER IF NOT EXISTS trg_data_version_{table}_{operation.lower()}
+                        AFTER {operation} ON {table}
+                        BEGIN
+                            INSERT INTO data_versions (tenant_id, version, updated_at)
+                            VALUES ({row}.tenant_id, 1, CURRENT_TIMESTAMP)
+                            ON CONFLICT(tenant_id) DO UPDATE SET
+                                version = version + 1,
+                                updated_at = CURRENT_TIMESTAMP;
+                        END
+                    """)
+            conn.commit()
+            self._ready = True
+            logger.info("[OK] Triggers de versão dos dados criados/verificados")
+
+    def get(self, tenant_id: str) -> int:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            self.ensure_schema(conn)
+            row = conn.execute("SELECT version FROM data_versions WHERE tenant_id = ?", (tenant_id,)).fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+
+# =========================================
+# JINJA
+# =========================================
+
+def current_scope() -> Optional[Tuple[str, str, int]]:
+    """(user_id, tenant_id, versão) da página sendo renderizada, se houver"""
+    if not has_app_context():
+        return None
+    return g.get('render_scope')
+
+
+class FragmentCacheExtension(Extension):
+    """
+    {% cache 'dashboard:tabelas', current_year, current_month %} ... {% endcache %}
+
+    Fora de uma página com cached_page (sem escopo) o bloco é renderizado
+    normalmente, sem cache.
+    """
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_cache_support', [nodes.List(parts)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _cache_support(self, parts, caller):
+        scope = current_scope()
+        if scope is None:
+            return caller()
+
+        key = scope + tuple(str(part) for part in parts)
+        html = fragment_cache.get(key)
+        if html is None:
+            html = caller()
+            fragment_cache.set(key, html)
+        return html
+
+
+def bytecode_cache() -> Optional[FileSystemBytecodeCache]:
+    """Bytecode cache em disco (JINJA_BYTECODE_CACHE_DIR); None se indisponível"""
+    directory = os.getenv('JINJA_BYTECODE_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'bws_jinja_cache')
+    try:
+        os.makedirs(directory, exist_ok=True)
+        return FileSystemBytecodeCache(directory)
+    except OSError as e:
+        logger.error(f"[ERRO] Bytecode cache do Jinja desativado: {e}")
+        return None
+
+
+# =========================================
+# ETAG / 304
+# =========================================
+
+def _build_id() -> str:
+    """Identifica a versão publicada: APP_BUILD_ID ou os arquivos de templates/static"""
+    build = os.getenv('APP_BUILD_ID')
+    if build:
+        return build
+    digest = hashlib.sha1()
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for folder in ('templates', 'static'):
+        for root, _, files in sorted(os.walk(os.path.join(base, folder))):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+    return digest.hexdigest()[:12]
+
+
+BUILD_ID = _build_id()
+
+
+def page_etag(user_id: str, version: int, path: str) -> str:
+    raw = f"{BUILD_ID}|{user_id}|{version}|{date.today().isoformat()}|{path}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def cached_page(view):
+    """
+    Decorator para GETs de páginas (usar depois de login_required)
+
+    Define o escopo dos fragmentos em flask.g e responde 304 quando o
+    navegador já tem a versão atual. A view pode marcar g.render_no_etag
+    (ex.: página de erro) para a resposta não ser validada depois.
+    """
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        user_id, tenant_id = session.get('user_id'), session.get('tenant_id')
+        if not user_id or not tenant_id:
+            return view(*args, **kwargs)
+
+        try:
+            version = data_versions.get(tenant_id)
+        except sqlite3.Error as e:
+            logger.error(f"[ERRO] Falha ao ler versão dos dados: {e}")
+            return view(*args, **kwargs)
+
+        etag = page_etag(user_id, version, request.full_path)
+        if request.method == 'GET' and request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            g.render_scope = (str(user_id), str(tenant_id), version)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or g.get('render_no_etag'):
+                return response
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+        return response
+    return decorated_function
+
+
+def get_stats() -> Dict:
+    return {'build_id': BUILD_ID, 'fragments': fragment_cache.get_stats()}
+
+
+# Instâncias globais
+fragment_cache = FragmentCache()
+data_versions = DataVersions()
@@ -0,0 +1,347 @@
+"""
+Retention - Retenção, arquivamento e compactação das tabelas de histórico
+
+notifications, notification_logs (uma linha por tentativa de envio), as
+tabelas de conversas/insights da IA e as chaves de idempotência do lote de
+transações crescem sem limite. Cada tabela tem uma
+política (idade máxima em dias, ação e filtro):
+
+- archive: move as linhas antigas, em lotes por id, para um banco de arquivo
+  anexado com ATTACH (data/archive/<banco>_archive.db)
+- compact: além de arquivar, soma as tentativas por (dia, canal, status) em
+  notification_log_daily, no banco principal
+
+Cada lote é copiado para o arquivo (INSERT OR REPLACE, commit) antes de ser
+apagado da origem em outra transação, que confere de novo o filtro: em modo
+WAL um commit com vários bancos anexados não é atômico entre os arquivos,
+então uma falha no meio deixa no máximo uma cópia duplicada, nunca perde
+linhas. A execução tem orçamento de tempo; o que sobrar fica para a próxima.
+
+Ao final, PRAGMA incremental_vacuum devolve as páginas livres ao sistema em
+fatias limitadas (bancos com auto_vacuum=INCREMENTAL; enable_incremental_vacuum
+converte um banco existente, com um VACUUM completo, uma única vez).
+"""
+
+import os
+import time
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+logger = logging.getLogger('retention')
+
+BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 1000))
+TIME_BUDGET_SECONDS = float(os.getenv('RETENTION_TIME_BUDGET_SECONDS', 60))
+VACUUM_SECONDS = float(os.getenv('RETENTION_VACUUM_SECONDS', 5))
+VACUUM_PAGES_PER_STEP = 256
+
+# database: 'app' (bws_finance.db) ou 'ai' (ai_history.db)
+# timestamp: primeira coluna existente (notification_logs tem dois schemas)
+# days <= 0 desativa a política
+RETENTION_POLICIES: List[Dict] = [
+    {
+        'table': 'notification_logs',
+        'database': 'app',
+        'timestamp': ('created_at', 'sent_at'),
+        'days': int(os.getenv('RETENTION_NOTIFICATION_LOGS_DAYS', 30)),
+        'action': 'compact',
+    },
+    {
+        'table': 'notifications',
+        'database': 'app',
+        'timestamp': ('created_at',),
+        'days': int(os.getenv('RETENTION_NOTIFICATIONS_DAYS', 180)),
+        'action': 'archive',
+        # Não lidas/pendentes ficam até o usuário ver (ou o envio sair)
+        'where': "status NOT IN ('unread', 'pending')",
+    },
+    {
+        'table': 'ai_conversations',
+        'database': 'ai',
+        'timestamp': ('timestamp',),
+        'days': int(os.getenv('RETENTION_AI_CONVERSATIONS_DAYS', 90)),
+        'action': 'archive',
+    },
+    {
+        'table': 'ai_insights',
+        'database': 'ai',
+        'timestamp': ('created_at',),
+        'days': int(os.getenv('RETENTION_AI_INSIGHTS_DAYS', 365)),
+        'action': 'archive',
+    },
+    {
+        # Chaves de idempotência do lote de transações (services/transaction_batch)
+        'table': 'transaction_idempotency_keys',
+        'database': 'app',
+        'timestamp': ('created_at',),
+        'days': int(os.getenv('RETENTION_IDEMPOTENCY_KEYS_DAYS', 30)),
+        'action': 'archive',
+    },
+]
+
+
+def _columns(conn, schema: str, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _page_stats(conn) -> Dict:
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return {
+        'page_size': page_size,
+        'pages': conn.execute("PRAGMA page_count").fetchone()[0],
+        'freelist': conn.execute("PRAGMA freelist_count").fetchone()[0],
+    }
+
+
+def incremental_vacuum(conn, max_seconds: float = VACUUM_SECONDS,
+                       pages_per_step: int = VACUUM_PAGES_PER_STEP) -> Dict:
+    """
+    Devolve páginas livres em passos de pages_per_step até esgotar a lista
+    livre ou o tempo (cada passo é uma transação curta)
+
+    Returns:
+        dict com auto_vacuum, bytes_reclaimed, freelist_before/after, seconds
+    """
+    started = time.monotonic()
+    mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    before = _page_stats(conn)
+    after = before
+
+    if mode == 2:
+        while after['freelist'] > 0 and time.monotonic() - started < max_seconds:
+            conn.execute(f"PRAGMA incremental_vacuum({int(pages_per_step)})").fetchall()
+            after = _page_stats(conn)
+    elif before['freelist']:
+        logger.info(f"[INFO] {before['freelist']} páginas livres; auto_vacuum não é INCREMENTAL "
+                    f"(use enable_incremental_vacuum)")
+
+    return {
+        'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}.get(mode, mode),
+        'bytes_reclaimed': (before['pages'] - after['pages']) * before['page_size'],
+        'freelist_before': before['freelist'],
+        'freelist_after': after['freelist'],
+        'seconds': round(time.monotonic() - started, 3)
+    }
+
+
+def enable_incremental_vacuum(db_path: str) -> Dict:
+    """Converte o banco para auto_vacuum=INCREMENTAL (VACUUM completo, bloqueante)"""
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    try:
+        size_before = _page_stats(conn)
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        size_after = _page_stats(conn)
+        logger.info(f"[OK] auto_vacuum=INCREMENTAL em {db_path}")
+        return {
+            'bytes_reclaimed': (size_before['pages'] - size_after['pages']) * size_before['page_size'],
+            'auto_vacuum': conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        }
+    finally:
+        conn.close()
+
+
+class RetentionManager:
+    """Aplica as políticas de retenção e compacta os bancos"""
+
+    def __init__(
+        self,
+        db_path: str = 'bws_finance.db',
+        ai_db_path: str = 'ai_history.db',
+        archive_dir: str = None,
+        policies: List[Dict] = None
+    ):
+        self.databases = {'app': db_path, 'ai': ai_db_path}
+        self.archive_dir = archive_dir or os.getenv('RETENTION_ARCHIVE_DIR', os.path.join('data', 'archive'))
+        self.policies = policies if policies is not None else RETENTION_POLICIES
+
+    def archive_path(self, db_path: str) -> str:
+        name = os.path.splitext(os.path.basename(db_path))[0]
+        return os.path.join(self.archive_dir, f"{name}_archive.db")
+
+    def _connect(self, db_path: str):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30.0, isolation_level=None)
+        conn.execute("ATTACH DATABASE ? AS archive", (self.archive_path(db_path),))
+        return conn
+
+    # =====================================================
+    # SCHEMA
+    # =====================================================
+
+    @staticmethod
+    def _prepare_archive(conn, table: str) -> List[str]:
+        """Cria/estende archive.<table> com as colunas da origem; retorna as colunas"""
+        columns = _columns(conn, 'main', table)
+        archived = _columns(conn, 'archive', table)
+        if not archived:
+            conn.execute(f"CREATE TABLE archive.{table} AS SELECT * FROM main.{table} WHERE 0")
+            conn.execute(f"CREATE UNIQUE INDEX archive.idx_{table}_archive_id ON {table}(id)")
+        else:
+            for column in columns:
+                if column not in archived:
+                    conn.execute(f"ALTER TABLE archive.{table} ADD COLUMN {column}")
+        return columns
+
+    @staticmethod
+    def _ensure_daily_table(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS main.notification_log_daily (
+                day TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, channel, status)
+            ) WITHOUT ROWID
+        """)
+
+    # =====================================================
+    # ARQUIVAMENTO
+    # =====================================================
+
+    def apply_policy(self, conn, policy: Dict, now: datetime = None,
+                     batch_size: int = BATCH_SIZE, deadline: float = None) -> Dict:
+        """
+        Move as linhas vencidas de uma tabela para o arquivo, em lotes por id
+
+        Returns:
+            dict com table, action, archived, compacted (grupos diários), done
+        """
+        table = policy['table']
+        result = {'table': table, 'action': policy['action'], 'archived': 0, 'compacted': 0, 'done': True}
+
+        columns = _columns(conn, 'main', table)
+        timestamp = next((c for c in policy['timestamp'] if c in columns), None)
+        if timestamp is None or policy['days'] <= 0:
+            return result
+
+        cutoff = ((now or datetime.now()) - timedelta(days=policy['days'])).strftime('%Y-%m-%d %H:%M:%S')
+        expired = f"{timestamp} < ?" + (f" AND {policy['where']}" if policy.get('where') else '')
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = self._prepare_archive(conn, table)
+            if policy['action'] == 'compact':
+                self._ensure_daily_table(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        column_list = ', '.join(columns)
+        last_id = 0
+        while True:
+            if deadline is not None and time.monotonic() >= deadline:
+                result['done'] = False
+                break
+
+            ids = [row[0] for row in conn.execute(f"""
+                SELECT id FROM main.{table}
+                WHERE id > ? AND {expired}
+                ORDER BY id
+                LIMIT ?
+            """, (last_id, cutoff, batch_size))]
+            if not ids:
+                break
+            low, high = ids[0], ids[-1]
+            batch = f"id BETWEEN ? AND ? AND {expired}"
+
+            # 1) cópia para o arquivo (commit próprio)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO archive.{table} ({column_list})
+                    SELECT {column_list} FROM main.{table} WHERE {batch}
+                """, (low, high, cutoff))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            # 2) agregação diária + remoção, só no banco principal (atômico)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                archived_only = f"{batch} AND id IN (SELECT id FROM archive.{table} WHERE id BETWEEN ? AND ?)"
+                params = (low, high, cutoff, low, high)
+                if policy['action'] == 'compact':
+                    cursor = conn.execute(f"""
+                        INSERT INTO main.notification_log_daily (day, channel, status, attempts)
+                        SELECT substr({timestamp}, 1, 10), COALESCE(channel, ''), COALESCE(status, ''), COUNT(*)
+                        FROM main.{table}
+                        WHERE {archived_only}
+                        GROUP BY 1, 2, 3
+                        ON CONFLICT(day, channel, status) DO UPDATE SET
+                            attempts = attempts + excluded.attempts
+                    """, params)
+                    result['compacted'] += cursor.rowcount
+                cursor = conn.execute(f"DELETE FROM main.{table} WHERE {archived_only}", params)
+                result['archived'] += cursor.rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            last_id = high
+        return result
+
+    def run(self, now: datetime = None, batch_size: int = BATCH_SIZE,
+            time_budget: float = TIME_BUDGET_SECONDS, vacuum_seconds: float = VACUUM_SECONDS) -> Dict:
+        """
+        Aplica todas as políticas e compacta os bancos tocados
+
+        Returns:
+            dict com tables (resultado por política), vacuum (por banco),
+            archived, bytes_reclaimed, done e seconds
+        """
+        started = time.monotonic()
+        deadline = started + time_budget
+        report = {'tables': [], 'vacuum': {}, 'archived': 0, 'bytes_reclaimed': 0, 'done': True}
+
+        for database, db_path in self.databases.items():
+            policies = [p for p in self.policies if p['database'] == database]
+            if not policies or not os.path.exists(db_path):
+                continue
+
+            conn = self._connect(db_path)
+            try:
+                existing = {row[0] for row in conn.execute(
+                    "SELECT name FROM main.sqlite_master WHERE type = 'table'")}
+                for policy in policies:
+                    if policy['table'] not in existing:
+                        continue
+                    try:
+                        result = self.apply_policy(conn, policy, now, batch_size, deadline)
+                    except Exception as e:
+                        logger.error(f"[ERRO] Retenção de {policy['table']}: {e}")
+                        result = {'table': policy['table'], 'action': policy['action'],
+                                  'archived': 0, 'compacted': 0, 'done': False, 'error': str(e)}
+                    report['tables'].append(result)
+                    report['archived'] += result['archived']
+                    report['done'] = report['done'] and result['done']
+
+                vacuum = incremental_vacuum(conn, vacuum_seconds)
+                report['vacuum'][db_path] = vacuum
+                report['bytes_reclaimed'] += vacuum['bytes_reclaimed']
+            finally:
+                conn.close()
+
+        report['seconds'] = round(time.monotonic() - started, 3)
+        logger.info(f"[OK] Retenção: {report['archived']} linhas arquivadas, "
+                    f"{report['bytes_reclaimed']} bytes devolvidos em {report['seconds']}s")
+        return report
+
+
+def run_nightly_retention() -> Dict:
+    """Job noturno: arquiva, compacta e devolve espaço (dentro do orçamento de tempo)"""
+    report = retention_manager.run()
+    return {
+        'archived': report['archived'],
+        'bytes_reclaimed': report['bytes_reclaimed'],
+        'done': report['done'],
+        'seconds': report['seconds']
+    }
+
+
+# Instância global
+retention_manager = RetentionManager()
@@ -0,0 +1,222 @@
+"""
+Spending Features - Extração de atributos de gastos em uma única leitura
+
+Carrega a janela recente (padrão: 120 dias) das transações pagas de um ou
+vários usuários com uma consulta e guarda cada usuário em arrays colunares
+(datas, valores, tipo, categoria, descrição). Os atributos usados pelos
+insights da NotificationAI saem de uma única passada sobre essas colunas:
+
+- duplicidades (mesma descrição, valor e dia)
+- total do período atual x anterior e o mesmo por categoria
+- gastos fora da curva por escore robusto (mediana/MAD dos últimos 90 dias)
+- receitas, despesas e top categorias do mês (taxa de poupança)
+"""
+
+from array import array
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from statistics import median
+from typing import Dict, Iterable, List, Optional
+
+WINDOW_DAYS = 120
+OUTLIER_DAYS = 90
+RECENT_DAYS = 7
+MIN_OUTLIER_SAMPLES = 10
+OUTLIER_SCORE = 3.5      # escore z modificado (Iglewicz-Hoaglin)
+BATCH_SIZE = 500         # usuários por consulta no modo em lote
+
+
+class UserColumns:
+    """Transações pagas de um usuário na janela, em colunas (ordem cronológica)"""
+
+    __slots__ = ('ids', 'dates', 'values', 'is_expense', 'categories', 'descriptions')
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.dates: List[str] = []
+        self.values = array('d')
+        self.is_expense = bytearray()
+        self.categories: List[Optional[str]] = []
+        self.descriptions: List[str] = []
+
+    def append(self, transaction_id, day, value, transaction_type, category, description):
+        self.ids.append(transaction_id)
+        self.dates.append(str(day)[:10])
+        self.values.append(value or 0.0)
+        self.is_expense.append(transaction_type == 'Despesa')
+        self.categories.append(category)
+        self.descriptions.append(description)
+
+    def __len__(self):
+        return len(self.values)
+
+
+def window_start(today: date, days: int = 30, window_days: int = WINDOW_DAYS) -> date:
+    """Início da janela que cobre todos os atributos (2 períodos, 90 dias e o mês)"""
+    return min(today - timedelta(days=max(window_days, days * 2, OUTLIER_DAYS)), today.replace(day=1))
+
+
+def load_columns(conn, user_ids: Iterable[str], start: date) -> Dict[str, UserColumns]:
+    """
+    Lê as transações pagas (Receita/Despesa) de vários usuários com uma consulta
+
+    Returns:
+        dict: user_id -> UserColumns (usuários sem transações ficam vazios)
+    """
+    user_ids = list(user_ids)
+    columns = {user_id: UserColumns() for user_id in user_ids}
+    if not user_ids:
+        return columns
+
+    placeholders = ','.join('?' * len(user_ids))
+    rows = conn.execute(f"""
+        SELECT t.user_id, t.id, t.date, t.value, t.type, c.name, t.description
+        FROM transactions t
+        LEFT JOIN categories c ON t.category_id = c.id
+        WHERE t.user_id IN ({placeholders})
+          AND t.date >= ?
+          AND t.status = 'Pago'
+          AND t.type IN ('Receita', 'Despesa')
+        ORDER BY t.user_id, t.date
+    """, user_ids + [start.isoformat()])
+
+    for row in rows:
+        columns[row[0]].append(*row[1:])
+    return columns
+
+
+def robust_scores(values: List[float]) -> Dict:
+    """
+    Mediana, MAD e função de escore z modificado (0.6745 * (x - mediana) / MAD)
+
+    Com MAD zero (metade ou mais dos gastos com o mesmo valor), usa o desvio
+    absoluto médio escalado, como sugerido por Iglewicz e Hoaglin.
+    """
+    center = median(values)
+    deviations = [abs(value - center) for value in values]
+    mad = median(deviations)
+    if mad > 0:
+        scale = mad / 0.6745
+    else:
+        scale = 1.253314 * (sum(deviations) / len(deviations))
+    return {
+        'median': center,
+        'mad': mad,
+        'score': (lambda value: (value - center) / scale) if scale > 0 else (lambda value: 0.0)
+    }
+
+
+def extract(cols: UserColumns, today: Optional[date] = None, days: int = 30) -> Dict:
+    """
+    Calcula todos os atributos de um usuário em uma passada pelas colunas
+
+    Args:
+        cols: Colunas do usuário (load_columns)
+        today: Data de referência (padrão: hoje)
+        days: Tamanho do período atual/anterior em dias
+
+    Returns:
+        dict com duplicates, period, categories, outliers, month
+    """
+    today = today or date.today()
+    start_current = (today - timedelta(days=days)).isoformat()
+    start_previous = (today - timedelta(days=days * 2)).isoformat()
+    start_outlier = (today - timedelta(days=OUTLIER_DAYS)).isoformat()
+    start_recent = (today - timedelta(days=RECENT_DAYS)).isoformat()
+    month_start = today.replace(day=1).isoformat()
+
+    current_total = previous_total = 0.0
+    current_by_category: Dict[str, float] = defaultdict(float)
+    previous_by_category: Dict[str, float] = defaultdict(float)
+    duplicates = Counter()
+    outlier_values: List[float] = []
+    recent: List[int] = []
+    month_income = month_expenses = 0.0
+    month_expense_count = 0
+    month_by_category: Dict[str, float] = defaultdict(float)
+
+    for i in range(len(cols)):
+        day, value, category = cols.dates[i], cols.values[i], cols.categories[i]
+
+        if not cols.is_expense[i]:
+            if day >= month_start:
+                month_income += value
+            continue
+
+        if day >= start_current:
+            current_total += value
+            duplicates[(cols.descriptions[i], value, day)] += 1
+            if category is not None:
+                current_by_category[category] += value
+        elif day >= start_previous:
+            previous_total += value
+            if category is not None:
+                previous_by_category[category] += value
+
+        if day >= start_outlier:
+            outlier_values.append(value)
+            if day >= start_recent:
+                recent.append(i)
+
+        if day >= month_start:
+            month_expenses += value
+            month_expense_count += 1
+            if category is not None:
+                month_by_category[category] += value
+
+    outliers = []
+    stats = None
+    if len(outlier_values) >= MIN_OUTLIER_SAMPLES:
+        stats = robust_scores(outlier_values)
+        for i in recent:
+            score = stats['score'](cols.values[i])
+            if score > OUTLIER_SCORE:
+                outliers.append({
+                    'id': cols.ids[i],
+                    'description': cols.descriptions[i],
+                    'value': cols.values[i],
+                    'date': cols.dates[i],
+                    'category': cols.categories[i],
+                    'score': round(score, 2)
+                })
+        outliers.sort(key=lambda item: item['value'], reverse=True)
+
+    return {
+        'duplicates': [
+            {'description': description, 'value': value, 'date': day, 'count': count}
+            for (description, value, day), count in duplicates.items() if count > 1
+        ],
+        'period': {'current': current_total, 'previous': previous_total},
+        'categories': {
+            'current': dict(current_by_category),
+            'previous': dict(previous_by_category)
+        },
+        'outliers': {
+            'samples': len(outlier_values),
+            'median': stats['median'] if stats else None,
+            'mad': stats['mad'] if stats else None,
+            'items': outliers
+        },
+        'month': {
+            'income': month_income,
+            'expenses': month_expenses,
+            'net': month_income - month_expenses,
+            'savings_rate': ((month_income - month_expenses) / month_income * 100) if month_income > 0 else None,
+            'expense_count': month_expense_count,
+            'top_categories': sorted(month_by_category.items(), key=lambda item: item[1], reverse=True)
+        }
+    }
+
+
+def extract_many(conn, user_ids: Iterable[str], today: Optional[date] = None, days: int = 30,
+                 batch_size: int = BATCH_SIZE) -> Dict[str, Dict]:
+    """Atributos de vários usuários, uma consulta por lote de batch_size usuários"""
+    today = today or date.today()
+    start = window_start(today, days)
+    user_ids = list(user_ids)
+    features = {}
+    for offset in range(0, len(user_ids), batch_size):
+        for user_id, cols in load_columns(conn, user_ids[offset:offset + batch_size], start).items():
+            features[user_id] = extract(cols, today, days)
+    return features
+
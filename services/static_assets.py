@@ -0,0 +1,199 @@
+"""
+Static Assets - Arquivos estáticos com fingerprint
+
+O build (scripts/build_assets.py) copia cada arquivo de static/ para
+static/dist/ com o hash do conteúdo no nome (js/live-updates.1a2b3c4d5e.js),
+gera as variantes .gz/.br dos arquivos de texto e grava o manifesto
+static/dist/assets-manifest.json (nome original -> nome com hash).
+
+- asset_url('js/live-updates.js'): URL com fingerprint; sem build, cai no
+  url_for('static') normal
+- /static/dist/<arquivo>: servido com Cache-Control imutável de 1 ano e a
+  variante pré-comprimida que o navegador aceitar
+- /service-worker.js: gerado a partir do manifesto (precache só dos
+  arquivos com fingerprint)
+"""
+
+import os
+import io
+import gzip
+import json
+import shutil
+import hashlib
+import logging
+import mimetypes
+import threading
+from typing import Dict, Optional
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+    BROTLI_SUPPORT = True
+except ImportError:
+    BROTLI_SUPPORT = False
+
+logger = logging.getLogger('static_assets')
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_NAME = 'assets-manifest.json'
+
+# Não entram no build: saída do próprio build, uploads de usuários e páginas utilitárias
+SKIP_DIRS = {'dist', 'uploads'}
+SKIP_FILES = {'generate-icons.html'}
+
+COMPRESSIBLE = {'.css', '.js', '.json', '.svg', '.html', '.txt', '.map'}
+MIN_COMPRESS_BYTES = 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+# =========================================
+# BUILD
+# =========================================
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def fingerprinted_name(relative_path: str, digest: str) -> str:
+    root, ext = os.path.splitext(relative_path)
+    return f"{root}.{digest}{ext}"
+
+
+def _write_compressed(path: str, data: bytes) -> Dict[str, int]:
+    """Grava .gz (e .br, se disponível) quando compensa; retorna os tamanhos"""
+    sizes = {}
+    buffer = io.BytesIO()
+    # mtime=0: mesma entrada gera o mesmo .gz em todo build
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9, mtime=0) as gz:
+        gz.write(data)
+    variants = [('gz', buffer.getvalue())]
+    if BROTLI_SUPPORT:
+        variants.append(('br', brotli.compress(data, quality=11)))
+
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(f"{path}.{suffix}", 'wb') as f:
+                f.write(compressed)
+            sizes[suffix] = len(compressed)
+    return sizes
+
+
+def build(static_dir: str = STATIC_DIR, dist_dir: str = None) -> Dict:
+    """
+    Gera static/dist do zero
+
+    Returns:
+        manifesto {'version', 'assets': {original: com hash}, 'sizes': {...}}
+    """
+    dist_dir = dist_dir or os.path.join(static_dir, 'dist')
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.makedirs(dist_dir)
+
+    assets, sizes = {}, {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if not (root == static_dir and d in SKIP_DIRS))
+        for name in sorted(files):
+            if name in SKIP_FILES:
+                continue
+            source = os.path.join(root, name)
+            relative = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+
+            hashed = fingerprinted_name(relative, content_hash(data))
+            target = os.path.join(dist_dir, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+
+            assets[relative] = hashed
+            sizes[hashed] = {'raw': len(data)}
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE and len(data) >= MIN_COMPRESS_BYTES:
+                sizes[hashed].update(_write_compressed(target, data))
+
+    version = content_hash(json.dumps(assets, sort_keys=True).encode())
+    manifest = {'version': version, 'assets': assets, 'sizes': sizes}
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    logger.info(f"[OK] {len(assets)} assets gerados em {dist_dir} (versão {version})")
+    return manifest
+
+
+# =========================================
+# RUNTIME
+# =========================================
+
+class AssetManifest:
+    """Manifesto carregado uma vez por processo (o build roda antes do servidor)"""
+
+    def __init__(self, dist_dir: str = DIST_DIR):
+        self.dist_dir = dist_dir
+        self._data: Optional[Dict] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict:
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    path = os.path.join(self.dist_dir, MANIFEST_NAME)
+                    try:
+                        with open(path, 'r', encoding='utf-8') as f:
+                            self._data = json.load(f)
+                    except (OSError, ValueError):
+                        logger.info("[OK] Sem static/dist: assets servidos sem fingerprint")
+                        self._data = {'version': 'dev', 'assets': {}}
+        return self._data
+
+    def reload(self):
+        with self._lock:
+            self._data = None
+
+    @property
+    def version(self) -> str:
+        return self.load()['version']
+
+    def resolve(self, filename: str) -> Optional[str]:
+        return self.load()['assets'].get(filename)
+
+
+def asset_url(filename: str) -> str:
+    """url_for('static') com fingerprint quando o build existe"""
+    hashed = manifest.resolve(filename)
+    if hashed:
+        return url_for('static', filename=f"dist/{hashed}")
+    return url_for('static', filename=filename)
+
+
+def send_asset(filename: str):
+    """Serve um arquivo de static/dist com cache imutável e pré-compressão"""
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for candidate, suffix in (('br', 'br'), ('gzip', 'gz')):
+        if request.accept_encodings[candidate] and os.path.isfile(os.path.join(DIST_DIR, f"{filename}.{suffix}")):
+            encoding, filename = candidate, f"{filename}.{suffix}"
+            break
+
+    response = send_from_directory(DIST_DIR, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def service_worker_context() -> Dict:
+    """Variáveis para templates/service-worker.js"""
+    data = manifest.load()
+    return {
+        'asset_version': data['version'],
+        'precache': [url_for('static', filename=f"dist/{hashed}") for hashed in sorted(data['assets'].values())]
+    }
+
+
+# Instância global
+manifest = AssetManifest()
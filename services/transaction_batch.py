@@ -0,0 +1,314 @@
+"""
+Transaction Batch - Escrita de transações em lote com chaves de idempotência
+
+POST /api/transactions/batch recebe uma lista de operações:
+
+    [
+        {"op": "create", "idempotency_key": "pwa-123", "data": {"account_id": ..., "type": "Despesa",
+                                                              "description": ..., "value": 50, "date": "2025-06-01"}},
+        {"op": "update", "idempotency_key": "pwa-124", "id": "<transaction_id>", "data": {"value": 60}},
+        {"op": "delete", "idempotency_key": "pwa-125", "id": "<transaction_id>"}
+    ]
+
+- o lote inteiro é validado antes de qualquer escrita (campos, contas,
+  cartões e categorias do usuário, chaves e ids repetidos); com erro, nada
+  é gravado e a resposta lista os erros por item
+- as operações novas são aplicadas em uma única transação SQLite pela
+  UnitOfWork: executemany por tipo de operação, saldo de cada conta
+  ajustado uma vez no commit; faturas do cartão e versão dos dados seguem
+  pelos triggers na mesma transação
+- cada resultado fica gravado com a chave de idempotência do cliente
+  (transaction_idempotency_keys); reenviar a mesma chave devolve o
+  resultado original sem aplicar de novo
+"""
+
+import os
+import json
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from services import metrics
+from services.transaction_service import TransactionService, check_high_expense, transaction_service
+
+logger = logging.getLogger('transaction_batch')
+
+MAX_BATCH_ITEMS = int(os.getenv('TRANSACTION_BATCH_MAX_ITEMS', 500))
+MAX_KEY_LENGTH = 200
+
+OPERATIONS = ('create', 'update', 'delete')
+TRANSACTION_TYPES = ('Receita', 'Despesa')
+TRANSACTION_STATUSES = ('Pendente', 'Pago')
+
+# Campos aceitos em data (create/update)
+FIELDS = ('account_id', 'category_id', 'card_id', 'type', 'description', 'value',
+          'date', 'status', 'is_fixed', 'payment_method')
+REQUIRED_ON_CREATE = ('account_id', 'type', 'description', 'value', 'date')
+
+IDEMPOTENCY_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS transaction_idempotency_keys (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        idempotency_key TEXT NOT NULL,
+        op TEXT NOT NULL,
+        transaction_id TEXT,
+        result TEXT NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (user_id, idempotency_key)
+    );
+    CREATE INDEX IF NOT EXISTS idx_transaction_idempotency_created
+        ON transaction_idempotency_keys(created_at);
+"""
+
+
+class BatchValidationError(Exception):
+    """Lote rejeitado antes de qualquer escrita (errors: [{'index', 'error'}])"""
+
+    def __init__(self, errors: List[Dict]):
+        super().__init__(f"{len(errors)} operações inválidas")
+        self.errors = errors
+
+
+def _clean_fields(data: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+    """Normaliza os campos de data; retorna (campos, erro)"""
+    unknown = sorted(set(data) - set(FIELDS))
+    if unknown:
+        return None, f"Campos não suportados: {', '.join(unknown)}"
+
+    fields = dict(data)
+    for key in ('account_id', 'category_id', 'card_id'):
+        if key in fields:
+            fields[key] = fields[key] or None
+    if 'account_id' in fields and not fields['account_id']:
+        return None, 'account_id é obrigatório'
+    if 'type' in fields and fields['type'] not in TRANSACTION_TYPES:
+        return None, f"type deve ser {' ou '.join(TRANSACTION_TYPES)}"
+    if 'status' in fields and fields['status'] not in TRANSACTION_STATUSES:
+        return None, f"status deve ser {' ou '.join(TRANSACTION_STATUSES)}"
+    if 'description' in fields:
+        if not isinstance(fields['description'], str) or not fields['description'].strip():
+            return None, 'description é obrigatória'
+        fields['description'] = fields['description'].strip()
+    if 'value' in fields:
+        try:
+            fields['value'] = round(float(fields['value']), 2)
+        except (TypeError, ValueError):
+            return None, 'value deve ser numérico'
+        if fields['value'] <= 0:
+            return None, 'value deve ser maior que zero'
+    if 'date' in fields:
+        try:
+            datetime.strptime(str(fields['date']), '%Y-%m-%d')
+        except ValueError:
+            return None, 'date deve estar no formato AAAA-MM-DD'
+    if 'is_fixed' in fields:
+        fields['is_fixed'] = bool(fields['is_fixed'])
+    return fields, None
+
+
+class TransactionBatchService:
+    """Validação e aplicação de lotes de create/update/delete de transações"""
+
+    def __init__(self, db_path: str = 'bws_finance.db', transactions: TransactionService = None):
+        self.db_path = db_path
+        self.transactions = transactions or transaction_service
+        self._schema_ready = False
+
+    def get_db(self):
+        conn = metrics.connect(self.db_path, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def ensure_schema(self, conn):
+        """Cria a tabela de chaves de idempotência (uma vez por processo)"""
+        if self._schema_ready:
+            return
+        conn.executescript(IDEMPOTENCY_SCHEMA)
+        self._schema_ready = True
+
+    # =====================================================
+    # VALIDAÇÃO
+    # =====================================================
+
+    @staticmethod
+    def _owned_ids(conn, sql: str, ids: set, owner: str) -> set:
+        if not ids:
+            return set()
+        ids = list(ids)
+        placeholders = ','.join('?' * len(ids))
+        return {row[0] for row in conn.execute(sql.format(placeholders=placeholders), ids + [owner])}
+
+    def validate(self, conn, user_id: str, tenant_id: str, operations) -> List[Dict]:
+        """
+        Valida o lote inteiro (formato, campos e posse das contas, cartões e
+        categorias); só consulta o banco uma vez por tipo de entidade
+
+        Returns:
+            Lista de operações normalizadas (index, op, key, id, fields)
+
+        Raises:
+            BatchValidationError: com os erros por item
+        """
+        if not isinstance(operations, list) or not operations:
+            raise BatchValidationError([{'index': None, 'error': 'Envie uma lista de operações'}])
+        if len(operations) > MAX_BATCH_ITEMS:
+            raise BatchValidationError([{'index': None, 'error': f'Máximo de {MAX_BATCH_ITEMS} operações por lote'}])
+
+        errors, items = [], []
+        keys, target_ids = set(), set()
+        for index, raw in enumerate(operations):
+            if not isinstance(raw, dict):
+                errors.append({'index': index, 'error': 'Operação deve ser um objeto'})
+                continue
+            op = raw.get('op')
+            key = raw.get('idempotency_key')
+            if op not in OPERATIONS:
+                errors.append({'index': index, 'error': f"op deve ser {', '.join(OPERATIONS)}"})
+                continue
+            if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH:
+                errors.append({'index': index, 'error': f'idempotency_key obrigatória (até {MAX_KEY_LENGTH} caracteres)'})
+                continue
+            if key in keys:
+                errors.append({'index': index, 'error': 'idempotency_key repetida no lote'})
+                continue
+            keys.add(key)
+
+            item = {'index': index, 'op': op, 'key': key, 'id': None, 'fields': {}}
+            if op in ('update', 'delete'):
+                item['id'] = raw.get('id')
+                if not item['id'] or not isinstance(item['id'], str):
+                    errors.append({'index': index, 'error': 'id da transação é obrigatório'})
+                    continue
+                if item['id'] in target_ids:
+                    errors.append({'index': index, 'error': 'Transação repetida no lote'})
+                    continue
+                target_ids.add(item['id'])
+
+            if op in ('create', 'update'):
+                data = raw.get('data')
+                if not isinstance(data, dict) or not data:
+                    errors.append({'index': index, 'error': 'data é obrigatório'})
+                    continue
+                fields, error = _clean_fields(data)
+                if error is None and op == 'create':
+                    missing = [field for field in REQUIRED_ON_CREATE if not fields.get(field)]
+                    if missing:
+                        error = f"Campos obrigatórios: {', '.join(missing)}"
+                    elif fields.get('payment_method') == 'credito' and not fields.get('card_id'):
+                        error = 'Transações no crédito precisam de card_id'
+                if error:
+                    errors.append({'index': index, 'error': error})
+                    continue
+                item['fields'] = fields
+            items.append(item)
+
+        # Posse das entidades referenciadas: uma consulta por tipo
+        referenced = {key: {item['fields'][key] for item in items if item['fields'].get(key)}
+                      for key in ('account_id', 'card_id', 'category_id')}
+        owned = {
+            'account_id': self._owned_ids(conn, "SELECT id FROM accounts WHERE id IN ({placeholders}) AND user_id = ?",
+                                          referenced['account_id'], user_id),
+            'card_id': self._owned_ids(conn, "SELECT id FROM cards WHERE id IN ({placeholders}) AND user_id = ?",
+                                       referenced['card_id'], user_id),
+            'category_id': self._owned_ids(conn, "SELECT id FROM categories WHERE id IN ({placeholders}) AND tenant_id = ?",
+                                           referenced['category_id'], tenant_id),
+        }
+        for item in items:
+            for key, allowed in owned.items():
+                value = item['fields'].get(key)
+                if value and value not in allowed:
+                    errors.append({'index': item['index'], 'error': f'{key} não encontrado'})
+                    break
+
+        if errors:
+            raise BatchValidationError(sorted(errors, key=lambda e: e['index']))
+        return items
+
+    # =====================================================
+    # APLICAÇÃO
+    # =====================================================
+
+    @staticmethod
+    def _stored_results(conn, user_id: str, keys: List[str]) -> Dict[str, Dict]:
+        stored = {}
+        for offset in range(0, len(keys), 500):
+            chunk = keys[offset:offset + 500]
+            rows = conn.execute(f"""
+                SELECT idempotency_key, result FROM transaction_idempotency_keys
+                WHERE user_id = ? AND idempotency_key IN ({','.join('?' * len(chunk))})
+            """, [user_id] + chunk)
+            for row in rows:
+                stored[row['idempotency_key']] = json.loads(row['result'])
+        return stored
+
+    def apply(self, user_id: str, tenant_id: str, operations) -> Dict:
+        """
+        Valida e aplica o lote em uma única transação
+
+        Returns:
+            dict com results (um por operação, na ordem recebida), applied e replayed
+
+        Raises:
+            BatchValidationError: lote inválido (nada é gravado)
+        """
+        conn = self.get_db()
+        try:
+            self.ensure_schema(conn)
+            items = self.validate(conn, user_id, tenant_id, operations)
+
+            with self.transactions.unit_of_work(conn) as uow:
+                # Serializa lotes concorrentes: a consulta das chaves e a gravação ficam na mesma transação
+                conn.execute("BEGIN IMMEDIATE")
+                stored = self._stored_results(conn, user_id, [item['key'] for item in items])
+                pending = [item for item in items if item['key'] not in stored]
+                results = {}
+
+                deletes = [item for item in pending if item['op'] == 'delete']
+                found = uow.delete_many([item['id'] for item in deletes], user_id)
+                for item in deletes:
+                    results[item['index']] = ({'status': 200, 'id': item['id']} if item['id'] in found
+                                              else {'status': 404, 'id': item['id'], 'error': 'Transação não encontrada'})
+
+                updates = [item for item in pending if item['op'] == 'update']
+                found = uow.update_many([(item['id'], item['fields']) for item in updates], user_id)
+                for item in updates:
+                    results[item['index']] = ({'status': 200, 'id': item['id']} if item['id'] in found
+                                              else {'status': 404, 'id': item['id'], 'error': 'Transação não encontrada'})
+
+                creates = [item for item in pending if item['op'] == 'create']
+                now = datetime.now()
+                rows = []
+                for item in creates:
+                    row = {'status': 'Pago', 'is_fixed': False, 'payment_method': 'debito', **item['fields']}
+                    row.update(user_id=user_id, tenant_id=tenant_id,
+                               paid_at=now if row['status'] == 'Pago' else None)
+                    rows.append(row)
+                for item, row, transaction_id in zip(creates, rows, uow.add_many(rows)):
+                    results[item['index']] = {'status': 201, 'id': transaction_id}
+                    if row['type'] == 'Despesa':
+                        uow.after_commit(check_high_expense, user_id, tenant_id, row['value'], row['description'])
+
+                conn.executemany("""
+                    INSERT INTO transaction_idempotency_keys (user_id, idempotency_key, op, transaction_id, result)
+                    VALUES (?, ?, ?, ?, ?)
+                """, [(user_id, item['key'], item['op'], results[item['index']].get('id'),
+                       json.dumps(results[item['index']])) for item in pending])
+
+            output = []
+            for item in items:
+                if item['key'] in stored:
+                    result = dict(stored[item['key']], replayed=True)
+                else:
+                    result = dict(results[item['index']], replayed=False)
+                output.append({'index': item['index'], 'op': item['op'],
+                               'idempotency_key': item['key'], **result})
+
+            logger.info(f"[OK] Lote de {len(items)} operações ({len(pending)} aplicadas) para {user_id}")
+            return {'results': output, 'applied': len(pending), 'replayed': len(items) - len(pending)}
+        finally:
+            conn.close()
+
+
+# Instância global
+transaction_batch = TransactionBatchService()
@@ -0,0 +1,212 @@
+"""
+Transaction Queries - Listagem de transações paginada por cursor (keyset)
+
+Em vez de LIMIT/OFFSET (que relê todas as linhas anteriores a cada página),
+cada página continua a partir da última linha vista, usando a chave de
+ordenação (date, created_at, id). Com os índices de
+migrations/add_transactions_keyset_indexes.sql, buscar a página N custa o
+mesmo que buscar a primeira.
+
+Totais e contagem dos filtros ativos são calculados em uma única agregação
+SQL, e só quando pedidos (a rolagem infinita não os recalcula).
+"""
+
+import os
+import json
+import base64
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger('transaction_queries')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+MIGRATION_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'migrations', 'add_transactions_keyset_indexes.sql'
+)
+
+_indexes_ready = set()
+_indexes_lock = threading.Lock()
+
+PAGE_COLUMNS = """
+    t.id,
+    t.description,
+    t.value,
+    t.type,
+    t.date,
+    t.created_at,
+    t.status,
+    t.account_id,
+    t.category_id,
+    t.is_fixed,
+    t.card_id,
+    c.name as category_name,
+    c.icon as category_icon,
+    c.color as category_color,
+    cards.name as card_name
+"""
+
+
+def ensure_indexes(db, db_path: str = None):
+    """
+    Aplica a migração dos índices de keyset uma vez por processo e arquivo
+    de banco (se falhar, a próxima chamada tenta de novo)
+    """
+    if db_path is None:
+        db_path = db.execute("PRAGMA database_list").fetchone()[2]
+    if db_path in _indexes_ready:
+        return
+    with _indexes_lock:
+        if db_path in _indexes_ready:
+            return
+        try:
+            with open(MIGRATION_PATH, 'r', encoding='utf-8') as f:
+                db.executescript(f.read())
+            db.commit()
+            logger.info("[OK] Índices de paginação de transações criados/verificados")
+        except Exception as e:
+            logger.error(f"[ERRO] Falha ao criar índices de paginação: {e}")
+            return
+        _indexes_ready.add(db_path)
+
+
+def clamp_limit(limit) -> int:
+    """Tamanho de página dentro de 1..MAX_PAGE_SIZE"""
+    return max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+
+
+def encode_cursor(row) -> str:
+    """Cursor opaco a partir da última linha da página"""
+    raw = json.dumps([row['date'], row['created_at'], row['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[str, str, str]]:
+    """Decodifica o cursor; retorna None se estiver ausente ou inválido"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        date, created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return str(date), str(created_at), str(row_id)
+    except Exception:
+        return None
+
+
+def parse_filters(args) -> Dict:
+    """Extrai os filtros suportados de request.args"""
+    return {
+        'type': args.get('type', ''),
+        'category': args.get('category', ''),
+        'account_id': args.get('account_id', ''),
+        'card_id': args.get('card_id', ''),
+        'start_date': args.get('start_date', '') or args.get('date_from', ''),
+        'end_date': args.get('end_date', '') or args.get('date_to', ''),
+    }
+
+
+def build_where(user_id: Optional[str], tenant_id: str, filters: Dict) -> Tuple[str, List]:
+    """Monta a cláusula WHERE (prefixo t.) para os filtros ativos
+
+    Com user_id None o escopo é o tenant inteiro (exportações de admin).
+    """
+    clauses = ["t.tenant_id = ?"]
+    params: List = [tenant_id]
+
+    if user_id is not None:
+        clauses.insert(0, "t.user_id = ?")
+        params.insert(0, user_id)
+
+    if filters.get('type'):
+        clauses.append("t.type = ?")
+        params.append(filters['type'])
+
+    if filters.get('category'):
+        clauses.append("t.category_id = ?")
+        params.append(filters['category'])
+
+    if filters.get('account_id'):
+        clauses.append("t.account_id = ?")
+        params.append(filters['account_id'])
+
+    if filters.get('card_id'):
+        clauses.append("t.card_id = ?")
+        params.append(filters['card_id'])
+
+    if filters.get('start_date'):
+        clauses.append("t.date >= ?")
+        params.append(filters['start_date'])
+
+    if filters.get('end_date'):
+        clauses.append("t.date <= ?")
+        params.append(filters['end_date'])
+
+    return " AND ".join(clauses), params
+
+
+def fetch_page(
+    db,
+    user_id: str,
+    tenant_id: str,
+    filters: Dict = None,
+    cursor: str = None,
+    limit: int = DEFAULT_PAGE_SIZE
+) -> Dict:
+    """
+    Busca uma página de transações a partir do cursor
+
+    Returns:
+        dict com 'transactions', 'next_cursor' e 'has_more'
+    """
+    ensure_indexes(db)
+    limit = clamp_limit(limit)
+    where, params = build_where(user_id, tenant_id, filters or {})
+
+    position = decode_cursor(cursor)
+    if position:
+        where += " AND (t.date, t.created_at, t.id) < (?, ?, ?)"
+        params.extend(position)
+
+    # Busca uma linha a mais para saber se existe próxima página
+    rows = db.execute(f"""
+        SELECT {PAGE_COLUMNS}
+        FROM transactions t
+        LEFT JOIN categories c ON t.category_id = c.id
+        LEFT JOIN cards ON t.card_id = cards.id
+        WHERE {where}
+        ORDER BY t.date DESC, t.created_at DESC, t.id DESC
+        LIMIT ?
+    """, params + [limit + 1]).fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        'transactions': [dict(row) for row in rows],
+        'next_cursor': encode_cursor(rows[-1]) if has_more else None,
+        'has_more': has_more
+    }
+
+
+def fetch_totals(db, user_id: str, tenant_id: str, filters: Dict = None) -> Dict:
+    """Contagem e totais de receitas/despesas dos filtros ativos em uma agregação"""
+    ensure_indexes(db)
+    where, params = build_where(user_id, tenant_id, filters or {})
+
+    row = db.execute(f"""
+        SELECT
+            COUNT(*) as total_transactions,
+            COALESCE(SUM(CASE WHEN t.type = 'Receita' THEN t.value ELSE 0 END), 0) as total_receitas,
+            COALESCE(SUM(CASE WHEN t.type = 'Despesa' THEN t.value ELSE 0 END), 0) as total_despesas
+        FROM transactions t
+        WHERE {where}
+    """, params).fetchone()
+
+    return {
+        'total_transactions': row['total_transactions'],
+        'total_receitas': float(row['total_receitas']),
+        'total_despesas': float(row['total_despesas'])
+    }
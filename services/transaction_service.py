@@ -0,0 +1,327 @@
+"""
+Transaction Service - Unidade de trabalho para escrita de transações
+
+Cada ponto de escrita (formulário, WhatsApp, recorrências, importação,
+parcelamentos) grava por uma UnitOfWork, em uma única transação SQLite:
+
+- INSERT/UPDATE/DELETE em transactions
+- delta de saldo das contas (accounts.current_balance), acumulado por conta
+  e aplicado uma vez no commit: lançamentos pagos somam (Receita) ou
+  subtraem (Despesa) o valor, como em recalculate_account_balance
+- faturas do cartão (card_cycles) e versão dos dados do tenant
+  (data_versions, cache de páginas) acompanham pelos triggers do próprio
+  SQLite, na mesma transação
+
+Efeitos colaterais (notificações, que podem esperar SMTP/WhatsApp, e outros
+ganchos) são registrados com after_commit() e só rodam depois do commit, na
+fila assíncrona do processo (PostCommitQueue). Se o commit falhar, nada roda.
+
+Uso:
+    with transaction_service.unit_of_work() as uow:
+        transaction_id = uow.add(user_id=..., tenant_id=..., account_id=..., ...)
+        uow.after_commit(check_high_expense, user_id, tenant_id, value, description)
+"""
+
+import os
+import uuid
+import queue
+import sqlite3
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from services import metrics
+
+logger = logging.getLogger('transaction_service')
+
+# Colunas que afetam o saldo da conta
+_BALANCE_COLUMNS = ('account_id', 'type', 'value', 'status')
+
+# Ids por consulta IN (...) (limite de variáveis do SQLite)
+_LOAD_CHUNK = 500
+
+
+def balance_effect(row) -> float:
+    """Efeito de um lançamento no saldo da conta (só lançamentos pagos contam)"""
+    if not row or row['status'] != 'Pago' or not row['account_id']:
+        return 0.0
+    if row['type'] == 'Receita':
+        return float(row['value'] or 0)
+    if row['type'] == 'Despesa':
+        return -float(row['value'] or 0)
+    return 0.0
+
+
+class PostCommitQueue:
+    """Fila de ganchos pós-commit executados por uma thread do processo"""
+
+    def __init__(self, async_mode: bool = None):
+        self.async_mode = (os.getenv('POST_COMMIT_ASYNC', 'true').lower() == 'true'
+                           if async_mode is None else async_mode)
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats = {'submitted': 0, 'done': 0, 'failed': 0}
+
+    def _run(self, fn: Callable, args, kwargs):
+        try:
+            fn(*args, **kwargs)
+            self.stats['done'] += 1
+        except Exception as e:
+            self.stats['failed'] += 1
+            logger.error(f"[ERRO] Gancho pós-commit {getattr(fn, '__name__', fn)}: {e}")
+
+    def _worker(self):
+        while True:
+            fn, args, kwargs = self._queue.get()
+            try:
+                self._run(fn, args, kwargs)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        """Agenda fn(*args, **kwargs); sem modo assíncrono, executa na hora"""
+        self.stats['submitted'] += 1
+        if not self.async_mode:
+            self._run(fn, args, kwargs)
+            return
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._worker, name='post-commit', daemon=True)
+                    self._thread.start()
+        self._queue.put((fn, args, kwargs))
+
+    def drain(self):
+        """Espera os ganchos pendentes (testes e desligamento)"""
+        self._queue.join()
+
+
+class UnitOfWork:
+    """Escritas de transações + deltas de saldo em uma transação SQLite"""
+
+    def __init__(self, service: 'TransactionService', conn, owns_connection: bool = True):
+        self.service = service
+        self.conn = conn
+        self.owns_connection = owns_connection
+        self.created: List[str] = []
+        self.updated: List[str] = []
+        self.deleted: List[str] = []
+        self._deltas: Dict[str, float] = defaultdict(float)
+        self._hooks: List[tuple] = []
+
+    # =====================================================
+    # ESCRITAS
+    # =====================================================
+
+    def _track(self, old, new):
+        if old:
+            self._deltas[old['account_id']] -= balance_effect(old)
+        if new:
+            self._deltas[new['account_id']] += balance_effect(new)
+
+    def add(self, **fields) -> str:
+        """
+        Insere uma transação (id gerado se ausente; status padrão 'Pendente')
+
+        Returns:
+            ID da transação
+        """
+        row = dict(fields)
+        row['id'] = row.get('id') or str(uuid.uuid4())
+        row.setdefault('status', 'Pendente')
+        columns = list(row)
+        self.conn.execute(f"""
+            INSERT INTO transactions ({', '.join(columns)})
+            VALUES ({', '.join('?' * len(columns))})
+        """, [row[column] for column in columns])
+        self._track(None, row)
+        self.created.append(row['id'])
+        return row['id']
+
+    def add_many(self, rows: Iterable[Dict]) -> List[str]:
+        """Insere várias transações; linhas com as mesmas colunas vão em um executemany"""
+        groups: Dict[tuple, List[Dict]] = defaultdict(list)
+        ids = []
+        for fields in rows:
+            row = dict(fields)
+            row['id'] = row.get('id') or str(uuid.uuid4())
+            row.setdefault('status', 'Pendente')
+            groups[tuple(row)].append(row)
+            ids.append(row['id'])
+
+        for columns, group in groups.items():
+            self.conn.executemany(f"""
+                INSERT INTO transactions ({', '.join(columns)})
+                VALUES ({', '.join('?' * len(columns))})
+            """, [[row[column] for column in columns] for row in group])
+            for row in group:
+                self._track(None, row)
+        self.created.extend(ids)
+        return ids
+
+    def _load_many(self, transaction_ids: List[str], user_id: Optional[str]) -> Dict[str, Dict]:
+        """Colunas de saldo das transações existentes (do usuário, se informado), por id"""
+        found = {}
+        unique_ids = list(dict.fromkeys(transaction_ids))
+        for offset in range(0, len(unique_ids), _LOAD_CHUNK):
+            chunk = unique_ids[offset:offset + _LOAD_CHUNK]
+            sql = f"""
+                SELECT id, {', '.join(_BALANCE_COLUMNS)} FROM transactions
+                WHERE id IN ({','.join('?' * len(chunk))})
+            """
+            params = list(chunk)
+            if user_id is not None:
+                sql += " AND user_id = ?"
+                params.append(user_id)
+            for row in self.conn.execute(sql, params):
+                found[row[0]] = dict(zip(('id',) + _BALANCE_COLUMNS, row))
+        return found
+
+    def update(self, transaction_id: str, user_id: str = None, **fields) -> bool:
+        """Atualiza campos de uma transação (do usuário, se informado)"""
+        return transaction_id in self.update_many([(transaction_id, fields)], user_id)
+
+    def update_many(self, changes: Iterable[tuple], user_id: str = None) -> set:
+        """
+        Atualiza várias transações [(id, {campo: valor})]; alterações com as
+        mesmas colunas vão em um executemany
+
+        Returns:
+            IDs encontrados (e atualizados)
+        """
+        changes = list(changes)
+        olds = self._load_many([transaction_id for transaction_id, _ in changes], user_id)
+        groups: Dict[tuple, List[list]] = defaultdict(list)
+        for transaction_id, fields in changes:
+            old = olds.get(transaction_id)
+            if old is None or not fields:
+                continue
+            groups[tuple(fields)].append(list(fields.values()) + [transaction_id])
+            new = dict(old)
+            new.update({key: value for key, value in fields.items() if key in _BALANCE_COLUMNS})
+            self._track(old, new)
+            # Alterações seguintes do mesmo id partem do estado novo
+            olds[transaction_id] = new
+
+        for columns, params in groups.items():
+            assignments = ', '.join(f"{column} = ?" for column in columns)
+            self.conn.executemany(f"""
+                UPDATE transactions SET {assignments}, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, params)
+        self.updated.extend(olds)
+        return set(olds)
+
+    def delete(self, transaction_id: str, user_id: str = None) -> bool:
+        """Remove uma transação (do usuário, se informado)"""
+        return transaction_id in self.delete_many([transaction_id], user_id)
+
+    def delete_many(self, transaction_ids: Iterable[str], user_id: str = None) -> set:
+        """
+        Remove várias transações com um executemany
+
+        Returns:
+            IDs encontrados (e removidos)
+        """
+        olds = self._load_many(list(transaction_ids), user_id)
+        if olds:
+            self.conn.executemany("DELETE FROM transactions WHERE id = ?", [(tid,) for tid in olds])
+        for old in olds.values():
+            self._track(old, None)
+        self.deleted.extend(olds)
+        return set(olds)
+
+    def adjust_balance(self, account_id: str, delta: float):
+        """Delta de saldo explícito (ex.: pagamento em lote de parcelas)"""
+        self._deltas[account_id] += delta
+
+    def after_commit(self, fn: Callable, *args, **kwargs):
+        """Registra um efeito colateral para depois do commit (fila assíncrona)"""
+        self._hooks.append((fn, args, kwargs))
+
+    # =====================================================
+    # COMMIT / ROLLBACK
+    # =====================================================
+
+    def _flush_balances(self):
+        updated_at = datetime.now().isoformat()
+        rows = [(round(delta, 2), updated_at, account_id)
+                for account_id, delta in self._deltas.items() if account_id and round(delta, 2)]
+        if rows:
+            self.conn.executemany("""
+                UPDATE accounts SET current_balance = current_balance + ?, updated_at = ?
+                WHERE id = ?
+            """, rows)
+        self._deltas.clear()
+
+    def commit(self):
+        """Aplica os deltas de saldo, faz um único commit e despacha os ganchos"""
+        self._flush_balances()
+        self.conn.commit()
+        hooks, self._hooks = self._hooks, []
+        for fn, args, kwargs in hooks:
+            self.service.hooks.submit(fn, *args, **kwargs)
+
+    def rollback(self):
+        self.conn.rollback()
+        self._deltas.clear()
+        self._hooks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+        finally:
+            if self.owns_connection:
+                self.conn.close()
+        return False
+
+
+class TransactionService:
+    """Fábrica de unidades de trabalho e dona da fila pós-commit"""
+
+    def __init__(self, db_path: str = 'bws_finance.db', hooks: PostCommitQueue = None):
+        self.db_path = db_path
+        self.hooks = hooks or PostCommitQueue()
+
+    def connect(self):
+        conn = metrics.connect(self.db_path, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def unit_of_work(self, conn=None) -> UnitOfWork:
+        """
+        Nova unidade de trabalho (use com `with`)
+
+        Com conn, reaproveita a conexão do chamador: escritas já feitas nela
+        entram no mesmo commit, e ela não é fechada ao final.
+        """
+        if conn is not None:
+            return UnitOfWork(self, conn, owns_connection=False)
+        return UnitOfWork(self, self.connect())
+
+
+# =====================================================
+# GANCHOS PÓS-COMMIT
+# =====================================================
+
+def check_high_expense(user_id: str, tenant_id: str, value: float, description: str):
+    """Notifica gasto alto se o valor passar do limite do usuário"""
+    from services.notification_center import notify_high_expense
+    from services.notification_preferences import notification_preferences
+
+    threshold = notification_preferences.get(user_id).get('high_expense_threshold', 500.0)
+    if value >= threshold:
+        notify_high_expense(user_id, tenant_id, value, description)
+
+
+# Instância global
+transaction_service = TransactionService()
@@ -5,8 +5,13 @@ import os
 import requests
 import logging
 
+from services.metrics import TimedSession
+
 logger = logging.getLogger('notifications.whatsapp')
 
+# Sessão compartilhada: reaproveita a conexão com o servidor Node e registra a duração em /metrics
+_session = TimedSession('whatsapp')
+
 WHATSAPP_SERVER_URL = os.environ.get('WHATSAPP_SERVER_URL', 'http://localhost:3000')
 WHATSAPP_AUTH_TOKEN = os.environ.get('WHATSAPP_AUTH_TOKEN', '')
 
@@ -26,7 +31,7 @@ def send_message(phone, text, template_data=None):
         'template_data': template_data or {}
     }
     try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=10)
+        resp = _session.post(url, json=payload, headers=headers, timeout=10)
         if resp.status_code == 200:
             logger.info('WhatsApp send OK to %s', phone)
             return True
@@ -93,7 +98,7 @@ class WhatsAppSender:
             logger.info(f"[WHATSAPP] Tentando enviar para {phone[:8]}****")
             
             # Enviar via servidor Node.js (WPPConnect)
-            response = requests.post(
+            response = _session.post(
                 f"{self.server_url}/send",
                 json={
                     'to': phone,
@@ -141,7 +146,7 @@ class WhatsAppSender:
             if not phone.startswith('+'):
                 phone = f'+55{phone}'
             
-            response = requests.post(
+            response = _session.post(
                 f"{self.server_url}/send-button",
                 json={
                     'to': phone,
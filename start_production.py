@@ -51,7 +51,7 @@ def main():
     
     try:
         from waitress import serve
-        serve(app, host=host, port=port, threads=8, _quiet=True)
+        serve(app, host=host, port=port, threads=int(os.getenv('WEB_THREADS', 8)), _quiet=True)
     except KeyboardInterrupt:
         print('\n[STOP] Servidor parado pelo usuario')
     except Exception as e:
@@ -51,7 +51,7 @@ def main():
     
     try:
         from waitress import serve
-        serve(app, host=host, port=port, threads=8)
+        serve(app, host=host, port=port, threads=int(os.getenv('WEB_THREADS', 8)))
     except KeyboardInterrupt:
         print(f'[{datetime.now()}] Servidor parado')
     except Exception as e:
@@ -0,0 +1,98 @@
+// Atualizações em tempo real via Server-Sent Events (/api/stream)
+// - quote: atualiza a linha do investimento ([data-investment-id] + [data-live])
+// - portfolio: atualiza os totais da carteira ([data-live="portfolio-*"])
+// - notification / resync: repassados a quem se inscreveu (ex.: sino em base.html)
+(function () {
+    const handlers = {};
+    let source = null;
+    let lastEventId = null;
+    let retryTimer = null;
+
+    const LiveUpdates = {
+        supported: typeof window.EventSource !== 'undefined',
+        on(event, handler) {
+            (handlers[event] = handlers[event] || []).push(handler);
+        }
+    };
+    window.LiveUpdates = LiveUpdates;
+
+    function emit(event, data) {
+        (handlers[event] || []).forEach(handler => {
+            try {
+                handler(data);
+            } catch (error) {
+                console.error(`Erro no handler de ${event}:`, error);
+            }
+        });
+    }
+
+    function formatBRL(value) {
+        return Number(value || 0).toLocaleString('pt-BR', { minimumFractionDigits: 2, maximumFractionDigits: 2 });
+    }
+
+    function signed(value, text) {
+        return (value >= 0 ? '+' : '') + text;
+    }
+
+    // Atualiza o texto e a cor (verde/vermelho) de um campo marcado com data-live
+    function patch(root, field, text, sign) {
+        root.querySelectorAll(`[data-live="${field}"]`).forEach(el => {
+            if (el.textContent.trim() === text) return;
+            el.textContent = text;
+            if (sign !== undefined && el.hasAttribute('data-live-sign')) {
+                el.classList.toggle('text-green-600', sign >= 0);
+                el.classList.toggle('text-red-600', sign < 0);
+            }
+            el.classList.add('live-updated');
+            setTimeout(() => el.classList.remove('live-updated'), 1500);
+        });
+    }
+
+    LiveUpdates.on('quote', q => {
+        document.querySelectorAll(`[data-investment-id="${q.investment_id}"]`).forEach(row => {
+            if (q.price) patch(row, 'price', `R$ ${formatBRL(q.price)}`);
+            patch(row, 'current_value', `R$ ${formatBRL(q.current_value)}`, q.profit);
+            patch(row, 'profit_percent', signed(q.profit_percent, `${formatBRL(q.profit_percent)}%`), q.profit);
+            patch(row, 'profit', signed(q.profit, `R$ ${formatBRL(q.profit)}`), q.profit);
+        });
+    });
+
+    LiveUpdates.on('portfolio', p => {
+        patch(document, 'portfolio-total', `R$ ${formatBRL(p.total_current)}`, p.profit_loss);
+        patch(document, 'portfolio-profit-percent', signed(p.profit_percent, `${formatBRL(p.profit_percent)}%`), p.profit_loss);
+        patch(document, 'portfolio-profit', signed(p.profit_loss, `R$ ${formatBRL(p.profit_loss)}`), p.profit_loss);
+        patch(document, 'portfolio-last-update', `Última atualização: ${p.last_update.slice(0, 16).replace('T', ' ')}`);
+    });
+
+    function connect() {
+        clearTimeout(retryTimer);
+        const url = lastEventId ? `/api/stream?last_event_id=${encodeURIComponent(lastEventId)}` : '/api/stream';
+        source = new EventSource(url);
+
+        ['quote', 'portfolio', 'notification', 'resync'].forEach(event => {
+            source.addEventListener(event, e => {
+                if (e.lastEventId) lastEventId = e.lastEventId;
+                emit(event, JSON.parse(e.data));
+            });
+        });
+
+        // O navegador reconecta sozinho (com Last-Event-ID) quando o servidor
+        // encerra o stream; se a conexão foi recusada (401/503) ele desiste,
+        // então tentamos de novo mais tarde retomando do último id
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED) {
+                source.close();
+                retryTimer = setTimeout(connect, 30000);
+            }
+        };
+    }
+
+    if (LiveUpdates.supported) {
+        if (document.readyState === 'loading') {
+            document.addEventListener('DOMContentLoaded', connect);
+        } else {
+            connect();
+        }
+        window.addEventListener('beforeunload', () => source && source.close());
+    }
+})();
@@ -1,152 +0,0 @@
-const CACHE_NAME = 'bws-finance-v1';
-const STATIC_CACHE = 'bws-static-v1';
-const DYNAMIC_CACHE = 'bws-dynamic-v1';
-
-// Assets to cache immediately
-const STATIC_ASSETS = [
-  '/',
-  '/dashboard',
-  '/static/css/style.css',
-  '/static/js/main.js',
-  'https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css',
-  'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css'
-];
-
-// Install event - cache static assets
-self.addEventListener('install', (event) => {
-  console.log('[Service Worker] Installing...');
-  event.waitUntil(
-    caches.open(STATIC_CACHE).then((cache) => {
-      console.log('[Service Worker] Caching static assets');
-      return cache.addAll(STATIC_ASSETS).catch(err => {
-        console.warn('[Service Worker] Failed to cache some assets:', err);
-      });
-    })
-  );
-  self.skipWaiting();
-});
-
-// Activate event - clean old caches
-self.addEventListener('activate', (event) => {
-  console.log('[Service Worker] Activating...');
-  event.waitUntil(
-    caches.keys().then((keys) => {
-      return Promise.all(
-        keys
-          .filter(key => key !== STATIC_CACHE && key !== DYNAMIC_CACHE)
-          .map(key => caches.delete(key))
-      );
-    })
-  );
-  return self.clients.claim();
-});
-
-// Fetch event - serve from cache, fallback to network
-self.addEventListener('fetch', (event) => {
-  // Skip non-GET requests
-  if (event.request.method !== 'GET') return;
-
-  // Skip chrome extensions and other non-http(s) requests
-  if (!event.request.url.startsWith('http')) return;
-
-  event.respondWith(
-    caches.match(event.request).then((response) => {
-      // Return cached version or fetch from network
-      return response || fetch(event.request).then((fetchResponse) => {
-        // Cache dynamic content
-        return caches.open(DYNAMIC_CACHE).then((cache) => {
-          // Only cache successful responses
-          if (fetchResponse.ok) {
-            cache.put(event.request, fetchResponse.clone());
-          }
-          return fetchResponse;
-        });
-      }).catch(() => {
-        // Return offline page if available
-        if (event.request.destination === 'document') {
-          return caches.match('/offline.html');
-        }
-      });
-    })
-  );
-});
-
-// Background sync for offline transactions
-self.addEventListener('sync', (event) => {
-  console.log('[Service Worker] Background sync:', event.tag);
-  
-  if (event.tag === 'sync-transactions') {
-    event.waitUntil(syncTransactions());
-  }
-});
-
-async function syncTransactions() {
-  // Get pending transactions from IndexedDB
-  const db = await openDB();
-  const transactions = await db.getAll('pending-transactions');
-  
-  for (const transaction of transactions) {
-    try {
-      await fetch('/transactions/add', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(transaction)
-      });
-      await db.delete('pending-transactions', transaction.id);
-    } catch (error) {
-      console.error('[Service Worker] Failed to sync transaction:', error);
-    }
-  }
-}
-
-// Push notification handler
-self.addEventListener('push', (event) => {
-  console.log('[Service Worker] Push received:', event);
-  
-  const data = event.data ? event.data.json() : {};
-  const title = data.title || 'BWS Finance';
-  const options = {
-    body: data.body || 'Nova notificação',
-    icon: '/static/img/icon-192.png',
-    badge: '/static/img/badge.png',
-    vibrate: [200, 100, 200],
-    data: data,
-    actions: [
-      { action: 'view', title: 'Ver' },
-      { action: 'close', title: 'Fechar' }
-    ]
-  };
-
-  event.waitUntil(
-    self.registration.showNotification(title, options)
-  );
-});
-
-// Notification click handler
-self.addEventListener('notificationclick', (event) => {
-  console.log('[Service Worker] Notification clicked:', event);
-  event.notification.close();
-
-  if (event.action === 'view') {
-    event.waitUntil(
-      clients.openWindow(event.notification.data.url || '/dashboard')
-    );
-  }
-});
-
-// Helper to open IndexedDB
-function openDB() {
-  return new Promise((resolve, reject) => {
-    const request = indexedDB.open('bws-finance-db', 1);
-    
-    request.onerror = () => reject(request.error);
-    request.onsuccess = () => resolve(request.result);
-    
-    request.onupgradeneeded = (event) => {
-      const db = event.target.result;
-      if (!db.objectStoreNames.contains('pending-transactions')) {
-        db.createObjectStore('pending-transactions', { keyPath: 'id', autoIncrement: true });
-      }
-    };
-  });
-}
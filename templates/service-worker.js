@@ -0,0 +1,235 @@
+// Gerado por /service-worker.js a partir de static/dist/assets-manifest.json
+// - assets com fingerprint (/static/dist/): cache-first, nunca mudam
+// - páginas HTML: network-first; cópia em cache só quando offline
+// - API e demais requisições: direto na rede
+// - réplica local (IndexedDB 'replica'): puxada de /api/sync só com o que mudou
+const ASSET_VERSION = '{{ asset_version }}';
+const ASSET_CACHE = `bws-assets-${ASSET_VERSION}`;
+const PAGE_CACHE = 'bws-pages-v2';
+const OFFLINE_URL = '/offline.html';
+
+const PRECACHE_ASSETS = {{ precache|tojson }};
+
+// Install event - precache dos assets da versão atual
+self.addEventListener('install', (event) => {
+  console.log('[Service Worker] Installing', ASSET_VERSION);
+  event.waitUntil(Promise.all([
+    caches.open(ASSET_CACHE).then(cache => cache.addAll(PRECACHE_ASSETS)),
+    caches.open(PAGE_CACHE).then(cache => cache.add(OFFLINE_URL))
+  ]).catch(err => {
+    console.warn('[Service Worker] Failed to precache some assets:', err);
+  }));
+  self.skipWaiting();
+});
+
+// Activate event - remove caches de versões anteriores
+self.addEventListener('activate', (event) => {
+  console.log('[Service Worker] Activating...');
+  event.waitUntil(
+    caches.keys().then((keys) => {
+      return Promise.all(
+        keys
+          .filter(key => key !== ASSET_CACHE && key !== PAGE_CACHE)
+          .map(key => caches.delete(key))
+      );
+    })
+  );
+  return self.clients.claim();
+});
+
+async function cacheFirst(request) {
+  const cached = await caches.match(request);
+  if (cached) return cached;
+
+  const response = await fetch(request);
+  if (response.ok) {
+    const cache = await caches.open(ASSET_CACHE);
+    cache.put(request, response.clone());
+  }
+  return response;
+}
+
+async function networkFirst(request) {
+  try {
+    const response = await fetch(request);
+    if (response.ok) {
+      const cache = await caches.open(PAGE_CACHE);
+      cache.put(request, response.clone());
+    }
+    return response;
+  } catch (error) {
+    return (await caches.match(request)) || caches.match(OFFLINE_URL);
+  }
+}
+
+self.addEventListener('fetch', (event) => {
+  const request = event.request;
+  if (request.method !== 'GET') return;
+
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) return;
+
+  if (url.pathname.startsWith('/static/dist/')) {
+    event.respondWith(cacheFirst(request));
+  } else if (request.mode === 'navigate') {
+    event.respondWith(networkFirst(request));
+  }
+});
+
+// Background sync for offline transactions
+self.addEventListener('sync', (event) => {
+  console.log('[Service Worker] Background sync:', event.tag);
+
+  if (event.tag === 'sync-transactions') {
+    event.waitUntil(syncTransactions());
+  } else if (event.tag === 'pull-changes') {
+    event.waitUntil(pullChanges());
+  }
+});
+
+self.addEventListener('periodicsync', (event) => {
+  if (event.tag === 'pull-changes') {
+    event.waitUntil(pullChanges());
+  }
+});
+
+// Página pede atualização da réplica (carregamento, volta da conexão)
+self.addEventListener('message', (event) => {
+  if (event.data && event.data.type === 'pull-changes') {
+    event.waitUntil(pullChanges());
+  }
+});
+
+function requestToPromise(request) {
+  return new Promise((resolve, reject) => {
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+function transactionDone(tx) {
+  return new Promise((resolve, reject) => {
+    tx.oncomplete = () => resolve();
+    tx.onerror = () => reject(tx.error);
+    tx.onabort = () => reject(tx.error);
+  });
+}
+
+// Aplica páginas de /api/sync na réplica até has_more=false; o cursor é
+// gravado na mesma transação da página, então uma falha no meio só repete
+// a página (upserts/tombstones são idempotentes)
+let pulling = null;
+
+function pullChanges() {
+  if (!pulling) {
+    pulling = doPullChanges().finally(() => { pulling = null; });
+  }
+  return pulling;
+}
+
+async function doPullChanges() {
+  const db = await openDB();
+  let cursor = await requestToPromise(db.transaction('meta').objectStore('meta').get('sync-cursor'));
+
+  for (;;) {
+    const url = '/api/sync' + (cursor ? `?since=${encodeURIComponent(cursor)}` : '');
+    const response = await fetch(url, { credentials: 'same-origin' });
+    if (!response.ok) return;
+    const page = await response.json();
+
+    const tx = db.transaction(['replica', 'meta'], 'readwrite');
+    const replica = tx.objectStore('replica');
+    if (page.reset) replica.clear();
+    for (const change of page.changes) {
+      const key = `${change.entity}:${change.id}`;
+      if (change.op === 'delete') {
+        replica.delete(key);
+      } else {
+        replica.put({ key, entity: change.entity, id: change.id, data: change.data });
+      }
+    }
+    tx.objectStore('meta').put(page.cursor, 'sync-cursor');
+    await transactionDone(tx);
+
+    cursor = page.cursor;
+    if (!page.has_more) return;
+  }
+}
+
+async function syncTransactions() {
+  // Get pending transactions from IndexedDB
+  const db = await openDB();
+  const transactions = await db.getAll('pending-transactions');
+
+  for (const transaction of transactions) {
+    try {
+      await fetch('/transactions/add', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(transaction)
+      });
+      await db.delete('pending-transactions', transaction.id);
+    } catch (error) {
+      console.error('[Service Worker] Failed to sync transaction:', error);
+    }
+  }
+}
+
+// Push notification handler
+self.addEventListener('push', (event) => {
+  console.log('[Service Worker] Push received:', event);
+
+  const data = event.data ? event.data.json() : {};
+  const title = data.title || 'BWS Finance';
+  const options = {
+    body: data.body || 'Nova notificação',
+    icon: '/static/img/icon-192.png',
+    badge: '/static/img/badge.png',
+    vibrate: [200, 100, 200],
+    data: data,
+    actions: [
+      { action: 'view', title: 'Ver' },
+      { action: 'close', title: 'Fechar' }
+    ]
+  };
+
+  event.waitUntil(
+    self.registration.showNotification(title, options)
+  );
+});
+
+// Notification click handler
+self.addEventListener('notificationclick', (event) => {
+  console.log('[Service Worker] Notification clicked:', event);
+  event.notification.close();
+
+  if (event.action === 'view') {
+    event.waitUntil(
+      clients.openWindow(event.notification.data.url || '/dashboard')
+    );
+  }
+});
+
+// Helper to open IndexedDB
+function openDB() {
+  return new Promise((resolve, reject) => {
+    const request = indexedDB.open('bws-finance-db', 2);
+
+    request.onerror = () => reject(request.error);
+    request.onsuccess = () => resolve(request.result);
+
+    request.onupgradeneeded = (event) => {
+      const db = event.target.result;
+      if (!db.objectStoreNames.contains('pending-transactions')) {
+        db.createObjectStore('pending-transactions', { keyPath: 'id', autoIncrement: true });
+      }
+      if (!db.objectStoreNames.contains('replica')) {
+        const replica = db.createObjectStore('replica', { keyPath: 'key' });
+        replica.createIndex('entity', 'entity');
+      }
+      if (!db.objectStoreNames.contains('meta')) {
+        db.createObjectStore('meta');
+      }
+    };
+  });
+}
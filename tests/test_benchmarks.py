@@ -0,0 +1,90 @@
+"""
+Testes unitários para o gerador de dados e o relatório dos benchmarks
+"""
+
+import os
+import sys
+import sqlite3
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.generator import generate, statement_rows, write_csv, write_ofx
+from benchmarks.runner import compare, percentile
+from services.bank_importer import BankStatementImporter
+
+TODAY = date(2025, 6, 15)
+
+
+# ==================== TESTES: GERADOR ====================
+
+def test_generate_is_deterministic(tmp_path):
+    first = generate(str(tmp_path / 'a.db'), tenants=2, users_per_tenant=1, transactions=600, today=TODAY)
+    second = generate(str(tmp_path / 'b.db'), tenants=2, users_per_tenant=1, transactions=600, today=TODAY)
+
+    assert first == second
+
+    def dump(path):
+        conn = sqlite3.connect(path)
+        rows = conn.execute("SELECT id, description, value, date FROM transactions ORDER BY id").fetchall()
+        conn.close()
+        return rows
+
+    assert dump(tmp_path / 'a.db') == dump(tmp_path / 'b.db')
+
+
+def test_generate_distributions(tmp_path):
+    db_path = str(tmp_path / 'bench.db')
+    dataset = generate(db_path, tenants=2, users_per_tenant=2, transactions=2000, today=TODAY)
+    conn = sqlite3.connect(db_path)
+
+    total = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    assert total == dataset['transactions']
+    assert abs(total - 2000) < 20
+
+    # Comerciantes em cauda longa: o mais frequente aparece bem mais que o mediano
+    counts = [n for _, n in conn.execute("""
+        SELECT description, COUNT(*) FROM transactions
+        WHERE installment_id IS NULL AND description NOT LIKE '%(Recorrente)'
+        GROUP BY description ORDER BY 2 DESC
+    """)]
+    assert counts[0] > 3 * counts[len(counts) // 2]
+
+    parcelas = conn.execute("SELECT COUNT(*) FROM transactions WHERE installment_id IS NOT NULL").fetchone()[0]
+    assert parcelas > 0
+
+    due = conn.execute("""
+        SELECT COUNT(*) FROM recurring_transactions WHERE next_execution <= ?
+    """, (TODAY.isoformat(),)).fetchone()[0]
+    assert due == sum(user['recurring_due'] for user in dataset['users'])
+    conn.close()
+
+
+def test_statement_files_parse_with_bank_importer(tmp_path):
+    rows = statement_rows(50, today=TODAY)
+    write_ofx(str(tmp_path / 'extrato.ofx'), rows)
+    write_csv(str(tmp_path / 'extrato.csv'), rows)
+
+    importer = BankStatementImporter('u', 't')
+    ofx = importer.parse_ofx(str(tmp_path / 'extrato.ofx'))
+    csv_rows = importer.parse_csv(str(tmp_path / 'extrato.csv'))
+
+    assert len(ofx) == len(csv_rows) == 50
+    assert [t['description'] for t in ofx] == [t['description'] for t in csv_rows]
+    assert [t['value'] for t in ofx] == [t['value'] for t in csv_rows]
+    assert [t['type'] for t in ofx] == [t['type'] for t in csv_rows]
+    assert {t['type'] for t in ofx} == {'Receita', 'Despesa'}
+
+
+# ==================== TESTES: RELATÓRIO ====================
+
+def test_percentile_and_compare():
+    assert percentile([10, 20, 30, 40, 50], 50) == 30
+    assert percentile([10, 20, 30, 40, 50], 95) == 48
+
+    report = {'scenarios': {'dashboard': {'median_ms': 90.0}, 'novo': {'median_ms': 5.0}}}
+    baseline = {'scenarios': {'dashboard': {'median_ms': 120.0}}}
+
+    rows = {row['scenario']: row for row in compare(report, baseline)}
+    assert rows['dashboard']['change_pct'] == -25.0
+    assert 'change_pct' not in rows['novo']
@@ -0,0 +1,140 @@
+"""
+Testes unitários para o ledger de faturas dos cartões
+"""
+
+import pytest
+import sqlite3
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.card_ledger import CardLedger, cycle_dates, cycle_for
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def ledger(tmp_path):
+    """Banco em arquivo com o schema da aplicação e um cartão (fecha dia 25, vence dia 5)"""
+    db_path = str(tmp_path / 'ledger.db')
+    conn = sqlite3.connect(db_path)
+    with open(os.path.join(os.path.dirname(__file__), '..', 'database_schema.sql'), encoding='utf-8') as f:
+        conn.executescript(f.read())
+    conn.execute("""
+        INSERT INTO cards (id, account_id, user_id, tenant_id, name, limit_amount, closing_day, due_day)
+        VALUES ('card-1', 'acc-1', 'u1', 't1', 'Nubank', 1000, 25, 5)
+    """)
+    conn.commit()
+    conn.close()
+    return CardLedger(db_path)
+
+
+def _insert(conn, transaction_id, value, day, card_id='card-1', type_='Despesa', status='Pendente'):
+    conn.execute("""
+        INSERT INTO transactions (id, user_id, tenant_id, account_id, card_id, type, description, value, date, status)
+        VALUES (?, 'u1', 't1', 'acc-1', ?, ?, 'Compra', ?, ?, ?)
+    """, (transaction_id, card_id, type_, value, day, status))
+
+
+def _cycles(conn):
+    return {row[0]: (row[1], row[2]) for row in conn.execute(
+        "SELECT cycle, total_cents, transaction_count FROM card_cycles WHERE card_id = 'card-1'")}
+
+
+# ==================== TESTES: CICLOS ====================
+
+def test_cycle_for_uses_closing_day():
+    assert cycle_for('2025-06-25', 25) == '2025-06'
+    assert cycle_for('2025-06-26', 25) == '2025-07'
+    assert cycle_for('2025-12-26', 25) == '2026-01'
+    assert cycle_for('2025-06-30', None) == '2025-06'
+
+
+def test_cycle_dates_clamp_and_roll_due_month():
+    assert cycle_dates('2025-06', 25, 5) == (date(2025, 6, 25), date(2025, 7, 5))
+    assert cycle_dates('2025-06', 3, 15) == (date(2025, 6, 3), date(2025, 6, 15))
+    assert cycle_dates('2025-02', 31, 30) == (date(2025, 2, 28), date(2025, 3, 30))
+
+
+# ==================== TESTES: TRIGGERS ====================
+
+def test_backfill_and_incremental_maintenance(ledger):
+    conn = ledger.get_db()
+    _insert(conn, 't1', 100, '2025-06-10')
+    conn.commit()
+
+    ledger.ensure_schema(conn)
+    assert _cycles(conn) == {'2025-06': (10000, 1)}
+
+    _insert(conn, 't2', 49.99, '2025-06-26')
+    _insert(conn, 't3', 500, '2025-06-11', type_='Receita')
+    conn.execute("UPDATE transactions SET value = 120 WHERE id = 't1'")
+    assert _cycles(conn) == {'2025-06': (12000, 1), '2025-07': (4999, 1)}
+
+    conn.execute("UPDATE transactions SET date = '2025-06-01' WHERE id = 't2'")
+    assert _cycles(conn) == {'2025-06': (16999, 2)}
+
+    conn.execute("UPDATE transactions SET status = 'Cancelado' WHERE id = 't1'")
+    conn.execute("DELETE FROM transactions WHERE id = 't2'")
+    assert _cycles(conn) == {}
+    conn.close()
+
+
+def test_closing_day_change_redistributes_cycles(ledger):
+    conn = ledger.get_db()
+    ledger.ensure_schema(conn)
+    _insert(conn, 't1', 10, '2025-06-10')
+    _insert(conn, 't2', 20, '2025-06-20')
+
+    conn.execute("UPDATE cards SET closing_day = 15 WHERE id = 'card-1'")
+    assert _cycles(conn) == {'2025-06': (1000, 1), '2025-07': (2000, 1)}
+    conn.close()
+
+
+# ==================== TESTES: LEITURA ====================
+
+def test_summary_splits_closed_current_and_future_invoices(ledger):
+    conn = ledger.get_db()
+    ledger.ensure_schema(conn)
+    _insert(conn, 'old', 999, '2025-03-10')       # fatura já vencida
+    _insert(conn, 'closed', 30, '2025-05-20')     # fechou 25/05, vence 05/06
+    _insert(conn, 'current', 100, '2025-06-10')
+    _insert(conn, 'p2', 50, '2025-07-10')         # parcela futura
+    conn.commit()
+    conn.close()
+
+    summary = ledger.summary('card-1', date(2025, 6, 1))
+    assert summary['closed_invoice']['total'] == 30
+    assert summary['due_invoice']['due_date'] == '2025-06-05'
+    assert summary['current_invoice']['total'] == 100
+    assert [i['total'] for i in summary['next_invoices']] == [50]
+    assert summary['used'] == 180
+    assert summary['available'] == 820
+
+    # Depois do vencimento, a fatura fechada deixa de ocupar o limite
+    after_due = ledger.summary('card-1', date(2025, 6, 6))
+    assert after_due['closed_invoice'] is None
+    assert after_due['used'] == 150
+
+
+# ==================== TESTES: VERIFICAÇÃO ====================
+
+def test_verify_detects_and_repairs_drift(ledger):
+    conn = ledger.get_db()
+    ledger.ensure_schema(conn)
+    _insert(conn, 't1', 10, '2025-06-10')
+    conn.execute("UPDATE card_cycles SET total_cents = 1")
+    conn.execute("INSERT INTO card_cycles VALUES ('card-x', '2025-06', 500, 1)")
+    conn.commit()
+    conn.close()
+
+    stats = ledger.verify(batch_size=1)
+    assert stats['mismatched'] == ['card-1']
+    assert stats['repaired'] == 0
+
+    stats = ledger.verify(repair=True, batch_size=1)
+    assert stats['repaired'] == 1
+    assert stats['orphans'] == 1
+    assert ledger.verify()['mismatched'] == []
@@ -0,0 +1,157 @@
+"""
+Testes unitários para o change log e o feed de sincronização delta
+"""
+
+import pytest
+import sqlite3
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.change_log import ChangeLog, decode_cursor, encode_cursor
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def log(tmp_path):
+    """Dois usuários do tenant t1 (e um de t2) com contas, categorias e notificações"""
+    path = str(tmp_path / 'sync.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE users (id TEXT PRIMARY KEY, tenant_id TEXT);
+        CREATE TABLE accounts (id TEXT PRIMARY KEY, user_id TEXT, tenant_id TEXT, name TEXT, current_balance REAL);
+        CREATE TABLE categories (id TEXT PRIMARY KEY, tenant_id TEXT, name TEXT);
+        CREATE TABLE transactions (
+            id TEXT PRIMARY KEY, user_id TEXT, tenant_id TEXT, account_id TEXT, description TEXT, value REAL
+        );
+        CREATE TABLE notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, tenant_id TEXT, title TEXT
+        );
+        INSERT INTO users VALUES ('u1', 't1'), ('u2', 't1'), ('u3', 't2');
+    """)
+    conn.commit()
+    conn.close()
+
+    change_log = ChangeLog(path)
+    conn = change_log.get_db()
+    change_log.ensure_schema(conn)
+    conn.executescript("""
+        INSERT INTO accounts VALUES ('acc-1', 'u1', 't1', 'Conta', 100), ('acc-2', 'u2', 't1', 'Outra', 0),
+                                    ('acc-3', 'u3', 't2', 'Alheia', 0);
+        INSERT INTO categories VALUES ('cat-1', 't1', 'Mercado'), ('cat-2', 't2', 'Outro');
+        INSERT INTO transactions VALUES ('tx-1', 'u1', 't1', 'acc-1', 'Pão', 10),
+                                        ('tx-2', 'u1', 't1', 'acc-1', 'Leite', 5);
+        INSERT INTO notifications (user_id, tenant_id, title) VALUES ('u1', NULL, 'Bem-vindo');
+    """)
+    conn.commit()
+    conn.close()
+    return change_log
+
+
+def _execute(log, sql):
+    conn = sqlite3.connect(log.db_path)
+    conn.executescript(sql)
+    conn.commit()
+    conn.close()
+
+
+def _drain(log, cursor=None, user_id='u1', tenant_id='t1', limit=500):
+    """Puxa páginas até has_more=false; retorna (réplica, último cursor, páginas)"""
+    replica, pages = {}, []
+    while True:
+        page = log.page(tenant_id, user_id, cursor=cursor, limit=limit)
+        pages.append(page)
+        if page['reset']:
+            replica.clear()
+        for change in page['changes']:
+            key = (change['entity'], change['id'])
+            if change['op'] == 'delete':
+                replica.pop(key, None)
+            else:
+                replica[key] = change['data']
+        cursor = page['cursor']
+        if not page['has_more']:
+            return replica, cursor, pages
+
+
+# ==================== TESTES: SNAPSHOT ====================
+
+def test_full_resync_snapshot_is_scoped_to_user_and_tenant(log):
+    replica, cursor, pages = _drain(log, limit=2)
+
+    assert pages[0]['reset'] is True and pages[0]['full_resync'] is True
+    assert set(replica) == {
+        ('transactions', 'tx-1'), ('transactions', 'tx-2'), ('accounts', 'acc-1'),
+        ('categories', 'cat-1'), ('notifications', '1'),
+    }
+    assert pages[-1]['full_resync'] is False
+    assert decode_cursor(cursor, 'u1')[0] == 'd'
+
+
+# ==================== TESTES: DELTA ====================
+
+def test_delta_returns_latest_state_and_tombstones(log):
+    replica, cursor, _ = _drain(log)
+
+    _execute(log, """
+        UPDATE transactions SET value = 11 WHERE id = 'tx-1';
+        UPDATE transactions SET value = 12 WHERE id = 'tx-1';
+        DELETE FROM transactions WHERE id = 'tx-2';
+        UPDATE accounts SET current_balance = 50 WHERE id = 'acc-2';
+        INSERT INTO categories VALUES ('cat-3', 't1', 'Lazer');
+    """)
+    page = log.page('t1', 'u1', cursor=cursor)
+
+    assert page['full_resync'] is False and page['reset'] is False
+    changes = {(c['entity'], c['id']): c for c in page['changes']}
+    assert set(changes) == {('transactions', 'tx-1'), ('transactions', 'tx-2'), ('categories', 'cat-3')}
+    assert changes[('transactions', 'tx-1')]['data']['value'] == 12
+    assert changes[('transactions', 'tx-2')] == {'entity': 'transactions', 'id': 'tx-2', 'op': 'delete'}
+
+    # Sem mudanças: mesma posição, página vazia
+    again = log.page('t1', 'u1', cursor=page['cursor'])
+    assert again['changes'] == [] and again['has_more'] is False
+
+
+def test_notification_without_tenant_inherits_users_tenant(log):
+    conn = sqlite3.connect(log.db_path)
+    assert conn.execute("SELECT tenant_id FROM change_log WHERE entity = 'notifications'").fetchone() == ('t1',)
+    conn.close()
+
+
+def test_cursor_of_another_user_forces_reset(log):
+    _, cursor, _ = _drain(log)
+
+    assert decode_cursor(cursor, 'u2') is None
+    assert log.page('t1', 'u2', cursor=cursor)['reset'] is True
+    assert decode_cursor('lixo', 'u1') is None
+    assert decode_cursor(encode_cursor('u1', ['x', 1]), 'u1') is None
+
+
+# ==================== TESTES: COMPACTAÇÃO ====================
+
+def test_compact_drops_superseded_and_old_tombstones(log):
+    _, old_cursor, _ = _drain(log)
+    _execute(log, """
+        UPDATE transactions SET value = 20 WHERE id = 'tx-1';
+        DELETE FROM transactions WHERE id = 'tx-2';
+    """)
+    _, recent_cursor, _ = _drain(log, cursor=old_cursor)
+
+    result = log.compact(now=datetime.now() + timedelta(days=31), tombstone_days=30)
+
+    assert result['superseded'] == 2  # insert de tx-1 e de tx-2
+    assert result['tombstones'] == 1
+    conn = sqlite3.connect(log.db_path)
+    assert conn.execute("SELECT COUNT(*) FROM change_log WHERE entity = 'transactions'").fetchone() == (1,)
+    conn.close()
+
+    # Cursor anterior ao tombstone removido: ressincronização completa
+    assert log.page('t1', 'u1', cursor=old_cursor)['reset'] is True
+    # Cursor já depois dele continua no delta
+    assert log.page('t1', 'u1', cursor=recent_cursor)['full_resync'] is False
+    # Outros tenants não são afetados
+    assert log._floor(sqlite3.connect(log.db_path), 't2') == 0
@@ -0,0 +1,92 @@
+"""
+Testes unitários para a memória de conversas da IA (LRU + SQLite)
+"""
+
+import pytest
+import sqlite3
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.conversation_store import ConversationStore, estimate_tokens
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'ai_history.db')
+
+
+@pytest.fixture
+def store(db_path):
+    return ConversationStore(db_path, max_users=1, max_exchanges=10)
+
+
+def _contents(window):
+    return [message['content'] for message in window]
+
+
+# ==================== TESTES: CAMADAS ====================
+
+def test_evicted_user_reloads_from_cold_tier(store):
+    store.append('u1', 't1', 'Quanto gastei?', 'R$ 100')
+    assert _contents(store.get_window('u1', 't1')) == ['Quanto gastei?', 'R$ 100']
+
+    store.append('u2', 't1', 'Oi', 'Olá')
+    store.get_window('u2', 't1')
+    assert store.get_stats()['evictions'] == 1
+    assert store.get_stats()['users'] == 1
+
+    misses = store.stats['misses']
+    assert _contents(store.get_window('u1', 't1')) == ['Quanto gastei?', 'R$ 100']
+    assert store.stats['misses'] == misses + 1
+
+
+def test_exchanges_older_than_ttl_are_not_context(store, db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        INSERT INTO ai_conversations (user_id, tenant_id, user_message, ai_response, timestamp)
+        VALUES ('u1', 't1', 'Antiga', 'Resposta antiga', '2000-01-01 00:00:00')
+    """)
+    conn.commit()
+    conn.close()
+    store.append('u1', 't1', 'Nova', 'Resposta nova')
+
+    assert _contents(store.get_window('u1', 't1')) == ['Nova', 'Resposta nova']
+    # O histórico completo continua disponível
+    assert len(store.get_history('u1', 't1')) == 2
+
+
+def test_token_budget_keeps_newest_whole_exchanges(store):
+    for index in range(3):
+        store.append('u1', 't1', f'pergunta {index} ' * 10, f'resposta {index} ' * 10)
+    cost = estimate_tokens('pergunta 0 ' * 10) + estimate_tokens('resposta 0 ' * 10)
+
+    window = store.get_window('u1', 't1', max_tokens=cost * 2 + 1)
+
+    assert len(window) == 4
+    assert [m['role'] for m in window] == ['user', 'assistant', 'user', 'assistant']
+    assert window[0]['content'].startswith('pergunta 1')
+    assert window[-1]['content'].startswith('resposta 2')
+    assert store.get_window('u1', 't1', max_tokens=cost - 1) == []
+
+
+# ==================== TESTES: WORKERS ====================
+
+def test_two_instances_share_the_same_database(db_path):
+    worker_a = ConversationStore(db_path)
+    worker_b = ConversationStore(db_path)
+
+    worker_a.append('u1', 't1', 'Primeira', 'Ok 1')
+    assert _contents(worker_b.get_window('u1', 't1')) == ['Primeira', 'Ok 1']
+
+    # Cópia quente de B é revalidada e estendida com a gravação de A
+    worker_a.append('u1', 't1', 'Segunda', 'Ok 2')
+    assert _contents(worker_b.get_window('u1', 't1')) == ['Primeira', 'Ok 1', 'Segunda', 'Ok 2']
+    assert worker_b.stats['refreshes'] == 1
+
+    # Histórico apagado em A some de B na próxima leitura
+    assert worker_a.clear('u1', 't1') == 2
+    assert worker_b.get_window('u1', 't1') == []
@@ -0,0 +1,151 @@
+"""
+Testes unitários para o canal de eventos SSE (publicação, retomada, limite)
+"""
+
+import os
+import sys
+import json
+import sqlite3
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+import routes.stream as stream_routes
+import services.event_stream as event_stream_module
+from routes.stream import stream_bp
+from services.event_stream import EventStream, StreamLimitReached, quote_event, thread_stream_cap
+
+
+def _stream(tmp_path, **kwargs):
+    options = dict(heartbeat_seconds=1, max_stream_seconds=1, poll_seconds=0.05, max_streams=2)
+    options.update(kwargs)
+    return EventStream(db_path=str(tmp_path / 'events.db'), **options)
+
+
+def _drain(generator):
+    """Consome o gerador até o fim do stream e separa os frames"""
+    return [frame for frame in generator]
+
+
+# ==================== TESTES: PUBLICAÇÃO ====================
+
+def test_fetch_since_returns_only_user_events(tmp_path):
+    stream = _stream(tmp_path)
+    ids = stream.publish_many([
+        ('u1', 't1', 'quote', {'investment_id': 1}),
+        ('u2', 't1', 'quote', {'investment_id': 2}),
+        ('u1', 't1', 'portfolio', {'total_current': 100}),
+    ])
+
+    events = stream.fetch_since('u1', 0)
+
+    assert [e['id'] for e in events] == [ids[0], ids[2]]
+    assert [e['event'] for e in events] == ['quote', 'portfolio']
+    assert stream.fetch_since('u1', ids[2]) == []
+
+
+def test_quote_event_computes_profit():
+    user_id, tenant_id, event, data = quote_event('u1', 't1', 7, 'PETR4', 40.0, 10, 350.0, 400.0)
+
+    assert event == 'quote'
+    assert data['profit'] == 50.0
+    assert data['profit_percent'] == pytest.approx(14.29)
+
+
+def test_format_event_splits_multiline_data():
+    frame = EventStream.format_event(5, 'notification', 'linha 1\nlinha 2')
+
+    assert frame == "id: 5\nevent: notification\ndata: linha 1\ndata: linha 2\n\n"
+
+
+# ==================== TESTES: STREAM ====================
+
+def test_stream_resumes_from_last_event_id(tmp_path):
+    stream = _stream(tmp_path)
+    first, second = stream.publish_many([
+        ('u1', 't1', 'quote', {'investment_id': 1}),
+        ('u1', 't1', 'quote', {'investment_id': 2}),
+    ])
+
+    frames = _drain(stream.stream('u1', last_event_id=first))
+
+    assert frames[0] == "retry: 3000\n\n"
+    delivered = [f for f in frames if f.startswith('id:')]
+    assert len(delivered) == 1
+    assert delivered[0].startswith(f"id: {second}\nevent: quote")
+
+
+def test_stream_without_cursor_starts_from_now(tmp_path):
+    stream = _stream(tmp_path, heartbeat_seconds=0.2)
+    stream.publish('u1', 't1', 'quote', {'investment_id': 1})
+
+    frames = _drain(stream.stream('u1'))
+
+    assert not [f for f in frames if f.startswith('id:')]
+    assert ": heartbeat\n\n" in frames
+
+
+def test_stream_sends_resync_when_range_was_pruned(tmp_path):
+    stream = _stream(tmp_path)
+    ids = stream.publish_many([('u1', 't1', 'quote', {'investment_id': i}) for i in range(3)])
+
+    conn = sqlite3.connect(stream.db_path)
+    conn.execute("DELETE FROM stream_events WHERE id < ?", (ids[2],))
+    conn.commit()
+    conn.close()
+
+    frames = _drain(stream.stream('u1', last_event_id=ids[0]))
+
+    assert frames[0].startswith(f"id: {ids[2]}\nevent: resync")
+    assert json.loads(frames[0].split('data: ')[1]) == {'reason': 'expired'}
+    # Depois do resync não reenvia eventos antigos
+    assert not [f for f in frames[1:] if f.startswith('id:')]
+
+
+# ==================== TESTES: LIMITE DE CONEXÕES ====================
+
+def test_open_respects_max_streams(tmp_path):
+    stream = _stream(tmp_path, max_streams=2)
+    stream.open()
+    stream.open()
+
+    with pytest.raises(StreamLimitReached):
+        stream.open()
+
+    stream.release()
+    stream.open()
+    assert stream.active_streams == 2
+
+
+def test_stream_cap_stays_below_worker_threads(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_stream_module, 'WEB_THREADS', 8)
+    monkeypatch.setattr(event_stream_module, 'SSE_RESERVED_THREADS', 2)
+    assert thread_stream_cap() == 6
+    assert thread_stream_cap(threads=2) == 1
+
+    # SSE_MAX_STREAMS maior que as threads não passa do teto; menor, reduz
+    monkeypatch.setenv('SSE_MAX_STREAMS', '50')
+    assert EventStream(db_path=str(tmp_path / 'events.db')).max_streams == 6
+    monkeypatch.setenv('SSE_MAX_STREAMS', '3')
+    assert EventStream(db_path=str(tmp_path / 'events.db')).max_streams == 3
+
+
+def test_route_returns_503_when_cap_is_reached(tmp_path, monkeypatch):
+    stream = _stream(tmp_path, max_streams=1)
+    monkeypatch.setattr(stream_routes, 'event_stream', stream)
+    app = Flask(__name__)
+    app.secret_key = 'teste'
+    app.register_blueprint(stream_bp)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 'u1'
+
+    stream.open()  # outra aba já ocupa a única vaga
+    response = client.get('/api/stream')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+    assert stream.active_streams == 1
@@ -0,0 +1,110 @@
+"""
+Testes unitários para o entendimento de mensagens em camadas (fast-path)
+"""
+
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.fast_intent import FastIntentParser, TieredIntentRouter, normalize_message, parse_amount
+
+
+@pytest.fixture
+def parser():
+    return FastIntentParser()
+
+
+# ==================== TESTES: PARSER LOCAL ====================
+
+@pytest.mark.parametrize('text,action', [
+    ('saldo', 'get_balance'),
+    ('Qual é o meu saldo?', 'get_balance'),
+    ('extrato', 'get_monthly_expenses'),
+    ('quanto gastei esse mês?', 'get_monthly_expenses'),
+])
+def test_commands_are_resolved_locally(parser, text, action):
+    result = parser.parse(text)
+
+    assert result['intent'] == 'query'
+    assert result['action'] == action
+    assert result['confidence'] >= 0.8
+
+
+def test_simple_expense_is_high_confidence(parser):
+    result = parser.parse('gastei 50 no mercado')
+
+    assert result['intent'] == 'transaction'
+    assert result['type'] == 'Despesa'
+    assert result['amount'] == 50.0
+    assert result['category'] == 'Alimentação'
+    assert result['confidence'] >= 0.8
+
+
+def test_income_with_brazilian_number_format(parser):
+    result = parser.parse('Recebi R$ 3.250,75 de salário')
+
+    assert result['type'] == 'Receita'
+    assert result['amount'] == 3250.75
+    assert result['category'] == 'Salário'
+
+
+def test_ambiguous_message_is_low_confidence(parser):
+    assert parser.parse('comprei 2 pizzas por 80')['confidence'] < 0.8
+    assert parser.parse('quanto custa um carro de 50 mil?')['confidence'] < 0.8
+
+
+@pytest.mark.parametrize('text, amount', [
+    ('gastei 2 mil no mercado', 2000.0),
+    ('paguei 1,5 mil de aluguel', 1500.0),
+    ('gastei 3k', 3000.0),
+    ('recebi 2.500 mil', 2500000.0),
+])
+def test_thousand_multipliers_are_applied(parser, text, amount):
+    assert parser.parse(text)['amount'] == amount
+
+
+def test_other_unit_suffix_lowers_confidence(parser):
+    assert parser.parse('gastei 2 mi no mercado')['confidence'] < 0.8
+    assert parser.parse('paguei 3x 100 na farmacia')['confidence'] < 0.8
+
+
+@pytest.mark.parametrize('text', [
+    'não gastei 50 no mercado',
+    'nao paguei 100 da luz',
+    'se eu gastar 200 no mercado',
+    'vou pagar 300 de aluguel',
+])
+def test_negated_and_hypothetical_messages_go_to_llm(parser, text):
+    assert parser.parse(text)['confidence'] == 0.0
+
+
+def test_normalization_and_amount_parsing():
+    assert normalize_message('  Olá,   TUDO bem?! ') == 'ola tudo bem'
+    assert parse_amount('1.500') == 1500.0
+    assert parse_amount('45,5') == 45.5
+    assert parse_amount('12.50') == 12.5
+
+
+# ==================== TESTES: ROTEAMENTO ====================
+
+def test_router_escalates_only_ambiguous_messages():
+    llm_calls = []
+
+    def llm(text, user_id, tenant_id):
+        llm_calls.append(text)
+        return {'intent': 'response', 'response': 'ok', 'confidence': 0.9}
+
+    router = TieredIntentRouter(llm_handler=llm, fallback_handler=lambda t: {'intent': 'unknown'})
+
+    assert router.route('gastei 50 no mercado')['source'] == 'local'
+    assert router.route('Gastei 50 no mercado!')['source'] == 'cache'
+    assert router.route('o que você acha de renda fixa?')['source'] == 'llm'
+    assert router.route('não gastei 50 no mercado')['source'] == 'llm'
+
+    metrics = router.get_metrics()
+    assert llm_calls == ['o que você acha de renda fixa?', 'não gastei 50 no mercado']
+    assert metrics['fast_path_hits'] == 1
+    assert metrics['cache_hits'] == 1
+    assert metrics['fast_path_hit_rate'] == pytest.approx(2 / 4, rel=1e-3)
@@ -0,0 +1,186 @@
+"""
+Testes unitários para o calendário de dias úteis e o motor de apropriação
+"""
+
+import pytest
+import sqlite3
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import services.fixed_income_accrual as accrual_module
+from services.fixed_income_accrual import FixedIncomeAccrual
+from utils.business_days import brazil_holidays, business_days, count_business_days, easter
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def engine(tmp_path):
+    """Banco com o schema do módulo de investimentos e taxas constantes"""
+    path = str(tmp_path / 'investments.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE investments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, tenant_id TEXT, user_id TEXT,
+            name TEXT, investment_type TEXT, amount REAL, interest_rate REAL,
+            interest_type TEXT DEFAULT 'compound', start_date TEXT, maturity_date TEXT,
+            current_value REAL, total_invested REAL, total_earned REAL DEFAULT 0,
+            investment_status TEXT DEFAULT 'active', description TEXT
+        );
+        CREATE TABLE investment_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, investment_id INTEGER, date TEXT,
+            operation_type TEXT, amount REAL, balance_before REAL, balance_after REAL,
+            interest_earned REAL, description TEXT
+        );
+    """)
+    conn.commit()
+    conn.close()
+
+    engine = FixedIncomeAccrual(db_path=path)
+    conn = engine.get_db()
+    engine.ensure_schema(conn)
+    engine.upsert_rates(conn, 'CDI', [('2024-01-01', 10.0)])
+    engine.upsert_rates(conn, 'SELIC', [('2024-01-01', 10.0)])
+    conn.commit()
+    conn.close()
+    return engine
+
+
+def _add(engine, investment_type='CDB', rate=0.0, indexer='PRE', percent=100, start='2025-01-02',
+         amount=1000.0, interest_type='compound', maturity=None):
+    conn = engine.get_db()
+    cursor = conn.execute("""
+        INSERT INTO investments (tenant_id, user_id, name, investment_type, amount, interest_rate,
+            interest_type, start_date, maturity_date, current_value, total_invested, indexer, indexer_percent)
+        VALUES ('t1', 'u1', 'x', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (investment_type, amount, rate, interest_type, start, maturity, amount, amount, indexer, percent))
+    conn.commit()
+    conn.close()
+    return cursor.lastrowid
+
+
+def _value(engine, investment_id):
+    conn = engine.get_db()
+    row = conn.execute("SELECT current_value, last_accrual_date FROM investments WHERE id = ?",
+                       (investment_id,)).fetchone()
+    conn.close()
+    return row['current_value'], row['last_accrual_date']
+
+
+def _date_after_business_days(start, n):
+    return business_days(start, date(start.year + 2, 12, 31))[n - 1]
+
+
+# ==================== TESTES: CALENDÁRIO ====================
+
+def test_movable_and_fixed_holidays():
+    assert easter(2025) == date(2025, 4, 20)
+    holidays = brazil_holidays(2025)
+
+    assert {date(2025, 3, 3), date(2025, 3, 4), date(2025, 4, 18), date(2025, 6, 19)} <= holidays
+    assert date(2025, 11, 20) in holidays
+    assert date(2023, 11, 20) not in brazil_holidays(2023)
+
+
+def test_business_day_count_excludes_start_and_weekends():
+    # Sexta 28/02/2025 -> sexta 07/03/2025: Carnaval (seg/ter) e fim de semana fora
+    assert count_business_days(date(2025, 2, 28), date(2025, 3, 7)) == 3
+    calendar = business_days(date(2025, 1, 1), date(2025, 12, 31))
+    assert count_business_days(date(2025, 2, 28), date(2025, 3, 7), calendar) == 3
+
+
+# ==================== TESTES: APROPRIAÇÃO ====================
+
+def test_prefixed_rate_compounds_over_252_business_days(engine):
+    investment_id = _add(engine, rate=12.0)
+    as_of = _date_after_business_days(date(2025, 1, 2), 252)
+
+    stats = engine.run(as_of=as_of)
+
+    assert stats['accrued'] == 1
+    assert stats['results'][0]['business_days'] == 252
+    assert _value(engine, investment_id) == (1120.0, as_of.isoformat())
+
+
+def test_percent_of_cdi(engine):
+    full = _add(engine, indexer='CDI', percent=100)
+    boosted = _add(engine, indexer='CDI', percent=110)
+    as_of = _date_after_business_days(date(2025, 1, 2), 252)
+
+    engine.run(as_of=as_of)
+
+    daily = 1.10 ** (1 / 252) - 1
+    assert _value(engine, full)[0] == 1100.0
+    assert _value(engine, boosted)[0] == round(1000 * (1 + daily * 1.10) ** 252, 2)
+
+
+def test_incremental_runs_match_single_run(engine):
+    once = _add(engine, indexer='CDI', percent=120, start='2025-01-02')
+    as_of = date(2025, 6, 30)
+    stepwise = FixedIncomeAccrual(db_path=engine.db_path)
+
+    engine.run(as_of=as_of, investment_ids=[once])
+    second = _add(engine, indexer='CDI', percent=120, start='2025-01-02')
+    for month in (2, 3, 4, 5, 6):
+        stepwise.run(as_of=date(2025, month, 15), investment_ids=[second])
+    stepwise.run(as_of=as_of, investment_ids=[second])
+
+    assert _value(engine, once)[0] == pytest.approx(_value(engine, second)[0], abs=0.02)
+    assert engine.run(as_of=as_of)['accrued'] == 0  # nada novo a apropriar
+
+
+def test_numpy_and_python_paths_agree(engine, monkeypatch):
+    _add(engine, rate=11.5)
+    _add(engine, indexer='CDI', percent=95)
+    _add(engine, investment_type='Poupança')
+    _add(engine, rate=6.0, interest_type='simple', maturity='2025-03-31')
+    positions = [dict(r) for r in engine.get_db().execute("SELECT * FROM investments")]
+
+    fast = engine.project(positions, as_of=date(2025, 9, 30))
+    monkeypatch.setattr(accrual_module, 'NUMPY_SUPPORT', False)
+    slow = engine.project(positions, as_of=date(2025, 9, 30))
+
+    assert {k: v['new_value'] for k, v in fast.items()} == {k: v['new_value'] for k, v in slow.items()}
+
+
+def test_poupanca_rule_and_maturity_cap(engine):
+    poupanca = _add(engine, investment_type='Poupança')
+    capped = _add(engine, rate=12.0, maturity='2025-01-31')
+
+    results = engine.run(as_of=date(2025, 12, 31))['results']
+    by_id = {r['id']: r for r in results}
+
+    # SELIC 10% > 8,5%: 0,5% a.m. (~6,17% a.a.)
+    n = by_id[poupanca]['business_days']
+    assert by_id[poupanca]['new_value'] == round(1000 * 1.005 ** (12 * n / 252), 2)
+    assert by_id[capped]['accrual_to'] == '2025-01-31'
+
+
+def test_concurrent_accrual_does_not_duplicate_history(engine, monkeypatch):
+    raced = _add(engine, rate=12.0)
+    free = _add(engine, rate=12.0)
+    as_of = date(2025, 3, 31)
+    compute = engine.compute
+
+    def compute_then_race(positions, *args):
+        results = compute(positions, *args)
+        # Outra execução apropria a primeira posição entre o SELECT e o UPDATE
+        conn = sqlite3.connect(engine.db_path)
+        conn.execute("UPDATE investments SET last_accrual_date = ? WHERE id = ?", (as_of.isoformat(), raced))
+        conn.commit()
+        conn.close()
+        return results
+
+    monkeypatch.setattr(engine, 'compute', compute_then_race)
+    stats = engine.run(as_of=as_of)
+
+    assert (stats['accrued'], stats['conflicts']) == (1, 1)
+    assert [r['id'] for r in stats['results']] == [free]
+    conn = sqlite3.connect(engine.db_path)
+    history = conn.execute("SELECT investment_id FROM investment_history WHERE operation_type = 'interest'").fetchall()
+    conn.close()
+    assert history == [(free,)]
+    assert _value(engine, raced)[0] == 1000.0
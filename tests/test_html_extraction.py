@@ -0,0 +1,96 @@
+"""
+Testes unitários para a extração de HTML e o cache de páginas do scraping
+"""
+
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.html_extraction import available_backends, extract_investidor10, parse_number
+from services.page_cache import PageCache
+
+FIXTURE = os.path.join(os.path.dirname(__file__), '..', 'investidor10_debug.html')
+
+
+@pytest.fixture(scope='module')
+def page():
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+class FakeResponse:
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(response=self)
+
+
+class FakeSession:
+    """Servidor que responde 304 quando o ETag confere"""
+
+    def __init__(self, body, etag='"v1"'):
+        self.body, self.etag = body, etag
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(headers or {})
+        if (headers or {}).get('If-None-Match') == self.etag:
+            return FakeResponse(304)
+        return FakeResponse(200, self.body, {'ETag': self.etag})
+
+
+# ==================== TESTES: EXTRAÇÃO ====================
+
+def test_extracts_price_and_indicators_from_saved_page(page):
+    data = extract_investidor10(page, backend='stdlib')
+
+    assert data['name'] == 'PETROLEO BRASILEIRO S.A. PETROBRAS'
+    assert (data['price'], data['change_percent']) == (30.02, -5.67)
+    assert (data['pl'], data['pvp'], data['dy']) == (5.0, 0.97, 17.25)
+    assert (data['roe'], data['roic'], data['margem_liquida']) == (19.38, 12.74, 15.69)
+    assert (data['liq_corrente'], data['divida_liquida_ebitda']) == (0.76, 1.81)
+
+
+def test_all_installed_backends_agree(page):
+    results = [extract_investidor10(page, backend=name) for name in available_backends()]
+    assert all(result == results[0] for result in results)
+
+
+def test_missing_nodes_and_number_parsing():
+    data = extract_investidor10('<html><title>XPTO3 - Empresa - Cotação</title><h2>Outro</h2></html>',
+                                backend='stdlib')
+
+    assert (data['name'], data['price'], data['roe']) == ('Outro', 0, 0)
+    assert parse_number('R$ 1.234,56') == 1234.56
+    assert parse_number('-') is None
+
+
+# ==================== TESTES: GET CONDICIONAL ====================
+
+def test_conditional_get_reuses_stored_page(tmp_path):
+    cache = PageCache(db_path=str(tmp_path / 'pages.db'))
+    session = FakeSession('<html>página</html>')
+
+    assert cache.fetch(session, 'https://x/petr4') == ('<html>página</html>', False)
+    assert cache.fetch(session, 'https://x/petr4') == ('<html>página</html>', True)
+    assert session.requests[1] == {'If-None-Match': '"v1"'}
+
+
+def test_not_found_raises_and_is_not_stored(tmp_path):
+    cache = PageCache(db_path=str(tmp_path / 'pages.db'))
+
+    class Missing(FakeSession):
+        def get(self, url, headers=None, timeout=None):
+            return FakeResponse(404)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        cache.fetch(Missing(''), 'https://x/fake3')
+    assert cache.load('https://x/fake3') is None
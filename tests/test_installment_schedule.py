@@ -0,0 +1,168 @@
+"""
+Testes unitários para o motor de cronograma de parcelamentos
+"""
+
+import pytest
+import sqlite3
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.card_ledger import CardLedger
+from services.installment_schedule import (
+    build_schedule, schedule_total, write_schedules, pay_pending, cancel_pending,
+    SYSTEM_SIMPLE, SYSTEM_PRICE, SYSTEM_SAC
+)
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def db():
+    """Banco em memória com as colunas usadas pelo motor"""
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE transactions (
+            id TEXT PRIMARY KEY, user_id TEXT, tenant_id TEXT, account_id TEXT,
+            card_id TEXT, category_id TEXT, type TEXT, description TEXT,
+            value REAL, date TEXT, due_date TEXT, status TEXT, paid_at TEXT,
+            installment_id TEXT, installment_number INTEGER, created_at TEXT
+        );
+        CREATE TABLE cards (id TEXT PRIMARY KEY, limit_amount REAL, closing_day INTEGER, due_day INTEGER);
+        CREATE TABLE accounts (id TEXT PRIMARY KEY, current_balance REAL DEFAULT 0);
+        INSERT INTO cards (id, limit_amount, closing_day, due_day) VALUES ('card-1', 5000, 25, 5);
+        INSERT INTO accounts (id, current_balance) VALUES ('acc-1', 5000);
+    """)
+    CardLedger().ensure_schema(conn)
+    yield conn
+    conn.close()
+
+
+def _card_total(db):
+    """Total lançado nas faturas do cartão (ledger por ciclo)"""
+    return db.execute("SELECT COALESCE(SUM(total_cents), 0) FROM card_cycles WHERE card_id = 'card-1'").fetchone()[0] / 100
+
+
+def _plan(card_id=None):
+    return {
+        'user_id': 'u1', 'tenant_id': 't1', 'account_id': 'acc-1',
+        'card_id': card_id, 'category_id': None, 'description': 'Notebook'
+    }
+
+
+# ==================== TESTES: CRONOGRAMA ====================
+
+@pytest.mark.parametrize('system', [SYSTEM_SIMPLE, SYSTEM_PRICE, SYSTEM_SAC])
+def test_principal_is_fully_amortized(system):
+    """A soma das amortizações é exatamente o valor financiado"""
+    schedule = build_schedule(1000, 7, '2025-01-31', 2.5, system)
+
+    assert len(schedule) == 7
+    assert round(sum(item['principal'] for item in schedule), 2) == 1000.00
+    assert schedule[-1]['balance'] == 0
+
+
+def test_no_interest_distributes_cents_exactly():
+    """Sem juros, os centavos restantes vão um para cada uma das primeiras parcelas"""
+    schedule = build_schedule(100, 3, '2025-01-15')
+
+    assert [item['value'] for item in schedule] == [33.34, 33.33, 33.33]
+    assert schedule_total(schedule) == 100.00
+
+
+def test_uneven_total_differs_by_at_most_one_cent():
+    schedule = build_schedule(10.99, 12, '2025-01-15')
+    values = [item['value'] for item in schedule]
+
+    assert values == [0.92] * 7 + [0.91] * 5
+    assert schedule_total(schedule) == 10.99
+
+
+def test_total_smaller_than_count_has_no_negative_installment():
+    schedule = build_schedule(0.05, 7, '2025-01-15')
+
+    assert [item['value'] for item in schedule] == [0.01] * 5 + [0.0] * 2
+    assert all(item['principal'] >= 0 and item['interest'] >= 0 for item in schedule)
+    assert schedule_total(schedule) == 0.05
+
+
+def test_due_dates_clamp_to_month_end():
+    """Vencimento no dia 31 cai no último dia dos meses mais curtos"""
+    schedule = build_schedule(300, 3, '2025-01-31')
+
+    assert [item['due_date'] for item in schedule] == ['2025-01-31', '2025-02-28', '2025-03-31']
+
+
+def test_price_has_constant_installments():
+    """Tabela Price: parcelas fixas (a última ajusta centavos)"""
+    schedule = build_schedule(50000, 48, '2025-01-10', 1.5, SYSTEM_PRICE)
+    values = {item['value'] for item in schedule[:-1]}
+
+    assert values == {1468.75}
+    assert abs(schedule[-1]['value'] - 1468.75) < 0.10
+
+
+def test_sac_has_decreasing_installments():
+    """SAC: amortização constante e parcelas decrescentes"""
+    schedule = build_schedule(1200, 12, '2025-01-10', 1, SYSTEM_SAC)
+
+    assert schedule[0]['value'] == 112.00
+    assert schedule[-1]['value'] == 101.00
+    assert all(a['value'] > b['value'] for a, b in zip(schedule, schedule[1:]))
+
+
+def test_simple_interest_matches_legacy_formula():
+    """Juros simples continua igual ao cálculo original do módulo"""
+    schedule = build_schedule(3000, 10, '2025-01-10', 2, SYSTEM_SIMPLE)
+
+    assert schedule[0]['value'] == round(3000 * (1 + 0.02 * 10) / 10, 2)
+    assert schedule_total(schedule) == 3600.00
+
+
+def test_invalid_system_raises():
+    with pytest.raises(ValueError):
+        build_schedule(100, 2, '2025-01-10', 1, 'alemao')
+
+
+# ==================== TESTES: ESCRITA EM LOTE ====================
+
+def test_write_schedules_inserts_all_rows_into_card_invoices(db):
+    """Vários parcelamentos gravados em um lote; cada parcela na fatura do seu ciclo"""
+    first = build_schedule(1000, 10, '2025-01-10')
+    second = build_schedule(500, 5, '2025-02-10', 1, SYSTEM_PRICE)
+
+    ids = write_schedules(db, [('inst-1', _plan('card-1'), first), ('inst-2', _plan('card-1'), second)])
+
+    assert len(ids['inst-1']) == 10
+    assert len(ids['inst-2']) == 5
+    assert db.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 15
+
+    assert round(_card_total(db), 2) == round(schedule_total(first) + schedule_total(second), 2)
+    cycles = db.execute("SELECT COUNT(*) FROM card_cycles WHERE card_id = 'card-1'").fetchone()[0]
+    assert cycles == 10
+
+
+def test_pay_pending_updates_all_without_touching_balance(db):
+    write_schedules(db, [('inst-1', _plan(), build_schedule(1000, 4, '2025-01-10'))])
+
+    count, total = pay_pending(db, 'inst-1', paid_at='2025-01-11 10:00:00')
+
+    assert (count, total) == (4, 1000.00)
+    assert db.execute("SELECT COUNT(*) FROM transactions WHERE status = 'Pago'").fetchone()[0] == 4
+    assert [row[0] for row in db.execute("SELECT DISTINCT paid_at FROM transactions")] == ['2025-01-11 10:00:00']
+    # O débito na conta é do chamador (unit_of_work.adjust_balance)
+    assert db.execute("SELECT current_balance FROM accounts").fetchone()[0] == 5000
+    assert pay_pending(db, 'inst-1') == (0, 0.0)
+
+
+def test_cancel_pending_keeps_paid_and_refunds_card(db):
+    write_schedules(db, [('inst-1', _plan('card-1'), build_schedule(900, 3, '2025-01-10'))])
+    db.execute("UPDATE transactions SET status = 'Pago' WHERE installment_number = 1")
+
+    deleted, refunded = cancel_pending(db, 'inst-1')
+
+    assert (deleted, refunded) == (2, 600.00)
+    assert db.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 1
+    assert _card_total(db) == 300
@@ -0,0 +1,150 @@
+"""
+Testes unitários para o job runner com eleição de líder
+"""
+
+import pytest
+import sqlite3
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apscheduler.triggers.cron import CronTrigger
+
+from services.job_runner import JobRunner
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'jobs.db')
+
+
+def _runner(db_path):
+    return JobRunner(db_path=db_path, lease_seconds=60, tick_seconds=15)
+
+
+def _set_next_run(db_path, job_id, when):
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE scheduled_jobs SET next_run_at = ? WHERE id = ?",
+                 (when.strftime('%Y-%m-%d %H:%M:%S'), job_id))
+    conn.commit()
+    conn.close()
+
+
+def _runs(db_path, job_id):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT status, trigger, duration_ms FROM job_runs WHERE job_id = ? ORDER BY id",
+                        (job_id,)).fetchall()
+    conn.close()
+    return rows
+
+
+NOW = datetime(2025, 3, 10, 12, 0, 0, tzinfo=timezone.utc)
+DAILY = CronTrigger(hour=0, minute=1, timezone='UTC')
+
+
+# ==================== TESTES: LIDERANÇA ====================
+
+def test_only_one_worker_holds_the_lease(db_path):
+    first, second = _runner(db_path), _runner(db_path)
+
+    assert first.try_acquire_lease(NOW)
+    assert not second.try_acquire_lease(NOW + timedelta(seconds=10))
+    assert first.try_acquire_lease(NOW + timedelta(seconds=30))  # renovação
+
+
+def test_lease_is_taken_over_after_expiry_or_release(db_path):
+    first, second = _runner(db_path), _runner(db_path)
+    first.try_acquire_lease(NOW)
+
+    assert second.try_acquire_lease(NOW + timedelta(seconds=61))
+    assert not first.try_acquire_lease(NOW + timedelta(seconds=62))
+
+    second.release_lease()
+    assert first.try_acquire_lease(NOW + timedelta(seconds=63))
+
+
+# ==================== TESTES: EXECUÇÃO ====================
+
+def test_due_job_runs_once_across_workers(db_path):
+    calls = []
+    workers = [_runner(db_path), _runner(db_path)]
+    for worker in workers:
+        worker.register('daily', lambda: calls.append(1), DAILY)
+
+    _set_next_run(db_path, 'daily', NOW - timedelta(minutes=1))
+
+    assert sum(worker.tick(NOW) for worker in workers) == 1
+    assert sum(worker.tick(NOW + timedelta(seconds=15)) for worker in workers) == 0
+    assert calls == [1]
+    assert _runs(db_path, 'daily')[0][0] == 'success'
+
+
+def test_missed_run_is_caught_up_once_within_grace(db_path):
+    calls = []
+    runner = _runner(db_path)
+    runner.register('daily', lambda: calls.append(1), DAILY, misfire_grace_seconds=23 * 3600)
+
+    # Servidor fora do ar à meia-noite: volta ao meio-dia
+    _set_next_run(db_path, 'daily', NOW.replace(hour=0, minute=1) - timedelta(days=1))
+    runner.tick(NOW)
+
+    status = runner.get_status()['jobs'][0]
+    assert calls == []  # além da tolerância (ontem) -> marcado como perdido
+    assert status['runs'][0]['status'] == 'missed'
+    assert status['next_run_at'] == '2025-03-11 00:01:00'
+
+    _set_next_run(db_path, 'daily', NOW.replace(hour=0, minute=1))
+    runner.tick(NOW)
+
+    assert calls == [1]
+    assert _runs(db_path, 'daily')[-1][:2] == ('success', 'catch-up')
+
+
+def test_max_instances_blocks_overlapping_runs(db_path):
+    runner = _runner(db_path)
+    runner.register('daily', lambda: None, DAILY, max_instances=1)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        INSERT INTO job_runs (job_id, holder, trigger, started_at, status)
+        VALUES ('daily', 'outro-worker', 'schedule', ?, 'running')
+    """, ((NOW - timedelta(minutes=5)).strftime('%Y-%m-%d %H:%M:%S'),))
+    conn.commit()
+    conn.close()
+
+    _set_next_run(db_path, 'daily', NOW - timedelta(seconds=5))
+
+    assert runner.tick(NOW) == 0
+    assert _runs(db_path, 'daily')[-1][0] == 'missed'
+
+
+def test_manual_run_records_history_and_returns_result(db_path):
+    runner = _runner(db_path)
+    runner.register('count', lambda: 42, DAILY)
+
+    assert runner.run_now('count') == 42
+
+    status, trigger, duration_ms = _runs(db_path, 'count')[0]
+    assert (status, trigger) == ('success', 'manual')
+    assert duration_ms >= 0
+
+
+def test_unregistered_job_is_left_for_other_workers(db_path):
+    calls = []
+    runner = _runner(db_path)
+    runner.register('daily', lambda: calls.append('daily'), DAILY)
+    runner.register('notify', lambda: calls.append('notify'), DAILY)
+    runner.unregister('notify')
+
+    _set_next_run(db_path, 'daily', NOW - timedelta(seconds=5))
+    _set_next_run(db_path, 'notify', NOW - timedelta(seconds=5))
+    runner.tick(NOW)
+
+    assert calls == ['daily']
+    assert {job['id']: job['registered_here'] for job in runner.get_status()['jobs']} == {
+        'daily': True, 'notify': False
+    }
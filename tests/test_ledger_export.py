@@ -0,0 +1,151 @@
+"""
+Testes unitários para a exportação de transações em streaming
+"""
+
+import pytest
+import sqlite3
+import gzip
+import json
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.ledger_export import export_transactions, iter_rows
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Banco com duas contas, dois usuários e transações de outro tenant"""
+    path = str(tmp_path / 'export.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE transactions (
+            id TEXT PRIMARY KEY, user_id TEXT, tenant_id TEXT, account_id TEXT,
+            category_id TEXT, card_id TEXT, type TEXT, description TEXT,
+            value REAL, date TEXT, due_date TEXT, paid_at TEXT, status TEXT,
+            notes TEXT, created_at TEXT
+        );
+        CREATE TABLE categories (id TEXT PRIMARY KEY, name TEXT);
+        CREATE TABLE accounts (id TEXT PRIMARY KEY, name TEXT, bank TEXT);
+        CREATE TABLE cards (id TEXT PRIMARY KEY, name TEXT);
+        CREATE TABLE users (id TEXT PRIMARY KEY, email TEXT);
+        INSERT INTO categories VALUES ('cat-1', 'Alimentação');
+        INSERT INTO accounts VALUES ('acc-1', 'Nubank', '260'), ('acc-2', 'Itaú', '341');
+        INSERT INTO users VALUES ('u1', 'u1@bws.com'), ('u2', 'u2@bws.com');
+        INSERT INTO transactions VALUES
+            ('t1', 'u1', 't1', 'acc-1', 'cat-1', NULL, 'Despesa', 'Mercado & Cia', 150.5, '2025-01-10', NULL, NULL, 'Pago', NULL, '2025-01-10 09:00:00'),
+            ('t2', 'u1', 't1', 'acc-2', NULL, NULL, 'Receita', 'Salário', 5000, '2025-01-05', NULL, NULL, 'Pago', NULL, '2025-01-05 08:00:00'),
+            ('t3', 'u2', 't1', 'acc-1', NULL, NULL, 'Despesa', 'Uber', 32, '2025-02-01', NULL, NULL, 'Pendente', NULL, '2025-02-01 22:00:00'),
+            ('t4', 'u9', 't2', 'acc-9', NULL, NULL, 'Despesa', 'Outro tenant', 10, '2025-01-01', NULL, NULL, 'Pago', NULL, '2025-01-01 00:00:00');
+    """)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _export(db_path, **kwargs):
+    return b''.join(export_transactions(db_path, 't1', **kwargs))
+
+
+# ==================== TESTES ====================
+
+def test_export_is_a_lazy_generator(db_path):
+    """Nada é lido do banco até o primeiro bloco ser pedido"""
+    stream = export_transactions(db_path, 't1', user_id='u1')
+
+    assert isinstance(stream, types.GeneratorType)
+    assert isinstance(iter_rows(db_path, 'u1', 't1'), types.GeneratorType)
+
+
+def test_csv_is_chronological_with_signed_brazilian_values(db_path):
+    lines = _export(db_path, user_id='u1').decode('utf-8-sig').splitlines()
+
+    assert lines[0].startswith('data;descricao;valor;tipo')
+    assert lines[1].startswith('2025-01-05;Salário;5000,00;Receita')
+    assert lines[2].startswith('2025-01-10;Mercado & Cia;-150,50;Despesa;Alimentação;Nubank')
+    assert len(lines) == 3
+
+
+def test_filters_and_gzip(db_path):
+    data = gzip.decompress(_export(db_path, user_id='u1', fmt='ndjson', compress=True,
+                                   filters={'start_date': '2025-01-06'}))
+    items = [json.loads(line) for line in data.decode().splitlines()]
+
+    assert [item['id'] for item in items] == ['t1']
+    assert items[0]['category'] == 'Alimentação'
+
+
+def test_tenant_scope_includes_every_user_of_the_tenant_only(db_path):
+    items = [json.loads(line) for line in _export(db_path, fmt='ndjson').decode().splitlines()]
+
+    assert {item['id'] for item in items} == {'t1', 't2', 't3'}
+    assert {item['user_email'] for item in items} == {'u1@bws.com', 'u2@bws.com'}
+
+
+def test_ofx_round_trips_through_importer(db_path, tmp_path):
+    """O OFX exportado é lido pelo BankStatementImporter"""
+    from services.bank_importer import BankStatementImporter
+
+    ofx = _export(db_path, user_id='u1', fmt='ofx')
+    assert ofx.count(b'<STMTRS>') == 2
+
+    path = tmp_path / 'export.ofx'
+    path.write_bytes(ofx)
+    parsed = BankStatementImporter('u1', 't1').parse_ofx(str(path))
+
+    assert sorted((t['date'], t['value'], t['type']) for t in parsed) == [
+        ('2025-01-05', 5000.0, 'Receita'),
+        ('2025-01-10', 150.5, 'Despesa'),
+    ]
+    assert {t['description'] for t in parsed} == {'Salário', 'Mercado & Cia'}
+
+
+def _insert(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(sql)
+    conn.commit()
+    conn.close()
+
+
+def test_csv_neutralizes_spreadsheet_formulas(db_path):
+    _insert(db_path, """
+        INSERT INTO transactions VALUES
+            ('t5', 'u1', 't1', 'acc-1', NULL, NULL, 'Despesa', '=HYPERLINK("http://x","clique")', 10,
+             '2025-01-20', NULL, NULL, 'Pago', NULL, '2025-01-20 10:00:00'),
+            ('t6', 'u1', 't1', 'acc-1', NULL, NULL, 'Despesa', '@SUM(A1)', 5,
+             '2025-01-21', NULL, NULL, 'Pago', NULL, '2025-01-21 10:00:00');
+    """)
+    lines = _export(db_path, user_id='u1').decode('utf-8-sig').splitlines()
+
+    assert lines[3].startswith('2025-01-20;"\'=HYPERLINK(""http://x"",""clique"")";-10,00;Despesa')
+    assert lines[4].startswith("2025-01-21;'@SUM(A1);-5,00;Despesa")
+
+
+def test_ofx_exports_cards_in_a_credit_card_statement(db_path, tmp_path):
+    from services.bank_importer import BankStatementImporter
+
+    _insert(db_path, """
+        INSERT INTO cards VALUES ('card-1', 'Visa');
+        INSERT INTO transactions VALUES
+            ('t7', 'u1', 't1', NULL, NULL, 'card-1', 'Despesa', 'Livraria', 80, '2025-01-12',
+             NULL, NULL, 'Pendente', NULL, '2025-01-12 10:00:00'),
+            ('t8', 'u1', 't1', NULL, NULL, NULL, 'Despesa', 'Sem conta', 9, '2025-01-13',
+             NULL, NULL, 'Pago', NULL, '2025-01-13 10:00:00');
+    """)
+    ofx = _export(db_path, user_id='u1', fmt='ofx').decode()
+
+    assert ofx.count('<STMTRS>') == 2
+    assert ofx.count('<CCSTMTRS>') == 1
+    assert '<ACCTID></ACCTID>' not in ofx
+    assert '<CCACCTFROM><ACCTID>card-1</ACCTID></CCACCTFROM>' in ofx
+    assert ofx.index('</BANKMSGSRSV1>') < ofx.index('<CREDITCARDMSGSRSV1>') < ofx.index('<FITID>t7</FITID>')
+    assert '<FITID>t8</FITID>' not in ofx
+
+    path = tmp_path / 'export.ofx'
+    path.write_text(ofx, encoding='utf-8')
+    parsed = BankStatementImporter('u1', 't1').parse_ofx(str(path))
+    assert sorted(t['value'] for t in parsed) == [80.0, 150.5, 5000.0]
@@ -0,0 +1,180 @@
+"""
+Testes unitários para a instrumentação de desempenho (/metrics, SQL, HTTP externo)
+"""
+
+import os
+import sys
+import json
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask, request
+
+from services import metrics
+from services.metrics import MetricsRegistry, TimedSession, normalize_sql
+
+
+@pytest.fixture
+def registry(monkeypatch, tmp_path):
+    fresh = metrics.create_registry()
+    monkeypatch.setattr(metrics, 'registry', fresh)
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    return fresh
+
+
+class StaticAdapter(BaseAdapter):
+    """Adapter local que responde com um status fixo (sem rede)"""
+
+    def __init__(self, status=200, error=None):
+        super().__init__()
+        self.status, self.error = status, error
+
+    def send(self, request, **kwargs):
+        if self.error:
+            raise self.error
+        response = requests.Response()
+        response.status_code = self.status
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+# ==================== TESTES: FORMATO ====================
+
+def test_normalize_sql_strips_literals_and_in_lists():
+    sql = """SELECT * FROM transactions
+             WHERE user_id = 'abc' AND value > 10.5 AND id IN (?, ?, ?)"""
+
+    assert normalize_sql(sql) == "SELECT * FROM transactions WHERE user_id = ? AND value > ? AND id IN (?...)"
+
+
+def test_render_sums_workers_with_cumulative_buckets():
+    registry = MetricsRegistry()
+    registry.histogram('latency_seconds', 'Latência', ('route',), (0.1, 1))
+    registry.counter('calls_total', 'Chamadas', ('route',))
+    registry.observe('latency_seconds', ('/a',), 0.05)
+    registry.observe('latency_seconds', ('/a',), 0.5)
+    registry.inc('calls_total', ('/a',))
+
+    other = MetricsRegistry()
+    other.histogram('latency_seconds', 'Latência', ('route',), (0.1, 1))
+    other.counter('calls_total', 'Chamadas', ('route',))
+    other.observe('latency_seconds', ('/a',), 5)
+    other.inc('calls_total', ('/a',), 2)
+
+    text = registry.render([registry.snapshot(), other.snapshot()])
+
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+    assert 'calls_total{route="/a"} 3' in text
+    assert '# TYPE latency_seconds histogram' in text
+
+
+# ==================== TESTES: SQLITE ====================
+
+def test_instrumented_connection_times_queries_and_counts_statements(registry, monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, 'SLOW_QUERY_MS', 0)
+    slow = []
+    monkeypatch.setattr(metrics, '_slow_log', slow.append)
+
+    conn = metrics.connect(str(tmp_path / 'db.sqlite'))
+    conn.executescript("CREATE TABLE t (id INTEGER, name TEXT); CREATE TABLE log (n INTEGER);"
+                       "CREATE TRIGGER tr AFTER INSERT ON t BEGIN INSERT INTO log VALUES (NEW.id); END;")
+    conn.execute("INSERT INTO t VALUES (1, 'a')")
+    conn.cursor().execute("SELECT * FROM t WHERE name = 'a'").fetchall()
+    conn.commit()
+    conn.close()
+
+    queries = registry.histograms['db_query_duration_seconds'][('background',)]
+    assert queries[-1] == 3  # executescript + insert + select
+    # O trace callback também vê as instruções do script e do trigger
+    assert registry.counters['db_statements_total'][('background',)] > 3
+    assert any("WHERE name = ?" in line for line in slow)
+
+
+# ==================== TESTES: HTTP EXTERNO ====================
+
+def test_timed_session_records_status_and_errors(registry):
+    session = TimedSession('brapi')
+    session.mount('http://ok/', StaticAdapter(200))
+    session.mount('http://down/', StaticAdapter(error=requests.exceptions.ConnectionError('offline')))
+    session.mount('http://slow/', StaticAdapter(error=requests.exceptions.ReadTimeout('timeout')))
+
+    assert session.get('http://ok/quote').status_code == 200
+    with pytest.raises(requests.exceptions.ConnectionError):
+        session.get('http://down/quote')
+    with pytest.raises(requests.exceptions.Timeout):
+        session.get('http://slow/quote')
+
+    outcomes = {labels[1] for labels in registry.histograms['http_client_duration_seconds']}
+    assert outcomes == {'2xx', 'error', 'timeout'}
+
+
+# ==================== TESTES: MIDDLEWARE ====================
+
+def test_middleware_labels_by_route_and_emits_server_timing(registry, monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, 'SERVER_TIMING_ENABLED', True)
+    db_path = str(tmp_path / 'db.sqlite')
+
+    app = Flask(__name__)
+    metrics.init_app(app)
+
+    @app.route('/items/<int:item_id>')
+    def item(item_id):
+        conn = metrics.connect(db_path)
+        conn.execute("SELECT ?", (item_id,)).fetchone()
+        conn.close()
+        return 'ok'
+
+    client = app.test_client()
+    plain = client.get('/items/1')
+    timed = client.get('/items/2', headers={'X-Server-Timing': '1'})
+    client.get('/nao-existe')
+
+    assert 'Server-Timing' not in plain.headers
+    assert timed.headers['Server-Timing'].startswith('app;dur=')
+    assert 'db;dur=' in timed.headers['Server-Timing']
+
+    series = registry.histograms['http_request_duration_seconds']
+    assert series[('GET', '/items/<int:item_id>', '200')][-1] == 2
+    assert series[('GET', 'unmatched', '404')][-1] == 1
+    assert registry.histograms['db_query_duration_seconds'][('/items/<int:item_id>',)][-1] == 2
+
+
+def test_collect_merges_other_worker_snapshots(registry):
+    registry.observe('http_request_duration_seconds', ('GET', '/dashboard', '200'), 0.2)
+
+    other = metrics.create_registry()
+    other.observe('http_request_duration_seconds', ('GET', '/dashboard', '200'), 0.3)
+    os.makedirs(metrics.METRICS_DIR)
+    with open(os.path.join(metrics.METRICS_DIR, '999999.json'), 'w') as f:
+        json.dump(other.snapshot(), f)
+
+    text = metrics.collect()
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/dashboard",status="200"} 2' in text
+
+
+def test_scrape_denied_uses_token_or_localhost(monkeypatch):
+    app = Flask(__name__)
+    monkeypatch.delenv('METRICS_TOKEN', raising=False)
+    with app.test_request_context('/', environ_base={'REMOTE_ADDR': '127.0.0.1'}):
+        assert metrics.scrape_denied(request) is None
+    with app.test_request_context('/', environ_base={'REMOTE_ADDR': '10.0.0.5'}):
+        assert metrics.scrape_denied(request) == 403
+
+    monkeypatch.setenv('METRICS_TOKEN', 'segredo')
+    with app.test_request_context('/', environ_base={'REMOTE_ADDR': '127.0.0.1'}):
+        assert metrics.scrape_denied(request) == 401
+    with app.test_request_context('/', headers={'Authorization': 'Bearer segredo'},
+                                  environ_base={'REMOTE_ADDR': '10.0.0.5'}):
+        assert metrics.scrape_denied(request) is None
@@ -0,0 +1,149 @@
+"""
+Testes unitários para contadores de notificações e paginação por cursor
+"""
+
+import pytest
+import sqlite3
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from flask import Flask
+
+from services.notification_center import (
+    NotificationCenter, NotificationCategory, ensure_schema, get_counters
+)
+
+
+def _counters(db_path, user_id='u1'):
+    conn = sqlite3.connect(db_path)
+    try:
+        return get_counters(conn, user_id)
+    finally:
+        conn.close()
+
+
+def _insert(conn, count, user_id='u1', status='unread', start=0):
+    conn.executemany("""
+        INSERT INTO notifications (user_id, tenant_id, title, message, category, status, created_at)
+        VALUES (?, 't1', ?, 'msg', 'Sistema', ?, ?)
+    """, [(user_id, f'n{i}', status, f'2025-01-01 10:00:{i % 60:02d}') for i in range(start, start + count)])
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Banco com o schema do NotificationCenter e histórico anterior aos contadores"""
+    monkeypatch.chdir(ROOT)   # migrações são lidas relativas à raiz do projeto
+    path = str(tmp_path / 'notifications.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id TEXT PRIMARY KEY, tenant_id TEXT)")
+    with open('migrations/add_notifications_tables.sql', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    _insert(conn, 5)
+    _insert(conn, 3, status='read', start=5)
+    conn.commit()
+    conn.close()
+    return path
+
+
+# ==================== TESTES: CONTADORES ====================
+
+def test_backfill_runs_once_and_triggers_keep_counts(db_path):
+    center = NotificationCenter(db_path)
+    assert _counters(db_path) == {'total': 8, 'unread': 5}
+
+    # Reaplicar a migração não conta o histórico de novo
+    conn = sqlite3.connect(db_path)
+    ensure_schema(conn, db_path + '-again')
+    conn.close()
+    assert _counters(db_path) == {'total': 8, 'unread': 5}
+
+    new_id = center.create_notification('u1', 't1', 'Nova', 'msg', NotificationCategory.SISTEMA)
+    assert center.get_unread_count('u1') == 6
+
+    assert center.mark_as_read(new_id, 'u1')
+    assert center.mark_as_read(new_id, 'u1')       # idempotente
+    assert _counters(db_path) == {'total': 9, 'unread': 5}
+
+    assert center.mark_all_as_read('u1') == 5
+    assert center.delete_notification(new_id, 'u1')
+    assert _counters(db_path) == {'total': 8, 'unread': 0}
+    assert _counters(db_path, 'u2') == {'total': 0, 'unread': 0}
+
+
+# ==================== TESTES: PAGINAÇÃO ====================
+
+def test_keyset_pages_cover_all_rows_once(db_path):
+    center = NotificationCenter(db_path)
+    conn = sqlite3.connect(db_path)
+    _insert(conn, 4, start=100)   # mesmos created_at de outras linhas: desempate por id
+    conn.commit()
+    conn.close()
+
+    seen, cursor = [], None
+    while True:
+        page = center.get_notifications_page('u1', limit=5, cursor=cursor)
+        seen.extend(n['id'] for n in page['notifications'])
+        if not page['has_more']:
+            break
+        cursor = page['next_cursor']
+
+    assert len(seen) == len(set(seen)) == 12
+    assert center.get_notifications_page('u1', status='unread', limit=50)['has_more'] is False
+    assert len(center.get_user_notifications('u1', status='unread')) == 9
+
+
+def test_blueprint_list_uses_counters_and_raw_meta(db_path, monkeypatch):
+    from services import metrics
+    import routes.notifications as notifications_routes
+
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        ALTER TABLE notifications ADD COLUMN event_type TEXT;
+        ALTER TABLE notifications ADD COLUMN meta TEXT;
+    """)
+    conn.execute("""
+        INSERT INTO notifications (user_id, tenant_id, title, message, category, status, event_type, meta, created_at)
+        VALUES ('u1', 't1', 'Fatura', 'msg', 'Financeiro', 'pending', 'invoice_due_soon', '{"amount": 10.5}',
+                '2025-02-01 09:00:00')
+    """)
+    conn.commit()
+    conn.close()
+    ensure_schema(sqlite3.connect(db_path), db_path)
+
+    monkeypatch.setattr(notifications_routes, 'get_db', lambda: metrics.connect(db_path))
+    monkeypatch.setattr(notifications_routes, 'ensure_notification_schema', lambda db: None)
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(notifications_routes.notifications_bp)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 'u1'
+
+    first = client.get('/api/notifications/?per_page=4').get_json()
+    assert first['total'] == 9
+    assert first['unread'] == 5
+    assert first['notifications'][0]['meta'] == {'amount': 10.5}
+    assert first['has_more'] is True
+
+    second = client.get(f"/api/notifications/?per_page=10&cursor={first['next_cursor']}").get_json()
+    assert len(second['notifications']) == 5
+    assert second['next_cursor'] is None
+
+    filtered = client.get('/api/notifications/?event_type=invoice_due_soon').get_json()
+    assert filtered['total'] is None
+    assert [n['title'] for n in filtered['notifications']] == ['Fatura']
+
+    # Clientes antigos: ?page=N com OFFSET e page/pages na resposta
+    legacy = client.get('/api/notifications/?per_page=4&page=3').get_json()
+    assert (legacy['page'], legacy['pages'], legacy['total']) == (3, 3, 9)
+    assert [n['title'] for n in legacy['notifications']] == [n['title'] for n in second['notifications']][-1:]
+    assert legacy['has_more'] is False
+    assert (first['page'], first['pages'], second['page']) == (1, 3, None)
+
+    legacy_filtered = client.get('/api/notifications/?event_type=invoice_due_soon&page=1').get_json()
+    assert (legacy_filtered['total'], legacy_filtered['pages']) == (1, 1)
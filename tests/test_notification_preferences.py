@@ -0,0 +1,100 @@
+"""
+Testes unitários para o cache de preferências de notificação
+"""
+
+import pytest
+import sqlite3
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.notification_preferences import DEFAULT_SETTINGS, NotificationPreferences
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Banco com as duas tabelas de preferências e um usuário configurado em cada"""
+    path = str(tmp_path / 'prefs.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE notification_preferences (
+            user_id TEXT PRIMARY KEY, enable_email BOOLEAN DEFAULT 1,
+            high_expense_threshold REAL DEFAULT 500.0
+        );
+        CREATE TABLE user_notifications_settings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT UNIQUE,
+            notify_whatsapp INTEGER, opt_in_whatsapp INTEGER, threshold_low_balance REAL
+        );
+        INSERT INTO notification_preferences (user_id, high_expense_threshold) VALUES ('u1', 800);
+        INSERT INTO user_notifications_settings (user_id, notify_whatsapp, opt_in_whatsapp, threshold_low_balance)
+        VALUES ('u1', 0, 1, 250);
+    """)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _update_threshold(db_path, value):
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE notification_preferences SET high_expense_threshold = ? WHERE user_id = 'u1'", (value,))
+    conn.commit()
+    conn.close()
+
+
+# ==================== TESTES: CACHE ====================
+
+def test_get_caches_until_invalidated(db_path):
+    prefs = NotificationPreferences(db_path, ttl_seconds=60)
+
+    assert prefs.get('u1')['high_expense_threshold'] == 800
+    _update_threshold(db_path, 900)
+    assert prefs.get('u1')['high_expense_threshold'] == 800
+    assert prefs.stats['hits'] == 1
+
+    prefs.invalidate('u1')
+    assert prefs.get('u1')['high_expense_threshold'] == 900
+
+
+def test_ttl_expiry_reloads(db_path):
+    prefs = NotificationPreferences(db_path, ttl_seconds=0)
+
+    prefs.get('u1')
+    _update_threshold(db_path, 1000)
+    assert prefs.get('u1')['high_expense_threshold'] == 1000
+
+
+def test_returned_dicts_are_copies(db_path):
+    prefs = NotificationPreferences(db_path, ttl_seconds=60)
+
+    prefs.get('u1')['high_expense_threshold'] = 1
+    assert prefs.get('u1')['high_expense_threshold'] == 800
+
+
+# ==================== TESTES: LOTE ====================
+
+def test_get_settings_many_fills_defaults(db_path):
+    prefs = NotificationPreferences(db_path, ttl_seconds=60)
+
+    settings = prefs.get_settings_many(['u1', 'u2', 'u1'])
+
+    assert list(settings) == ['u1', 'u2']
+    assert settings['u1']['notify_whatsapp'] is False
+    assert settings['u1']['opt_in_whatsapp'] is True
+    assert settings['u1']['threshold_low_balance'] == 250
+    assert settings['u1']['invoice_alert_days'] == DEFAULT_SETTINGS['invoice_alert_days']
+    assert settings['u2'] == DEFAULT_SETTINGS
+    assert prefs.get_many(['u1', 'u2'])['u2'] == {}
+
+    prefs.get_settings_many(['u1', 'u2'])
+    assert prefs.stats['hits'] == 2
+
+
+def test_missing_table_falls_back_without_caching(tmp_path):
+    prefs = NotificationPreferences(str(tmp_path / 'empty.db'), ttl_seconds=60)
+
+    assert prefs.get('u1') == {}
+    assert prefs.get_settings('u1') == DEFAULT_SETTINGS
+    assert prefs.stats['hits'] == 0
@@ -0,0 +1,132 @@
+"""
+Testes unitários para a resolução de remetentes do WhatsApp pelo telefone
+"""
+
+import pytest
+import sqlite3
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.phone_directory import PhoneDirectory, normalize_phone, phone_variants
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Usuários com telefones em formatos variados (um duplicado, um inválido)"""
+    path = str(tmp_path / 'phones.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE users (
+            id TEXT PRIMARY KEY, tenant_id TEXT, email TEXT, name TEXT, phone TEXT,
+            active BOOLEAN DEFAULT 1, created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT INTO users (id, tenant_id, email, name, phone, created_at) VALUES
+            ('u1', 't1', 'a@x.com', 'Ana', '(11) 99999-8888', '2025-01-01'),
+            ('u2', 't1', 'b@x.com', 'Bruno', '+55 21 98888-7777', '2025-01-02'),
+            ('u3', 't2', 'c@x.com', 'Carla', '5511999998888', '2025-01-03'),
+            ('u4', 't2', 'd@x.com', 'Davi', 'não informado', '2025-01-04');
+    """)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _directory(db_path, **kwargs):
+    kwargs.setdefault('ttl_seconds', 60)
+    kwargs.setdefault('negative_ttl_seconds', 60)
+    return PhoneDirectory(db_path, **kwargs)
+
+
+def _execute(db_path, sql, params=()):
+    conn = sqlite3.connect(db_path)
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+# ==================== TESTES: NORMALIZAÇÃO ====================
+
+def test_normalize_phone_formats():
+    assert normalize_phone('5511999998888@c.us') == '+5511999998888'
+    assert normalize_phone('(11) 99999-8888') == '+5511999998888'
+    assert normalize_phone('011 99999-8888') == '+5511999998888'
+    assert normalize_phone('+1 (415) 555-0100') == '+14155550100'
+    assert normalize_phone('0044 20 7946 0958') == '+442079460958'
+    assert normalize_phone('123') is None
+    assert normalize_phone('') is None
+
+
+def test_phone_variants_ninth_digit():
+    assert phone_variants('+5511999998888') == ['+5511999998888', '+551199998888']
+    assert phone_variants('+551199998888') == ['+551199998888', '+5511999998888']
+    assert phone_variants('+551133334444') == ['+551133334444']
+
+
+# ==================== TESTES: SCHEMA / BACKFILL ====================
+
+def test_ensure_schema_backfills_and_skips_duplicates(db_path):
+    directory = _directory(db_path)
+    conn = directory.get_db()
+    directory.ensure_schema(conn)
+    rows = dict(conn.execute("SELECT id, phone_normalized FROM users").fetchall())
+    conn.close()
+
+    # Primeiro cadastro vence o duplicado; inválido fica sem valor
+    assert rows == {'u1': '+5511999998888', 'u2': '+5521988887777', 'u3': None, 'u4': None}
+
+    with pytest.raises(sqlite3.IntegrityError):
+        _execute(db_path, "UPDATE users SET phone_normalized = '+5511999998888' WHERE id = 'u3'")
+
+
+# ==================== TESTES: RESOLUÇÃO ====================
+
+def test_resolve_uses_cache_and_negative_cache(db_path):
+    directory = _directory(db_path)
+
+    assert directory.resolve('5511999998888@c.us')['id'] == 'u1'
+    # Formato antigo (sem o nono dígito) resolve o mesmo usuário
+    assert directory.resolve('551199998888@c.us')['tenant_id'] == 't1'
+    assert directory.resolve('+55 11 99999-8888')['name'] == 'Ana'
+    assert directory.stats['hits'] == 1
+
+    assert directory.resolve('5531977776666@c.us') is None
+    assert directory.resolve('5531977776666@c.us') is None
+    assert directory.stats['negative_hits'] == 1
+
+
+def test_invalidate_after_phone_change(db_path):
+    directory = _directory(db_path)
+    assert directory.resolve('5511999998888')['id'] == 'u1'
+    assert directory.resolve('5531977776666') is None
+
+    _execute(db_path, "UPDATE users SET phone = ?, phone_normalized = ? WHERE id = 'u1'",
+             ('31 97777-6666', '+5531977776666'))
+    assert directory.resolve('5511999998888')['id'] == 'u1'
+
+    directory.invalidate('u1', phones=['31 97777-6666'])
+    assert directory.resolve('5511999998888') is None
+    assert directory.resolve('5531977776666')['id'] == 'u1'
+
+
+def test_external_phone_update_is_renormalized_on_miss(db_path):
+    directory = _directory(db_path)
+    directory.resolve('5511999998888')
+
+    # Script grava só o phone: o trigger limpa o normalizado e o próximo miss preenche
+    _execute(db_path, "UPDATE users SET phone = '+55 41 96666-5555' WHERE id = 'u2'")
+    assert directory.resolve('5541966665555')['id'] == 'u2'
+
+
+def test_lru_evicts_oldest_entry(db_path):
+    directory = _directory(db_path, max_entries=2)
+
+    directory.resolve('5511999998888')
+    directory.resolve('5521988887777')
+    directory.resolve('5511999998888')
+    directory.resolve('5531977776666')
+
+    assert list(directory._cache) == ['+5511999998888', '+5531977776666']
@@ -0,0 +1,132 @@
+"""
+Testes unitários para o principal do request (g.principal e cache por versão)
+"""
+
+import pytest
+import sqlite3
+import os
+import sys
+
+from flask import Flask, g, session
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import services.principal as principal_module
+from services.principal import (
+    PrincipalCache, current_principal, load_principal, principal_for, refresh_principal
+)
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """Usuários u1 e u2 com hash de senha; cache global apontando para o banco temporário"""
+    path = str(tmp_path / 'principal.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE users (
+            id TEXT PRIMARY KEY, tenant_id TEXT, email TEXT, name TEXT,
+            is_admin BOOLEAN DEFAULT 0, phone TEXT, password_hash TEXT
+        );
+        INSERT INTO users VALUES ('u1', 't1', 'ana@x.com', 'Ana', 1, NULL, 'hash-1'),
+                                 ('u2', 't1', 'bia@x.com', 'Bia', 0, NULL, 'hash-2');
+    """)
+    conn.commit()
+    conn.close()
+    cache = PrincipalCache(path, ttl_seconds=60)
+    monkeypatch.setattr(principal_module, 'principal_cache', cache)
+    return cache
+
+
+@pytest.fixture
+def app(cache):
+    app = Flask(__name__)
+    app.secret_key = 'teste'
+    app.before_request(load_principal)
+
+    @app.route('/login/<user_id>')
+    def login(user_id):
+        session['user_id'] = user_id
+        session['principal_version'] = 1
+        return ''
+
+    @app.route('/me')
+    def me():
+        first, second = current_principal(), current_principal()
+        return {'same': first is second, 'principal': g.principal}
+
+    @app.route('/rename')
+    def rename():
+        _execute(cache, "UPDATE users SET name = 'Ana Maria' WHERE id = 'u1'")
+        refresh_principal('u1')
+        return {'name': g.principal['name'], 'user_name': session['user_name']}
+
+    return app
+
+
+def _execute(cache, sql):
+    conn = sqlite3.connect(cache.db_path)
+    conn.executescript(sql)
+    conn.commit()
+    conn.close()
+
+
+# ==================== TESTES: REQUEST ====================
+
+def test_principal_resolved_once_without_password_hash(app, cache):
+    client = app.test_client()
+    client.get('/login/u1')
+
+    first = client.get('/me').get_json()
+    second = client.get('/me').get_json()
+
+    assert first['same'] is True
+    assert first['principal'] == {'id': 'u1', 'tenant_id': 't1', 'email': 'ana@x.com',
+                                  'name': 'Ana', 'is_admin': 1, 'phone': None}
+    assert second == first
+    assert cache.stats == {'hits': 1, 'misses': 1, 'invalidations': 0}
+
+
+def test_anonymous_request_has_no_principal(app, cache):
+    assert app.test_client().get('/me').get_json()['principal'] is None
+    assert cache.stats['misses'] == 0
+
+
+def test_refresh_bumps_session_version_and_reloads(app, cache):
+    client = app.test_client()
+    client.get('/login/u1')
+    client.get('/me')
+
+    assert client.get('/rename').get_json() == {'name': 'Ana Maria', 'user_name': 'Ana Maria'}
+    with client.session_transaction() as sess:
+        assert sess['principal_version'] != 1
+    assert client.get('/me').get_json()['principal']['name'] == 'Ana Maria'
+
+
+# ==================== TESTES: CACHE ====================
+
+def test_other_version_misses_and_ttl_expires(cache):
+    assert cache.get('u1', 1)['name'] == 'Ana'
+    _execute(cache, "UPDATE users SET name = 'Outra' WHERE id = 'u1'")
+
+    # Mesma versão: hit dentro do TTL; versão nova (outro worker) recarrega
+    assert cache.get('u1', 1)['name'] == 'Ana'
+    assert cache.get('u1', 2)['name'] == 'Outra'
+    # Sem versão (user_id por parâmetro): aceita a entrada em cache
+    assert cache.get('u1')['name'] == 'Outra'
+
+    expired = PrincipalCache(cache.db_path, ttl_seconds=0)
+    expired.get('u1')
+    expired.get('u1')
+    assert expired.stats['misses'] == 2
+
+
+def test_principal_for_reuses_session_principal(app, cache):
+    with app.test_request_context('/'):
+        session['user_id'] = 'u1'
+        load_principal()
+        assert principal_for('u1') is g.principal
+        assert principal_for('u2')['name'] == 'Bia'
+        assert principal_for('inexistente') is None
+    assert cache.stats['misses'] == 3
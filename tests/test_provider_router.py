@@ -0,0 +1,118 @@
+"""
+Testes unitários para o roteador de provedores de cotação
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.provider_router import CLOSED, HALF_OPEN, OPEN, ProviderError, ProviderRouter
+
+
+def _router(**kwargs):
+    return ProviderRouter('test', window=20, failure_threshold=3, reset_seconds=kwargs.pop('reset_seconds', 60),
+                          min_timeout=1, min_samples=kwargs.pop('min_samples', 5), **kwargs)
+
+
+def _failing(calls):
+    def fetch(symbol, timeout):
+        calls.append(symbol)
+        raise ProviderError('HTTP 503')
+    return fetch
+
+
+def _quote(price=10.0, delay=0.0, calls=None):
+    def fetch(symbol, timeout):
+        if calls is not None:
+            calls.append(symbol)
+        time.sleep(delay)
+        return {'symbol': symbol, 'price': price}
+    return fetch
+
+
+# ==================== TESTES: CIRCUIT BREAKER ====================
+
+def test_breaker_opens_after_consecutive_failures_and_skips_provider():
+    router = _router()
+    down_calls = []
+    router.register('down', _failing(down_calls), priority=0)
+
+    for _ in range(5):
+        assert router.call('PETR4') == (None, None)
+
+    assert len(down_calls) == 3  # pulado depois de abrir
+    assert router.providers['down'].breaker.state == OPEN
+    assert router.get_stats()['providers'][0]['last_error'] == 'HTTP 503'
+
+
+def test_failing_provider_is_demoted_behind_backup():
+    router = _router()
+    router.register('down', _failing([]), priority=0)
+    router.register('backup', _quote(), priority=1)
+
+    for _ in range(2):
+        assert router.call('PETR4')[1] == 'backup'
+
+    # Demovido antes mesmo de o circuito abrir
+    assert router.providers['down'].breaker.state == CLOSED
+    assert [p.name for p in router.ordered()] == ['backup', 'down']
+
+
+def test_half_open_probe_closes_or_reopens():
+    router = _router(reset_seconds=0.05)
+    healthy = {'up': False}
+
+    def flaky(symbol, timeout):
+        if not healthy['up']:
+            raise ProviderError('timeout')
+        return {'price': 1.0}
+
+    router.register('flaky', flaky, priority=0)
+    for _ in range(3):
+        router.call('X')
+    breaker = router.providers['flaky'].breaker
+
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # só uma chamada de teste
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.reset_seconds == 0.1
+
+    time.sleep(0.11)
+    healthy['up'] = True
+    assert router.call('X') == ({'price': 1.0}, 'flaky')
+    assert breaker.state == CLOSED
+
+
+# ==================== TESTES: ORDENAÇÃO ADAPTATIVA ====================
+
+def test_fast_provider_is_promoted_and_misses_do_not_trip_breaker():
+    router = _router(min_samples=2)
+    router.register('slow', _quote(delay=0.08), priority=0)
+    router.register('fast', _quote(delay=0.0), priority=1)
+    router.register('empty', lambda symbol, timeout: None, priority=2)
+
+    for _ in range(3):
+        router.call_provider('slow', 'PETR4')
+        router.call_provider('fast', 'PETR4')
+        router.call_provider('empty', 'PETR4')
+
+    assert [p.name for p in router.ordered()][:2] == ['fast', 'slow']
+    assert router.call('PETR4')[1] == 'fast'
+    assert router.providers['empty'].breaker.state == CLOSED
+
+    stats = {p['name']: p for p in router.get_stats()['providers']}
+    assert stats['empty']['hit_rate'] == 0 and stats['empty']['error_rate'] == 0
+    assert stats['fast']['timeout_seconds'] == 1  # p95 baixa -> timeout mínimo
+
+
+def test_accepts_filter_and_invalid_results():
+    router = _router()
+    router.register('fii_only', _quote(), priority=0, accepts=lambda s: s.endswith('11'))
+    router.register('zero', _quote(price=0), priority=1)
+
+    is_valid = lambda d: bool(d) and d['price'] > 0
+    assert router.call('HGLG11', is_valid) == ({'symbol': 'HGLG11', 'price': 10.0}, 'fii_only')
+    assert router.call('PETR4', is_valid) == (None, None)
@@ -0,0 +1,152 @@
+"""
+Testes unitários para o serviço de cotações (cache, single-flight, rate limit)
+"""
+
+import os
+import sys
+import time
+import threading
+
+from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import routes.investments as investments_routes
+from routes.investments import investments_bp
+from services.quote_service import QuoteService, SingleFlight, TickerIndex, TokenBucketLimiter
+
+
+def _service(fetcher, **kwargs):
+    return QuoteService(fetcher=fetcher, ttl_seconds=60, negative_ttl_seconds=30,
+                        rate_per_minute=kwargs.pop('rate_per_minute', 60), burst=kwargs.pop('burst', 5))
+
+
+def _slow_fetcher(calls, delay=0.2):
+    def fetch(ticker, is_crypto):
+        calls.append(ticker)
+        time.sleep(delay)
+        return {'name': ticker, 'price': 38.5, 'change': 0.4, 'change_percent': 1.05}
+    return fetch
+
+
+# ==================== TESTES: COALESCÊNCIA E CACHE ====================
+
+def test_concurrent_requests_share_one_fetch():
+    calls = []
+    service = _service(_slow_fetcher(calls))
+    sources = []
+
+    threads = [threading.Thread(target=lambda i=i: sources.append(service.get_quote('petr4', f'ip:{i}')[2]))
+               for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ['PETR4']
+    assert sources.count('MISS') == 1
+    assert set(sources) <= {'MISS', 'COALESCED', 'HIT'}
+
+
+def test_cached_response_and_negative_cache():
+    calls = []
+    service = _service(lambda ticker, crypto: calls.append(ticker) or (
+        {'name': 'Petrobras', 'price': 38.5} if ticker == 'PETR4' else None))
+
+    payload, status, source = service.get_quote('PETR4', 'ip:1')
+    assert (status, source, payload['asset_type']) == (200, 'MISS', 'Ação')
+    assert service.get_quote('PETR4', 'ip:2')[2] == 'HIT'
+
+    assert service.get_quote('XXXX9', 'ip:1')[1] == 404
+    assert service.get_quote('XXXX9', 'ip:1')[1:] == (404, 'HIT')
+    assert calls == ['PETR4', 'XXXX9']
+
+
+def test_leader_error_propagates_to_waiters():
+    flights = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError('provedor fora do ar')
+
+    def waiter():
+        started.wait()
+        try:
+            flights.do('PETR4', failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    try:
+        flights.do('PETR4', failing)
+    except RuntimeError as e:
+        errors.append(str(e))
+    thread.join()
+
+    assert errors == ['provedor fora do ar'] * 2
+
+
+# ==================== TESTES: RATE LIMIT ====================
+
+def test_token_bucket_limits_only_network_fetches():
+    service = _service(lambda ticker, crypto: {'name': ticker, 'price': 10.0}, rate_per_minute=6, burst=2)
+
+    assert service.get_quote('VALE3', 'ip:1')[1] == 200
+    assert service.get_quote('ITUB4', 'ip:1')[1] == 200
+    payload, status, source = service.get_quote('BBAS3', 'ip:1')
+    assert (status, source) == (429, 'LIMITED')
+    assert payload['retry_after'] >= 1
+
+    # Cache não consome fichas; outro cliente tem seu próprio bucket
+    assert service.get_quote('VALE3', 'ip:1')[1:] == (200, 'HIT')
+    assert service.get_quote('BBAS3', 'ip:2')[1] == 200
+
+
+def test_anonymous_limit_keyed_by_forwarded_client(monkeypatch):
+    service = _service(lambda ticker, crypto: {'name': ticker, 'price': 10.0}, rate_per_minute=6, burst=1)
+    monkeypatch.setattr(investments_routes, 'quote_service', service)
+    app = Flask(__name__)
+    app.secret_key = 'teste'
+    app.register_blueprint(investments_bp)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+    client = app.test_client()
+
+    def get(ticker, forwarded_for):
+        return client.get(f'/api/quote/{ticker}', headers={'X-Forwarded-For': forwarded_for},
+                          environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code
+
+    # Todos chegam do IP do nginx; o bucket é o do cliente anotado pelo proxy
+    assert get('VALE3', '200.1.1.1') == 200
+    assert get('ITUB4', '200.1.1.1') == 429
+    assert get('ITUB4', '200.2.2.2') == 200
+    # Entradas forjadas antes da gravada pelo proxy confiável não mudam a chave
+    assert get('BBAS3', '6.6.6.6, 200.1.1.1') == 429
+
+
+def test_token_bucket_refills_over_time():
+    limiter = TokenBucketLimiter(rate_per_minute=600, burst=1)
+
+    assert limiter.allow('c')[0]
+    allowed, retry_after = limiter.allow('c')
+    assert not allowed and 0 < retry_after <= 0.1
+    time.sleep(0.12)
+    assert limiter.allow('c')[0]
+
+
+# ==================== TESTES: ÍNDICE DE TICKERS ====================
+
+def test_ticker_index_prefix_then_name():
+    index = TickerIndex()
+
+    tickers = [r['ticker'] for r in index.search('petr')]
+    assert tickers[:2] == ['PETR3', 'PETR4']
+
+    by_name = index.search('itau', limit=5)
+    assert any(r['ticker'] == 'ITUB4' for r in by_name)
+    assert index.get('hglg11')['type'] == 'FII'
+    assert index.search('') == []
@@ -0,0 +1,149 @@
+"""
+Testes unitários para o cache de renderização (fragmentos, versão dos dados, ETag)
+"""
+
+import os
+import sys
+import sqlite3
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask, g, render_template, render_template_string, request, session
+from jinja2 import DictLoader
+
+from services import render_cache
+from services.render_cache import DataVersions, FragmentCache, FragmentCacheExtension, cached_page
+
+
+def _db(tmp_path):
+    path = str(tmp_path / 'render.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE transactions (id TEXT PRIMARY KEY, user_id TEXT, tenant_id TEXT, value REAL)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _app(tmp_path, monkeypatch, renders):
+    monkeypatch.setattr(render_cache, 'data_versions', DataVersions(_db(tmp_path)))
+    monkeypatch.setattr(render_cache, 'fragment_cache', FragmentCache(max_bytes=1024 * 1024))
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.loader = DictLoader({
+        'page.html': "{% cache 'lista', month %}{{ render() }}{% endcache %}|{{ month }}"
+    })
+
+    def render():
+        renders.append(1)
+        return f"render {len(renders)}"
+
+    @app.route('/login')
+    def login():
+        session['user_id'], session['tenant_id'] = 'u1', 't1'
+        return 'ok'
+
+    @app.route('/page')
+    @cached_page
+    def page():
+        return render_template('page.html', render=render, month=request.args.get('month', '1'))
+
+    return app
+
+
+# ==================== TESTES: LRU ====================
+
+def test_lru_evicts_least_recent_within_byte_budget():
+    cache = FragmentCache(max_bytes=10)
+    cache.set('a', 'aaaa')
+    cache.set('b', 'bbbb')
+    cache.get('a')
+    cache.set('c', 'cccc')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'aaaa'
+    assert cache.get('c') == 'cccc'
+    assert cache.size == 8
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_lru_ignores_values_larger_than_budget():
+    cache = FragmentCache(max_bytes=4)
+    cache.set('a', 'ção!')  # 6 bytes em UTF-8
+
+    assert cache.get('a') is None
+    assert cache.size == 0
+
+
+# ==================== TESTES: VERSÃO DOS DADOS ====================
+
+def test_triggers_bump_tenant_version_on_writes(tmp_path):
+    versions = DataVersions(_db(tmp_path))
+    assert versions.get('t1') == 0
+
+    conn = sqlite3.connect(versions.db_path)
+    conn.execute("INSERT INTO transactions VALUES ('x', 'u1', 't1', 10)")
+    conn.execute("UPDATE transactions SET value = 20 WHERE id = 'x'")
+    conn.commit()
+    assert versions.get('t1') == 2
+    assert versions.get('t2') == 0
+
+    conn.execute("DELETE FROM transactions WHERE id = 'x'")
+    conn.commit()
+    conn.close()
+    assert versions.get('t1') == 3
+
+
+# ==================== TESTES: FRAGMENTOS E ETAG ====================
+
+def test_fragment_is_reused_until_data_changes(tmp_path, monkeypatch):
+    renders = []
+    client = _app(tmp_path, monkeypatch, renders).test_client()
+    client.get('/login')
+
+    first = client.get('/page?month=1').get_data(as_text=True)
+    second = client.get('/page?month=1&x=1').get_data(as_text=True)
+    assert first == second == 'render 1|1'
+
+    # Outro valor de vary gera outro fragmento
+    assert client.get('/page?month=2').get_data(as_text=True) == 'render 2|2'
+
+    conn = sqlite3.connect(render_cache.data_versions.db_path)
+    conn.execute("INSERT INTO transactions VALUES ('x', 'u1', 't1', 10)")
+    conn.commit()
+    conn.close()
+
+    assert client.get('/page?month=1').get_data(as_text=True) == 'render 3|1'
+
+
+def test_etag_returns_304_without_running_the_view(tmp_path, monkeypatch):
+    renders = []
+    client = _app(tmp_path, monkeypatch, renders).test_client()
+    client.get('/login')
+
+    response = client.get('/page')
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    cached = client.get('/page', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+    conn = sqlite3.connect(render_cache.data_versions.db_path)
+    conn.execute("INSERT INTO transactions VALUES ('x', 'u1', 't1', 10)")
+    conn.commit()
+    conn.close()
+
+    changed = client.get('/page', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_fragment_tag_renders_without_scope():
+    app = Flask(__name__)
+    app.jinja_env.add_extension(FragmentCacheExtension)
+
+    with app.app_context():
+        assert g.get('render_scope') is None
+        assert render_template_string("{% cache 'x' %}sem cache{% endcache %}") == 'sem cache'
@@ -0,0 +1,150 @@
+"""
+Testes unitários para retenção, arquivamento e compactação do histórico
+"""
+
+import pytest
+import sqlite3
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.retention import RetentionManager, enable_incremental_vacuum, incremental_vacuum
+
+NOW = datetime(2025, 6, 20, 12, 0, 0)
+
+
+def _ts(days_ago):
+    return (NOW - timedelta(days=days_ago)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def manager(tmp_path):
+    """Banco principal (notificações + logs) e banco da IA com histórico antigo e recente"""
+    app_db = str(tmp_path / 'app.db')
+    conn = sqlite3.connect(app_db)
+    conn.executescript("""
+        CREATE TABLE notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, title TEXT,
+            status TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE notification_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, notification_id INTEGER, channel TEXT,
+            status TEXT, error_message TEXT, sent_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    conn.executemany("INSERT INTO notifications (user_id, title, status, created_at) VALUES (?, ?, ?, ?)", [
+        ('u1', 'antiga lida', 'read', _ts(400)),
+        ('u1', 'antiga não lida', 'unread', _ts(400)),
+        ('u1', 'antiga enviada', 'sent', _ts(200)),
+        ('u1', 'recente', 'read', _ts(10)),
+    ])
+    logs = [(1, 'email', 'sent', _ts(40)) for _ in range(3)]
+    logs += [(1, 'whatsapp', 'failed', _ts(40)), (2, 'email', 'sent', _ts(35)), (3, 'email', 'sent', _ts(1))]
+    conn.executemany("INSERT INTO notification_logs (notification_id, channel, status, sent_at) VALUES (?, ?, ?, ?)", logs)
+    conn.commit()
+    conn.close()
+
+    ai_db = str(tmp_path / 'ai.db')
+    conn = sqlite3.connect(ai_db)
+    conn.executescript("""
+        CREATE TABLE ai_conversations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, tenant_id TEXT,
+            user_message TEXT, ai_response TEXT, context TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    conn.executemany("INSERT INTO ai_conversations (user_id, user_message, ai_response, timestamp) VALUES (?, ?, ?, ?)",
+                     [('u1', f'pergunta {i}', 'x' * 2000, _ts(100 if i < 50 else 1)) for i in range(60)])
+    conn.commit()
+    conn.close()
+
+    return RetentionManager(app_db, ai_db, archive_dir=str(tmp_path / 'archive'))
+
+
+def _rows(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+# ==================== TESTES: ARQUIVAMENTO ====================
+
+def test_run_archives_expired_rows_and_compacts_logs(manager):
+    app_db, ai_db = manager.databases['app'], manager.databases['ai']
+
+    report = manager.run(now=NOW, batch_size=2)
+
+    assert report['done'] is True
+    assert _rows(app_db, "SELECT title FROM notifications ORDER BY id") == [('antiga não lida',), ('recente',)]
+    archived = _rows(manager.archive_path(app_db), "SELECT title FROM notifications ORDER BY id")
+    assert archived == [('antiga lida',), ('antiga enviada',)]
+
+    assert _rows(app_db, "SELECT COUNT(*) FROM notification_logs") == [(1,)]
+    assert _rows(app_db, "SELECT day, channel, status, attempts FROM notification_log_daily ORDER BY day, channel") == [
+        (_ts(40)[:10], 'email', 'sent', 3),
+        (_ts(40)[:10], 'whatsapp', 'failed', 1),
+        (_ts(35)[:10], 'email', 'sent', 1),
+    ]
+
+    assert _rows(ai_db, "SELECT COUNT(*) FROM ai_conversations") == [(10,)]
+    assert _rows(manager.archive_path(ai_db), "SELECT COUNT(*) FROM ai_conversations") == [(50,)]
+    assert report['archived'] == 2 + 5 + 50
+
+    # Segunda execução não encontra nada e não duplica agregados
+    assert manager.run(now=NOW)['archived'] == 0
+    assert _rows(app_db, "SELECT SUM(attempts) FROM notification_log_daily") == [(5,)]
+
+
+def test_archive_table_gains_new_source_columns(manager):
+    app_db = manager.databases['app']
+    manager.run(now=NOW)
+
+    conn = sqlite3.connect(app_db)
+    conn.execute("ALTER TABLE notifications ADD COLUMN meta TEXT")
+    conn.execute("INSERT INTO notifications (user_id, title, status, created_at, meta) VALUES ('u1', 'nova', 'read', ?, '{}')",
+                 (_ts(300),))
+    conn.commit()
+    conn.close()
+
+    manager.run(now=NOW)
+    assert _rows(manager.archive_path(app_db), "SELECT title, meta FROM notifications WHERE meta IS NOT NULL") == [('nova', '{}')]
+
+
+def test_time_budget_stops_between_batches(manager):
+    report = manager.run(now=NOW, batch_size=1, time_budget=0)
+
+    assert report['done'] is False
+    assert report['archived'] == 0
+    assert _rows(manager.databases['ai'], "SELECT COUNT(*) FROM ai_conversations") == [(60,)]
+
+
+# ==================== TESTES: VACUUM ====================
+
+def test_incremental_vacuum_reports_reclaimed_bytes(manager):
+    ai_db = manager.databases['ai']
+    assert enable_incremental_vacuum(ai_db)['auto_vacuum'] == 2
+
+    report = manager.run(now=NOW)
+    vacuum = report['vacuum'][ai_db]
+
+    assert vacuum['auto_vacuum'] == 'incremental'
+    assert vacuum['freelist_after'] == 0
+    assert vacuum['bytes_reclaimed'] > 50 * 2000 * 0.5
+    assert report['bytes_reclaimed'] >= vacuum['bytes_reclaimed']
+
+
+def test_incremental_vacuum_is_noop_without_incremental_mode(manager):
+    conn = sqlite3.connect(manager.databases['app'])
+    conn.execute("DELETE FROM notifications")
+    conn.commit()
+
+    result = incremental_vacuum(conn)
+    conn.close()
+    assert result['auto_vacuum'] == 'none'
+    assert result['bytes_reclaimed'] == 0
@@ -0,0 +1,114 @@
+"""
+Testes unitários para o extrator de atributos de gastos (NotificationAI)
+"""
+
+import pytest
+import sqlite3
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.spending_features import UserColumns, extract, extract_many, load_columns, robust_scores
+from services.notification_ai import NotificationAI
+
+TODAY = date(2025, 6, 20)
+
+
+def _day(days_ago):
+    return (TODAY - timedelta(days=days_ago)).isoformat()
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Banco com dois usuários: u1 com histórico variado, u2 sem transações"""
+    path = str(tmp_path / 'features.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE categories (id TEXT PRIMARY KEY, name TEXT);
+        CREATE TABLE transactions (
+            id TEXT PRIMARY KEY, user_id TEXT, category_id TEXT, type TEXT,
+            description TEXT, value REAL, date TEXT, status TEXT
+        );
+        CREATE TABLE investments (
+            id TEXT PRIMARY KEY, user_id TEXT, amount REAL, current_value REAL, investment_status TEXT
+        );
+        INSERT INTO categories VALUES ('food', 'Alimentação'), ('fun', 'Lazer');
+    """)
+    rows = [('inc', 'u1', None, 'Receita', 'Salário', 5000, TODAY.replace(day=5).isoformat(), 'Pago')]
+    for i in range(40):
+        rows.append((f'f{i}', 'u1', 'food', 'Despesa', f'Mercado {i}', 50 + i % 5, _day(i * 2), 'Pago'))
+    rows += [
+        ('dup1', 'u1', 'fun', 'Despesa', 'Cinema', 40, _day(3), 'Pago'),
+        ('dup2', 'u1', 'fun', 'Despesa', 'Cinema', 40, _day(3), 'Pago'),
+        ('big', 'u1', 'fun', 'Despesa', 'Show', 900, _day(2), 'Pago'),
+        ('pend', 'u1', 'fun', 'Despesa', 'Viagem', 5000, _day(1), 'Pendente'),
+        ('old', 'u1', 'fun', 'Despesa', 'Antigo', 999, _day(200), 'Pago'),
+    ]
+    conn.executemany("INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return path
+
+
+# ==================== TESTES: EXTRAÇÃO ====================
+
+def test_load_columns_reads_window_for_all_users(db_path):
+    conn = sqlite3.connect(db_path)
+    columns = load_columns(conn, ['u1', 'u2'], TODAY - timedelta(days=120))
+    conn.close()
+
+    assert len(columns['u2']) == 0
+    assert len(columns['u1']) == 44          # sem pendente nem fora da janela
+    assert columns['u1'].dates == sorted(columns['u1'].dates)
+
+
+def test_extract_computes_all_features_in_one_pass(db_path):
+    conn = sqlite3.connect(db_path)
+    features = extract_many(conn, ['u1', 'u2'], today=TODAY)
+    conn.close()
+
+    u1 = features['u1']
+    assert u1['duplicates'] == [{'description': 'Cinema', 'value': 40, 'date': _day(3), 'count': 2}]
+    assert u1['period']['current'] > u1['period']['previous'] > 0
+    assert u1['categories']['current']['Lazer'] == 980
+    assert [item['id'] for item in u1['outliers']['items']] == ['big']
+    assert u1['month']['income'] == 5000
+    assert u1['month']['top_categories'][0][0] == 'Lazer'
+
+    assert features['u2']['outliers']['items'] == []
+    assert features['u2']['month']['savings_rate'] is None
+
+
+def test_robust_scores_are_not_inflated_by_outlier():
+    """Com a regra de 3x a média, um gasto grande elevaria a própria referência"""
+    values = [50.0] * 8 + [55.0, 60.0, 400.0]
+    stats = robust_scores(values)
+
+    assert stats['median'] == 50.0
+    assert stats['score'](400.0) > 3.5
+    assert stats['score'](60.0) < 3.5
+
+
+def test_extract_needs_minimum_samples_for_outliers():
+    cols = UserColumns()
+    for i in range(5):
+        cols.append(f't{i}', _day(i), 10 if i else 1000, 'Despesa', None, 'x')
+
+    assert extract(cols, TODAY)['outliers']['items'] == []
+
+
+# ==================== TESTES: NOTIFICATION AI ====================
+
+def test_analyze_users_matches_single_user_analysis(db_path):
+    ai = NotificationAI(db_path)
+
+    single = ai.analyze_spending_patterns('u1', today=TODAY)
+    batch = ai.analyze_users(['u1', 'u2'], today=TODAY)
+
+    assert batch['u1'] == single
+    assert batch['u2'] == []
+    assert {'duplicate', 'unusual_expense'} <= {insight['type'] for insight in single}
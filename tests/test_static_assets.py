@@ -0,0 +1,104 @@
+"""
+Testes unitários para o build de assets estáticos (fingerprint, gzip, manifesto)
+"""
+
+import os
+import sys
+import gzip
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask, render_template_string
+
+from services import static_assets
+from services.static_assets import AssetManifest, MANIFEST_NAME, build, content_hash
+
+
+def _static(tmp_path):
+    static = tmp_path / 'static'
+    (static / 'js').mkdir(parents=True)
+    (static / 'uploads').mkdir()
+    (static / 'js' / 'app.js').write_text('console.log("bws");\n' * 200)
+    (static / 'js' / 'tiny.js').write_text('var a = 1;')
+    (static / 'uploads' / 'extrato.pdf').write_bytes(b'%PDF')
+    return static
+
+
+def _app(static, monkeypatch):
+    dist = str(static / 'dist')
+    monkeypatch.setattr(static_assets, 'DIST_DIR', dist)
+    monkeypatch.setattr(static_assets, 'manifest', AssetManifest(dist))
+
+    app = Flask(__name__, static_folder=str(static))
+    app.jinja_env.globals['asset_url'] = static_assets.asset_url
+
+    @app.route('/static/dist/<path:filename>')
+    def fingerprinted_asset(filename):
+        return static_assets.send_asset(filename)
+
+    return app
+
+
+# ==================== TESTES: BUILD ====================
+
+def test_build_fingerprints_and_precompresses(tmp_path):
+    static = _static(tmp_path)
+    manifest = build(str(static))
+
+    source = (static / 'js' / 'app.js').read_bytes()
+    hashed = f"js/app.{content_hash(source)}.js"
+    assert manifest['assets']['js/app.js'] == hashed
+    assert (static / 'dist' / hashed).read_bytes() == source
+    assert gzip.decompress((static / 'dist' / f"{hashed}.gz").read_bytes()) == source
+
+    # Arquivos pequenos não ganham variante comprimida; uploads ficam fora
+    tiny = manifest['assets']['js/tiny.js']
+    assert not (static / 'dist' / f"{tiny}.gz").exists()
+    assert not any(name.startswith('uploads/') for name in manifest['assets'])
+
+    saved = json.loads((static / 'dist' / MANIFEST_NAME).read_text())
+    assert saved['version'] == manifest['version']
+
+
+def test_build_version_changes_only_with_content(tmp_path):
+    static = _static(tmp_path)
+    first = build(str(static))['version']
+    assert build(str(static))['version'] == first
+
+    (static / 'js' / 'tiny.js').write_text('var a = 2;')
+    assert build(str(static))['version'] != first
+
+
+# ==================== TESTES: RUNTIME ====================
+
+def test_asset_url_uses_manifest_and_falls_back(tmp_path, monkeypatch):
+    static = _static(tmp_path)
+    app = _app(static, monkeypatch)
+
+    with app.test_request_context():
+        assert render_template_string("{{ asset_url('js/app.js') }}") == '/static/js/app.js'
+
+    manifest = build(str(static))
+    static_assets.manifest.reload()
+    with app.test_request_context():
+        assert render_template_string("{{ asset_url('js/app.js') }}") == f"/static/dist/{manifest['assets']['js/app.js']}"
+        assert render_template_string("{{ asset_url('js/nao-existe.js') }}") == '/static/js/nao-existe.js'
+
+
+def test_send_asset_serves_gzip_with_immutable_cache(tmp_path, monkeypatch):
+    static = _static(tmp_path)
+    hashed = build(str(static))['assets']['js/app.js']
+    client = _app(static, monkeypatch).test_client()
+
+    response = client.get(f"/static/dist/{hashed}", headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.mimetype in ('application/javascript', 'text/javascript')
+    assert gzip.decompress(response.data) == (static / 'js' / 'app.js').read_bytes()
+
+    plain = client.get(f"/static/dist/{hashed}", headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.data == (static / 'js' / 'app.js').read_bytes()
@@ -0,0 +1,134 @@
+"""
+Testes unitários para a escrita de transações em lote
+"""
+
+import pytest
+import sqlite3
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.transaction_batch import BatchValidationError, TransactionBatchService
+from services.transaction_service import PostCommitQueue, TransactionService
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def batch(tmp_path):
+    """Usuário u1 com duas contas, um cartão, uma categoria e uma despesa paga"""
+    path = str(tmp_path / 'batch.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE accounts (
+            id TEXT PRIMARY KEY, user_id TEXT, current_balance REAL DEFAULT 0, updated_at TEXT
+        );
+        CREATE TABLE cards (id TEXT PRIMARY KEY, user_id TEXT);
+        CREATE TABLE categories (id TEXT PRIMARY KEY, tenant_id TEXT);
+        CREATE TABLE transactions (
+            id TEXT PRIMARY KEY, user_id TEXT, tenant_id TEXT, account_id TEXT NOT NULL,
+            category_id TEXT, card_id TEXT, type TEXT, description TEXT, value REAL, date DATE,
+            status TEXT DEFAULT 'Pendente', is_fixed BOOLEAN DEFAULT 0, payment_method TEXT,
+            paid_at DATETIME, updated_at DATETIME
+        );
+        INSERT INTO accounts (id, user_id, current_balance) VALUES
+            ('acc-1', 'u1', 1000), ('acc-2', 'u1', 0), ('acc-x', 'u2', 0);
+        INSERT INTO cards (id, user_id) VALUES ('card-1', 'u1');
+        INSERT INTO categories (id, tenant_id) VALUES ('cat-1', 't1'), ('cat-x', 't2');
+        INSERT INTO transactions (id, user_id, tenant_id, account_id, type, description, value, date, status)
+        VALUES ('tx-1', 'u1', 't1', 'acc-1', 'Despesa', 'Mercado', 100, '2025-06-01', 'Pago'),
+               ('tx-2', 'u1', 't1', 'acc-1', 'Despesa', 'Farmácia', 40, '2025-06-02', 'Pago');
+    """)
+    conn.commit()
+    conn.close()
+    transactions = TransactionService(path, hooks=PostCommitQueue(async_mode=False))
+    return TransactionBatchService(path, transactions=transactions)
+
+
+def _query(batch, sql):
+    conn = sqlite3.connect(batch.db_path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def _income(key, value, account_id='acc-2'):
+    return {'op': 'create', 'idempotency_key': key,
+            'data': {'account_id': account_id, 'type': 'Receita', 'description': 'Freela',
+                     'value': value, 'date': '2025-06-10', 'category_id': 'cat-1'}}
+
+
+# ==================== TESTES: APLICAÇÃO ====================
+
+def test_apply_mixed_batch_in_one_commit(batch):
+    result = batch.apply('u1', 't1', [
+        _income('k1', 300),
+        _income('k2', 200),
+        {'op': 'update', 'idempotency_key': 'k3', 'id': 'tx-1', 'data': {'value': 150, 'account_id': 'acc-2'}},
+        {'op': 'delete', 'idempotency_key': 'k4', 'id': 'tx-2'},
+        {'op': 'delete', 'idempotency_key': 'k5', 'id': 'tx-inexistente'},
+    ])
+
+    assert [item['status'] for item in result['results']] == [201, 201, 200, 200, 404]
+    assert [item['index'] for item in result['results']] == [0, 1, 2, 3, 4]
+    assert result['applied'] == 5 and result['replayed'] == 0
+
+    # acc-1: estorna 100 + 40; acc-2: +300 +200 -150
+    assert dict(_query(batch, "SELECT id, current_balance FROM accounts WHERE user_id = 'u1'")) == {
+        'acc-1': 1140, 'acc-2': 350
+    }
+    assert _query(batch, "SELECT COUNT(*) FROM transactions") == [(3,)]
+
+
+def test_replayed_keys_return_stored_results(batch):
+    first = batch.apply('u1', 't1', [_income('k1', 300)])
+    created_id = first['results'][0]['id']
+
+    again = batch.apply('u1', 't1', [_income('k1', 300), _income('k2', 50)])
+
+    assert again['results'][0] == dict(first['results'][0], replayed=True)
+    assert again['results'][0]['id'] == created_id
+    assert again['results'][1]['replayed'] is False
+    assert again['applied'] == 1 and again['replayed'] == 1
+    assert _query(batch, "SELECT current_balance FROM accounts WHERE id = 'acc-2'") == [(350,)]
+
+    # A mesma chave de outro usuário é independente
+    operation = _income('k1', 10, account_id='acc-x')
+    operation['data']['category_id'] = 'cat-x'
+    other = batch.apply('u2', 't2', [operation])
+    assert other['results'][0]['replayed'] is False
+
+
+# ==================== TESTES: VALIDAÇÃO ====================
+
+def test_invalid_batch_writes_nothing(batch):
+    with pytest.raises(BatchValidationError) as error:
+        batch.apply('u1', 't1', [
+            _income('k1', 300),
+            _income('k1', 10),
+            _income('k2', -5),
+            _income('k3', 10, account_id='acc-x'),
+            {'op': 'update', 'idempotency_key': 'k4', 'id': 'tx-1', 'data': {'category_id': 'cat-x'}},
+            {'op': 'delete', 'idempotency_key': 'k5', 'id': 'tx-1'},
+            {'op': 'create', 'idempotency_key': 'k6', 'data': {'account_id': 'acc-1', 'type': 'Despesa',
+                                                             'description': 'TV', 'value': 10,
+                                                             'date': '2025-06-01', 'payment_method': 'credito'}},
+            {'op': 'upsert', 'idempotency_key': 'k7'},
+        ])
+
+    assert [e['index'] for e in error.value.errors] == [1, 2, 3, 4, 5, 6, 7]
+    assert _query(batch, "SELECT COUNT(*) FROM transactions") == [(2,)]
+    assert _query(batch, "SELECT COUNT(*) FROM transaction_idempotency_keys") == [(0,)]
+
+
+def test_empty_or_oversized_batch_is_rejected(batch, monkeypatch):
+    with pytest.raises(BatchValidationError):
+        batch.apply('u1', 't1', [])
+    with pytest.raises(BatchValidationError):
+        batch.apply('u1', 't1', {'op': 'create'})
+
+    monkeypatch.setattr('services.transaction_batch.MAX_BATCH_ITEMS', 1)
+    with pytest.raises(BatchValidationError):
+        batch.apply('u1', 't1', [_income('k1', 1), _income('k2', 1)])
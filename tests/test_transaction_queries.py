@@ -0,0 +1,153 @@
+"""
+Testes unitários para a listagem de transações por cursor (keyset)
+"""
+
+import pytest
+import sqlite3
+import os
+import sys
+
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import routes.accounts as accounts_routes
+import services.principal as principal_module
+import services.transaction_queries as transaction_queries
+from routes.accounts import accounts_bp
+from services.principal import PrincipalCache
+from services.transaction_queries import decode_cursor, encode_cursor, fetch_page, fetch_totals
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Usuário u1 com 7 transações na conta acc-1 (datas repetidas) e uma de u2"""
+    path = str(tmp_path / 'queries.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE users (
+            id TEXT PRIMARY KEY, tenant_id TEXT, email TEXT, name TEXT, is_admin BOOLEAN, phone TEXT
+        );
+        CREATE TABLE accounts (id TEXT PRIMARY KEY, user_id TEXT, tenant_id TEXT);
+        CREATE TABLE categories (id TEXT PRIMARY KEY, name TEXT, icon TEXT, color TEXT);
+        CREATE TABLE cards (id TEXT PRIMARY KEY, name TEXT);
+        CREATE TABLE transactions (
+            id TEXT PRIMARY KEY, user_id TEXT, tenant_id TEXT, account_id TEXT, category_id TEXT,
+            card_id TEXT, description TEXT, value REAL, type TEXT, date DATE, created_at DATETIME,
+            status TEXT, is_fixed BOOLEAN DEFAULT 0
+        );
+        INSERT INTO users VALUES ('u1', 't1', 'ana@x.com', 'Ana', 0, NULL), ('u2', 't1', 'bia@x.com', 'Bia', 0, NULL);
+        INSERT INTO accounts VALUES ('acc-1', 'u1', 't1'), ('acc-2', 'u2', 't1');
+        INSERT INTO transactions (id, user_id, tenant_id, account_id, description, value, type, date, created_at) VALUES
+            ('tx-1', 'u1', 't1', 'acc-1', 'A', 10, 'Despesa', '2025-06-01', '2025-06-01 08:00:00'),
+            ('tx-2', 'u1', 't1', 'acc-1', 'B', 20, 'Despesa', '2025-06-02', '2025-06-02 08:00:00'),
+            ('tx-3', 'u1', 't1', 'acc-1', 'C', 30, 'Receita', '2025-06-02', '2025-06-02 08:00:00'),
+            ('tx-4', 'u1', 't1', 'acc-1', 'D', 40, 'Despesa', '2025-06-02', '2025-06-02 09:00:00'),
+            ('tx-5', 'u1', 't1', 'acc-1', 'E', 50, 'Despesa', '2025-06-03', NULL),
+            ('tx-6', 'u1', 't1', 'acc-1', 'F', 60, 'Receita', '2025-06-04', '2025-06-04 08:00:00'),
+            ('tx-7', 'u1', 't1', 'acc-1', 'G', 70, 'Despesa', '2025-06-05', '2025-06-05 08:00:00'),
+            ('tx-x', 'u2', 't1', 'acc-2', 'X', 99, 'Despesa', '2025-06-05', '2025-06-05 08:00:00');
+    """)
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def db(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def client(db_path, monkeypatch):
+    def get_db():
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    monkeypatch.setattr(accounts_routes, 'get_db', get_db)
+    monkeypatch.setattr(principal_module, 'principal_cache', PrincipalCache(db_path))
+    app = Flask(__name__)
+    app.register_blueprint(accounts_bp)
+    return app.test_client()
+
+
+EXPECTED_ORDER = ['tx-7', 'tx-6', 'tx-5', 'tx-4', 'tx-3', 'tx-2', 'tx-1']
+
+
+def _ids(rows):
+    return [row['id'] for row in rows]
+
+
+# ==================== TESTES: KEYSET ====================
+
+def test_cursor_walk_matches_full_order_without_gaps(db):
+    seen, cursor = [], None
+    while True:
+        page = fetch_page(db, 'u1', 't1', cursor=cursor, limit=2)
+        seen.extend(_ids(page['transactions']))
+        if not page['has_more']:
+            assert page['next_cursor'] is None
+            break
+        cursor = page['next_cursor']
+
+    # Empates de date/created_at desempatados por id; created_at NULL preenchido pela migração
+    assert seen == EXPECTED_ORDER
+    assert db.execute("SELECT created_at FROM transactions WHERE id = 'tx-5'").fetchone()[0] == '2025-06-03 00:00:00'
+
+
+def test_invalid_cursor_restarts_and_filters_apply(db):
+    assert _ids(fetch_page(db, 'u1', 't1', cursor='lixo', limit=2)['transactions']) == ['tx-7', 'tx-6']
+    assert decode_cursor(encode_cursor({'date': '2025-06-02', 'created_at': 'x', 'id': 'tx-3'})) == \
+        ('2025-06-02', 'x', 'tx-3')
+
+    filters = {'type': 'Receita', 'start_date': '2025-06-02'}
+    assert _ids(fetch_page(db, 'u1', 't1', filters)['transactions']) == ['tx-6', 'tx-3']
+    assert fetch_totals(db, 'u1', 't1', filters) == {
+        'total_transactions': 2, 'total_receitas': 90.0, 'total_despesas': 0.0
+    }
+
+
+def test_failed_migration_is_retried(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(transaction_queries, '_indexes_ready', set())
+    monkeypatch.setattr(transaction_queries, 'MIGRATION_PATH', str(tmp_path / 'nao-existe.sql'))
+    transaction_queries.ensure_indexes(db)
+    assert transaction_queries._indexes_ready == set()
+
+    monkeypatch.undo()
+    monkeypatch.setattr(transaction_queries, '_indexes_ready', set())
+    transaction_queries.ensure_indexes(db)
+    assert len(transaction_queries._indexes_ready) == 1
+    indexes = {row[1] for row in db.execute("PRAGMA index_list(transactions)")}
+    assert 'idx_transactions_account_keyset' in indexes
+
+
+# ==================== TESTES: PÁGINA LEGADA ====================
+
+def test_legacy_page_maps_to_cursor(client):
+    body = client.get('/api/accounts/acc-1/transactions?user_id=u1&limit=3&page=2').get_json()
+
+    assert _ids(body['transactions']) == ['tx-4', 'tx-3', 'tx-2']
+    assert body['pagination'] == {'limit': 3, 'page': 2, 'total': 7, 'pages': 3,
+                                  'next_cursor': body['pagination']['next_cursor'], 'has_more': True}
+
+
+def test_legacy_page_past_the_end_is_empty(client):
+    body = client.get('/api/accounts/acc-1/transactions?user_id=u1&limit=3&page=4').get_json()
+
+    assert body['transactions'] == []
+    assert body['pagination']['has_more'] is False
+
+
+def test_legacy_page_uses_capped_limit(client, monkeypatch):
+    monkeypatch.setattr(transaction_queries, 'MAX_PAGE_SIZE', 3)
+    body = client.get('/api/accounts/acc-1/transactions?user_id=u1&limit=500&page=2').get_json()
+
+    assert _ids(body['transactions']) == ['tx-4', 'tx-3', 'tx-2']
+    assert body['pagination']['limit'] == 3
+    assert body['pagination']['pages'] == 3
@@ -0,0 +1,151 @@
+"""
+Testes unitários para a unidade de trabalho de transações
+"""
+
+import pytest
+import sqlite3
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.transaction_service import PostCommitQueue, TransactionService
+
+
+# ==================== FIXTURES ====================
+
+@pytest.fixture
+def service(tmp_path):
+    """Banco com duas contas e a fila pós-commit síncrona"""
+    path = str(tmp_path / 'uow.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE accounts (
+            id TEXT PRIMARY KEY, current_balance REAL DEFAULT 0, updated_at TEXT
+        );
+        CREATE TABLE transactions (
+            id TEXT PRIMARY KEY, user_id TEXT, tenant_id TEXT, account_id TEXT,
+            description TEXT, value REAL, type TEXT, status TEXT DEFAULT 'Pendente',
+            updated_at TEXT
+        );
+        INSERT INTO accounts (id, current_balance) VALUES ('acc-1', 1000), ('acc-2', 0);
+    """)
+    conn.commit()
+    conn.close()
+    return TransactionService(path, hooks=PostCommitQueue(async_mode=False))
+
+
+def _balances(service):
+    conn = sqlite3.connect(service.db_path)
+    try:
+        return dict(conn.execute("SELECT id, current_balance FROM accounts"))
+    finally:
+        conn.close()
+
+
+def _count(service):
+    conn = sqlite3.connect(service.db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _expense(value, status='Pago', account_id='acc-1'):
+    return {'user_id': 'u1', 'tenant_id': 't1', 'account_id': account_id,
+            'description': 'Mercado', 'value': value, 'type': 'Despesa', 'status': status}
+
+
+# ==================== TESTES: SALDO ====================
+
+def test_add_update_delete_apply_balance_deltas(service):
+    with service.unit_of_work() as uow:
+        expense_id = uow.add(**_expense(100))
+        uow.add(**_expense(50, status='Pendente'))
+        uow.add(user_id='u1', tenant_id='t1', account_id='acc-2', description='Salário',
+                value=300, type='Receita', status='Pago')
+    assert _balances(service) == {'acc-1': 900, 'acc-2': 300}
+
+    # Troca de conta e valor: estorna na antiga, lança na nova
+    with service.unit_of_work() as uow:
+        assert uow.update(expense_id, user_id='u1', account_id='acc-2', value=40) is True
+        assert uow.update('inexistente', user_id='u1', value=1) is False
+    assert _balances(service) == {'acc-1': 1000, 'acc-2': 260}
+
+    with service.unit_of_work() as uow:
+        assert uow.delete(expense_id, user_id='outro') is False
+        assert uow.delete(expense_id, user_id='u1') is True
+    assert _balances(service) == {'acc-1': 1000, 'acc-2': 300}
+
+
+def test_add_many_and_explicit_adjustment(service):
+    with service.unit_of_work() as uow:
+        ids = uow.add_many([_expense(10), _expense(20), dict(_expense(30), status='Pendente')])
+        uow.adjust_balance('acc-2', -5)
+
+    assert len(set(ids)) == 3
+    assert _count(service) == 3
+    assert _balances(service) == {'acc-1': 970, 'acc-2': -5}
+
+
+# ==================== TESTES: COMMIT / ROLLBACK ====================
+
+def test_exception_rolls_back_rows_deltas_and_hooks(service):
+    calls = []
+
+    with pytest.raises(RuntimeError):
+        with service.unit_of_work() as uow:
+            uow.add(**_expense(100))
+            uow.after_commit(calls.append, 'notificar')
+            raise RuntimeError('falha no meio')
+
+    assert _count(service) == 0
+    assert _balances(service) == {'acc-1': 1000, 'acc-2': 0}
+    assert calls == []
+
+
+def test_hooks_run_only_after_commit(service):
+    calls = []
+
+    def hook(label):
+        conn = sqlite3.connect(service.db_path)
+        calls.append((label, conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]))
+        conn.close()
+
+    uow = service.unit_of_work()
+    uow.add(**_expense(100))
+    uow.after_commit(hook, 'gasto alto')
+    assert calls == []
+
+    uow.commit()
+    uow.conn.close()
+    assert calls == [('gasto alto', 1)]
+    assert service.hooks.stats == {'submitted': 1, 'done': 1, 'failed': 0}
+
+
+def test_async_queue_isolates_hook_failures():
+    hooks = PostCommitQueue(async_mode=True)
+    calls = []
+
+    def broken():
+        raise ValueError('smtp fora do ar')
+
+    hooks.submit(broken)
+    hooks.submit(calls.append, 'ok')
+    hooks.drain()
+
+    assert calls == ['ok']
+    assert hooks.stats == {'submitted': 2, 'done': 1, 'failed': 1}
+
+
+def test_caller_connection_is_shared_and_not_closed(service):
+    conn = service.connect()
+    conn.execute("UPDATE accounts SET updated_at = 'antes' WHERE id = 'acc-2'")
+
+    with service.unit_of_work(conn) as uow:
+        uow.add(**_expense(100))
+
+    # Conexão continua utilizável e a escrita anterior entrou no mesmo commit
+    assert conn.execute("SELECT updated_at FROM accounts WHERE id = 'acc-2'").fetchone()[0] == 'antes'
+    conn.close()
+    assert _balances(service)['acc-1'] == 900
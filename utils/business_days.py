@@ -0,0 +1,80 @@
+"""
+Calendário de dias úteis brasileiro (convenção 252, feriados nacionais ANBIMA)
+
+Os feriados são calculados (datas fixas + móveis a partir da Páscoa), então o
+calendário não depende de rede nem de arquivo externo.
+"""
+
+from bisect import bisect_right
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import List, Set
+
+BUSINESS_DAYS_PER_YEAR = 252
+
+
+def easter(year: int) -> date:
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+@lru_cache(maxsize=256)
+def brazil_holidays(year: int) -> frozenset:
+    """Feriados nacionais que fecham o mercado financeiro no ano"""
+    fixed = [
+        (1, 1),    # Confraternização Universal
+        (4, 21),   # Tiradentes
+        (5, 1),    # Dia do Trabalho
+        (9, 7),    # Independência
+        (10, 12),  # Nossa Senhora Aparecida
+        (11, 2),   # Finados
+        (11, 15),  # Proclamação da República
+        (12, 25),  # Natal
+    ]
+    if year >= 2024:
+        fixed.append((11, 20))  # Dia Nacional de Zumbi e da Consciência Negra (Lei 14.759/2023)
+
+    holidays: Set[date] = {date(year, m, d) for m, d in fixed}
+
+    sunday = easter(year)
+    holidays.update({
+        sunday - timedelta(days=48),  # Carnaval (segunda)
+        sunday - timedelta(days=47),  # Carnaval (terça)
+        sunday - timedelta(days=2),   # Sexta-feira Santa
+        sunday + timedelta(days=60),  # Corpus Christi
+    })
+    return frozenset(holidays)
+
+
+def is_business_day(day: date) -> bool:
+    return day.weekday() < 5 and day not in brazil_holidays(day.year)
+
+
+def business_days(start: date, end: date) -> List[date]:
+    """Dias úteis no intervalo (start, end] - o dia inicial já foi remunerado"""
+    days = []
+    current = start + timedelta(days=1)
+    while current <= end:
+        if is_business_day(current):
+            days.append(current)
+        current += timedelta(days=1)
+    return days
+
+
+def count_business_days(start: date, end: date, calendar: List[date] = None) -> int:
+    """Quantidade de dias úteis em (start, end]; usa o calendário pré-calculado se dado"""
+    if end <= start:
+        return 0
+    if calendar is not None:
+        return bisect_right(calendar, end) - bisect_right(calendar, start)
+    return len(business_days(start, end))
@@ -179,27 +179,19 @@ def insert_transaction_from_whatsapp(data: dict, sender: str) -> str:
         
         category_id = category['id'] if category else None
         
-        # Inserir transação
-        transaction_id = str(uuid.uuid4())
-        
-        db.execute("""
-            INSERT INTO transactions (
-                id, user_id, tenant_id, account_id, category_id,
-                description, value, type, date, is_fixed, created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0, CURRENT_TIMESTAMP)
-        """, (
-            transaction_id,
-            user['id'],
-            user['tenant_id'],
-            account_id,
-            category_id,
-            data.get('description', 'Via WhatsApp'),
-            data.get('amount', 0),
-            data.get('type', 'Despesa'),
-            data.get('date', datetime.now().strftime('%Y-%m-%d'))
-        ))
-        
-        db.commit()
+        # Inserir transação (unidade de trabalho: um commit junto com a conta criada acima)
+        with transaction_service.unit_of_work(db) as uow:
+            transaction_id = uow.add(
+                user_id=user['id'],
+                tenant_id=user['tenant_id'],
+                account_id=account_id,
+                category_id=category_id,
+                description=data.get('description', 'Via WhatsApp'),
+                value=data.get('amount', 0),
+                type=data.get('type', 'Despesa'),
+                date=data.get('date', datetime.now().strftime('%Y-%m-%d')),
+                is_fixed=0
+            )
         db.close()
         
         whatsapp_logger.info(f"✅ Transação inserida: {transaction_id}")